@@ -0,0 +1,9 @@
+"""Audit logging helpers shared by OFAIR services."""
+
+from .sink import AuditSink, get_audit_sink, sqlalchemy_writer
+
+__all__ = [
+    "AuditSink",
+    "get_audit_sink",
+    "sqlalchemy_writer",
+]
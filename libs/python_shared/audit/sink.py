@@ -0,0 +1,167 @@
+"""Batched, asynchronous audit log writer.
+
+Request handlers enqueue audit records and return; a background task writes
+them in batches, grouped per stream (table), once `batch_size` records are
+waiting or `flush_interval_ms` has passed since the first one.
+
+The buffer is bounded: when it is full, `submit` waits for room, which
+slows producers down instead of dropping records. Failed batches are retried
+and then written row by row, so one bad record cannot take its batch down
+with it. `stop` drains and flushes everything that was accepted.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Writes a list of records to the named stream
+AuditWriter = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+_STOP = object()
+
+
+class AuditSink:
+    """Bounded in-memory buffer flushed to the database in batches."""
+
+    def __init__(
+        self,
+        writer: AuditWriter,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval_ms: int = 200,
+        max_retries: int = 3
+    ):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_retries = max_retries
+        self._queue: "asyncio.Queue" = asyncio.Queue(maxsize=max_buffer)
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if not self.running:
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, stream: str, record: Dict[str, Any]) -> None:
+        """Queue a record, waiting for room while the buffer is full.
+
+        Without a running worker (not started yet, or stopped during
+        shutdown) the record is written immediately.
+        """
+        if not self.running:
+            await self._write([(stream, record)])
+            return
+
+        await self._queue.put((stream, record))
+
+    async def stop(self) -> None:
+        """Flush every queued record and stop the background task."""
+        if not self.running:
+            return
+
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        streams: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for stream, record in batch:
+            streams.setdefault(stream, []).append(record)
+
+        for stream, records in streams.items():
+            if await self._write_with_retry(stream, records):
+                continue
+
+            # Isolate the records the database rejects
+            for record in records:
+                try:
+                    await self.writer(stream, [record])
+                except Exception as e:
+                    logger.error(f"Dropping audit record for {stream}: {e} - {record}")
+
+    async def _write_with_retry(self, stream: str, records: List[Dict[str, Any]]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                await self.writer(stream, records)
+                return True
+            except Exception as e:
+                logger.error(
+                    f"Audit batch write to {stream} failed "
+                    f"({len(records)} records, attempt {attempt + 1}): {e}"
+                )
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        return False
+
+
+def sqlalchemy_writer(tables: Dict[str, Any]) -> AuditWriter:
+    """Writer inserting each batch into `tables[stream]` with one multi-row INSERT."""
+    from ..database.connection import async_engine
+
+    async def write(stream: str, records: List[Dict[str, Any]]) -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(tables[stream].insert(), records)
+
+    return write
+
+
+_sink: Optional[AuditSink] = None
+
+
+def get_audit_sink() -> AuditSink:
+    """Get the process-wide sink for the shared audit tables."""
+    global _sink
+
+    if _sink is None:
+        from ..database.models import AdminAuditLog, ContactAccessLog
+
+        settings = get_settings()
+        _sink = AuditSink(
+            sqlalchemy_writer({
+                ContactAccessLog.__tablename__: ContactAccessLog.__table__,
+                AdminAuditLog.__tablename__: AdminAuditLog.__table__,
+            }),
+            max_buffer=settings.audit_buffer_size,
+            batch_size=settings.audit_batch_size,
+            flush_interval_ms=settings.audit_flush_interval_ms
+        )
+
+    return _sink
@@ -0,0 +1,21 @@
+"""Authentication helpers shared by OFAIR services."""
+
+from .principal import (
+    PRINCIPAL_INVALIDATION_CHANNEL,
+    REVOKED_TOKENS_CHANNEL,
+    REVOKED_TOKENS_INDEX,
+    PrincipalResolver,
+    get_principal_resolver,
+    publish_principal_invalidation,
+    revoke_token,
+)
+
+__all__ = [
+    "PRINCIPAL_INVALIDATION_CHANNEL",
+    "REVOKED_TOKENS_CHANNEL",
+    "REVOKED_TOKENS_INDEX",
+    "PrincipalResolver",
+    "get_principal_resolver",
+    "publish_principal_invalidation",
+    "revoke_token",
+]
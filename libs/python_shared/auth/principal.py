@@ -0,0 +1,378 @@
+"""Authenticated principal resolution shared by service dependencies.
+
+Resolving the caller of a request used to cost a JWT decode, a Redis GET for
+the revocation marker and one or two database queries. This module keeps
+three small in-process caches so most requests pay none of those:
+
+* verified JWT payloads, keyed by token, until the token (or the cache TTL)
+  expires;
+* revoked token ids, mirrored from Redis and kept current through pub/sub;
+* the (user, professional) pair of each principal, for a short TTL, dropped
+  whenever a service publishes a principal invalidation.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config.settings import get_settings
+from ..database.models import Professional, User
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_INVALIDATION_CHANNEL = "principal_invalidation"
+REVOKED_TOKENS_CHANNEL = "revoked_tokens"
+REVOKED_TOKENS_INDEX = "revoked_tokens_index"
+REVOKED_TOKENS_BACKFILLED = "revoked_tokens_index:backfilled"
+
+# Keys read per round trip while backfilling the revoked tokens index
+_BACKFILL_BATCH_SIZE = 500
+
+# Marks a principal whose professional profile has not been loaded yet
+_NOT_LOADED = object()
+
+
+class TokenVerificationCache:
+    """LRU cache of verified JWT payloads keyed by the raw token."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Get the cached payload for a token, if still valid."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+
+        payload, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[token]
+            return None
+
+        self._entries.move_to_end(token)
+        return payload
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Cache a verified payload until the token or the TTL expires."""
+        expires_at = time.time() + self.ttl_seconds
+        if payload.get("exp"):
+            expires_at = min(expires_at, float(payload["exp"]))
+
+        self._entries[token] = (payload, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class RevokedTokenSet:
+    """Local mirror of revoked token ids, synced from Redis."""
+
+    def __init__(self, sync_interval_seconds: int = 30):
+        self.sync_interval_seconds = sync_interval_seconds
+        self._expires: Dict[str, float] = {}
+        self._synced_at: Optional[float] = None
+
+    @property
+    def is_fresh(self) -> bool:
+        """Whether the local set is recent enough to answer on its own."""
+        if self._synced_at is None:
+            return False
+        return time.monotonic() - self._synced_at < self.sync_interval_seconds * 2
+
+    def add(self, jti: str, expires_at: float) -> None:
+        self._expires[jti] = expires_at
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self._expires.get(jti)
+        if expires_at is None:
+            return False
+        if time.time() >= expires_at:
+            del self._expires[jti]
+            return False
+        return True
+
+    async def sync(self, redis_client) -> None:
+        """Reload every unexpired revocation from the Redis index."""
+        now = time.time()
+        await redis_client.zremrangebyscore(REVOKED_TOKENS_INDEX, "-inf", now)
+        entries = await redis_client.zrangebyscore(
+            REVOKED_TOKENS_INDEX, now, "+inf", withscores=True
+        )
+        self._expires = {jti: score for jti, score in entries}
+        self._synced_at = time.monotonic()
+
+    async def backfill(self, redis_client) -> int:
+        """Index revocations written before REVOKED_TOKENS_INDEX existed.
+
+        Runs once per Redis: the marker is set only after every
+        ``revoked_token:<jti>`` key has been added, and re-adding an indexed
+        token is harmless, so concurrent or interrupted runs are safe.
+        """
+        if await redis_client.exists(REVOKED_TOKENS_BACKFILLED):
+            return 0
+
+        added = 0
+        batch = []
+        async for key in redis_client.scan_iter(
+            match="revoked_token:*", count=_BACKFILL_BATCH_SIZE
+        ):
+            batch.append(key)
+            if len(batch) >= _BACKFILL_BATCH_SIZE:
+                added += await _index_revocations(redis_client, batch)
+                batch = []
+        if batch:
+            added += await _index_revocations(redis_client, batch)
+
+        await redis_client.set(REVOKED_TOKENS_BACKFILLED, "1")
+        if added:
+            logger.info(f"Backfilled {added} revoked tokens into {REVOKED_TOKENS_INDEX}")
+        return added
+
+    async def is_revoked(self, redis_client, jti: Optional[str]) -> bool:
+        """Check a token id locally, or in Redis while the mirror is stale."""
+        if not jti:
+            return False
+        if self.is_fresh:
+            return self.contains(jti)
+        return bool(await redis_client.get(f"revoked_token:{jti}"))
+
+
+async def _index_revocations(redis_client, keys) -> int:
+    """Add revoked_token:<jti> keys to the index, expiring with their TTL."""
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.ttl(key)
+    ttls = await pipe.execute()
+
+    now = time.time()
+    entries = {}
+    for key, ttl in zip(keys, ttls):
+        if isinstance(key, bytes):
+            key = key.decode()
+        # -2: already gone; -1: no expiry, revoked for good
+        if ttl == -2:
+            continue
+        entries[key.split(":", 1)[1]] = now + ttl if ttl >= 0 else float("inf")
+
+    if entries:
+        await redis_client.zadd(REVOKED_TOKENS_INDEX, entries, nx=True)
+    return len(entries)
+
+
+class PrincipalCache:
+    """Short-TTL cache of (user, professional) per user id.
+
+    Cached instances are detached from the session that loaded them and are
+    merged into the caller's session without a query, so they behave like
+    freshly loaded rows.
+    """
+
+    def __init__(self, ttl_seconds: int = 30, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def _entry(self, user_id: str) -> Optional[list]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[2]:
+            del self._entries[user_id]
+            return None
+        return entry
+
+    def get_user(self, db: Session, user_id: str) -> Optional[User]:
+        """Get a user, from the cache when possible."""
+        key = str(user_id)
+        entry = self._entry(key)
+        if entry is not None:
+            return db.merge(entry[0], load=False)
+
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+
+        cached, user = _detach_for_cache(db, user)
+        self._entries[key] = [cached, _NOT_LOADED, time.monotonic() + self.ttl_seconds]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return user
+
+    def get_professional(self, db: Session, user: User) -> Optional[Professional]:
+        """Get the professional profile of a user, from the cache when possible."""
+        entry = self._entry(str(user.id))
+        if entry is not None and entry[1] is not _NOT_LOADED:
+            return db.merge(entry[1], load=False) if entry[1] is not None else None
+
+        professional = db.query(Professional).filter(
+            Professional.user_id == user.id
+        ).first()
+
+        if entry is not None:
+            if professional is not None:
+                entry[1], professional = _detach_for_cache(db, professional)
+            else:
+                entry[1] = None
+        return professional
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _detach_for_cache(db: Session, instance):
+    """Detach a freshly loaded instance for caching.
+
+    Returns the detached instance and an identical copy attached to `db`.
+    The detached one is never expired by a later commit in `db`.
+    """
+    db.expunge(instance)
+    return instance, db.merge(instance, load=False)
+
+
+class PrincipalResolver:
+    """Resolves token claims and principals through the local caches."""
+
+    def __init__(
+        self,
+        principal_ttl_seconds: int = 30,
+        token_cache_size: int = 10000,
+        token_cache_ttl_seconds: int = 300,
+        revoked_sync_seconds: int = 30
+    ):
+        self.tokens = TokenVerificationCache(token_cache_size, token_cache_ttl_seconds)
+        self.revoked = RevokedTokenSet(revoked_sync_seconds)
+        self.principals = PrincipalCache(principal_ttl_seconds)
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def verify_token(
+        self,
+        token: str,
+        decode: Callable[[str], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Decode a token with `decode`, reusing earlier successful results."""
+        payload = self.tokens.get(token)
+        if payload is None:
+            payload = decode(token)
+            self.tokens.put(token, payload)
+        return payload
+
+    async def is_revoked(self, redis_client, jti: Optional[str]) -> bool:
+        return await self.revoked.is_revoked(redis_client, jti)
+
+    def get_user(self, db: Session, user_id: str) -> Optional[User]:
+        return self.principals.get_user(db, user_id)
+
+    def get_professional(self, db: Session, user: User) -> Optional[Professional]:
+        return self.principals.get_professional(db, user)
+
+    def start(self, redis_client) -> None:
+        """Start syncing revocations and invalidations from Redis."""
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_loop(redis_client))
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def _sync_loop(self, redis_client) -> None:
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(PRINCIPAL_INVALIDATION_CHANNEL, REVOKED_TOKENS_CHANNEL)
+                await self.revoked.backfill(redis_client)
+                await self.revoked.sync(redis_client)
+                next_sync = time.monotonic() + self.revoked.sync_interval_seconds
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        self._handle_message(message)
+
+                    if time.monotonic() >= next_sync:
+                        await self.revoked.sync(redis_client)
+                        next_sync = time.monotonic() + self.revoked.sync_interval_seconds
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # While disconnected the revoked set goes stale and checks
+                # fall back to Redis; cached principals expire by TTL
+                logger.error(f"Principal cache sync failed: {e}")
+                self.principals.clear()
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        channel = message.get("channel")
+        data = message.get("data")
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        if channel == PRINCIPAL_INVALIDATION_CHANNEL:
+            if data == "*":
+                self.principals.clear()
+            else:
+                self.principals.invalidate(data)
+        elif channel == REVOKED_TOKENS_CHANNEL:
+            jti, _, expires_at = data.partition(":")
+            self.revoked.add(jti, float(expires_at or time.time() + 3600))
+
+
+_resolver: Optional[PrincipalResolver] = None
+
+
+def get_principal_resolver() -> PrincipalResolver:
+    """Get the process-wide principal resolver."""
+    global _resolver
+
+    if _resolver is None:
+        settings = get_settings()
+        _resolver = PrincipalResolver(
+            principal_ttl_seconds=settings.principal_cache_ttl_seconds,
+            token_cache_size=settings.token_cache_size,
+            token_cache_ttl_seconds=settings.token_cache_ttl_seconds,
+            revoked_sync_seconds=settings.revoked_tokens_sync_seconds
+        )
+
+    return _resolver
+
+
+async def publish_principal_invalidation(redis_client, user_id: str) -> None:
+    """Tell every service to drop its cached principal for a user."""
+    await redis_client.publish(PRINCIPAL_INVALIDATION_CHANNEL, str(user_id))
+
+
+async def revoke_token(redis_client, jti: str, ttl_seconds: int = 3600) -> None:
+    """Revoke a token id and broadcast it to the local revoked sets."""
+    expires_at = time.time() + ttl_seconds
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.setex(f"revoked_token:{jti}", ttl_seconds, "1")
+    pipe.zadd(REVOKED_TOKENS_INDEX, {jti: expires_at})
+    pipe.publish(REVOKED_TOKENS_CHANNEL, f"{jti}:{expires_at}")
+    await pipe.execute()
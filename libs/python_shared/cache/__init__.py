@@ -0,0 +1,17 @@
+"""Response caches shared by OFAIR services."""
+
+from .lead_board import (
+    LEAD_BOARD_VERSION_KEY,
+    LeadBoardCache,
+    bump_leads_version,
+    bump_professional_board_version,
+    professional_board_version_key,
+)
+
+__all__ = [
+    "LEAD_BOARD_VERSION_KEY",
+    "LeadBoardCache",
+    "bump_leads_version",
+    "bump_professional_board_version",
+    "professional_board_version_key",
+]
@@ -0,0 +1,146 @@
+"""Lead board response cache with version-based invalidation.
+
+A board is cached per (professional, filters) as its serialized JSON response.
+Entries are never deleted; they go stale when one of two counters moves:
+
+* the professional's board version, bumped when the professional sends a
+  proposal or asks for a refresh. It is part of the cache key, so a bump
+  simply points the professional at new keys.
+* the global leads version, bumped when a lead is created, updated or
+  closed. Every entry is stamped with the version it was computed at, since
+  a new lead touches every board and recomputing them all at once would
+  stampede the database.
+
+Stale entries are served while a single request, holding a short Redis lock,
+recomputes the board (stale-while-revalidate). Superseded keys expire on
+their own TTL, so no pattern deletes are ever needed.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LEAD_BOARD_VERSION_KEY = "lead_board:version"
+
+_ENTRY_SEPARATOR = "|"
+
+
+def professional_board_version_key(professional_id) -> str:
+    return f"lead_board:version:{professional_id}"
+
+
+async def bump_leads_version(redis_client) -> None:
+    """Mark every cached board stale after a lead was created, updated or closed."""
+    try:
+        await redis_client.incr(LEAD_BOARD_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to bump lead board version: {e}")
+
+
+async def bump_professional_board_version(redis_client, professional_id) -> None:
+    """Drop one professional's cached boards."""
+    try:
+        await redis_client.incr(professional_board_version_key(professional_id))
+    except Exception as e:
+        logger.warning(f"Failed to bump lead board version of {professional_id}: {e}")
+
+
+class LeadBoardCache:
+    """Stale-while-revalidate cache of serialized lead boards."""
+
+    def __init__(
+        self,
+        redis_client,
+        fresh_seconds: int = 300,
+        stale_seconds: int = 600,
+        lock_seconds: int = 30
+    ):
+        self.redis_client = redis_client
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.lock_seconds = lock_seconds
+
+    @staticmethod
+    def _filters_digest(filters: Dict[str, Any]) -> str:
+        encoded = json.dumps(filters, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+    async def get_or_compute(
+        self,
+        professional_id,
+        filters: Dict[str, Any],
+        compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        """
+        Get a professional's board JSON, computing it when missing or stale.
+
+        Args:
+            professional_id: Professional the board belongs to
+            filters: Request parameters the board depends on
+            compute: Builds the serialized board
+
+        Returns:
+            The serialized board; possibly stale while another request refreshes it
+        """
+        try:
+            professional_version, leads_version = await self.redis_client.mget(
+                professional_board_version_key(professional_id), LEAD_BOARD_VERSION_KEY
+            )
+            leads_version = leads_version or "0"
+            key = (
+                f"lead_board:{professional_id}:v{professional_version or 0}:"
+                f"{self._filters_digest(filters)}"
+            )
+            entry = await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Lead board cache unavailable: {e}")
+            return await compute()
+
+        stale_payload: Optional[str] = None
+        if entry:
+            version, fresh_until, payload = entry.split(_ENTRY_SEPARATOR, 2)
+            if version == leads_version and time.time() < float(fresh_until):
+                return payload
+
+            # Stale: one request revalidates, the others keep serving the old board
+            try:
+                locked = await self.redis_client.set(
+                    f"{key}:lock", "1", nx=True, ex=self.lock_seconds
+                )
+            except Exception as e:
+                logger.warning(f"Failed to lock lead board {key}, serving the stale one: {e}")
+                return payload
+            if not locked:
+                return payload
+            stale_payload = payload
+
+        try:
+            payload = await compute()
+        except Exception:
+            if stale_payload is None:
+                raise
+            logger.exception(f"Failed to revalidate lead board {key}, serving the stale one")
+            return stale_payload
+        finally:
+            if stale_payload is not None:
+                try:
+                    await self.redis_client.delete(f"{key}:lock")
+                except Exception as e:
+                    # The lock expires on its own after lock_seconds
+                    logger.warning(f"Failed to unlock lead board {key}: {e}")
+
+        fresh_until = time.time() + self.fresh_seconds
+        try:
+            await self.redis_client.set(
+                key,
+                _ENTRY_SEPARATOR.join((leads_version, f"{fresh_until:.0f}", payload)),
+                ex=self.fresh_seconds + self.stale_seconds
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache lead board {key}: {e}")
+
+        return payload
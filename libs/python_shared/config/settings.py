@@ -25,6 +25,17 @@ class Settings(BaseSettings):
     jwt_algorithm: str = Field(default="HS256", alias="JWT_ALGORITHM")
     jwt_expire_minutes: int = Field(default=1440, alias="JWT_EXPIRE_MINUTES")
     
+    # Principal caching
+    principal_cache_ttl_seconds: int = Field(default=30, alias="PRINCIPAL_CACHE_TTL_SECONDS")
+    token_cache_size: int = Field(default=10000, alias="TOKEN_CACHE_SIZE")
+    token_cache_ttl_seconds: int = Field(default=300, alias="TOKEN_CACHE_TTL_SECONDS")
+    revoked_tokens_sync_seconds: int = Field(default=30, alias="REVOKED_TOKENS_SYNC_SECONDS")
+    
+    # Audit logging
+    audit_buffer_size: int = Field(default=10000, alias="AUDIT_BUFFER_SIZE")
+    audit_batch_size: int = Field(default=500, alias="AUDIT_BATCH_SIZE")
+    audit_flush_interval_ms: int = Field(default=200, alias="AUDIT_FLUSH_INTERVAL_MS")
+    
     # S3/MinIO
     s3_endpoint: Optional[str] = Field(default=None, alias="S3_ENDPOINT")
     s3_access_key: str = Field(..., alias="S3_ACCESS_KEY")
@@ -51,6 +62,14 @@ class Settings(BaseSettings):
     greenapi_id_instance: Optional[str] = Field(default=None, alias="GREENAPI_ID_INSTANCE")
     greenapi_api_token: Optional[str] = Field(default=None, alias="GREENAPI_API_TOKEN")
     
+    # Internal services
+    notifications_service_url: str = Field(
+        default="http://notifications-service:8007", alias="NOTIFICATIONS_SERVICE_URL"
+    )
+    new_lead_notification_template_id: Optional[str] = Field(
+        default=None, alias="NEW_LEAD_NOTIFICATION_TEMPLATE_ID"
+    )
+    
     # Platform Settings
     platform_commission_consumer: int = Field(default=10, alias="PLATFORM_COMMISSION_CONSUMER")
     platform_commission_professional: int = Field(default=5, alias="PLATFORM_COMMISSION_PROFESSIONAL")
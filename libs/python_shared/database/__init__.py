@@ -22,6 +22,8 @@ from .models import (
     # Support and Audit
     Notification, ContactAccessLog, PhoneRevelation,
     ProfessionalRating, Project, AdminAuditLog,
+    ProfessionalScorecard, ProfessionalActivityDay,
+    LeadCategoryStats, LeadCategoryDay,
 )
 
 __all__ = [
@@ -48,4 +50,6 @@ __all__ = [
     # Support and Audit
     "Notification", "ContactAccessLog", "PhoneRevelation",
     "ProfessionalRating", "Project", "AdminAuditLog",
+    "ProfessionalScorecard", "ProfessionalActivityDay",
+    "LeadCategoryStats", "LeadCategoryDay",
 ]
\ No newline at end of file
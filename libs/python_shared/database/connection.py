@@ -1,7 +1,7 @@
 """Database connection and session management."""
 
-from typing import Generator
-from sqlalchemy import create_engine
+from typing import Generator, Optional
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
 from ..config.settings import get_settings
@@ -67,10 +67,67 @@ async def get_async_session() -> Generator[AsyncSession, None, None]:
             await session.close()
 
 
+# Row Level Security context
+#
+# The context is kept in session.info and applied with transaction-scoped
+# set_config(..., true) by an after_begin hook, so it is sent as the first
+# statement of every transaction the session opens and is cleared by the
+# commit or rollback that ends it. Nothing leaks to the next user of a
+# pooled connection, and no extra commit is needed.
+
+RLS_CONTEXT_KEY = "rls_context"
+_RLS_APPLIED_KEY = "rls_context_applied"
+
+_RLS_STATEMENT = text(
+    "SELECT set_config('app.current_user_id', :user_id, true), "
+    "set_config('app.current_professional_id', :professional_id, true)"
+)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_rls_context(session: Session, transaction, connection) -> None:
+    """Apply the session's RLS context at the start of each transaction."""
+    context = session.info.get(RLS_CONTEXT_KEY)
+    if context is not None:
+        connection.execute(_RLS_STATEMENT, context)
+        session.info[_RLS_APPLIED_KEY] = (transaction, context)
+
+
+def _rls_params(user_id: str, professional_id: Optional[str]) -> dict:
+    return {
+        "user_id": str(user_id),
+        "professional_id": str(professional_id) if professional_id else "",
+    }
+
+
+def _needs_apply(session: Session, context: dict) -> bool:
+    """Whether the open transaction has not seen this context yet."""
+    return session.info.get(_RLS_APPLIED_KEY) != (session.get_transaction(), context)
+
+
 def set_rls_context(db: Session, user_id: str, professional_id: str = None) -> None:
     """Set Row Level Security context for the session."""
-    if professional_id:
-        db.execute(f"SELECT set_current_user_context('{user_id}', '{professional_id}')")
-    else:
-        db.execute(f"SELECT set_current_user_context('{user_id}')")
-    db.commit()
\ No newline at end of file
+    context = _rls_params(user_id, professional_id)
+    db.info[RLS_CONTEXT_KEY] = context
+
+    # A transaction already in progress gets the context right away
+    if db.in_transaction():
+        db.connection()
+        if _needs_apply(db, context):
+            db.execute(_RLS_STATEMENT, context)
+            db.info[_RLS_APPLIED_KEY] = (db.get_transaction(), context)
+
+
+async def set_async_rls_context(
+    db: AsyncSession, user_id: str, professional_id: str = None
+) -> None:
+    """Set Row Level Security context for an async session."""
+    context = _rls_params(user_id, professional_id)
+    sync_session = db.sync_session
+    sync_session.info[RLS_CONTEXT_KEY] = context
+
+    if db.in_transaction():
+        await db.connection()
+        if _needs_apply(sync_session, context):
+            await db.execute(_RLS_STATEMENT, context)
+            sync_session.info[_RLS_APPLIED_KEY] = (sync_session.get_transaction(), context)
@@ -1,16 +1,16 @@
 """SQLAlchemy database models for OFAIR platform."""
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional, List
 from enum import Enum as PyEnum
 
 from sqlalchemy import (
-    Boolean, DateTime, Enum, ForeignKey, Index, Integer, Numeric, String, Text,
-    CheckConstraint, UniqueConstraint, func
+    Boolean, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, Numeric, String, Text,
+    CheckConstraint, UniqueConstraint, DDL, event, func
 )
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -178,6 +178,19 @@ class Professional(Base):
     specialties: Mapped[Optional[List[str]]] = mapped_column(ARRAY(String))
     location: Mapped[str] = mapped_column(String(500), nullable=False)
     
+    # Geocoded service area, filled from location on first use and cleared
+    # by the professionals_location_reset trigger when location changes
+    city: Mapped[Optional[str]] = mapped_column(String(100))
+    region: Mapped[Optional[str]] = mapped_column(String(50))
+    latitude: Mapped[Optional[float]] = mapped_column(Float)
+    longitude: Mapped[Optional[float]] = mapped_column(Float)
+    service_radius_km: Mapped[Optional[int]] = mapped_column(
+        Integer, comment="Distance the professional travels for work"
+    )
+    geocode_attempted_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), comment="Last time location was sent to the geocoder"
+    )
+    
     # Rating and verification
     rating: Mapped[Optional[Decimal]] = mapped_column(
         Numeric(3, 2), default=Decimal("0.00"),
@@ -189,6 +202,9 @@ class Professional(Base):
         Enum(ProfessionalStatus), default=ProfessionalStatus.PENDING
     )
     
+    # Full-text search document, maintained by the professionals_search_vector trigger
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+    
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="professional_profile")
     created_leads: Mapped[List["Lead"]] = relationship(
@@ -226,11 +242,128 @@ class Professional(Base):
         Index("idx_professionals_rating", "rating"),
         Index("idx_professionals_status", "status"),
         Index("idx_professionals_is_verified", "is_verified"),
+        Index("idx_professionals_search_vector", "search_vector", postgresql_using="gin"),
+        Index("idx_professionals_specialties", "specialties", postgresql_using="gin"),
+        Index(
+            "idx_professionals_profession_trgm", "profession",
+            postgresql_using="gin", postgresql_ops={"profession": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_professionals_company_name_trgm", "company_name",
+            postgresql_using="gin", postgresql_ops={"company_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_professionals_location_trgm", "location",
+            postgresql_using="gin", postgresql_ops={"location": "gin_trgm_ops"}
+        ),
         CheckConstraint("rating >= 0.00 AND rating <= 5.00", name="check_rating_range"),
         CheckConstraint("review_count >= 0", name="check_review_count_positive"),
     )
 
 
+# Public directory order (verified, rating, reviews, id), read backwards for
+# keyset pagination over active professionals
+Index(
+    "idx_professionals_directory",
+    Professional.is_verified,
+    func.coalesce(Professional.rating, 0),
+    func.coalesce(Professional.review_count, 0),
+    Professional.id,
+    postgresql_where=Professional.status == ProfessionalStatus.ACTIVE,
+)
+
+# New-lead recipients: active professionals of a category in a region or city
+# (specialties are matched through idx_professionals_specialties)
+Index(
+    "idx_professionals_region_profession",
+    Professional.region,
+    Professional.profession,
+    postgresql_where=Professional.status == ProfessionalStatus.ACTIVE,
+)
+Index(
+    "idx_professionals_city_profession",
+    Professional.city,
+    Professional.profession,
+    postgresql_where=Professional.status == ProfessionalStatus.ACTIVE,
+)
+
+# Hebrew has no stemmer in PostgreSQL: documents use the 'simple' config over
+# lowercased text with niqqud and cantillation marks removed (maqaf kept as a
+# word separator), and queries are normalized the same way. Every table with
+# a search document installs the function with its own DDL, so each one can
+# be created on its own.
+SEARCH_TEXT_FUNCTION_DDL = """
+    CREATE OR REPLACE FUNCTION professional_search_text(value TEXT)
+    RETURNS TEXT AS $$
+        SELECT regexp_replace(lower(coalesce(value, '')), '[\\u0591-\\u05BD\\u05BF-\\u05C7]', '', 'g')
+    $$ LANGUAGE sql IMMUTABLE
+"""
+
+PROFESSIONAL_SEARCH_DDL = [
+    # No-ops after create_all; they add the column and its index to an
+    # existing professionals table
+    "ALTER TABLE professionals ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE INDEX IF NOT EXISTS idx_professionals_search_vector
+        ON professionals USING gin (search_vector)
+    """,
+    SEARCH_TEXT_FUNCTION_DDL,
+    """
+    CREATE OR REPLACE FUNCTION professionals_search_vector_update()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', professional_search_text(NEW.profession)), 'A') ||
+            setweight(to_tsvector('simple', professional_search_text(NEW.company_name)), 'A') ||
+            setweight(to_tsvector('simple', professional_search_text(array_to_string(NEW.specialties, ' '))), 'B') ||
+            setweight(to_tsvector('simple', professional_search_text(NEW.location)), 'C');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS professionals_search_vector ON professionals",
+    """
+    CREATE TRIGGER professionals_search_vector
+        BEFORE INSERT OR UPDATE OF profession, company_name, specialties, location ON professionals
+        FOR EACH ROW EXECUTE FUNCTION professionals_search_vector_update()
+    """,
+    # Backfill rows written before the trigger existed (no-op on a new table)
+    "UPDATE professionals SET profession = profession WHERE search_vector IS NULL",
+]
+
+# A changed location invalidates the geocoded service area; it is geocoded
+# again the next time the professional is considered for a lead
+PROFESSIONAL_LOCATION_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION professionals_location_reset()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.location IS DISTINCT FROM OLD.location THEN
+            NEW.city := NULL;
+            NEW.region := NULL;
+            NEW.latitude := NULL;
+            NEW.longitude := NULL;
+            NEW.geocode_attempted_at := NULL;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS professionals_location_reset ON professionals",
+    """
+    CREATE TRIGGER professionals_location_reset
+        BEFORE UPDATE OF location ON professionals
+        FOR EACH ROW EXECUTE FUNCTION professionals_location_reset()
+    """,
+]
+
+for _statement in PROFESSIONAL_SEARCH_DDL + PROFESSIONAL_LOCATION_DDL:
+    event.listen(
+        Professional.__table__, "after_create",
+        DDL(_statement).execute_if(dialect="postgresql")
+    )
+
+
 class UserProfile(Base):
     """Consumer user profile and preferences."""
     
@@ -289,6 +422,9 @@ class Lead(Base):
         Numeric(12, 2), comment="Final agreed amount after proposal acceptance"
     )
     
+    # Full-text search document, maintained by the leads_search_vector trigger
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+    
     # Relationships
     creator_user: Mapped["User"] = relationship(
         "User", foreign_keys=[created_by_user_id], back_populates="created_leads"
@@ -333,11 +469,46 @@ class Lead(Base):
         Index("idx_leads_created_at", "created_at"),
         Index("idx_leads_category_status", "category", "status"),
         Index("idx_leads_location_status", "location", "status"),
+        # Search order (created_at, id) per status, read backwards for keyset pagination
+        Index("idx_leads_status_created_at_id", "status", "created_at", "id"),
+        Index("idx_leads_search_vector", "search_vector", postgresql_using="gin"),
         CheckConstraint("final_amount IS NULL OR final_amount > 0", 
                        name="check_final_amount_positive"),
     )
 
 
+# Same normalization as the professionals document
+LEAD_SEARCH_DDL = [
+    SEARCH_TEXT_FUNCTION_DDL,
+    """
+    CREATE OR REPLACE FUNCTION leads_search_vector_update()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', professional_search_text(NEW.title)), 'A') ||
+            setweight(to_tsvector('simple', professional_search_text(NEW.short_description)), 'B') ||
+            setweight(to_tsvector('simple', professional_search_text(NEW.location)), 'C');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS leads_search_vector ON leads",
+    """
+    CREATE TRIGGER leads_search_vector
+        BEFORE INSERT OR UPDATE OF title, short_description, location ON leads
+        FOR EACH ROW EXECUTE FUNCTION leads_search_vector_update()
+    """,
+    # Backfill rows written before the trigger existed (no-op on a new table)
+    "UPDATE leads SET title = title WHERE search_vector IS NULL",
+]
+
+for _statement in LEAD_SEARCH_DDL:
+    event.listen(
+        Lead.__table__, "after_create",
+        DDL(_statement).execute_if(dialect="postgresql")
+    )
+
+
 class ConsumerLead(Base):
     """Consumer-specific lead details (PII sensitive)."""
     
@@ -909,6 +1080,369 @@ class Project(Base):
     )
 
 
+class ProfessionalScorecard(Base):
+    """Running per-professional totals, maintained by triggers on the source tables."""
+    
+    __tablename__ = "professional_scorecards"
+    
+    # Primary key is also foreign key to professionals table
+    professional_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("professionals.id"), primary_key=True
+    )
+    
+    # Proposal counters
+    proposals_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    accepted_proposals_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    # Project counters
+    projects_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    active_projects_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completed_projects_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    # Net payments for the professional's completed projects
+    total_earnings: Mapped[Decimal] = mapped_column(
+        Numeric(14, 2), nullable=False, default=Decimal("0.00")
+    )
+    
+    # Running rating sum and count (average = rating_sum / rating_count)
+    rating_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rating_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    # Override base class columns since professional_id is the primary key
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), nullable=False, default=uuid.uuid4
+    )
+
+
+class ProfessionalActivityDay(Base):
+    """Per-day activity of a professional, summed for rolling windows (last N days)."""
+    
+    __tablename__ = "professional_activity_days"
+    
+    professional_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("professionals.id"), nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False, comment="UTC date")
+    
+    # Proposals created on this day, and how many of them are accepted
+    proposals_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    accepted_proposals_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    proposal_price_sum: Mapped[Decimal] = mapped_column(
+        Numeric(14, 2), nullable=False, default=Decimal("0.00")
+    )
+    
+    # Projects completed on this day
+    completed_projects_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Constraints and indexes
+    __table_args__ = (
+        UniqueConstraint("professional_id", "day", name="uq_professional_activity_day"),
+    )
+
+
+# Scorecards are kept current by row triggers on proposals, projects,
+# lead_payments and professional_ratings, so every service writing those
+# tables updates them. A changed row is applied as "remove the old row, add
+# the new one" through the apply_*_to_scorecard() functions; earnings count
+# the payments of completed projects, from whichever side changes last.
+# rebuild_professional_scorecards() recomputes everything from the source
+# tables (backfill / repair).
+SCORECARD_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION bump_professional_scorecard(
+        p_professional_id UUID,
+        p_proposals INTEGER DEFAULT 0,
+        p_accepted_proposals INTEGER DEFAULT 0,
+        p_projects INTEGER DEFAULT 0,
+        p_active_projects INTEGER DEFAULT 0,
+        p_completed_projects INTEGER DEFAULT 0,
+        p_earnings NUMERIC DEFAULT 0,
+        p_rating_sum INTEGER DEFAULT 0,
+        p_rating_count INTEGER DEFAULT 0
+    ) RETURNS VOID AS $$
+        INSERT INTO professional_scorecards (
+            id, professional_id, proposals_count, accepted_proposals_count,
+            projects_count, active_projects_count, completed_projects_count,
+            total_earnings, rating_sum, rating_count
+        )
+        VALUES (
+            uuid_generate_v4(), p_professional_id, p_proposals, p_accepted_proposals,
+            p_projects, p_active_projects, p_completed_projects,
+            p_earnings, p_rating_sum, p_rating_count
+        )
+        ON CONFLICT (professional_id) DO UPDATE SET
+            proposals_count = professional_scorecards.proposals_count + EXCLUDED.proposals_count,
+            accepted_proposals_count = professional_scorecards.accepted_proposals_count + EXCLUDED.accepted_proposals_count,
+            projects_count = professional_scorecards.projects_count + EXCLUDED.projects_count,
+            active_projects_count = professional_scorecards.active_projects_count + EXCLUDED.active_projects_count,
+            completed_projects_count = professional_scorecards.completed_projects_count + EXCLUDED.completed_projects_count,
+            total_earnings = professional_scorecards.total_earnings + EXCLUDED.total_earnings,
+            rating_sum = professional_scorecards.rating_sum + EXCLUDED.rating_sum,
+            rating_count = professional_scorecards.rating_count + EXCLUDED.rating_count,
+            updated_at = now()
+    $$ LANGUAGE sql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_professional_activity(
+        p_professional_id UUID,
+        p_day DATE,
+        p_proposals INTEGER DEFAULT 0,
+        p_accepted_proposals INTEGER DEFAULT 0,
+        p_proposal_price_sum NUMERIC DEFAULT 0,
+        p_completed_projects INTEGER DEFAULT 0
+    ) RETURNS VOID AS $$
+        INSERT INTO professional_activity_days (
+            id, professional_id, day, proposals_count, accepted_proposals_count,
+            proposal_price_sum, completed_projects_count
+        )
+        VALUES (
+            uuid_generate_v4(), p_professional_id, p_day, p_proposals, p_accepted_proposals,
+            p_proposal_price_sum, p_completed_projects
+        )
+        ON CONFLICT (professional_id, day) DO UPDATE SET
+            proposals_count = professional_activity_days.proposals_count + EXCLUDED.proposals_count,
+            accepted_proposals_count = professional_activity_days.accepted_proposals_count + EXCLUDED.accepted_proposals_count,
+            proposal_price_sum = professional_activity_days.proposal_price_sum + EXCLUDED.proposal_price_sum,
+            completed_projects_count = professional_activity_days.completed_projects_count + EXCLUDED.completed_projects_count,
+            updated_at = now()
+    $$ LANGUAGE sql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION apply_proposal_to_scorecard(p proposals, sign INTEGER)
+    RETURNS VOID AS $$
+    DECLARE
+        accepted INTEGER := CASE WHEN p.status = 'ACCEPTED' THEN sign ELSE 0 END;
+    BEGIN
+        PERFORM bump_professional_scorecard(
+            p.professional_id, p_proposals => sign, p_accepted_proposals => accepted
+        );
+        PERFORM bump_professional_activity(
+            p.professional_id, (p.created_at AT TIME ZONE 'UTC')::date,
+            p_proposals => sign, p_accepted_proposals => accepted,
+            p_proposal_price_sum => sign * p.price
+        );
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION apply_project_to_scorecard(p projects, sign INTEGER)
+    RETURNS VOID AS $$
+    DECLARE
+        completed BOOLEAN := p.status = 'COMPLETED';
+        earnings NUMERIC := 0;
+    BEGIN
+        IF completed THEN
+            SELECT coalesce(sum(professional_net_amount), 0) INTO earnings
+            FROM lead_payments WHERE proposal_id = p.proposal_id;
+        END IF;
+
+        PERFORM bump_professional_scorecard(
+            p.professional_id,
+            p_projects => sign,
+            p_active_projects => CASE WHEN p.status = 'ACTIVE' THEN sign ELSE 0 END,
+            p_completed_projects => CASE WHEN completed THEN sign ELSE 0 END,
+            p_earnings => sign * earnings
+        );
+
+        IF completed AND p.completion_date IS NOT NULL THEN
+            PERFORM bump_professional_activity(
+                p.professional_id, (p.completion_date AT TIME ZONE 'UTC')::date,
+                p_completed_projects => sign
+            );
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION apply_payment_to_scorecard(p lead_payments, sign INTEGER)
+    RETURNS VOID AS $$
+    BEGIN
+        PERFORM bump_professional_scorecard(
+            pr.professional_id, p_earnings => sign * p.professional_net_amount
+        )
+        FROM projects pr
+        WHERE pr.proposal_id = p.proposal_id AND pr.status = 'COMPLETED';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION apply_rating_to_scorecard(p professional_ratings, sign INTEGER)
+    RETURNS VOID AS $$
+    BEGIN
+        PERFORM bump_professional_scorecard(
+            p.professional_id, p_rating_sum => sign * p.rating, p_rating_count => sign
+        );
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# table -> (apply function, columns whose updates affect the scorecard)
+_SCORECARD_SOURCES = {
+    "proposals": ("apply_proposal_to_scorecard", "professional_id, status, price, created_at"),
+    "projects": ("apply_project_to_scorecard", "professional_id, proposal_id, status, completion_date"),
+    "lead_payments": ("apply_payment_to_scorecard", "proposal_id, professional_net_amount"),
+    "professional_ratings": ("apply_rating_to_scorecard", "professional_id, rating"),
+}
+
+for _table, (_apply, _columns) in _SCORECARD_SOURCES.items():
+    SCORECARD_DDL += [
+        f"""
+        CREATE OR REPLACE FUNCTION {_table}_scorecard_update()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM {_apply}(OLD, -1);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM {_apply}(NEW, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {_table}_scorecard ON {_table}",
+        f"""
+        CREATE TRIGGER {_table}_scorecard
+            AFTER INSERT OR DELETE OR UPDATE OF {_columns} ON {_table}
+            FOR EACH ROW EXECUTE FUNCTION {_table}_scorecard_update()
+        """,
+    ]
+
+SCORECARD_DDL += [
+    """
+    CREATE OR REPLACE FUNCTION rebuild_professional_scorecards()
+    RETURNS VOID AS $$
+    BEGIN
+        DELETE FROM professional_activity_days;
+        DELETE FROM professional_scorecards;
+        -- Payments are counted through their completed projects
+        PERFORM apply_proposal_to_scorecard(p, 1) FROM proposals p;
+        PERFORM apply_project_to_scorecard(p, 1) FROM projects p;
+        PERFORM apply_rating_to_scorecard(p, 1) FROM professional_ratings p;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Backfill rows written before the triggers existed (no-op on a new database)
+    """
+    SELECT rebuild_professional_scorecards()
+    WHERE NOT EXISTS (SELECT 1 FROM professional_scorecards)
+    """,
+]
+
+# The triggers span several tables, so they are installed once all tables exist
+for _statement in SCORECARD_DDL:
+    event.listen(
+        Base.metadata, "after_create",
+        DDL(_statement).execute_if(dialect="postgresql")
+    )
+
+# The apply_*_to_scorecard() functions take a row of their source table and
+# depend on its type, so they are dropped before the tables are
+for _table, (_apply, _columns) in _SCORECARD_SOURCES.items():
+    event.listen(
+        Base.metadata, "before_drop",
+        DDL(f"DROP FUNCTION IF EXISTS {_apply}({_table}, INTEGER)").execute_if(dialect="postgresql")
+    )
+
+
+class LeadCategoryStats(Base):
+    """Demand per lead category over the last 30 days, rebuilt by refresh_lead_category_stats()."""
+
+    __tablename__ = "lead_category_stats"
+
+    category: Mapped[str] = mapped_column(String(100), nullable=False)
+
+    # Active leads created in the last 30 days
+    recent_leads_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Budgets of those leads (referral leads only; consumer leads have none)
+    avg_budget: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2))
+    median_budget: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2))
+    p90_budget: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2))
+
+    # Competition: proposals on those leads, and proposals per lead
+    proposals_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    competition_ratio: Mapped[Decimal] = mapped_column(
+        Numeric(8, 2), nullable=False, default=Decimal("0.00")
+    )
+
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    # Constraints and indexes
+    __table_args__ = (
+        UniqueConstraint("category", name="uq_lead_category_stats_category"),
+    )
+
+
+class LeadCategoryDay(Base):
+    """Active leads per category and creation day, summed for rolling windows (last N days)."""
+
+    __tablename__ = "lead_category_days"
+
+    category: Mapped[str] = mapped_column(String(100), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False, comment="UTC date")
+    active_leads_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Constraints and indexes
+    __table_args__ = (
+        UniqueConstraint("category", "day", name="uq_lead_category_day"),
+    )
+
+
+# Lead category rollups. Percentiles cannot be maintained row by row, so the
+# leads service recomputes both tables about once a minute; the function
+# swaps their contents in one transaction, so readers never see them empty.
+# Daily rows cover the longest Lead Board stats window (365 days).
+LEAD_CATEGORY_STATS_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION refresh_lead_category_stats()
+    RETURNS VOID AS $$
+    BEGIN
+        -- One refresh at a time
+        PERFORM pg_advisory_xact_lock(hashtext('refresh_lead_category_stats'));
+
+        DELETE FROM lead_category_days;
+        INSERT INTO lead_category_days (id, category, day, active_leads_count)
+        SELECT uuid_generate_v4(), category, (created_at AT TIME ZONE 'UTC')::date, count(*)
+        FROM leads
+        WHERE status = 'ACTIVE' AND created_at >= now() - interval '366 days'
+        GROUP BY category, (created_at AT TIME ZONE 'UTC')::date;
+
+        DELETE FROM lead_category_stats;
+        INSERT INTO lead_category_stats (
+            id, category, recent_leads_count, avg_budget, median_budget, p90_budget,
+            proposals_count, competition_ratio, refreshed_at
+        )
+        SELECT
+            uuid_generate_v4(),
+            l.category,
+            count(*),
+            round(avg(pl.estimated_budget), 2),
+            round(percentile_cont(0.5) WITHIN GROUP (ORDER BY pl.estimated_budget::float8)::numeric, 2),
+            round(percentile_cont(0.9) WITHIN GROUP (ORDER BY pl.estimated_budget::float8)::numeric, 2),
+            sum(lp.proposals_count),
+            round(sum(lp.proposals_count)::numeric / count(*), 2),
+            now()
+        FROM leads l
+        LEFT JOIN professional_leads pl ON pl.lead_id = l.id
+        CROSS JOIN LATERAL (
+            SELECT count(*) AS proposals_count FROM proposals p WHERE p.lead_id = l.id
+        ) lp
+        WHERE l.status = 'ACTIVE' AND l.created_at >= now() - interval '30 days'
+        GROUP BY l.category;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+for _statement in LEAD_CATEGORY_STATS_DDL:
+    event.listen(
+        Base.metadata, "after_create",
+        DDL(_statement).execute_if(dialect="postgresql")
+    )
+
+
 class AdminAuditLog(Base):
     """Admin action audit log."""
     
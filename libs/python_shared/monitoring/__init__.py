@@ -0,0 +1,31 @@
+"""Request metrics shared by OFAIR services."""
+
+from .metrics import (
+    DEFAULT_BUCKETS,
+    MetricsMiddleware,
+    RequestMetrics,
+    asyncpg_connection_class,
+    get_request_metrics,
+    histogram_quantile,
+    instrument_engine,
+    instrument_redis,
+    multiprocess_enabled,
+    record_dependency_time,
+    setup_metrics,
+    timed_dependency,
+)
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "MetricsMiddleware",
+    "RequestMetrics",
+    "asyncpg_connection_class",
+    "get_request_metrics",
+    "histogram_quantile",
+    "instrument_engine",
+    "instrument_redis",
+    "multiprocess_enabled",
+    "record_dependency_time",
+    "setup_metrics",
+    "timed_dependency",
+]
@@ -0,0 +1,333 @@
+"""Request metrics for OFAIR services.
+
+`setup_metrics` installs an ASGI middleware that records, per route template:
+
+* a bucketed latency histogram and a request counter by status code;
+* the number of requests in flight;
+* time spent in the database and in Redis by each request.
+
+Dependency time is accumulated in a context variable while the request runs.
+SQLAlchemy engines, Redis clients and asyncpg pools report into it once they
+are instrumented with `instrument_engine`, `instrument_redis` and
+`asyncpg_connection_class`; other code can use `timed_dependency`.
+
+The metrics are prometheus_client metrics served at `/metrics`. When a
+service runs several worker processes, set PROMETHEUS_MULTIPROC_DIR to an
+empty directory shared by the workers (wiped on every start); every scrape
+then reports the sum over all workers instead of the one that answered.
+"""
+
+import atexit
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Upper bounds in seconds; prometheus_client adds the +Inf bucket
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+
+# Route label for requests that matched no route, to bound label cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+_dependency_times: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_dependency_times", default=None
+)
+
+
+def record_dependency_time(kind: str, seconds: float) -> None:
+    """Add time spent in a dependency ("db", "redis", ...) to the current request."""
+    times = _dependency_times.get()
+    if times is not None:
+        times[kind] = times.get(kind, 0.0) + seconds
+
+
+@contextmanager
+def timed_dependency(kind: str):
+    """Time a block as dependency time of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_dependency_time(kind, time.perf_counter() - started)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared by worker processes through files."""
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+class RequestMetrics:
+    """Request metrics of one service."""
+
+    def __init__(
+        self,
+        service: str,
+        registry: Optional[CollectorRegistry] = None,
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.service = service
+        self.registry = registry if registry is not None else CollectorRegistry()
+
+        # Earliest worker start since the metrics began; counters reset with it
+        self.start_time = Gauge(
+            "process_start_time_seconds",
+            "Start time of the process since unix epoch in seconds.",
+            ["service"],
+            registry=self.registry,
+            multiprocess_mode="min"
+        )
+        self.in_flight = Gauge(
+            "http_requests_in_flight",
+            "Requests currently being served.",
+            ["service"],
+            registry=self.registry,
+            multiprocess_mode="livesum"
+        )
+        self.requests = Counter(
+            "http_requests",
+            "Finished HTTP requests.",
+            ["service", "method", "route", "status"],
+            registry=self.registry
+        )
+        self.latency = Histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency.",
+            ["service", "method", "route"],
+            registry=self.registry,
+            buckets=buckets
+        )
+        self.dependency_latency = Histogram(
+            "http_request_dependency_seconds",
+            "Time a request spent in a dependency.",
+            ["service", "method", "route", "dependency"],
+            registry=self.registry,
+            buckets=buckets
+        )
+
+        self.start_time.labels(service).set(time.time())
+        self.in_flight.labels(service).set(0)
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        duration: float,
+        dependency_times: Optional[Dict[str, float]] = None
+    ) -> None:
+        """Record one finished request."""
+        self.requests.labels(self.service, method, route, str(status)).inc()
+        self.latency.labels(self.service, method, route).observe(duration)
+
+        for kind, seconds in (dependency_times or {}).items():
+            self.dependency_latency.labels(self.service, method, route, kind).observe(seconds)
+
+    def render(self) -> bytes:
+        """Render the metrics in the Prometheus text format, summed over workers."""
+        if not multiprocess_enabled():
+            return generate_latest(self.registry)
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request metrics."""
+
+    def __init__(self, app, metrics: RequestMetrics, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.metrics = metrics
+        self.in_flight = metrics.in_flight.labels(metrics.service)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        dependency_times: Dict[str, float] = {}
+        token = _dependency_times.set(dependency_times)
+        self.in_flight.inc()
+        started = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            self.in_flight.dec()
+            _dependency_times.reset(token)
+
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            self.metrics.observe(scope["method"], route, status, duration, dependency_times)
+
+
+_request_metrics: Optional[RequestMetrics] = None
+
+
+def get_request_metrics() -> Optional[RequestMetrics]:
+    """Get the metrics installed by `setup_metrics`, if any."""
+    return _request_metrics
+
+
+def setup_metrics(app, service_name: str, engines: Iterable = (), path: str = "/metrics") -> RequestMetrics:
+    """Instrument a FastAPI app and expose its metrics at `path`.
+
+    Call after the other middleware has been added so the measured time
+    covers the whole middleware stack.
+    """
+    from fastapi import Response
+
+    global _request_metrics
+    _request_metrics = RequestMetrics(service_name)
+    metrics = _request_metrics
+
+    if multiprocess_enabled():
+        # Drop this worker's in-flight gauge from the sum once it exits
+        atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+    for engine in engines:
+        instrument_engine(engine)
+
+    app.add_middleware(MetricsMiddleware, metrics=metrics, exclude_paths=(path,))
+
+    async def metrics_endpoint() -> Response:
+        return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+    app.add_api_route(path, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    return metrics
+
+
+_instrumented_engines = set()
+
+
+def instrument_engine(engine) -> None:
+    """Record query time of a SQLAlchemy engine (sync or async)."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _finish_query(conn)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        if exception_context.connection is not None:
+            _finish_query(exception_context.connection)
+
+
+def _finish_query(conn) -> None:
+    starts = conn.info.get("metrics_query_start")
+    if starts:
+        record_dependency_time("db", time.perf_counter() - starts.pop())
+
+
+def instrument_redis(client):
+    """Record command time of an asyncio Redis client. Returns the client."""
+    if getattr(client, "_metrics_instrumented", False):
+        return client
+
+    execute_command = client.execute_command
+
+    async def timed_execute_command(*args, **options):
+        with timed_dependency("redis"):
+            return await execute_command(*args, **options)
+
+    client.execute_command = timed_execute_command
+    client._metrics_instrumented = True
+    return client
+
+
+_asyncpg_connection_class = None
+
+
+def asyncpg_connection_class():
+    """asyncpg connection class recording query time; pass as `connection_class`."""
+    global _asyncpg_connection_class
+
+    if _asyncpg_connection_class is None:
+        import asyncpg
+
+        class TimedConnection(asyncpg.Connection):
+            async def execute(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().execute(*args, **kwargs)
+
+            async def executemany(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().executemany(*args, **kwargs)
+
+            async def fetch(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().fetch(*args, **kwargs)
+
+            async def fetchrow(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().fetchrow(*args, **kwargs)
+
+            async def fetchval(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().fetchval(*args, **kwargs)
+
+            async def copy_records_to_table(self, *args, **kwargs):
+                with timed_dependency("db"):
+                    return await super().copy_records_to_table(*args, **kwargs)
+
+        _asyncpg_connection_class = TimedConnection
+
+    return _asyncpg_connection_class
+
+
+def histogram_quantile(quantile: float, buckets: Sequence[Tuple[float, float]]) -> Optional[float]:
+    """Estimate a quantile from cumulative (upper bound, count) buckets.
+
+    Interpolates linearly inside the bucket holding the quantile, like
+    PromQL's histogram_quantile. Returns None without observations.
+    """
+    buckets = sorted(buckets)
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+
+    rank = quantile * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
@@ -0,0 +1,19 @@
+"""Rate limiting shared by OFAIR services."""
+
+from .limiter import (
+    RateLimiter,
+    RateLimitResult,
+    RateLimitRule,
+    SLIDING_WINDOW_SCRIPT,
+    TokenBucketLimiter,
+    get_rate_limiter,
+)
+
+__all__ = [
+    "RateLimiter",
+    "RateLimitResult",
+    "RateLimitRule",
+    "SLIDING_WINDOW_SCRIPT",
+    "TokenBucketLimiter",
+    "get_rate_limiter",
+]
@@ -0,0 +1,185 @@
+"""Sliding-window rate limiting shared by OFAIR services.
+
+A check evaluates every rule of a request (say "5 per hour and 20 per day")
+in one Redis round trip: a Lua script trims each rule's sorted-set log to its
+window, and only when every rule has room records the request in all of
+them. Rejected requests are not recorded, so retrying while blocked does not
+extend the block, and `retry_after` is exact: the time until the oldest
+entry that keeps the rule full leaves its window.
+
+When Redis is unavailable the limiter falls back to in-process token
+buckets with the same limits, so limits still hold per instance instead of
+failing open.
+"""
+
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "ratelimit"
+
+# KEYS: one sorted set per rule. ARGV: member, then limit and window (ms)
+# per rule. Returns {allowed, retry_after_ms, count per rule}.
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local member = ARGV[1]
+local counts = {}
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    counts[i] = count
+    if count >= limit then
+        local wait = window
+        if limit > 0 then
+            local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+            wait = tonumber(oldest[2]) + window - now
+        end
+        if wait > retry_after then
+            retry_after = wait
+        end
+    end
+end
+
+if retry_after > 0 then
+    return {0, retry_after, unpack(counts)}
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, member)
+    redis.call('PEXPIRE', key, tonumber(ARGV[2 * i + 1]))
+    counts[i] = counts[i] + 1
+end
+return {1, 0, unpack(counts)}
+"""
+
+
+class RateLimitRule(NamedTuple):
+    """At most `limit` requests per `window_seconds` for `key`."""
+
+    key: str
+    limit: int
+    window_seconds: int
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: int  # seconds until the request would be allowed, 0 if allowed
+    counts: Tuple[int, ...]  # requests in each rule's window, this one included
+    backend: str  # "redis" or "local"
+
+
+class TokenBucketLimiter:
+    """In-process token buckets used while Redis is unavailable.
+
+    Each rule gets a bucket of `limit` tokens refilled at
+    `limit / window_seconds` per second. Like the Redis script, a request
+    takes a token from every bucket or from none.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def _tokens(self, rule: RateLimitRule, now: float) -> float:
+        entry = self._buckets.get(rule.key)
+        if entry is None:
+            return float(rule.limit)
+
+        tokens, updated_at = entry
+        rate = rule.limit / rule.window_seconds
+        return min(float(rule.limit), tokens + (now - updated_at) * rate)
+
+    def check(self, rules: Sequence[RateLimitRule]) -> RateLimitResult:
+        now = time.monotonic()
+        levels = [self._tokens(rule, now) for rule in rules]
+
+        retry_after = 0.0
+        for rule, tokens in zip(rules, levels):
+            if tokens < 1:
+                rate = rule.limit / rule.window_seconds if rule.limit else 0
+                wait = (1 - tokens) / rate if rate else rule.window_seconds
+                retry_after = max(retry_after, wait)
+
+        allowed = retry_after == 0
+        for rule, tokens in zip(rules, levels):
+            self._buckets[rule.key] = (tokens - 1 if allowed else tokens, now)
+            self._buckets.move_to_end(rule.key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return RateLimitResult(
+            allowed=allowed,
+            retry_after=math.ceil(retry_after),
+            counts=tuple(
+                rule.limit - math.floor(tokens) + (1 if allowed else 0)
+                for rule, tokens in zip(rules, levels)
+            ),
+            backend="local"
+        )
+
+
+class RateLimiter:
+    """Multi-rule sliding-window limiter backed by Redis."""
+
+    def __init__(
+        self,
+        redis_client,
+        prefix: str = DEFAULT_PREFIX,
+        fallback: Optional[TokenBucketLimiter] = None
+    ):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.fallback = fallback if fallback is not None else TokenBucketLimiter()
+        self._script = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def check(self, rules: Sequence[RateLimitRule]) -> RateLimitResult:
+        """Count the request against every rule, or against none if any is full."""
+        if not rules:
+            return RateLimitResult(True, 0, (), "redis")
+
+        args = [uuid.uuid4().hex]
+        for rule in rules:
+            args.extend((rule.limit, rule.window_seconds * 1000))
+
+        try:
+            result = await self._script(
+                keys=[f"{self.prefix}:{rule.key}" for rule in rules],
+                args=args
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiting unavailable, using local buckets: {e}")
+            return self.fallback.check(rules)
+
+        allowed, retry_after_ms, *counts = (int(value) for value in result)
+        return RateLimitResult(
+            allowed=bool(allowed),
+            retry_after=math.ceil(retry_after_ms / 1000),
+            counts=tuple(counts),
+            backend="redis"
+        )
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter(redis_client) -> RateLimiter:
+    """Get the process-wide limiter, rebuilt if the Redis client changes."""
+    global _limiter
+
+    if _limiter is None or _limiter.redis is not redis_client:
+        _limiter = RateLimiter(
+            redis_client,
+            fallback=_limiter.fallback if _limiter is not None else None
+        )
+
+    return _limiter
@@ -0,0 +1,112 @@
+"""Benchmark rate limiter overhead per request.
+
+Checks the OTP send limits (1/minute, 5/hour, 10/day) the way each limiter
+does and reports Redis round trips and latency per check:
+
+    legacy   INCR + EXPIRE pipeline per window, plus TTL on rejection
+    shared   python_shared.ratelimit: one Lua script call for all windows
+    local    the in-process token-bucket fallback (no Redis)
+
+Every iteration uses a new contact, so all checks are allowed; the
+`--blocked` flag reuses one contact so most checks are rejected instead.
+
+Usage (from the repository root):
+
+    REDIS_URL=redis://localhost:6379 python scripts/benchmark_rate_limiter.py [iterations] [--blocked]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libs"))
+from python_shared.ratelimit import RateLimiter, RateLimitRule, TokenBucketLimiter  # noqa: E402
+
+OTP_LIMITS = [("otp_1min", 1, 60), ("otp_1hour", 5, 3600), ("otp_24hour", 10, 86400)]
+
+
+async def legacy_check(client: redis.Redis, contact: str) -> int:
+    round_trips = 0
+    for limit_type, limit, window in OTP_LIMITS:
+        key = f"bench_legacy:{limit_type}:{contact}"
+        pipe = client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, window)
+        current, _ = await pipe.execute()
+        round_trips += 1
+        if current > limit:
+            await client.ttl(key)
+            round_trips += 1
+            break
+    return round_trips
+
+
+async def shared_check(limiter: RateLimiter, contact: str) -> int:
+    await limiter.check([
+        RateLimitRule(f"{limit_type}:{contact}", limit, window)
+        for limit_type, limit, window in OTP_LIMITS
+    ])
+    return 1
+
+
+async def local_check(buckets: TokenBucketLimiter, contact: str) -> int:
+    buckets.check([
+        RateLimitRule(f"{limit_type}:{contact}", limit, window)
+        for limit_type, limit, window in OTP_LIMITS
+    ])
+    return 0
+
+
+async def run(check, iterations: int, blocked: bool) -> dict:
+    contact = uuid.uuid4().hex
+    timings = []
+    round_trips = 0
+
+    for _ in range(iterations):
+        if not blocked:
+            contact = uuid.uuid4().hex
+        started = time.perf_counter()
+        round_trips += await check(contact)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    return {
+        "round_trips": round_trips / iterations,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+    }
+
+
+async def main() -> None:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    iterations = int(args[0]) if args else 5000
+    blocked = "--blocked" in sys.argv
+
+    client = redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    await client.ping()  # Warm up the connection
+    limiter = RateLimiter(client, prefix="bench_shared")
+    buckets = TokenBucketLimiter()
+
+    checks = (
+        ("legacy", lambda contact: legacy_check(client, contact)),
+        ("shared", lambda contact: shared_check(limiter, contact)),
+        ("local", lambda contact: local_check(buckets, contact)),
+    )
+
+    print(f"{'mode':<8} {'trips':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, check in checks:
+            result = await run(check, iterations, blocked)
+            print(f"{name:<8} {result['round_trips']:>6.2f} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f}")
+    finally:
+        async for key in client.scan_iter(match="bench_*"):
+            await client.delete(key)
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
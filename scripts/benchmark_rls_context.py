@@ -0,0 +1,108 @@
+"""Benchmark database round-trips spent on RLS context per request.
+
+Simulates the start of an authenticated request (set the RLS context, then
+run the first query of the handler) and counts what reaches the server:
+BEGIN, statements and COMMIT/ROLLBACK.
+
+    legacy   SELECT set_current_user_context(...) + COMMIT, then the query
+    scoped   set_rls_context(): set_config(..., true) sent with the
+             transaction of the first query, no commit
+
+Usage (from the repository root, against a database initialised with
+scripts/init-db.sql):
+
+    DATABASE_URL=postgresql://... python scripts/benchmark_rls_context.py [iterations]
+"""
+
+import os
+import sys
+import time
+import uuid
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libs"))
+from python_shared.database.connection import set_rls_context  # noqa: E402
+
+FIRST_QUERY = text("SELECT current_setting('app.current_user_id', true)")
+
+
+def legacy_request(db: Session, user_id: str) -> None:
+    db.execute(
+        text("SELECT set_current_user_context(CAST(:user_id AS uuid))"),
+        {"user_id": user_id}
+    )
+    db.commit()
+    db.execute(FIRST_QUERY).scalar()
+
+
+def scoped_request(db: Session, user_id: str) -> None:
+    set_rls_context(db, user_id)
+    assert db.execute(FIRST_QUERY).scalar() == user_id
+
+
+def run(engine, request, iterations: int) -> dict:
+    counts = {"begin": 0, "statements": 0, "commit": 0, "rollback": 0}
+
+    def on_begin(conn):
+        counts["begin"] += 1
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    def on_commit(conn):
+        counts["commit"] += 1
+
+    def on_rollback(conn):
+        counts["rollback"] += 1
+
+    listeners = [
+        ("begin", on_begin),
+        ("before_cursor_execute", on_execute),
+        ("commit", on_commit),
+        ("rollback", on_rollback),
+    ]
+    for name, fn in listeners:
+        event.listen(engine, name, fn)
+
+    started = time.perf_counter()
+    try:
+        for _ in range(iterations):
+            with Session(engine) as db:
+                request(db, str(uuid.uuid4()))
+    finally:
+        for name, fn in listeners:
+            event.remove(engine, name, fn)
+    elapsed = time.perf_counter() - started
+
+    round_trips = sum(counts.values())
+    return {
+        **{key: value / iterations for key, value in counts.items()},
+        "round_trips": round_trips / iterations,
+        "ms_per_request": elapsed * 1000 / iterations,
+    }
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    database_url = os.environ["DATABASE_URL"]
+    if database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+psycopg2://", 1)
+
+    engine = create_engine(database_url, pool_size=1)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # Warm up the pool
+
+    print(f"{'mode':<8} {'begin':>6} {'stmts':>6} {'commit':>7} {'rollback':>9} {'trips':>6} {'ms/req':>8}")
+    for name, request in (("legacy", legacy_request), ("scoped", scoped_request)):
+        result = run(engine, request, iterations)
+        print(
+            f"{name:<8} {result['begin']:>6.2f} {result['statements']:>6.2f} "
+            f"{result['commit']:>7.2f} {result['rollback']:>9.2f} "
+            f"{result['round_trips']:>6.2f} {result['ms_per_request']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,12 +20,14 @@ GRANT USAGE ON SCHEMA public TO ofair_app;
 GRANT CREATE ON SCHEMA public TO ofair_app;
 
 -- Set up Row Level Security context functions
+-- Settings are transaction-scoped so they never leak to the next user of a
+-- pooled connection (python_shared sets them directly with set_config)
 CREATE OR REPLACE FUNCTION set_current_user_context(user_id UUID, professional_id UUID DEFAULT NULL)
 RETURNS VOID AS $$
 BEGIN
-    PERFORM set_config('app.current_user_id', user_id::text, false);
+    PERFORM set_config('app.current_user_id', user_id::text, true);
     PERFORM set_config('app.current_professional_id', 
-        COALESCE(professional_id::text, ''), false);
+        COALESCE(professional_id::text, ''), true);
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
@@ -129,6 +129,10 @@ CREATE TABLE IF NOT EXISTS leads (
     expires_at TIMESTAMP DEFAULT (CURRENT_TIMESTAMP + INTERVAL '30 days')
 );
 
+-- When the lead's earliest proposal was sent; NULL while unanswered.
+-- Maintained by dashboard_proposals_counter().
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS first_proposal_at TIMESTAMP;
+
 -- Lead categories
 CREATE TABLE IF NOT EXISTS lead_categories (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -209,6 +213,10 @@ CREATE TABLE IF NOT EXISTS referrals (
     UNIQUE(lead_id, referred_professional_id)
 );
 
+-- Materialized referral chain paths (nearest ancestor first)
+ALTER TABLE referrals ADD COLUMN IF NOT EXISTS ancestor_ids UUID[] DEFAULT '{}';
+ALTER TABLE referrals ADD COLUMN IF NOT EXISTS chain_length INTEGER;
+
 -- Commission calculations
 CREATE TABLE IF NOT EXISTS commissions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -224,6 +232,44 @@ CREATE TABLE IF NOT EXISTS commissions (
     paid_at TIMESTAMP
 );
 
+-- Per-user monthly referral stats rollup, maintained incrementally
+CREATE TABLE IF NOT EXISTS referral_monthly_stats (
+    user_id UUID NOT NULL,
+    month DATE NOT NULL,
+    category VARCHAR(100) NOT NULL DEFAULT 'general',
+    referral_count INTEGER NOT NULL DEFAULT 0,
+    active_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    commission_earned DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    commission_paid DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    commission_pending DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month, category)
+);
+
+-- First month from which referral_monthly_stats is complete
+CREATE TABLE IF NOT EXISTS referral_rollup_coverage (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    covered_from DATE NOT NULL
+);
+
+-- Versioned commission rate tables (only one version is active at a time)
+CREATE TABLE IF NOT EXISTS commission_rate_versions (
+    version SERIAL PRIMARY KEY,
+    is_active BOOLEAN DEFAULT FALSE,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS commission_rates (
+    version INTEGER NOT NULL REFERENCES commission_rate_versions(version),
+    rate_type VARCHAR(20) NOT NULL, -- tier, category, level
+    rate_key VARCHAR(100) NOT NULL,
+    rate_field VARCHAR(50) NOT NULL DEFAULT 'value',
+    rate_value DECIMAL(8,6) NOT NULL,
+    PRIMARY KEY (version, rate_type, rate_key, rate_field)
+);
+
 -- ==========================================
 -- PAYMENTS SERVICE TABLES
 -- ==========================================
@@ -406,6 +452,8 @@ CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
 CREATE INDEX IF NOT EXISTS idx_users_status ON users(status);
+CREATE INDEX IF NOT EXISTS idx_users_last_login ON users(last_login);
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
 
 -- Leads indexes
 CREATE INDEX IF NOT EXISTS idx_leads_customer_id ON leads(customer_id);
@@ -418,11 +466,15 @@ CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_proposals_lead_id ON proposals(lead_id);
 CREATE INDEX IF NOT EXISTS idx_proposals_professional_id ON proposals(professional_id);
 CREATE INDEX IF NOT EXISTS idx_proposals_status ON proposals(status);
+CREATE INDEX IF NOT EXISTS idx_proposals_created_at ON proposals(created_at);
+CREATE INDEX IF NOT EXISTS idx_proposals_accepted_at ON proposals(accepted_at) WHERE accepted_at IS NOT NULL;
 
 -- Transactions indexes
 CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status);
 CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_processed_at ON transactions(processed_at) WHERE processed_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_commissions_calculated_at ON commissions(calculated_at);
 
 -- Notifications indexes
 CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id);
@@ -458,6 +510,255 @@ BEGIN
 END;
 $$;
 
+-- ==========================================
+-- DASHBOARD COUNTERS
+-- ==========================================
+
+-- Admin dashboard counters kept current by triggers, so dashboard reads
+-- never scan the source tables. Each metric is spread over a few shards to
+-- avoid a single hot row; readers sum the shards. Totals use the epoch
+-- bucket, windowed metrics a bucket per day. users_last_login counts each
+-- user once, on the day of their latest login, so the users active since a
+-- day are the sum of its buckets from that day on.
+CREATE TABLE IF NOT EXISTS dashboard_counters (
+    metric VARCHAR(50) NOT NULL,
+    bucket DATE NOT NULL DEFAULT DATE '1970-01-01',
+    shard SMALLINT NOT NULL,
+    value DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, bucket, shard)
+);
+
+CREATE OR REPLACE FUNCTION bump_dashboard_counter(p_metric TEXT, p_bucket DATE, p_delta NUMERIC)
+RETURNS VOID AS $$
+BEGIN
+    IF p_delta = 0 THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO dashboard_counters (metric, bucket, shard, value)
+    VALUES (p_metric, p_bucket, floor(random() * 8)::smallint, p_delta)
+    ON CONFLICT (metric, bucket, shard)
+    DO UPDATE SET value = dashboard_counters.value + EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_response_hours(p_created_at TIMESTAMP, p_answered_at TIMESTAMP)
+RETURNS NUMERIC AS $$
+    SELECT round((EXTRACT(EPOCH FROM (p_answered_at - p_created_at)) / 3600)::numeric, 2);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION dashboard_users_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_dashboard_counter('users_total', DATE '1970-01-01', 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_dashboard_counter('users_total', DATE '1970-01-01', -1);
+    END IF;
+
+    -- Only the first login of a day moves the user between buckets
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.last_login IS NOT NULL
+       AND (TG_OP = 'DELETE' OR OLD.last_login::date IS DISTINCT FROM NEW.last_login::date) THEN
+        PERFORM bump_dashboard_counter('users_last_login', OLD.last_login::date, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.last_login IS NOT NULL
+       AND (TG_OP = 'INSERT' OR OLD.last_login::date IS DISTINCT FROM NEW.last_login::date) THEN
+        PERFORM bump_dashboard_counter('users_last_login', NEW.last_login::date, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_leads_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'open' THEN
+        PERFORM bump_dashboard_counter('leads_open', DATE '1970-01-01', 1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'open' THEN
+        PERFORM bump_dashboard_counter('leads_open', DATE '1970-01-01', -1);
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_dashboard_counter('leads_total', DATE '1970-01-01', 1);
+        PERFORM bump_dashboard_counter('leads_created', NEW.created_at::date, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_dashboard_counter('leads_total', DATE '1970-01-01', -1);
+        PERFORM bump_dashboard_counter('leads_created', OLD.created_at::date, -1);
+        IF OLD.first_proposal_at IS NOT NULL THEN
+            PERFORM bump_dashboard_counter('leads_answered', OLD.created_at::date, -1);
+            PERFORM bump_dashboard_counter(
+                'lead_response_hours',
+                OLD.created_at::date,
+                -dashboard_response_hours(OLD.created_at, OLD.first_proposal_at)
+            );
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A lead counts as answered, bucketed by the day it was created, from its
+-- first proposal on. leads.first_proposal_at records that proposal; it is
+-- only changed under the lead's row lock, so concurrent proposals count the
+-- lead once, and deletes move it to the next proposal or clear it.
+CREATE OR REPLACE FUNCTION dashboard_proposals_counter()
+RETURNS TRIGGER AS $$
+DECLARE
+    lead_created_at TIMESTAMP;
+    old_first_at TIMESTAMP;
+    new_first_at TIMESTAMP;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'pending' THEN
+        PERFORM bump_dashboard_counter('proposals_pending', DATE '1970-01-01', 1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'pending' THEN
+        PERFORM bump_dashboard_counter('proposals_pending', DATE '1970-01-01', -1);
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_dashboard_counter('proposals_total', DATE '1970-01-01', 1);
+
+        UPDATE leads SET first_proposal_at = NEW.created_at
+        WHERE id = NEW.lead_id AND first_proposal_at IS NULL
+        RETURNING created_at INTO lead_created_at;
+
+        IF FOUND THEN
+            PERFORM bump_dashboard_counter('leads_answered', lead_created_at::date, 1);
+            PERFORM bump_dashboard_counter(
+                'lead_response_hours',
+                lead_created_at::date,
+                dashboard_response_hours(lead_created_at, NEW.created_at)
+            );
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_dashboard_counter('proposals_total', DATE '1970-01-01', -1);
+
+        -- No row when the lead itself is being deleted; its trigger took the
+        -- lead out of the answered counters already
+        SELECT created_at, first_proposal_at INTO lead_created_at, old_first_at
+        FROM leads WHERE id = OLD.lead_id
+        FOR UPDATE;
+
+        IF old_first_at IS NOT NULL THEN
+            SELECT min(created_at) INTO new_first_at FROM proposals WHERE lead_id = OLD.lead_id;
+
+            IF new_first_at IS DISTINCT FROM old_first_at THEN
+                UPDATE leads SET first_proposal_at = new_first_at WHERE id = OLD.lead_id;
+
+                PERFORM bump_dashboard_counter('leads_answered', lead_created_at::date, -1);
+                PERFORM bump_dashboard_counter(
+                    'lead_response_hours',
+                    lead_created_at::date,
+                    -dashboard_response_hours(lead_created_at, old_first_at)
+                );
+                IF new_first_at IS NOT NULL THEN
+                    PERFORM bump_dashboard_counter('leads_answered', lead_created_at::date, 1);
+                    PERFORM bump_dashboard_counter(
+                        'lead_response_hours',
+                        lead_created_at::date,
+                        dashboard_response_hours(lead_created_at, new_first_at)
+                    );
+                END IF;
+            END IF;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Platform revenue: completed commission transactions, by processing day
+CREATE OR REPLACE FUNCTION dashboard_transactions_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'completed' AND OLD.type = 'commission' THEN
+        PERFORM bump_dashboard_counter('revenue', COALESCE(OLD.processed_at, OLD.created_at)::date, -OLD.amount);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'completed' AND NEW.type = 'commission' THEN
+        PERFORM bump_dashboard_counter('revenue', COALESCE(NEW.processed_at, NEW.created_at)::date, NEW.amount);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dashboard_users_counter ON users;
+CREATE TRIGGER dashboard_users_counter AFTER INSERT OR UPDATE OF last_login OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION dashboard_users_counter();
+
+DROP TRIGGER IF EXISTS dashboard_leads_counter ON leads;
+CREATE TRIGGER dashboard_leads_counter AFTER INSERT OR UPDATE OF status OR DELETE ON leads
+    FOR EACH ROW EXECUTE FUNCTION dashboard_leads_counter();
+
+DROP TRIGGER IF EXISTS dashboard_proposals_counter ON proposals;
+CREATE TRIGGER dashboard_proposals_counter AFTER INSERT OR UPDATE OF status OR DELETE ON proposals
+    FOR EACH ROW EXECUTE FUNCTION dashboard_proposals_counter();
+
+DROP TRIGGER IF EXISTS dashboard_transactions_counter ON transactions;
+CREATE TRIGGER dashboard_transactions_counter
+    AFTER INSERT OR UPDATE OF status, type, amount, processed_at OR DELETE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION dashboard_transactions_counter();
+
+-- Recompute every counter from the source tables (initial load or repair).
+-- Blocks writes to the counted tables while it runs.
+CREATE OR REPLACE FUNCTION rebuild_dashboard_counters()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE users, leads, proposals, transactions IN SHARE ROW EXCLUSIVE MODE;
+    DELETE FROM dashboard_counters;
+
+    UPDATE leads l
+    SET first_proposal_at = f.first_at
+    FROM (
+        SELECT l2.id, (SELECT min(p.created_at) FROM proposals p WHERE p.lead_id = l2.id) AS first_at
+        FROM leads l2
+    ) f
+    WHERE f.id = l.id AND f.first_at IS DISTINCT FROM l.first_proposal_at;
+
+    INSERT INTO dashboard_counters (metric, bucket, shard, value)
+    SELECT 'users_total', DATE '1970-01-01', 0, count(*) FROM users
+    UNION ALL
+    SELECT 'users_last_login', last_login::date, 0, count(*)
+    FROM users WHERE last_login IS NOT NULL GROUP BY last_login::date
+    UNION ALL
+    SELECT 'leads_total', DATE '1970-01-01', 0, count(*) FROM leads
+    UNION ALL
+    SELECT 'leads_open', DATE '1970-01-01', 0, count(*) FROM leads WHERE status = 'open'
+    UNION ALL
+    SELECT 'leads_created', created_at::date, 0, count(*) FROM leads GROUP BY created_at::date
+    UNION ALL
+    SELECT 'proposals_total', DATE '1970-01-01', 0, count(*) FROM proposals
+    UNION ALL
+    SELECT 'proposals_pending', DATE '1970-01-01', 0, count(*) FROM proposals WHERE status = 'pending'
+    UNION ALL
+    SELECT metric, day, 0, value
+    FROM (
+        SELECT created_at::date AS day,
+               count(*) AS answered,
+               sum(dashboard_response_hours(created_at, first_proposal_at)) AS hours
+        FROM leads
+        WHERE first_proposal_at IS NOT NULL
+        GROUP BY created_at::date
+    ) answered
+    CROSS JOIN LATERAL (
+        VALUES ('leads_answered', answered.answered::numeric),
+               ('lead_response_hours', answered.hours)
+    ) AS v(metric, value)
+    UNION ALL
+    SELECT 'revenue', COALESCE(processed_at, created_at)::date, 0, sum(amount)
+    FROM transactions
+    WHERE status = 'completed' AND type = 'commission'
+    GROUP BY COALESCE(processed_at, created_at)::date;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM dashboard_counters) THEN
+        PERFORM rebuild_dashboard_counters();
+    END IF;
+END;
+$$;
+
 -- ==========================================
 -- INITIAL DATA
 -- ==========================================
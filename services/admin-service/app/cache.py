@@ -0,0 +1,154 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+import asyncio
+import logging
+import time
+
+import redis.asyncio as redis
+
+from python_shared.monitoring import instrument_redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Admin IDs published here are evicted from every instance's admin principal
+# cache. Admins are admin_users rows, not the users rows behind
+# python_shared.auth's PRINCIPAL_INVALIDATION_CHANNEL, so they get their own.
+ADMIN_PRINCIPAL_INVALIDATION_CHANNEL = "admin_principal_invalidation"
+
+_redis_client: Optional[redis.Redis] = None
+
+def get_redis_client() -> redis.Redis:
+    """Get Redis client instance"""
+    global _redis_client
+
+    if _redis_client is None:
+        _redis_client = redis.from_url(
+            settings.REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True,
+            health_check_interval=30
+        )
+        instrument_redis(_redis_client)
+
+    return _redis_client
+
+async def close_redis_client():
+    """Close Redis client connection"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.close()
+        _redis_client = None
+
+
+class AdminPrincipalCache:
+    """
+    מטמון פרטי אדמין - In-process cache of admin rows used for authentication
+
+    Entries live for `ttl_seconds`. Anything that changes an admin row calls
+    `invalidate`, which evicts the entry here and publishes the ID so other
+    instances evict it too; the TTL bounds staleness if a message is missed.
+    Concurrent misses for the same admin share one load.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(
+        self,
+        admin_id: str,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Get an admin row, loading it on a miss"""
+        admin_id = str(admin_id)
+        entry = self._entries.get(admin_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            return dict(entry[1])
+
+        task = self._loading.get(admin_id)
+        if task is None:
+            task = asyncio.create_task(self._load(admin_id, loader))
+            self._loading[admin_id] = task
+        admin_user = await asyncio.shield(task)
+        return dict(admin_user) if admin_user else None
+
+    async def _load(self, admin_id: str, loader) -> Optional[Dict[str, Any]]:
+        try:
+            loaded_at = time.monotonic()
+            admin_user = await loader(admin_id)
+            # An invalidation during the load dropped this task; don't cache stale data
+            if admin_user and self._loading.get(admin_id) is asyncio.current_task():
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[admin_id] = (loaded_at, admin_user)
+            return admin_user
+        finally:
+            if self._loading.get(admin_id) is asyncio.current_task():
+                del self._loading[admin_id]
+
+    def evict(self, admin_id: str):
+        """Drop an admin from this instance's cache"""
+        admin_id = str(admin_id)
+        self._entries.pop(admin_id, None)
+        self._loading.pop(admin_id, None)
+
+    async def invalidate(self, admin_id: str):
+        """
+        ביטול מטמון אדמין - Invalidation hook for every change to an admin row
+        """
+        self.evict(admin_id)
+        try:
+            await get_redis_client().publish(ADMIN_PRINCIPAL_INVALIDATION_CHANNEL, str(admin_id))
+        except Exception as e:
+            logger.error(f"Failed to publish admin cache invalidation for {admin_id}: {e}")
+
+    def start(self):
+        """Start listening for invalidations from other instances"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            pubsub = get_redis_client().pubsub()
+            try:
+                await pubsub.subscribe(ADMIN_PRINCIPAL_INVALIDATION_CHANNEL)
+                # Invalidations may have been missed while unsubscribed
+                self._entries.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.evict(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Admin cache invalidation listener failed: {e}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+_principal_cache: Optional[AdminPrincipalCache] = None
+
+def get_admin_principal_cache() -> AdminPrincipalCache:
+    """Get the admin principal cache"""
+    global _principal_cache
+
+    if _principal_cache is None:
+        _principal_cache = AdminPrincipalCache(settings.ADMIN_PRINCIPAL_CACHE_TTL)
+
+    return _principal_cache
@@ -36,20 +36,42 @@ class Settings(BaseSettings):
     ADMIN_SESSION_TIMEOUT: int = 8 * 60 * 60  # 8 hours
     MAX_FAILED_LOGINS: int = 5
     ACCOUNT_LOCKOUT_DURATION: int = 30 * 60  # 30 minutes
+    ADMIN_PRINCIPAL_CACHE_TTL: int = 60  # seconds an admin row is served from cache
+    ADMIN_ACTIVITY_FLUSH_INTERVAL: int = 30  # seconds between last-activity writes
     
     # Audit and logging
     AUDIT_LOG_RETENTION_DAYS: int = 365
     SYSTEM_LOG_LEVEL: str = "INFO"
     ENABLE_AUDIT_LOGGING: bool = True
+    AUDIT_ROLLUP_ENABLED: bool = True
+    AUDIT_ROLLUP_INTERVAL: int = 300  # seconds
+    ANALYTICS_ROLLUP_ENABLED: bool = True
+    ANALYTICS_ROLLUP_INTERVAL: int = 3600  # seconds between checks for a completed day
     
     # Data export settings
     MAX_EXPORT_RECORDS: int = 100000
     EXPORT_TIMEOUT_MINUTES: int = 30
-    ALLOWED_EXPORT_FORMATS: List[str] = ["csv", "xlsx", "json"]
+    ALLOWED_EXPORT_FORMATS: List[str] = ["csv", "parquet", "json"]
+    EXPORT_MAX_CONCURRENT_JOBS: int = 2  # exports running at once per instance
+    EXPORT_FETCH_SIZE: int = 2000  # rows per server-side cursor fetch
+    EXPORT_PART_SIZE_MB: int = 8  # multipart upload part size (S3 minimum is 5MB)
+    EXPORT_DOWNLOAD_URL_EXPIRY: int = 3600  # seconds
+    EXPORT_PREFIX: str = "admin-exports"
+    
+    # Object storage (S3/MinIO) for export files
+    S3_ENDPOINT: Optional[str] = None
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_BUCKET: str = "ofair-uploads"
+    S3_REGION: str = "us-east-1"
     
     # System monitoring
     HEALTH_CHECK_TIMEOUT: int = 5  # seconds
     SERVICE_MONITOR_INTERVAL: int = 60  # seconds
+    HEALTH_HISTORY_SIZE: int = 60  # probes kept per service
+    HEALTH_FLAP_THRESHOLD: int = 4  # status changes within the window
+    DASHBOARD_CACHE_TTL: int = 30  # seconds before dashboard stats are refreshed
+    DASHBOARD_CACHE_MAX_STALE: int = 300  # seconds stale stats may still be served
     ALERT_EMAIL_RECIPIENTS: List[str] = []
     
     # Rate limiting
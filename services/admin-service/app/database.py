@@ -1,11 +1,14 @@
 import asyncpg
 import json
 from typing import Optional, List, Dict, Any, Union
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import uuid
 import logging
 
+from python_shared.monitoring import asyncpg_connection_class
+
 from config import settings
+from cache import get_admin_principal_cache
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +23,8 @@ class AdminDatabase:
                 dsn=settings.DATABASE_URL,
                 min_size=5,
                 max_size=20,
-                command_timeout=30
+                command_timeout=30,
+                connection_class=asyncpg_connection_class()
             )
             logger.info("Connected to admin database")
             
@@ -146,13 +150,98 @@ class AdminDatabase:
                     )
                 """)
                 
+                # Hourly audit rollup, complete between audit_rollup_state.covered_from and refreshed_until
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS audit_log_hourly (
+                        hour TIMESTAMPTZ NOT NULL,
+                        event_type VARCHAR(50) NOT NULL,
+                        severity VARCHAR(20),
+                        admin_id UUID,
+                        action VARCHAR(100) NOT NULL,
+                        event_count INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS audit_rollup_state (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        covered_from TIMESTAMPTZ NOT NULL,
+                        refreshed_until TIMESTAMPTZ NOT NULL
+                    )
+                """)
+                
+                # Daily analytics facts per lead category ('' for facts without one),
+                # complete through analytics_rollup_state.rolled_up_through
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analytics_daily_facts (
+                        day DATE NOT NULL,
+                        category VARCHAR(100) NOT NULL DEFAULT '',
+                        new_users INTEGER NOT NULL DEFAULT 0,
+                        new_professionals INTEGER NOT NULL DEFAULT 0,
+                        new_customers INTEGER NOT NULL DEFAULT 0,
+                        new_leads INTEGER NOT NULL DEFAULT 0,
+                        leads_answered INTEGER NOT NULL DEFAULT 0,
+                        response_hours DECIMAL(14,2) NOT NULL DEFAULT 0,
+                        new_proposals INTEGER NOT NULL DEFAULT 0,
+                        accepted_proposals INTEGER NOT NULL DEFAULT 0,
+                        platform_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+                        payment_volume DECIMAL(14,2) NOT NULL DEFAULT 0,
+                        referral_commissions DECIMAL(14,2) NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, category)
+                    )
+                """)
+                
+                # Lead status distribution at the end of each rolled-up day
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analytics_daily_lead_status (
+                        day DATE NOT NULL,
+                        status VARCHAR(50) NOT NULL,
+                        lead_count INTEGER NOT NULL,
+                        PRIMARY KEY (day, status)
+                    )
+                """)
+                
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        rolled_up_through DATE NOT NULL
+                    )
+                """)
+                
+                # Data export jobs and their progress
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS export_jobs (
+                        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        admin_id UUID,
+                        entity_type VARCHAR(50) NOT NULL,
+                        format VARCHAR(20) NOT NULL,
+                        parameters JSONB NOT NULL DEFAULT '{}'::jsonb,
+                        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                        estimated_rows BIGINT,
+                        rows_exported BIGINT NOT NULL DEFAULT 0,
+                        bytes_uploaded BIGINT NOT NULL DEFAULT 0,
+                        parts_uploaded INTEGER NOT NULL DEFAULT 0,
+                        s3_key TEXT,
+                        error_message TEXT,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                        started_at TIMESTAMPTZ,
+                        completed_at TIMESTAMPTZ
+                    )
+                """)
+                
                 # Create indexes for performance
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs(timestamp DESC)")
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_admin_id ON audit_logs(admin_id)")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_admin_timestamp ON audit_logs(admin_id, timestamp) WHERE admin_id IS NOT NULL")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_severity_timestamp ON audit_logs(severity, timestamp DESC)")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_action_timestamp ON audit_logs(action, timestamp)")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_failed_login_ip ON audit_logs(timestamp, ip_address) WHERE action = 'login_failed'")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_hourly_hour ON audit_log_hourly(hour)")
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_admin_sessions_admin_id ON admin_sessions(admin_id)")
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_admin_sessions_expires ON admin_sessions(expires_at)")
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_system_alerts_status ON system_alerts(status)")
                 await conn.execute("CREATE INDEX IF NOT EXISTS idx_security_logs_timestamp ON security_logs(timestamp DESC)")
+                await conn.execute("CREATE INDEX IF NOT EXISTS idx_export_jobs_admin_created ON export_jobs(admin_id, created_at DESC)")
                 
                 logger.info("Admin database tables initialized successfully")
                 
@@ -273,6 +362,8 @@ class AdminDatabase:
         
         async with self.pool.acquire() as conn:
             await conn.execute(query, *values)
+        
+        await get_admin_principal_cache().invalidate(admin_id)
     
     async def update_admin_last_activity(self, admin_id: str):
         """Update admin last activity"""
@@ -285,6 +376,18 @@ class AdminDatabase:
         async with self.pool.acquire() as conn:
             await conn.execute(query, datetime.utcnow(), admin_id)
     
+    async def bulk_update_admin_last_activity(self, activity: Dict[str, datetime]):
+        """Apply coalesced last activity times, one statement for all admins"""
+        query = """
+        UPDATE admin_users a
+        SET last_login = v.seen_at
+        FROM unnest($1::uuid[], $2::timestamptz[]) AS v(id, seen_at)
+        WHERE a.id = v.id AND (a.last_login IS NULL OR a.last_login < v.seen_at)
+        """
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(query, list(activity.keys()), list(activity.values()))
+    
     async def increment_failed_login(self, admin_id: str):
         """Increment failed login attempts"""
         query = """
@@ -307,6 +410,8 @@ class AdminDatabase:
                 lockout_until,
                 admin_id
             )
+        
+        await get_admin_principal_cache().invalidate(admin_id)
     
     async def reset_failed_logins(self, admin_id: str):
         """Reset failed login attempts after successful login"""
@@ -320,6 +425,8 @@ class AdminDatabase:
         
         async with self.pool.acquire() as conn:
             await conn.execute(query, admin_id)
+        
+        await get_admin_principal_cache().invalidate(admin_id)
     
     # Session management
     async def create_admin_session(self, session_data: Dict[str, Any]) -> str:
@@ -369,6 +476,18 @@ class AdminDatabase:
         async with self.pool.acquire() as conn:
             await conn.execute(query, datetime.utcnow(), session_id)
     
+    async def bulk_update_session_activity(self, activity: Dict[str, datetime]):
+        """Apply coalesced session activity times, one statement for all sessions"""
+        query = """
+        UPDATE admin_sessions s
+        SET last_activity = v.seen_at
+        FROM unnest($1::uuid[], $2::timestamptz[]) AS v(id, seen_at)
+        WHERE s.id = v.id AND (s.last_activity IS NULL OR s.last_activity < v.seen_at)
+        """
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(query, list(activity.keys()), list(activity.values()))
+    
     async def expire_admin_session(self, session_id: str):
         """Expire admin session"""
         query = """
@@ -396,47 +515,106 @@ class AdminDatabase:
             await conn.execute(query, admin_id)
     
     # Dashboard statistics
+    # Read from dashboard_counters, which triggers on users, leads, proposals
+    # and transactions keep current (see scripts/init_database.sql)
+    async def get_dashboard_snapshot(
+        self,
+        month_start: datetime,
+        window_start: datetime
+    ) -> Dict[str, Any]:
+        """Get every dashboard statistic in one query"""
+        query = """
+        SELECT
+            COALESCE(SUM(value) FILTER (WHERE metric = 'users_total'), 0) AS total_users,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'leads_total'), 0) AS total_leads,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'leads_open'), 0) AS open_leads,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'proposals_total'), 0) AS total_proposals,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'proposals_pending'), 0) AS pending_proposals,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'revenue'), 0) AS total_revenue,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'revenue' AND bucket >= $1::date), 0) AS monthly_revenue,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'leads_created' AND bucket >= $2::date), 0) AS leads_created,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'leads_answered' AND bucket >= $2::date), 0) AS leads_answered,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'lead_response_hours' AND bucket >= $2::date), 0) AS response_hours,
+            COALESCE(SUM(value) FILTER (WHERE metric = 'users_last_login' AND bucket >= $2::date), 0) AS active_users
+        FROM dashboard_counters
+        """
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(query, month_start, window_start)
+        
+        return {
+            "total_users": int(row["total_users"]),
+            "active_users": int(row["active_users"]),
+            "total_leads": int(row["total_leads"]),
+            "open_leads": int(row["open_leads"]),
+            "total_proposals": int(row["total_proposals"]),
+            "pending_proposals": int(row["pending_proposals"]),
+            "total_revenue": float(row["total_revenue"]),
+            "monthly_revenue": float(row["monthly_revenue"]),
+            "conversion_rate": self._percentage(row["leads_answered"], row["leads_created"]),
+            "avg_response_time": (
+                round(float(row["response_hours"] / row["leads_answered"]), 2)
+                if row["leads_answered"] else 0.0
+            )
+        }
+    
+    @staticmethod
+    def _percentage(part, whole) -> float:
+        return round(float(part) / float(whole) * 100, 1) if whole else 0.0
+    
+    async def _get_counter(self, metric: str, since: Optional[datetime] = None) -> float:
+        query = """
+        SELECT COALESCE(SUM(value), 0)
+        FROM dashboard_counters
+        WHERE metric = $1 AND ($2::date IS NULL OR bucket >= $2::date)
+        """
+        
+        async with self.pool.acquire() as conn:
+            return float(await conn.fetchval(query, metric, since))
+    
     async def get_total_users(self) -> int:
         """Get total number of users across all services"""
-        # This would normally call other services or access their databases
-        # For now, return mock data
-        return 15420
+        return int(await self._get_counter("users_total"))
     
     async def get_active_users(self, days: int = 30) -> int:
         """Get active users in last N days"""
-        return 8930
+        return int(await self._get_counter("users_last_login", datetime.utcnow() - timedelta(days=days)))
     
     async def get_total_leads(self) -> int:
         """Get total number of leads"""
-        return 3280
+        return int(await self._get_counter("leads_total"))
     
     async def get_open_leads(self) -> int:
         """Get number of open leads"""
-        return 450
+        return int(await self._get_counter("leads_open"))
     
     async def get_total_proposals(self) -> int:
         """Get total number of proposals"""
-        return 12560
+        return int(await self._get_counter("proposals_total"))
     
     async def get_pending_proposals(self) -> int:
         """Get number of pending proposals"""
-        return 280
+        return int(await self._get_counter("proposals_pending"))
     
     async def get_total_revenue(self) -> float:
         """Get total platform revenue"""
-        return 284750.80
+        return await self._get_counter("revenue")
     
     async def get_monthly_revenue(self, start_date: datetime) -> float:
         """Get revenue for current month"""
-        return 45230.50
+        return await self._get_counter("revenue", start_date)
     
     async def get_conversion_rate(self, start_date: datetime) -> float:
         """Get lead to proposal conversion rate"""
-        return 78.5
+        created = await self._get_counter("leads_created", start_date)
+        answered = await self._get_counter("leads_answered", start_date)
+        return self._percentage(answered, created)
     
     async def get_avg_response_time(self, start_date: datetime) -> float:
         """Get average response time in hours"""
-        return 2.3
+        answered = await self._get_counter("leads_answered", start_date)
+        hours = await self._get_counter("lead_response_hours", start_date)
+        return round(hours / answered, 2) if answered else 0.0
     
     # System health
     async def get_database_stats(self) -> Dict[str, Any]:
@@ -545,6 +723,38 @@ class AdminDatabase:
                 audit_data.get("severity", "info")
             )
     
+    async def insert_audit_logs(self, audit_records: List[Dict[str, Any]]):
+        """Insert a batch of audit log entries with COPY"""
+        records = [
+            (
+                uuid.uuid4(),
+                audit_data.get("admin_id"),
+                audit_data.get("user_id"),
+                audit_data.get("event_type", "system"),
+                audit_data["action"],
+                audit_data["resource_type"],
+                audit_data.get("resource_id"),
+                audit_data.get("description", ""),
+                audit_data.get("ip_address"),
+                audit_data.get("user_agent"),
+                audit_data["timestamp"],
+                json.dumps(audit_data.get("metadata", {})),
+                audit_data.get("severity", "info")
+            )
+            for audit_data in audit_records
+        ]
+        
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                "audit_logs",
+                records=records,
+                columns=[
+                    "id", "admin_id", "user_id", "event_type", "action", "resource_type",
+                    "resource_id", "description", "ip_address", "user_agent",
+                    "timestamp", "metadata", "severity"
+                ]
+            )
+    
     async def get_recent_audit_logs(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get recent audit log entries"""
         query = """
@@ -659,72 +869,584 @@ class AdminDatabase:
                 "total_pages": (total_count + page_size - 1) // page_size
             }
     
-    # Rate limiting support
-    async def count_admin_actions(self, admin_id: str, action: str, since: datetime) -> int:
-        """Count admin actions since given time"""
+    # Audit aggregation
+    async def get_audit_summary_counts(
+        self,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """
+        Count audit events by event type, severity, admin, day and action in
+        a single GROUPING SETS query.
+        
+        Whole hours already covered by audit_log_hourly are read from the
+        rollup; the partial hours at either edge come from audit_logs.
+        """
         query = """
-        SELECT COUNT(*)
+        WITH state AS (
+            SELECT
+                GREATEST(
+                    date_trunc('hour', $1::timestamptz) + interval '1 hour',
+                    (SELECT covered_from FROM audit_rollup_state WHERE id = 1)
+                ) AS lo,
+                LEAST(
+                    date_trunc('hour', $2::timestamptz),
+                    COALESCE(
+                        (SELECT refreshed_until FROM audit_rollup_state WHERE id = 1),
+                        '-infinity'::timestamptz
+                    )
+                ) AS until
+        ),
+        bounds AS (
+            SELECT lo, GREATEST(lo, until) AS hi FROM state
+        ),
+        events AS (
+            SELECT h.event_type, h.severity, h.admin_id, h.action,
+                   h.hour AS ts, h.event_count AS n
+            FROM audit_log_hourly h, bounds b
+            WHERE h.hour >= b.lo AND h.hour < b.hi
+            UNION ALL
+            SELECT al.event_type, al.severity, al.admin_id, al.action,
+                   al.timestamp AS ts, 1 AS n
+            FROM audit_logs al, bounds b
+            WHERE al.timestamp >= $1 AND al.timestamp <= $2
+            AND (al.timestamp < b.lo OR al.timestamp >= b.hi)
+        )
+        SELECT
+            CASE
+                WHEN GROUPING(event_type) = 0 THEN 'event_type'
+                WHEN GROUPING(severity) = 0 THEN 'severity'
+                WHEN GROUPING(admin_id) = 0 THEN 'admin'
+                WHEN GROUPING(day) = 0 THEN 'day'
+                WHEN GROUPING(action) = 0 THEN 'action'
+                ELSE 'total'
+            END AS dimension,
+            COALESCE(event_type, severity, admin_id::text, to_char(day, 'YYYY-MM-DD'), action) AS key,
+            SUM(n)::bigint AS count
+        FROM (
+            SELECT event_type, severity, admin_id, action,
+                   date_trunc('day', ts AT TIME ZONE 'UTC') AS day, n
+            FROM events
+        ) e
+        GROUP BY GROUPING SETS ((event_type), (severity), (admin_id), (day), (action), ())
+        """
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, start_date, end_date)
+        
+        counts = {
+            "total": 0,
+            "event_type": {},
+            "severity": {},
+            "admin": {},
+            "day": {},
+            "action": {}
+        }
+        for row in rows:
+            if row["dimension"] == "total":
+                counts["total"] = row["count"]
+            else:
+                counts[row["dimension"]][row["key"]] = row["count"]
+        
+        return counts
+    
+    async def get_admin_names(self, admin_ids: List[str]) -> Dict[str, str]:
+        """Map admin ids to display names"""
+        if not admin_ids:
+            return {}
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, full_name FROM admin_users WHERE id = ANY($1::uuid[])",
+                admin_ids
+            )
+            return {str(row["id"]): row["full_name"] for row in rows}
+    
+    async def get_recent_audit_logs_by_severity(
+        self,
+        severities: List[str],
+        start_date: datetime,
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Most recent audit entries with one of the given severities"""
+        query = """
+        SELECT 
+            al.id, al.admin_id, al.user_id, al.event_type, al.action,
+            al.resource_type, al.resource_id, al.description,
+            al.timestamp, al.severity, al.metadata,
+            au.username as admin_username,
+            au.full_name as admin_name
+        FROM audit_logs al
+        LEFT JOIN admin_users au ON al.admin_id = au.id
+        WHERE al.severity = ANY($1::text[]) AND al.timestamp >= $2
+        ORDER BY al.timestamp DESC
+        LIMIT $3
+        """
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, severities, start_date, limit)
+            return [
+                {
+                    **dict(row),
+                    "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+                    "user_name": row.get("admin_name") or "מערכת"
+                }
+                for row in rows
+            ]
+    
+    async def get_failed_logins_by_ip(
+        self,
+        since: datetime,
+        min_failures: int
+    ) -> List[Dict[str, Any]]:
+        """IPs with at least `min_failures` failed logins since the given time"""
+        query = """
+        SELECT COALESCE(host(ip_address), 'unknown') AS ip_address, COUNT(*) AS count
         FROM audit_logs
-        WHERE admin_id = $1 AND action = $2 AND timestamp >= $3
+        WHERE action = 'login_failed' AND timestamp >= $1
+        GROUP BY ip_address
+        HAVING COUNT(*) >= $2
+        ORDER BY count DESC
+        """
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, since, min_failures)
+            return [dict(row) for row in rows]
+    
+    async def get_audit_activity_counts(self, since: datetime) -> Dict[str, int]:
+        """Night-hour admin actions (22:00-06:59 UTC) and data exports since the given time"""
+        query = """
+        SELECT
+            COUNT(*) FILTER (
+                WHERE admin_id IS NOT NULL
+                AND (EXTRACT(hour FROM timestamp AT TIME ZONE 'UTC') >= 22
+                     OR EXTRACT(hour FROM timestamp AT TIME ZONE 'UTC') <= 6)
+            ) AS night_actions,
+            COUNT(*) FILTER (WHERE action ILIKE '%export%') AS export_actions
+        FROM audit_logs
+        WHERE timestamp >= $1
+        """
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(query, since)
+            return dict(row) if row else {"night_actions": 0, "export_actions": 0}
+    
+    async def get_rapid_admin_actions(
+        self,
+        since: datetime,
+        max_gap_seconds: float,
+        min_occurrences: int
+    ) -> List[Dict[str, Any]]:
+        """Admins with at least `min_occurrences` actions following the previous one within `max_gap_seconds`"""
+        query = """
+        WITH gaps AS (
+            SELECT admin_id,
+                   timestamp - LAG(timestamp) OVER (PARTITION BY admin_id ORDER BY timestamp) AS gap
+            FROM audit_logs
+            WHERE admin_id IS NOT NULL AND timestamp >= $1
+        )
+        SELECT admin_id::text AS admin_id, COUNT(*) AS count
+        FROM gaps
+        WHERE gap < make_interval(secs => $2)
+        GROUP BY admin_id
+        HAVING COUNT(*) >= $3
+        ORDER BY count DESC
         """
         
         async with self.pool.acquire() as conn:
-            return await conn.fetchval(query, admin_id, action, since)
+            rows = await conn.fetch(query, since, max_gap_seconds, min_occurrences)
+            return [dict(row) for row in rows]
+    
+    async def refresh_audit_rollup(self, initial_days: int = 30) -> Optional[datetime]:
+        """
+        Roll audit_logs into audit_log_hourly for every complete hour since
+        the last refresh. The most recent rolled-up hour is recomputed too,
+        to pick up rows that landed just after it was closed.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Serialize concurrent refreshers across instances
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('audit_log_hourly'))")
+                
+                refreshed_until = await conn.fetchval(
+                    "SELECT refreshed_until FROM audit_rollup_state WHERE id = 1"
+                )
+                until = await conn.fetchval("SELECT date_trunc('hour', NOW())")
+                if refreshed_until is None:
+                    since = until - timedelta(days=initial_days)
+                else:
+                    since = refreshed_until - timedelta(hours=1)
+                
+                await conn.execute(
+                    "DELETE FROM audit_log_hourly WHERE hour >= $1 AND hour < $2",
+                    since, until
+                )
+                await conn.execute("""
+                    INSERT INTO audit_log_hourly (hour, event_type, severity, admin_id, action, event_count)
+                    SELECT date_trunc('hour', timestamp), event_type, severity, admin_id, action, COUNT(*)
+                    FROM audit_logs
+                    WHERE timestamp >= $1 AND timestamp < $2
+                    GROUP BY 1, 2, 3, 4, 5
+                """, since, until)
+                await conn.execute("""
+                    INSERT INTO audit_rollup_state (id, covered_from, refreshed_until)
+                    VALUES (1, $1, $2)
+                    ON CONFLICT (id) DO UPDATE SET refreshed_until = EXCLUDED.refreshed_until
+                """, since, until)
+                
+                return until
     
     # Analytics data
+    # Served from analytics_daily_facts, which refresh_analytics_rollup fills
+    # one completed day at a time; ranges are inclusive and end at the last
+    # rolled-up day
+    @staticmethod
+    def _analytics_range(start_date: datetime, end_date: datetime):
+        start = start_date.date()
+        end = end_date.date()
+        previous_start = start - (end - start) - timedelta(days=1)
+        return start, end, previous_start
+    
+    @staticmethod
+    def _growth_rate(current, previous) -> Optional[float]:
+        if not previous:
+            return None
+        return round((float(current) - float(previous)) / float(previous) * 100, 1)
+    
+    async def get_analytics_rolled_up_through(self) -> Optional[date]:
+        """Last day included in the analytics rollups"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT rolled_up_through FROM analytics_rollup_state WHERE id = 1"
+            )
+    
     async def get_user_analytics(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Get user analytics for date range"""
-        # Mock data - would normally query other services
+        """
+        Get user analytics for date range
+        
+        active_users and churn_rate go by each user's latest login:
+        churn_rate is the share of users last seen in the previous
+        equal-length range, out of everyone seen since its start.
+        """
+        start, end, previous_start = self._analytics_range(start_date, end_date)
+        
+        query = """
+        WITH logins AS (
+            SELECT
+                COALESCE(SUM(value) FILTER (WHERE bucket BETWEEN $1 AND $2), 0) AS active,
+                COALESCE(SUM(value) FILTER (WHERE bucket >= $3 AND bucket < $1), 0) AS churned,
+                COALESCE(SUM(value), 0) AS seen
+            FROM dashboard_counters
+            WHERE metric = 'users_last_login' AND bucket >= $3
+        )
+        SELECT
+            COALESCE(SUM(new_users) FILTER (WHERE day >= $1), 0) AS new_users,
+            COALESCE(SUM(new_users) FILTER (WHERE day >= $3 AND day < $1), 0) AS previous_new_users,
+            COALESCE(SUM(new_users), 0) AS total_users,
+            COALESCE(SUM(new_professionals), 0) AS professionals,
+            COALESCE(SUM(new_customers), 0) AS customers,
+            (SELECT active::int FROM logins) AS active_users,
+            (SELECT churned FROM logins) AS churned_users,
+            (SELECT seen FROM logins) AS seen_users
+        FROM analytics_daily_facts
+        WHERE category = '' AND day <= $2
+        """
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(query, start, end, previous_start)
+            rolled_up_through = await conn.fetchval(
+                "SELECT rolled_up_through FROM analytics_rollup_state WHERE id = 1"
+            )
+        
         return {
-            "new_users": 245,
-            "total_users": 15420,
-            "active_users": 8930,
-            "churn_rate": 2.1,
-            "growth_rate": 12.5,
+            "new_users": row["new_users"],
+            "total_users": row["total_users"],
+            "active_users": row["active_users"],
+            "churn_rate": self._percentage(row["churned_users"], row["seen_users"]),
+            "growth_rate": self._growth_rate(row["new_users"], row["previous_new_users"]),
             "by_type": {
-                "professionals": 8450,
-                "customers": 6970
-            }
+                "professionals": row["professionals"],
+                "customers": row["customers"]
+            },
+            "data_through": rolled_up_through.isoformat() if rolled_up_through else None
         }
     
     async def get_lead_analytics(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Get lead analytics for date range"""
+        """
+        Get lead analytics for date range
+        
+        Leads keep no status history, so by_status is the snapshot
+        refresh_analytics_rollup took of the last rolled-up day at or before
+        the end of the range: the statuses those leads had when that day was
+        rolled up, normally a few hours after it ended. Ranges that end before
+        the first snapshot have an all-zero breakdown.
+        """
+        start, end, previous_start = self._analytics_range(start_date, end_date)
+        
+        query = """
+        SELECT
+            category,
+            COALESCE(SUM(new_leads) FILTER (WHERE day >= $1), 0) AS new_leads,
+            COALESCE(SUM(new_leads) FILTER (WHERE day >= $3 AND day < $1), 0) AS previous_new_leads,
+            COALESCE(SUM(new_leads), 0) AS total_leads,
+            COALESCE(SUM(leads_answered) FILTER (WHERE day >= $1), 0) AS leads_answered,
+            COALESCE(SUM(response_hours) FILTER (WHERE day >= $1), 0) AS response_hours,
+            COALESCE(SUM(new_proposals) FILTER (WHERE day >= $1), 0) AS new_proposals,
+            COALESCE(SUM(accepted_proposals) FILTER (WHERE day >= $1), 0) AS accepted_proposals
+        FROM analytics_daily_facts
+        WHERE day <= $2
+        GROUP BY category
+        """
+        
+        # Latest status snapshot within the range
+        status_query = """
+        SELECT status, lead_count
+        FROM analytics_daily_lead_status
+        WHERE day = (
+            SELECT MAX(day) FROM analytics_daily_lead_status WHERE day <= $1
+        )
+        """
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, start, end, previous_start)
+            status_rows = await conn.fetch(status_query, end)
+            rolled_up_through = await conn.fetchval(
+                "SELECT rolled_up_through FROM analytics_rollup_state WHERE id = 1"
+            )
+        
+        totals = {
+            key: sum(row[key] for row in rows)
+            for key in (
+                "new_leads", "previous_new_leads", "total_leads", "leads_answered",
+                "response_hours", "new_proposals", "accepted_proposals"
+            )
+        }
+        
+        by_status = {"open": 0, "in_progress": 0, "closed": 0, "cancelled": 0}
+        status_groups = {
+            "open": "open",
+            "assigned": "in_progress",
+            "in_progress": "in_progress",
+            "completed": "closed",
+            "cancelled": "cancelled"
+        }
+        for row in status_rows:
+            group = status_groups.get(row["status"], row["status"])
+            by_status[group] = by_status.get(group, 0) + row["lead_count"]
+        
         return {
-            "total_leads": 3280,
-            "new_leads": 420,
-            "conversion_rate": 78.5,
-            "avg_response_time": 2.3,
+            "total_leads": totals["total_leads"],
+            "new_leads": totals["new_leads"],
+            "growth_rate": self._growth_rate(totals["new_leads"], totals["previous_new_leads"]),
+            "conversion_rate": self._percentage(totals["leads_answered"], totals["new_leads"]),
+            "avg_response_time": (
+                round(float(totals["response_hours"]) / totals["leads_answered"], 2)
+                if totals["leads_answered"] else 0.0
+            ),
+            "proposals": {
+                "new_proposals": totals["new_proposals"],
+                "accepted_proposals": totals["accepted_proposals"],
+                "acceptance_rate": self._percentage(totals["accepted_proposals"], totals["new_proposals"])
+            },
             "by_category": {
-                "בנייה ושיפוצים": 980,
-                "אלקטריקאי": 650,
-                "שרברבות": 520,
-                "ניקיון": 380,
-                "אחר": 750
+                row["category"]: row["new_leads"]
+                for row in sorted(rows, key=lambda r: r["new_leads"], reverse=True)
+                if row["category"] and row["new_leads"]
             },
-            "by_status": {
-                "open": 450,
-                "in_progress": 1200,
-                "closed": 1430,
-                "cancelled": 200
-            }
+            "by_status": by_status,
+            "data_through": rolled_up_through.isoformat() if rolled_up_through else None
         }
     
     async def get_revenue_analytics(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Get revenue analytics for date range"""
+        """
+        Get revenue analytics for date range
+        
+        commission_revenue is the platform revenue of the range;
+        monthly_revenue that of the calendar month the range ends in.
+        """
+        start, end, previous_start = self._analytics_range(start_date, end_date)
+        
+        query = """
+        SELECT
+            category,
+            COALESCE(SUM(platform_revenue) FILTER (WHERE day >= $1), 0) AS revenue,
+            COALESCE(SUM(platform_revenue) FILTER (WHERE day >= $3 AND day < $1), 0) AS previous_revenue,
+            COALESCE(SUM(platform_revenue), 0) AS total_revenue,
+            COALESCE(SUM(platform_revenue) FILTER (WHERE day >= $4), 0) AS month_revenue,
+            COALESCE(SUM(payment_volume) FILTER (WHERE day >= $1), 0) AS payment_volume,
+            COALESCE(SUM(referral_commissions) FILTER (WHERE day >= $1), 0) AS referral_commissions
+        FROM analytics_daily_facts
+        WHERE day <= $2
+        GROUP BY category
+        """
+        
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, start, end, previous_start, end.replace(day=1))
+            rolled_up_through = await conn.fetchval(
+                "SELECT rolled_up_through FROM analytics_rollup_state WHERE id = 1"
+            )
+        
+        totals = {
+            key: float(sum(row[key] for row in rows))
+            for key in (
+                "revenue", "previous_revenue", "total_revenue", "month_revenue",
+                "payment_volume", "referral_commissions"
+            )
+        }
+        
         return {
-            "total_revenue": 284750.80,
-            "monthly_revenue": 45230.50,
-            "commission_revenue": 42180.30,
-            "growth_rate": 18.5,
+            "total_revenue": totals["total_revenue"],
+            # Month to date of the range's last month, as on the dashboard
+            "monthly_revenue": totals["month_revenue"],
+            "commission_revenue": totals["revenue"],
+            "payment_volume": totals["payment_volume"],
+            "referral_commissions": totals["referral_commissions"],
+            "growth_rate": self._growth_rate(totals["revenue"], totals["previous_revenue"]),
             "by_category": {
-                "בנייה ושיפוצים": 125000.00,
-                "אלקטריקאי": 78500.00,
-                "שרברבות": 45200.00,
-                "ניקיון": 22100.00,
-                "אחר": 13950.80
-            }
+                (row["category"] or "ללא קטגוריה"): float(row["revenue"])
+                for row in sorted(rows, key=lambda r: r["revenue"], reverse=True)
+                if row["revenue"]
+            },
+            "data_through": rolled_up_through.isoformat() if rolled_up_through else None
         }
     
+    async def refresh_analytics_rollup(self) -> Optional[date]:
+        """
+        Roll up every completed day since the last run into
+        analytics_daily_facts, one day at a time. Normally that is just
+        yesterday; the first run backfills from the oldest user or lead.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Serialize concurrent rollups across instances
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('analytics_daily_facts'))")
+                
+                rolled_up_through = await conn.fetchval(
+                    "SELECT rolled_up_through FROM analytics_rollup_state WHERE id = 1"
+                )
+                yesterday = await conn.fetchval("SELECT (NOW() AT TIME ZONE 'UTC')::date - 1")
+                
+                if rolled_up_through is None:
+                    first_day = await conn.fetchval("""
+                        SELECT LEAST(
+                            (SELECT MIN(created_at) FROM users),
+                            (SELECT MIN(created_at) FROM leads)
+                        )::date
+                    """)
+                    day = first_day or yesterday
+                else:
+                    day = rolled_up_through + timedelta(days=1)
+                
+                if day > yesterday:
+                    return rolled_up_through
+                
+                while day <= yesterday:
+                    await self._rollup_analytics_day(conn, day)
+                    day += timedelta(days=1)
+                
+                # Status snapshot as of the end of the last rolled-up day
+                await conn.execute(
+                    "DELETE FROM analytics_daily_lead_status WHERE day = $1", yesterday
+                )
+                await conn.execute("""
+                    INSERT INTO analytics_daily_lead_status (day, status, lead_count)
+                    SELECT $1::date, status::text, COUNT(*)
+                    FROM leads
+                    WHERE created_at < $1::date + 1
+                    GROUP BY status
+                """, yesterday)
+                
+                await conn.execute("""
+                    INSERT INTO analytics_rollup_state (id, rolled_up_through)
+                    VALUES (1, $1)
+                    ON CONFLICT (id) DO UPDATE SET rolled_up_through = EXCLUDED.rolled_up_through
+                """, yesterday)
+                
+                return yesterday
+    
+    async def _rollup_analytics_day(self, conn, day: date):
+        """Recompute the facts of one day; every source query is a one-day range scan"""
+        await conn.execute("DELETE FROM analytics_daily_facts WHERE day = $1", day)
+        await conn.execute("""
+            WITH facts AS (
+                SELECT '' AS category,
+                       COUNT(*) AS new_users,
+                       COUNT(*) FILTER (WHERE role = 'professional') AS new_professionals,
+                       COUNT(*) FILTER (WHERE role = 'customer') AS new_customers,
+                       0 AS new_leads, 0 AS leads_answered, 0::numeric AS response_hours,
+                       0 AS new_proposals, 0 AS accepted_proposals,
+                       0::numeric AS platform_revenue, 0::numeric AS payment_volume,
+                       0::numeric AS referral_commissions
+                FROM users
+                WHERE created_at >= $1::date AND created_at < $1::date + 1
+                
+                UNION ALL
+                SELECT category, 0, 0, 0, COUNT(*), 0, 0, 0, 0, 0, 0, 0
+                FROM leads
+                WHERE created_at >= $1::date AND created_at < $1::date + 1
+                GROUP BY category
+                
+                UNION ALL
+                -- Proposals made that day; a lead counts as answered on the day of its first proposal
+                SELECT l.category, 0, 0, 0, 0,
+                       COUNT(*) FILTER (WHERE NOT EXISTS (
+                           SELECT 1 FROM proposals e
+                           WHERE e.lead_id = p.lead_id AND (e.created_at, e.id) < (p.created_at, p.id)
+                       )),
+                       COALESCE(SUM(EXTRACT(EPOCH FROM (p.created_at - l.created_at)) / 3600) FILTER (WHERE NOT EXISTS (
+                           SELECT 1 FROM proposals e
+                           WHERE e.lead_id = p.lead_id AND (e.created_at, e.id) < (p.created_at, p.id)
+                       )), 0)::numeric,
+                       COUNT(*), 0, 0, 0, 0
+                FROM proposals p
+                JOIN leads l ON l.id = p.lead_id
+                WHERE p.created_at >= $1::date AND p.created_at < $1::date + 1
+                GROUP BY l.category
+                
+                UNION ALL
+                SELECT l.category, 0, 0, 0, 0, 0, 0, 0, COUNT(*), 0, 0, 0
+                FROM proposals p
+                JOIN leads l ON l.id = p.lead_id
+                WHERE p.accepted_at >= $1::date AND p.accepted_at < $1::date + 1
+                GROUP BY l.category
+                
+                UNION ALL
+                -- Completed transactions by processing day: commissions are platform revenue
+                SELECT COALESCE(l.category, ''), 0, 0, 0, 0, 0, 0, 0, 0,
+                       COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'commission'), 0),
+                       COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'payment'), 0),
+                       0
+                FROM transactions t
+                LEFT JOIN leads l ON l.id = t.lead_id
+                WHERE t.status = 'completed'
+                  AND (
+                      (t.processed_at >= $1::date AND t.processed_at < $1::date + 1)
+                      OR (t.processed_at IS NULL AND t.created_at >= $1::date AND t.created_at < $1::date + 1)
+                  )
+                GROUP BY COALESCE(l.category, '')
+                
+                UNION ALL
+                SELECT l.category, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, SUM(c.commission_amount)
+                FROM commissions c
+                JOIN referrals r ON r.id = c.referral_id
+                JOIN leads l ON l.id = r.lead_id
+                WHERE c.calculated_at >= $1::date AND c.calculated_at < $1::date + 1
+                GROUP BY l.category
+            )
+            INSERT INTO analytics_daily_facts (
+                day, category, new_users, new_professionals, new_customers,
+                new_leads, leads_answered, response_hours, new_proposals, accepted_proposals,
+                platform_revenue, payment_volume, referral_commissions
+            )
+            SELECT $1::date, category,
+                   SUM(new_users), SUM(new_professionals), SUM(new_customers),
+                   SUM(new_leads), SUM(leads_answered), ROUND(SUM(response_hours), 2),
+                   SUM(new_proposals), SUM(accepted_proposals),
+                   SUM(platform_revenue), SUM(payment_volume), SUM(referral_commissions)
+            FROM facts
+            GROUP BY category
+        """, day)
+    
     # 2FA support
     async def store_2fa_code(self, admin_id: str, code: str, expires_in_minutes: int = 5):
         """Store 2FA code"""
@@ -786,6 +1508,94 @@ class AdminDatabase:
                 security_data.get("severity", "medium")
             )
 
+    # Data export jobs
+    async def create_export_job(self, job_data: Dict[str, Any]) -> str:
+        """Create a pending export job"""
+        query = """
+        INSERT INTO export_jobs (admin_id, entity_type, format, parameters)
+        VALUES ($1, $2, $3, $4)
+        RETURNING id
+        """
+        
+        async with self.pool.acquire() as conn:
+            job_id = await conn.fetchval(
+                query,
+                job_data.get("admin_id"),
+                job_data["entity_type"],
+                job_data["format"],
+                json.dumps(job_data.get("parameters", {}), default=str)
+            )
+            return str(job_id)
+    
+    async def start_export_job(self, job_id: str, s3_key: str, estimated_rows: Optional[int]):
+        """Mark an export job as running"""
+        query = """
+        UPDATE export_jobs
+        SET status = 'running', s3_key = $2, estimated_rows = $3, started_at = NOW()
+        WHERE id = $1
+        """
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(query, job_id, s3_key, estimated_rows)
+    
+    async def update_export_progress(
+        self,
+        job_id: str,
+        rows_exported: int,
+        bytes_uploaded: int,
+        parts_uploaded: int
+    ):
+        """Record export progress after an uploaded part"""
+        query = """
+        UPDATE export_jobs
+        SET rows_exported = $2, bytes_uploaded = $3, parts_uploaded = $4
+        WHERE id = $1
+        """
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(query, job_id, rows_exported, bytes_uploaded, parts_uploaded)
+    
+    async def finish_export_job(
+        self,
+        job_id: str,
+        status: str,
+        error_message: Optional[str] = None
+    ):
+        """Mark an export job as completed or failed"""
+        query = """
+        UPDATE export_jobs
+        SET status = $2, error_message = $3, completed_at = NOW()
+        WHERE id = $1
+        """
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(query, job_id, status, error_message)
+    
+    async def get_export_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get export job by ID"""
+        query = "SELECT * FROM export_jobs WHERE id = $1"
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(query, job_id)
+            if not row:
+                return None
+            job = dict(row)
+            job["parameters"] = json.loads(job["parameters"]) if job["parameters"] else {}
+            return job
+    
+    async def fail_stale_export_jobs(self, timeout_minutes: int) -> int:
+        """Fail jobs left unfinished past the export timeout (e.g. by a restart)"""
+        query = """
+        UPDATE export_jobs
+        SET status = 'failed', error_message = 'Export interrupted', completed_at = NOW()
+        WHERE status IN ('pending', 'running')
+          AND created_at < NOW() - make_interval(mins => $1)
+        """
+        
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(query, timeout_minutes)
+            return int(result.split()[-1])
+
 # Global database instance
 _db_instance = None
 
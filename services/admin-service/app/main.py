@@ -5,6 +5,7 @@ import sys
 import os
 import uvicorn
 import logging
+import asyncio
 from datetime import datetime
 from typing import Optional
 
@@ -19,8 +20,13 @@ from routes.users import router as users_router
 from routes.leads import router as leads_router
 from routes.system import router as system_router
 from routes.reports import router as reports_router
-from middleware.auth import verify_admin_token
-from services.audit_service import AuditService
+from middleware.auth import verify_admin_token, get_activity_tracker
+from cache import get_admin_principal_cache, close_redis_client
+from services.audit_service import AuditService, get_audit_sink
+from services.health_monitor import get_health_monitor
+from services.export_service import get_export_service
+from services.dashboard_service import DashboardService
+from python_shared.monitoring import setup_metrics
 
 # Configure logging
 logging.basicConfig(
@@ -47,8 +53,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "admin-service")
+
 security = HTTPBearer()
 
+# Background task keeping the hourly audit rollup current
+audit_rollup_task: Optional[asyncio.Task] = None
+
+# Background task rolling each completed day into the analytics facts
+analytics_rollup_task: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection and services"""
@@ -57,6 +72,19 @@ async def startup_event():
         await db.connect()
         logger.info("מערכת הניהול הופעלה בהצלחה - Admin service started successfully")
         
+        # Start batched audit logging
+        get_audit_sink().start()
+        
+        # Admin principal cache invalidations and coalesced activity writes
+        get_admin_principal_cache().start()
+        get_activity_tracker().start()
+        
+        # Probe the other services in the background for dashboard reads
+        get_health_monitor().start()
+        
+        # Exports cut short by a restart can never finish
+        await db.fail_stale_export_jobs(settings.EXPORT_TIMEOUT_MINUTES)
+        
         # Initialize audit service
         audit_service = AuditService()
         await audit_service.log_system_event(
@@ -66,6 +94,18 @@ async def startup_event():
             metadata={"version": "1.0.0", "environment": settings.ENVIRONMENT}
         )
         
+        if settings.AUDIT_ROLLUP_ENABLED:
+            global audit_rollup_task
+            audit_rollup_task = asyncio.create_task(
+                audit_service.run_rollup_loop(settings.AUDIT_ROLLUP_INTERVAL)
+            )
+        
+        if settings.ANALYTICS_ROLLUP_ENABLED:
+            global analytics_rollup_task
+            analytics_rollup_task = asyncio.create_task(
+                DashboardService().run_analytics_rollup_loop(settings.ANALYTICS_ROLLUP_INTERVAL)
+            )
+        
     except Exception as e:
         logger.error(f"Failed to start admin service: {e}")
         raise
@@ -74,6 +114,21 @@ async def startup_event():
 async def shutdown_event():
     """Clean up database connections"""
     try:
+        if audit_rollup_task:
+            audit_rollup_task.cancel()
+        if analytics_rollup_task:
+            analytics_rollup_task.cancel()
+        
+        await get_health_monitor().stop()
+        await get_export_service().stop()
+        await get_admin_principal_cache().stop()
+        await get_activity_tracker().stop()
+        
+        # Flush queued audit records before the pool goes away
+        await get_audit_sink().stop()
+        
+        await close_redis_client()
+        
         db = get_database()
         await db.disconnect()
         logger.info("מערכת הניהול הופסקה - Admin service shut down")
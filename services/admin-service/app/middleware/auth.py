@@ -1,13 +1,16 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional, List
+from typing import Optional, List, Dict
 import jwt
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 
+from python_shared.ratelimit import RateLimitRule, get_rate_limiter
+
 from config import settings, check_permission
 from database import get_database
+from cache import get_admin_principal_cache, get_redis_client
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
@@ -53,7 +56,7 @@ class AdminAuthMiddleware:
     async def get_admin_user(self, user_id: str) -> dict:
         """קבלת פרטי אדמין - Get admin user details"""
         try:
-            admin_user = await self.db.get_admin_by_id(user_id)
+            admin_user = await get_admin_principal_cache().get(user_id, self.db.get_admin_by_id)
             
             if not admin_user:
                 raise HTTPException(
@@ -68,7 +71,7 @@ class AdminAuthMiddleware:
                 )
             
             # Check for account lockout
-            if admin_user.get("locked_until") and admin_user["locked_until"] > datetime.utcnow():
+            if admin_user.get("locked_until") and admin_user["locked_until"] > datetime.now(timezone.utc):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="החשבון נעול זמנית - Account temporarily locked"
@@ -76,6 +79,8 @@ class AdminAuthMiddleware:
             
             return admin_user
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error getting admin user {user_id}: {e}")
             raise HTTPException(
@@ -128,11 +133,8 @@ async def verify_admin_token(
     # Get admin user details
     admin_user = await auth_middleware.get_admin_user(payload["sub"])
     
-    # Update last activity
-    try:
-        await auth_middleware.db.update_admin_last_activity(admin_user["id"])
-    except Exception as e:
-        logger.error(f"Failed to update admin last activity: {e}")
+    # Update last activity (coalesced, written in the background)
+    get_activity_tracker().touch_admin(admin_user["id"])
     
     return admin_user
 
@@ -225,8 +227,8 @@ class AdminSessionManager:
             await self.db.expire_admin_session(session_id)
             return None
         
-        # Update last activity
-        await self.db.update_session_activity(session_id)
+        # Update last activity (coalesced, written in the background)
+        get_activity_tracker().touch_session(session_id)
         
         return session
     
@@ -254,39 +256,120 @@ class AdminSessionManager:
             "timestamp": datetime.utcnow()
         })
 
+# Coalesced activity updates
+class AdminActivityTracker:
+    """
+    צבירת עדכוני פעילות - Coalesced last-activity updates
+
+    Requests only note the time in memory; a background task writes what was
+    seen since the previous flush once per `flush_interval_seconds`, with one
+    UPDATE for sessions and one for admins.
+    """
+    
+    def __init__(self, flush_interval_seconds: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._sessions: Dict[str, datetime] = {}
+        self._admins: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def touch_session(self, session_id: str):
+        self._sessions[str(session_id)] = datetime.now(timezone.utc)
+    
+    def touch_admin(self, admin_id: str):
+        self._admins[str(admin_id)] = datetime.now(timezone.utc)
+    
+    def start(self):
+        """הפעלת כתיבה ברקע - Start the background flush loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """עצירה וכתיבת הפעילות שנצברה - Stop and flush pending activity"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+    
+    async def flush(self):
+        """Write every pending activity time"""
+        db = get_database()
+        
+        sessions, self._sessions = self._sessions, {}
+        if sessions:
+            try:
+                await db.bulk_update_session_activity(sessions)
+            except Exception as e:
+                logger.error(f"Failed to flush session activity: {e}")
+                for session_id, seen_at in sessions.items():
+                    self._sessions.setdefault(session_id, seen_at)
+        
+        admins, self._admins = self._admins, {}
+        if admins:
+            try:
+                await db.bulk_update_admin_last_activity(admins)
+            except Exception as e:
+                logger.error(f"Failed to flush admin last activity: {e}")
+                for admin_id, seen_at in admins.items():
+                    self._admins.setdefault(admin_id, seen_at)
+
+_activity_tracker: Optional[AdminActivityTracker] = None
+
+def get_activity_tracker() -> AdminActivityTracker:
+    """Get the admin activity tracker"""
+    global _activity_tracker
+    
+    if _activity_tracker is None:
+        _activity_tracker = AdminActivityTracker(settings.ADMIN_ACTIVITY_FLUSH_INTERVAL)
+    
+    return _activity_tracker
+
 # Rate limiting
 class AdminRateLimiter:
-    def __init__(self):
+    """
+    הגבלת קצב אדמין - Per-admin, per-action sliding window limit
+
+    Uses the shared python_shared.ratelimit limiter, which falls back to
+    in-process token buckets while Redis is unavailable instead of failing
+    open.
+    """
+    
+    def __init__(self, window_seconds: int = 60):
         self.db = get_database()
+        self.limiter = get_rate_limiter(get_redis_client())
+        self.window_seconds = window_seconds
     
     async def check_rate_limit(self, admin_id: str, action: str, limit: int = None) -> bool:
         """בדיקת הגבלת קצב - Check rate limiting"""
         if limit is None:
             limit = settings.ADMIN_RATE_LIMIT_PER_MINUTE
         
-        try:
-            # Count actions in the last minute
-            one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
-            action_count = await self.db.count_admin_actions(
-                admin_id, action, one_minute_ago
-            )
-            
-            if action_count >= limit:
-                # Log rate limit exceeded
+        result = await self.limiter.check([
+            RateLimitRule(f"admin_rate:{admin_id}:{action}", limit, self.window_seconds)
+        ])
+        
+        if not result.allowed:
+            # Log rate limit exceeded
+            try:
                 await self.db.insert_audit_log({
                     "admin_id": admin_id,
                     "action": "rate_limit_exceeded",
                     "resource_type": "system",
                     "timestamp": datetime.utcnow(),
-                    "metadata": {"action": action, "count": action_count}
+                    "metadata": {"action": action, "count": result.counts[0]}
                 })
-                return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Rate limiting check failed: {e}")
-            return True  # Allow on error to avoid blocking
+            except Exception as e:
+                logger.error(f"Failed to log rate limit exceeded: {e}")
+        
+        return result.allowed
 
 # IP whitelisting (optional security layer)
 class IPWhitelist:
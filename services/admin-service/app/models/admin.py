@@ -110,7 +110,7 @@ class DataExportRequest(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     filters: Dict[str, Any] = Field(default_factory=dict)
-    format: str = Field(default="csv", pattern=r'^(csv|xlsx|json)$')
+    format: str = Field(default="csv", pattern=r'^(csv|parquet|json)$')
     include_pii: bool = Field(default=False)  # כלל מידע אישי
 
 # Response Models
@@ -242,6 +242,12 @@ class DataExportResult(BaseModel):
     completed_at: Optional[datetime]
     expires_at: Optional[datetime]
     error_message: Optional[str]
+    started_at: Optional[datetime] = None
+    rows_exported: int = 0
+    estimated_rows: Optional[int] = None  # planner estimate
+    bytes_uploaded: int = 0
+    parts_uploaded: int = 0
+    progress_percentage: float = 0.0
 
 class BulkActionResult(BaseModel):
     """תוצאת פעולה נפחית - Bulk action result"""
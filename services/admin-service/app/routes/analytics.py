@@ -6,6 +6,7 @@ from middleware.auth import verify_admin_token, require_permissions
 from services.dashboard_service import DashboardService
 from services.metrics_service import MetricsService
 from services.audit_service import AuditService
+from services.export_service import get_export_service, ExportError
 
 router = APIRouter()
 
@@ -63,8 +64,8 @@ async def get_user_analytics(
         },
         "insights": {
             "daily_growth_rate": daily_growth,
-            "activity_rate": (user_analytics["active_users"] / user_analytics["total_users"]) * 100,
-            "professional_percentage": (user_analytics["by_type"]["professionals"] / user_analytics["total_users"]) * 100
+            "activity_rate": (user_analytics["active_users"] / max(user_analytics["total_users"], 1)) * 100,
+            "professional_percentage": (user_analytics["by_type"]["professionals"] / max(user_analytics["total_users"], 1)) * 100
         }
     }
     
@@ -102,9 +103,9 @@ async def get_lead_analytics(
         },
         "insights": {
             "daily_leads_average": daily_leads,
-            "completion_rate": (lead_analytics["by_status"]["closed"] / lead_analytics["total_leads"]) * 100,
-            "open_rate": (lead_analytics["by_status"]["open"] / lead_analytics["total_leads"]) * 100,
-            "top_category": max(lead_analytics["by_category"].items(), key=lambda x: x[1])[0]
+            "completion_rate": (lead_analytics["by_status"]["closed"] / max(lead_analytics["total_leads"], 1)) * 100,
+            "open_rate": (lead_analytics["by_status"]["open"] / max(lead_analytics["total_leads"], 1)) * 100,
+            "top_category": max(lead_analytics["by_category"].items(), key=lambda x: x[1], default=(None, 0))[0]
         }
     }
     
@@ -131,7 +132,7 @@ async def get_revenue_analytics(
     
     # Calculate additional metrics
     total_days = (end_date - start_date).days
-    daily_revenue = revenue_analytics["monthly_revenue"] / max(total_days, 1)
+    daily_revenue = revenue_analytics["commission_revenue"] / max(total_days, 1)
     
     analytics_data = {
         **revenue_analytics,
@@ -142,8 +143,8 @@ async def get_revenue_analytics(
         },
         "insights": {
             "daily_revenue_average": daily_revenue,
-            "commission_percentage": (revenue_analytics["commission_revenue"] / revenue_analytics["total_revenue"]) * 100,
-            "top_revenue_category": max(revenue_analytics["by_category"].items(), key=lambda x: x[1])[0]
+            "commission_percentage": (revenue_analytics["commission_revenue"] / max(revenue_analytics["payment_volume"], 1)) * 100,
+            "top_revenue_category": max(revenue_analytics["by_category"].items(), key=lambda x: x[1], default=(None, 0))[0]
         }
     }
     
@@ -280,19 +281,30 @@ async def export_analytics_data(
     # Log the export request
     audit_service = AuditService()
     await audit_service.log_admin_action(
-        admin_id=admin_user["user_id"],
+        admin_id=admin_user["id"],
         action="analytics_export",
         resource_type="analytics",
         description="יצוא נתוני אנליטיקה",
         metadata=export_request
     )
     
-    # For now, return success - would implement actual export
-    export_id = f"export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        start_date = export_request.get("start_date")
+        end_date = export_request.get("end_date")
+        export_id = await get_export_service().create_export(
+            admin_id=admin_user["id"],
+            entity_type="analytics",
+            export_format=export_request.get("format", "csv"),
+            start_date=datetime.fromisoformat(start_date) if start_date else None,
+            end_date=datetime.fromisoformat(end_date) if end_date else None,
+            filters=export_request.get("filters") or {}
+        )
+    except (ExportError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "export_id": export_id,
-        "status": "initiated",
+        "status": "pending",
         "message": "יצוא נתונים החל",
-        "estimated_completion": (datetime.utcnow() + timedelta(minutes=5)).isoformat()
-    }
\ No newline at end of file
+        "status_url": f"/api/v1/reports/export/{export_id}"
+    }
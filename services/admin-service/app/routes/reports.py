@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, Query, BackgroundTasks, HTTPException, status
 from typing import Optional
 from datetime import datetime, timedelta
 
 from middleware.auth import verify_admin_token, require_permissions
-from models.admin import DataExportRequest
+from models.admin import DataExportRequest, DataExportResult
 from services.audit_service import AuditService
+from services.export_service import get_export_service, ExportError
 
 router = APIRouter()
 
@@ -70,7 +71,7 @@ async def export_data(
     # Log export request
     audit_service = AuditService()
     await audit_service.log_admin_action(
-        admin_id=admin_user["user_id"],
+        admin_id=admin_user["id"],
         action="data_export_requested",
         resource_type="data_export",
         description=f"בקשת יצוא נתונים: {export_request.entity_type}",
@@ -78,11 +79,41 @@ async def export_data(
         severity="high"
     )
     
-    export_id = f"export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        export_id = await get_export_service().create_export(
+            admin_id=admin_user["id"],
+            entity_type=export_request.entity_type,
+            export_format=export_request.format,
+            start_date=export_request.start_date,
+            end_date=export_request.end_date,
+            filters=export_request.filters,
+            include_pii=export_request.include_pii
+        )
+    except ExportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     return {
         "export_id": export_id,
-        "status": "processing",
+        "status": "pending",
         "message": "יצוא נתונים החל",
-        "estimated_completion": (datetime.utcnow() + timedelta(minutes=10)).isoformat()
-    }
\ No newline at end of file
+        "status_url": f"/api/v1/reports/export/{export_id}"
+    }
+
+@router.get("/export/{export_id}", response_model=DataExportResult)
+async def get_export_status(
+    export_id: str,
+    admin_user: dict = Depends(require_permissions(["data.export"]))
+):
+    """סטטוס יצוא נתונים - Export job status, progress and download link of the caller's export"""
+    try:
+        export_status = await get_export_service().get_export_status(export_id, admin_user["id"])
+    except ValueError:
+        export_status = None
+    
+    if not export_status:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="יצוא לא נמצא - Export not found"
+        )
+    
+    return export_status
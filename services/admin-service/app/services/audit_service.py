@@ -1,10 +1,29 @@
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import asyncio
+import logging
 from enum import Enum
 
 from database import get_database
 from models.admin import AuditEventType, AuditSeverity
+from python_shared.audit import AuditSink
+
+logger = logging.getLogger(__name__)
+
+# Batches admin/user action logs off the request path
+_audit_sink: Optional[AuditSink] = None
+
+def get_audit_sink() -> AuditSink:
+    """Get the admin audit log sink"""
+    global _audit_sink
+    
+    if _audit_sink is None:
+        async def write(stream: str, records: List[Dict[str, Any]]):
+            await get_database().insert_audit_logs(records)
+        
+        _audit_sink = AuditSink(write)
+    
+    return _audit_sink
 
 class AuditService:
     def __init__(self):
@@ -39,7 +58,7 @@ class AuditService:
             "event_type": "admin_action"
         }
         
-        await self.db.insert_audit_log(audit_data)
+        await get_audit_sink().submit("audit_logs", audit_data)
     
     async def log_user_action(
         self,
@@ -66,7 +85,7 @@ class AuditService:
             "event_type": "user_action"
         }
         
-        await self.db.insert_audit_log(audit_data)
+        await get_audit_sink().submit("audit_logs", audit_data)
     
     async def log_system_event(
         self,
@@ -163,54 +182,33 @@ class AuditService:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        search_params = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "page_size": 10000  # Get all for summary
-        }
-        
-        results = await self.db.search_audit_logs(search_params)
-        logs = results["results"]
-        
-        # Calculate summary statistics
-        total_events = len(logs)
+        # Counts are aggregated in the database, so they cover the whole period
+        counts, recent_critical = await asyncio.gather(
+            self.db.get_audit_summary_counts(start_date, end_date),
+            self.db.get_recent_audit_logs_by_severity(["critical", "high"], start_date, 5)
+        )
         
-        # Group by event type
-        by_event_type = {}
-        by_severity = {}
+        top_admins = sorted(counts["admin"].items(), key=lambda x: x[1], reverse=True)[:10]
+        admin_names = await self.db.get_admin_names(
+            [admin_id for admin_id, _ in top_admins if admin_id]
+        )
         by_admin = {}
-        by_day = {}
+        for admin_id, count in top_admins:
+            admin_name = admin_names.get(admin_id, "מערכת") if admin_id else "מערכת"
+            by_admin[admin_name] = by_admin.get(admin_name, 0) + count
         
-        for log in logs:
-            # By event type
-            event_type = log["event_type"]
-            by_event_type[event_type] = by_event_type.get(event_type, 0) + 1
-            
-            # By severity
-            severity = log["severity"]
-            by_severity[severity] = by_severity.get(severity, 0) + 1
-            
-            # By admin
-            admin_name = log.get("admin_name", "מערכת")
-            by_admin[admin_name] = by_admin.get(admin_name, 0) + 1
-            
-            # By day
-            day = log["timestamp"][:10]  # YYYY-MM-DD
-            by_day[day] = by_day.get(day, 0) + 1
-        
-        # Get critical/high severity events
-        critical_events = [log for log in logs if log["severity"] in ["critical", "high"]]
+        by_severity = counts["severity"]
         
         return {
             "period_days": days,
-            "total_events": total_events,
-            "by_event_type": by_event_type,
+            "total_events": counts["total"],
+            "by_event_type": counts["event_type"],
             "by_severity": by_severity,
-            "by_admin": dict(sorted(by_admin.items(), key=lambda x: x[1], reverse=True)[:10]),
-            "by_day": by_day,
-            "critical_events": len(critical_events),
-            "recent_critical": critical_events[:5],  # Last 5 critical events
-            "top_actions": self._get_top_actions(logs)
+            "by_admin": by_admin,
+            "by_day": dict(sorted(counts["day"].items())),
+            "critical_events": by_severity.get("critical", 0) + by_severity.get("high", 0),
+            "recent_critical": recent_critical,  # Last 5 critical events
+            "top_actions": self._get_top_actions(counts["action"])
         }
     
     async def get_user_activity_report(
@@ -270,97 +268,58 @@ class AuditService:
         """
         זיהוי פעילות חשודה - Detect suspicious activity
         """
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(hours=hours)
+        start_date = datetime.utcnow() - timedelta(hours=hours)
         
-        search_params = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "page_size": 5000
-        }
-        
-        results = await self.db.search_audit_logs(search_params)
-        logs = results["results"]
+        failed_logins, activity, rapid_admins = await asyncio.gather(
+            self.db.get_failed_logins_by_ip(start_date, 10),
+            self.db.get_audit_activity_counts(start_date),
+            self.db.get_rapid_admin_actions(start_date, 2, 10)
+        )
         
         suspicious_patterns = []
         
         # Pattern 1: Too many failed logins from same IP
-        failed_logins = [log for log in logs if log["action"] == "login_failed"]
-        ip_failures = {}
-        
-        for log in failed_logins:
-            ip = log.get("ip_address", "unknown")
-            ip_failures[ip] = ip_failures.get(ip, 0) + 1
-        
-        for ip, count in ip_failures.items():
-            if count >= 10:  # 10+ failed logins from same IP
-                suspicious_patterns.append({
-                    "type": "multiple_failed_logins",
-                    "description": f"10+ נסיונות כניסה כושלים מ-IP {ip}",
-                    "severity": "high",
-                    "count": count,
-                    "ip_address": ip,
-                    "detected_at": datetime.utcnow()
-                })
-        
-        # Pattern 2: Unusual admin activity hours
-        admin_actions = [log for log in logs if log.get("admin_id")]
-        night_actions = []
-        
-        for log in admin_actions:
-            timestamp = datetime.fromisoformat(log["timestamp"].replace('Z', '+00:00'))
-            hour = timestamp.hour
-            
-            # Consider 22:00-06:00 as unusual hours
-            if hour >= 22 or hour <= 6:
-                night_actions.append(log)
+        for row in failed_logins:  # 10+ failed logins from same IP
+            suspicious_patterns.append({
+                "type": "multiple_failed_logins",
+                "description": f"10+ נסיונות כניסה כושלים מ-IP {row['ip_address']}",
+                "severity": "high",
+                "count": row["count"],
+                "ip_address": row["ip_address"],
+                "detected_at": datetime.utcnow()
+            })
         
-        if len(night_actions) >= 20:  # 20+ actions during night
+        # Pattern 2: Unusual admin activity hours (22:00-06:00)
+        night_actions = activity["night_actions"]
+        if night_actions >= 20:  # 20+ actions during night
             suspicious_patterns.append({
                 "type": "unusual_hours_activity",
-                "description": f"{len(night_actions)} פעולות אדמין בשעות לא רגילות",
+                "description": f"{night_actions} פעולות אדמין בשעות לא רגילות",
                 "severity": "medium",
-                "count": len(night_actions),
+                "count": night_actions,
                 "detected_at": datetime.utcnow()
             })
         
-        # Pattern 3: Rapid successive actions (potential automation)
-        admin_by_time = {}
-        for log in admin_actions:
-            admin_id = log["admin_id"]
-            timestamp = datetime.fromisoformat(log["timestamp"].replace('Z', '+00:00'))
-            
-            if admin_id not in admin_by_time:
-                admin_by_time[admin_id] = []
-            admin_by_time[admin_id].append(timestamp)
-        
-        for admin_id, timestamps in admin_by_time.items():
-            timestamps.sort()
-            rapid_actions = 0
-            
-            for i in range(1, len(timestamps)):
-                time_diff = (timestamps[i] - timestamps[i-1]).total_seconds()
-                if time_diff < 2:  # Less than 2 seconds between actions
-                    rapid_actions += 1
-            
-            if rapid_actions >= 10:
-                suspicious_patterns.append({
-                    "type": "rapid_successive_actions",
-                    "description": f"אדמין {admin_id} ביצע פעולות מהירות ברצף",
-                    "severity": "medium",
-                    "admin_id": admin_id,
-                    "count": rapid_actions,
-                    "detected_at": datetime.utcnow()
-                })
+        # Pattern 3: Rapid successive actions (potential automation),
+        # less than 2 seconds between actions
+        for row in rapid_admins:
+            suspicious_patterns.append({
+                "type": "rapid_successive_actions",
+                "description": f"אדמין {row['admin_id']} ביצע פעולות מהירות ברצף",
+                "severity": "medium",
+                "admin_id": row["admin_id"],
+                "count": row["count"],
+                "detected_at": datetime.utcnow()
+            })
         
         # Pattern 4: Mass data export
-        export_actions = [log for log in logs if "export" in log["action"].lower()]
-        if len(export_actions) >= 5:  # 5+ exports
+        export_actions = activity["export_actions"]
+        if export_actions >= 5:  # 5+ exports
             suspicious_patterns.append({
                 "type": "mass_data_export",
-                "description": f"{len(export_actions)} פעולות יצוא נתונים",
+                "description": f"{export_actions} פעולות יצוא נתונים",
                 "severity": "high",
-                "count": len(export_actions),
+                "count": export_actions,
                 "detected_at": datetime.utcnow()
             })
         
@@ -413,14 +372,8 @@ class AuditService:
         
         return severity_descriptions.get(severity, severity)
     
-    def _get_top_actions(self, logs: List[Dict[str, Any]], limit: int = 10) -> List[Dict[str, Any]]:
+    def _get_top_actions(self, action_counts: Dict[str, int], limit: int = 10) -> List[Dict[str, Any]]:
         """קבלת הפעולות הנפוצות - Get top actions"""
-        action_counts = {}
-        
-        for log in logs:
-            action = log["action"]
-            action_counts[action] = action_counts.get(action, 0) + 1
-        
         # Sort by count and return top N
         sorted_actions = sorted(action_counts.items(), key=lambda x: x[1], reverse=True)
         
@@ -433,6 +386,21 @@ class AuditService:
             for action, count in sorted_actions[:limit]
         ]
     
+    async def refresh_rollup(self):
+        """
+        רענון סיכום שעתי - Roll complete hours into the hourly audit table
+        """
+        try:
+            await self.db.refresh_audit_rollup()
+        except Exception as e:
+            logger.error(f"Audit rollup refresh failed: {e}")
+    
+    async def run_rollup_loop(self, interval_seconds: int):
+        """Refresh the hourly rollup every `interval_seconds` until cancelled"""
+        while True:
+            await self.refresh_rollup()
+            await asyncio.sleep(interval_seconds)
+    
     async def generate_compliance_report(
         self,
         start_date: datetime,
@@ -1,10 +1,72 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 from datetime import datetime, timedelta
 import asyncio
+import logging
+import time
 
 from database import get_database
+from config import settings
+from services.health_monitor import get_health_monitor
 from models.admin import DashboardStats, SystemStatus, SystemHealth
 
+logger = logging.getLogger(__name__)
+
+class StaleWhileRevalidate:
+    """
+    מטמון עם רענון ברקע - Serve a cached value while refreshing it in the background
+
+    Fresh for `ttl_seconds`; until `max_stale_seconds` the cached value is
+    still returned and one background refresh is started. Older (or missing)
+    values are reloaded inline. Concurrent reloads share one load.
+    """
+    
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: float,
+        max_stale_seconds: float
+    ):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+    
+    async def get(self) -> Any:
+        if self._loaded_at is not None:
+            age = time.monotonic() - self._loaded_at
+            if age < self.ttl_seconds:
+                return self._value
+            if age < self.max_stale_seconds:
+                self._start_refresh()
+                return self._value
+        
+        return await asyncio.shield(self._start_refresh())
+    
+    def invalidate(self):
+        self._loaded_at = None
+    
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._load())
+            self._refreshing.add_done_callback(self._log_failure)
+        return self._refreshing
+    
+    async def _load(self) -> Any:
+        value = await self.loader()
+        self._value = value
+        self._loaded_at = time.monotonic()
+        return value
+    
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Cache refresh failed: {task.exception()}")
+
+# Dashboard statistics shared by every request
+_basic_stats_cache: Optional[StaleWhileRevalidate] = None
+
 class DashboardService:
     def __init__(self):
         self.db = get_database()
@@ -42,45 +104,31 @@ class DashboardService:
     
     async def _get_basic_stats(self) -> DashboardStats:
         """קבלת סטטיסטיקות בסיסיות - Get basic statistics"""
+        global _basic_stats_cache
+        
+        if _basic_stats_cache is None:
+            _basic_stats_cache = StaleWhileRevalidate(
+                self._load_basic_stats,
+                ttl_seconds=settings.DASHBOARD_CACHE_TTL,
+                max_stale_seconds=settings.DASHBOARD_CACHE_MAX_STALE
+            )
+        
+        return await _basic_stats_cache.get()
+    
+    async def _load_basic_stats(self) -> DashboardStats:
+        """טעינת סטטיסטיקות מטבלת המונים - Load statistics from the dashboard counters"""
         # Get current date range
         now = datetime.utcnow()
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         thirty_days_ago = now - timedelta(days=30)
         
-        # User statistics
-        total_users = await self.db.get_total_users()
-        active_users = await self.db.get_active_users(days=30)
-        
-        # Lead statistics
-        total_leads = await self.db.get_total_leads()
-        open_leads = await self.db.get_open_leads()
-        
-        # Proposal statistics
-        total_proposals = await self.db.get_total_proposals()
-        pending_proposals = await self.db.get_pending_proposals()
-        
-        # Revenue statistics
-        total_revenue = await self.db.get_total_revenue()
-        monthly_revenue = await self.db.get_monthly_revenue(start_of_month)
-        
-        # Performance metrics
-        conversion_rate = await self.db.get_conversion_rate(thirty_days_ago)
-        avg_response_time = await self.db.get_avg_response_time(thirty_days_ago)
-        
-        # System status
-        system_status = await self._determine_system_status()
+        snapshot, system_status = await asyncio.gather(
+            self.db.get_dashboard_snapshot(start_of_month, thirty_days_ago),
+            self._determine_system_status()
+        )
         
         return DashboardStats(
-            total_users=total_users,
-            active_users=active_users,
-            total_leads=total_leads,
-            open_leads=open_leads,
-            total_proposals=total_proposals,
-            pending_proposals=pending_proposals,
-            total_revenue=total_revenue,
-            monthly_revenue=monthly_revenue,
-            conversion_rate=conversion_rate,
-            avg_response_time=avg_response_time,
+            **snapshot,
             system_status=system_status,
             last_updated=now
         )
@@ -88,30 +136,11 @@ class DashboardService:
     async def _get_system_health(self) -> SystemHealth:
         """קבלת נתוני בריאות מערכת - Get system health data"""
         try:
-            # Check all microservices
-            services_health = {}
-            services = [
-                ("auth-service", "http://auth-service:8001/health"),
-                ("users-service", "http://users-service:8002/health"), 
-                ("leads-service", "http://leads-service:8003/health"),
-                ("proposals-service", "http://proposals-service:8004/health"),
-                ("referrals-service", "http://referrals-service:8005/health"),
-                ("payments-service", "http://payments-service:8006/health"),
-                ("notifications-service", "http://notifications-service:8007/health")
-            ]
-            
-            # Check each service (with timeout)
-            for service_name, health_url in services:
-                try:
-                    health_data = await self._check_service_health(service_name, health_url)
-                    services_health[service_name] = health_data
-                except Exception as e:
-                    services_health[service_name] = {
-                        "status": "unhealthy",
-                        "response_time": None,
-                        "error": str(e),
-                        "last_check": datetime.utcnow().isoformat()
-                    }
+            # Latest probe of each microservice, from the background health monitor
+            services_health = {
+                service_name: {**health, "response_time": health["response_time_ms"]}
+                for service_name, health in (await get_health_monitor().get_snapshot()).items()
+            }
             
             # Get database health
             db_health = await self._get_database_health()
@@ -154,47 +183,6 @@ class DashboardService:
                 uptime=0
             )
     
-    async def _check_service_health(self, service_name: str, health_url: str) -> Dict[str, Any]:
-        """בדיקת בריאות שירות יחיד - Check individual service health"""
-        import aiohttp
-        import time
-        
-        start_time = time.time()
-        
-        try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(health_url) as response:
-                    response_time = int((time.time() - start_time) * 1000)  # ms
-                    
-                    if response.status == 200:
-                        return {
-                            "status": "healthy",
-                            "response_time": response_time,
-                            "last_check": datetime.utcnow().isoformat()
-                        }
-                    else:
-                        return {
-                            "status": "unhealthy",
-                            "response_time": response_time,
-                            "http_status": response.status,
-                            "last_check": datetime.utcnow().isoformat()
-                        }
-                        
-        except asyncio.TimeoutError:
-            return {
-                "status": "timeout",
-                "response_time": 5000,  # timeout threshold
-                "error": "Service timeout",
-                "last_check": datetime.utcnow().isoformat()
-            }
-        except Exception as e:
-            return {
-                "status": "error",
-                "response_time": None,
-                "error": str(e),
-                "last_check": datetime.utcnow().isoformat()
-            }
-    
     async def _get_database_health(self) -> Dict[str, Any]:
         """בדיקת בריאות בסיס נתונים - Check database health"""
         try:
@@ -428,6 +416,22 @@ class DashboardService:
             last_updated=datetime.utcnow()
         )
     
+    async def refresh_analytics_rollup(self):
+        """
+        רענון סיכומי אנליטיקה יומיים - Roll completed days into the daily analytics facts
+        """
+        try:
+            rolled_up_through = await self.db.refresh_analytics_rollup()
+            logger.info(f"Analytics rolled up through {rolled_up_through}")
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {e}")
+    
+    async def run_analytics_rollup_loop(self, interval_seconds: int):
+        """Check for newly completed days every `interval_seconds` until cancelled"""
+        while True:
+            await self.refresh_analytics_rollup()
+            await asyncio.sleep(interval_seconds)
+    
     async def get_detailed_analytics(self, period: str = "30d") -> Dict[str, Any]:
         """
         קבלת אנליטיקה מפורטת - Get detailed analytics
@@ -0,0 +1,625 @@
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import csv
+import io
+import json
+import logging
+
+import asyncpg
+import boto3
+from botocore.config import Config
+
+from database import get_database
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# What each entity exports. Filters are equality matches on the listed
+# columns; PII columns are only exported with include_pii.
+EXPORT_ENTITIES: Dict[str, Dict[str, Any]] = {
+    "users": {
+        "table": "users",
+        "date_column": "created_at",
+        "columns": ["id", "role", "status", "created_at", "updated_at", "last_login"],
+        "pii_columns": ["name", "phone", "email"],
+        "filters": ["role", "status"]
+    },
+    "leads": {
+        "table": "leads",
+        "date_column": "created_at",
+        "columns": [
+            "id", "customer_id", "title", "category", "subcategory",
+            "budget_min", "budget_max", "urgency", "status", "views_count",
+            "proposals_count", "assigned_professional_id", "completed_at",
+            "created_at", "expires_at"
+        ],
+        "pii_columns": ["description", "location", "latitude", "longitude"],
+        "filters": ["category", "status", "urgency"]
+    },
+    "proposals": {
+        "table": "proposals",
+        "date_column": "created_at",
+        "columns": [
+            "id", "lead_id", "professional_id", "price", "estimated_duration",
+            "status", "customer_viewed", "accepted_at", "rejected_at",
+            "created_at", "expires_at"
+        ],
+        "pii_columns": ["description"],
+        "filters": ["status", "lead_id", "professional_id"]
+    },
+    "payments": {
+        "table": "transactions",
+        "date_column": "created_at",
+        "columns": [
+            "id", "user_id", "lead_id", "proposal_id", "type", "amount",
+            "currency", "status", "payment_method", "reference_number",
+            "processed_at", "failed_at", "created_at"
+        ],
+        "pii_columns": ["description"],
+        "filters": ["type", "status", "currency", "user_id"]
+    },
+    "referrals": {
+        "table": "referrals",
+        "date_column": "created_at",
+        "columns": [
+            "id", "referrer_id", "lead_id", "referred_professional_id", "status",
+            "commission_percentage", "commission_amount", "accepted_at",
+            "completed_at", "paid_at", "created_at"
+        ],
+        "pii_columns": ["notes"],
+        "filters": ["status", "referrer_id"]
+    },
+    "analytics": {
+        "table": "analytics_daily_facts",
+        "date_column": "day",
+        "columns": [
+            "day", "category", "new_users", "new_professionals", "new_customers",
+            "new_leads", "leads_answered", "response_hours", "new_proposals",
+            "accepted_proposals", "platform_revenue", "payment_volume",
+            "referral_commissions"
+        ],
+        "pii_columns": [],
+        "filters": ["category"]
+    }
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+
+class ExportError(Exception):
+    """שגיאת יצוא - Invalid export request"""
+
+
+def _to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # The exported tables store naive UTC timestamps
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def build_export_query(
+    entity_type: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    include_pii: bool = False,
+    limit: Optional[int] = None
+) -> Tuple[str, List[Any]]:
+    """בניית שאילתת יצוא - Build the export SELECT and its parameters"""
+    spec = EXPORT_ENTITIES.get(entity_type)
+    if spec is None:
+        raise ExportError(f"Unsupported export entity: {entity_type}")
+
+    columns = spec["columns"] + (spec["pii_columns"] if include_pii else [])
+    date_column = spec["date_column"]
+    conditions: List[str] = []
+    args: List[Any] = []
+
+    if start_date:
+        args.append(_to_utc_naive(start_date))
+        conditions.append(f"{date_column} >= ${len(args)}")
+    if end_date:
+        args.append(_to_utc_naive(end_date))
+        conditions.append(f"{date_column} < ${len(args)}")
+
+    for key, value in (filters or {}).items():
+        if key not in spec["filters"]:
+            raise ExportError(f"Unsupported filter for {entity_type}: {key}")
+        args.append(str(value))
+        conditions.append(f"{key}::text = ${len(args)}")
+
+    query = f"SELECT {', '.join(columns)} FROM {spec['table']}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {date_column}"
+    if limit:
+        args.append(limit)
+        query += f" LIMIT ${len(args)}"
+
+    return query, args
+
+
+class PartBuffer:
+    """
+    חוצץ חלקי העלאה - Byte buffer the writers fill and the uploader drains
+
+    File-like enough for pyarrow's ParquetWriter (write/tell/flush/close).
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def size(self) -> int:
+        return len(self._buffer)
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _json_value(value: Any) -> Any:
+    # Dates and timestamps as ISO 8601; Decimal, UUID and the rest as strings
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class CsvExportWriter:
+    """כתיבת CSV - UTF-8 CSV with a BOM so Excel shows Hebrew correctly"""
+
+    def __init__(self, columns: List[str], sink: PartBuffer):
+        self.sink = sink
+        self.sink.write("\ufeff".encode("utf-8"))
+        self._write([columns])
+
+    def _write(self, rows):
+        text = io.StringIO()
+        csv.writer(text).writerows(rows)
+        self.sink.write(text.getvalue().encode("utf-8"))
+
+    def write_rows(self, records: List[asyncpg.Record]):
+        self._write(
+            ["" if value is None else value for value in record.values()]
+            for record in records
+        )
+
+    def close(self):
+        pass
+
+
+class JsonExportWriter:
+    """כתיבת JSON - A JSON array of objects, written row by row"""
+
+    def __init__(self, columns: List[str], sink: PartBuffer):
+        self.sink = sink
+        self._first = True
+        self.sink.write(b"[")
+
+    def write_rows(self, records: List[asyncpg.Record]):
+        parts = []
+        for record in records:
+            parts.append(("\n" if self._first else ",\n") + json.dumps(
+                dict(record), ensure_ascii=False, default=_json_value
+            ))
+            self._first = False
+        self.sink.write("".join(parts).encode("utf-8"))
+
+    def close(self):
+        self.sink.write(b"\n]\n")
+
+
+# PostgreSQL type name -> pyarrow type factory; anything else is exported as text
+_PARQUET_TYPES = {
+    "bool": lambda pa: pa.bool_(),
+    "int2": lambda pa: pa.int16(),
+    "int4": lambda pa: pa.int32(),
+    "int8": lambda pa: pa.int64(),
+    "float4": lambda pa: pa.float32(),
+    "float8": lambda pa: pa.float64(),
+    "numeric": lambda pa: pa.decimal128(38, 10),
+    "date": lambda pa: pa.date32(),
+    "timestamp": lambda pa: pa.timestamp("us"),
+    "timestamptz": lambda pa: pa.timestamp("us", tz="UTC"),
+}
+
+
+class ParquetExportWriter:
+    """כתיבת Parquet - One row group per fetched chunk, schema from the statement"""
+
+    def __init__(self, attributes, sink: PartBuffer):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportError("Parquet export requires pyarrow")
+
+        self._pa = pa
+        fields = []
+        self._text_columns = set()
+        for attribute in attributes:
+            factory = _PARQUET_TYPES.get(attribute.type.name)
+            if factory is None:
+                self._text_columns.add(attribute.name)
+                fields.append(pa.field(attribute.name, pa.string()))
+            else:
+                fields.append(pa.field(attribute.name, factory(pa)))
+        self.schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(sink, self.schema, compression="snappy")
+
+    def write_rows(self, records: List[asyncpg.Record]):
+        columns = {
+            name: [
+                None if record[name] is None
+                else str(record[name]) if name in self._text_columns
+                else record[name]
+                for record in records
+            ]
+            for name in self.schema.names
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class MultipartUpload:
+    """העלאה מרובת חלקים - S3 multipart upload driven from the event loop"""
+
+    def __init__(self, client, bucket: str, key: str, content_type: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict[str, Any]] = []
+        self.parts_uploaded = 0
+        self.bytes_uploaded = 0
+
+    async def start(self):
+        response = await asyncio.to_thread(
+            self.client.create_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            ContentType=self.content_type
+        )
+        self.upload_id = response["UploadId"]
+
+    async def upload_part(self, data: bytes):
+        part_number = len(self.parts) + 1
+        # Reserve the slot before awaiting so part numbers stay ordered
+        self.parts.append({"PartNumber": part_number})
+        response = await asyncio.to_thread(
+            self.client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        self.parts[part_number - 1]["ETag"] = response["ETag"]
+        self.parts_uploaded += 1
+        self.bytes_uploaded += len(data)
+
+    async def complete(self):
+        await asyncio.to_thread(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+
+    async def abort(self):
+        if self.upload_id is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id
+            )
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload {self.key}: {e}")
+
+
+class ExportService:
+    """
+    שירות יצוא נתונים - Background data export jobs
+
+    Each job streams its rows through a server-side cursor in a read-only
+    snapshot, encodes them chunk by chunk and uploads parts to S3 as they
+    fill, so neither the result set nor the file is held in memory. Jobs
+    run on a separate small pool behind a semaphore, so at most
+    EXPORT_MAX_CONCURRENT_JOBS exports hold database connections at once.
+    """
+
+    def __init__(self):
+        self.db = get_database()
+        self.part_size = max(settings.EXPORT_PART_SIZE_MB * 1024 * 1024, MIN_PART_SIZE)
+        self._semaphore = asyncio.Semaphore(settings.EXPORT_MAX_CONCURRENT_JOBS)
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+        self._client = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def client(self):
+        """Get or create the S3 client"""
+        if self._client is None:
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=settings.S3_ENDPOINT,
+                aws_access_key_id=settings.S3_ACCESS_KEY,
+                aws_secret_access_key=settings.S3_SECRET_KEY,
+                config=Config(
+                    region_name=settings.S3_REGION,
+                    retries={"max_attempts": 3},
+                    max_pool_connections=settings.EXPORT_MAX_CONCURRENT_JOBS * 2
+                )
+            )
+        return self._client
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    dsn=settings.DATABASE_URL,
+                    min_size=0,
+                    max_size=settings.EXPORT_MAX_CONCURRENT_JOBS,
+                    server_settings={"application_name": "ofair-admin-export"}
+                )
+        return self._pool
+
+    async def create_export(
+        self,
+        admin_id: str,
+        entity_type: str,
+        export_format: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        include_pii: bool = False
+    ) -> str:
+        """
+        יצירת משימת יצוא - Validate the request, record the job and start it
+
+        Returns the job ID; the export runs in the background.
+        """
+        if export_format not in settings.ALLOWED_EXPORT_FORMATS:
+            raise ExportError(f"Unsupported export format: {export_format}")
+
+        parameters = {
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "filters": filters or {},
+            "include_pii": include_pii
+        }
+        # Reject bad entities/filters before the job exists
+        query, args = build_export_query(
+            entity_type, start_date, end_date, filters, include_pii,
+            limit=settings.MAX_EXPORT_RECORDS
+        )
+
+        job_id = await self.db.create_export_job({
+            "admin_id": admin_id,
+            "entity_type": entity_type,
+            "format": export_format,
+            "parameters": parameters
+        })
+
+        task = asyncio.create_task(self._run_job(job_id, entity_type, export_format, query, args))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+        return job_id
+
+    async def _run_job(
+        self,
+        job_id: str,
+        entity_type: str,
+        export_format: str,
+        query: str,
+        args: List[Any]
+    ):
+        async with self._semaphore:
+            s3_key = f"{settings.EXPORT_PREFIX}/{entity_type}/{job_id}.{export_format}"
+            upload = MultipartUpload(self.client, settings.S3_BUCKET, s3_key, CONTENT_TYPES[export_format])
+
+            try:
+                await asyncio.wait_for(
+                    self._stream_export(job_id, export_format, query, args, upload),
+                    timeout=settings.EXPORT_TIMEOUT_MINUTES * 60
+                )
+                await self.db.finish_export_job(job_id, "completed")
+                logger.info(f"Export {job_id} completed: {upload.bytes_uploaded} bytes in {len(upload.parts)} parts")
+
+            except asyncio.CancelledError:
+                await upload.abort()
+                await self.db.finish_export_job(job_id, "failed", "Export cancelled")
+                raise
+            except asyncio.TimeoutError:
+                await upload.abort()
+                await self.db.finish_export_job(job_id, "failed", "Export timed out")
+            except Exception as e:
+                logger.error(f"Export {job_id} failed: {e}")
+                await upload.abort()
+                await self.db.finish_export_job(job_id, "failed", str(e))
+
+    async def _stream_export(
+        self,
+        job_id: str,
+        export_format: str,
+        query: str,
+        args: List[Any],
+        upload: MultipartUpload
+    ):
+        pool = await self._get_pool()
+
+        async with pool.acquire() as conn:
+            # One consistent snapshot; the cursor only lives inside a transaction
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                await conn.execute(
+                    f"SET LOCAL statement_timeout = '{settings.EXPORT_TIMEOUT_MINUTES}min'"
+                )
+                statement = await conn.prepare(query)
+                estimated_rows = await self._estimate_rows(conn, query, args)
+
+                await upload.start()
+                await self.db.start_export_job(job_id, upload.key, estimated_rows)
+
+                sink = PartBuffer()
+                columns = [attribute.name for attribute in statement.get_attributes()]
+                if export_format == "parquet":
+                    writer = ParquetExportWriter(statement.get_attributes(), sink)
+                elif export_format == "json":
+                    writer = JsonExportWriter(columns, sink)
+                else:
+                    writer = CsvExportWriter(columns, sink)
+
+                cursor = await statement.cursor(*args)
+                rows_exported = 0
+                pending_part: Optional[asyncio.Task] = None
+
+                try:
+                    while True:
+                        records = await cursor.fetch(settings.EXPORT_FETCH_SIZE)
+                        if not records:
+                            break
+
+                        writer.write_rows(records)
+                        rows_exported += len(records)
+
+                        if sink.size >= self.part_size:
+                            # Upload this part while the next chunks are fetched
+                            if pending_part is not None:
+                                await pending_part
+                                await self.db.update_export_progress(
+                                    job_id, rows_exported, upload.bytes_uploaded, upload.parts_uploaded
+                                )
+                            pending_part = asyncio.create_task(upload.upload_part(sink.take()))
+
+                    writer.close()
+                    if pending_part is not None:
+                        await pending_part
+                    if sink.size or not upload.parts:
+                        await upload.upload_part(sink.take())
+                finally:
+                    if pending_part is not None and not pending_part.done():
+                        pending_part.cancel()
+
+        await upload.complete()
+        await self.db.update_export_progress(
+            job_id, rows_exported, upload.bytes_uploaded, upload.parts_uploaded
+        )
+
+    async def _estimate_rows(self, conn: asyncpg.Connection, query: str, args: List[Any]) -> Optional[int]:
+        """Planner row estimate for progress reporting, without counting"""
+        try:
+            plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args))
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            logger.warning(f"Could not estimate export size: {e}")
+            return None
+
+    async def get_export_status(self, job_id: str, admin_id: str) -> Optional[Dict[str, Any]]:
+        """
+        סטטוס משימת יצוא - Job status, progress and a download link once completed
+
+        Only the admin who requested the export can see it; other admins get
+        None, as if the job did not exist.
+        """
+        job = await self.db.get_export_job(job_id)
+        if not job or str(job["admin_id"]) != str(admin_id):
+            return None
+
+        estimated_rows = job["estimated_rows"]
+        if job["status"] == "completed":
+            progress = 100.0
+        elif estimated_rows:
+            progress = round(min(job["rows_exported"] / estimated_rows * 100, 99.0), 1)
+        else:
+            progress = 0.0
+
+        file_url = None
+        expires_at = None
+        if job["status"] == "completed" and job["s3_key"]:
+            file_url = await asyncio.to_thread(
+                self.client.generate_presigned_url,
+                "get_object",
+                Params={"Bucket": settings.S3_BUCKET, "Key": job["s3_key"]},
+                ExpiresIn=settings.EXPORT_DOWNLOAD_URL_EXPIRY
+            )
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.EXPORT_DOWNLOAD_URL_EXPIRY)
+
+        return {
+            "export_id": str(job["id"]),
+            "status": job["status"],
+            "entity_type": job["entity_type"],
+            "format": job["format"],
+            "total_records": job["rows_exported"] if job["status"] == "completed" else None,
+            "file_url": file_url,
+            "file_size": job["bytes_uploaded"] if job["status"] == "completed" else None,
+            "created_at": job["created_at"],
+            "completed_at": job["completed_at"],
+            "expires_at": expires_at,
+            "error_message": job["error_message"],
+            "started_at": job["started_at"],
+            "rows_exported": job["rows_exported"],
+            "estimated_rows": estimated_rows,
+            "bytes_uploaded": job["bytes_uploaded"],
+            "parts_uploaded": job["parts_uploaded"],
+            "progress_percentage": progress
+        }
+
+    async def stop(self):
+        """עצירת משימות פעילות - Cancel running exports and close the export pool"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+_export_service: Optional[ExportService] = None
+
+def get_export_service() -> ExportService:
+    """Get the admin service export job runner"""
+    global _export_service
+
+    if _export_service is None:
+        _export_service = ExportService()
+
+    return _export_service
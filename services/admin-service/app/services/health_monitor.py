@@ -0,0 +1,229 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import asyncio
+import aiohttp
+import logging
+import time
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+
+
+class ServiceHealthHistory:
+    """היסטוריית בריאות שירות - Rolling window of probe results for one service"""
+
+    def __init__(self, window_size: int, flap_threshold: int):
+        self.flap_threshold = flap_threshold
+        self.samples: deque = deque(maxlen=window_size)
+        self.total_checks = 0
+        self.healthy_checks = 0
+        self.consecutive_failures = 0
+        self.last_change: Optional[datetime] = None
+        self.last_result: Dict[str, Any] = {}
+
+    def record(self, result: Dict[str, Any]):
+        """רישום תוצאת בדיקה - Record one probe result"""
+        status = result["status"]
+
+        if not self.samples or self.samples[-1]["status"] != status:
+            self.last_change = result["checked_at"]
+
+        self.samples.append({
+            "status": status,
+            "response_time_ms": result.get("response_time_ms"),
+            "checked_at": result["checked_at"]
+        })
+        self.total_checks += 1
+        if status == HEALTHY:
+            self.healthy_checks += 1
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+        self.last_result = result
+
+    def summary(self) -> Dict[str, Any]:
+        """סיכום חלון הבדיקות - Current status with window latency, flap and uptime stats"""
+        samples = list(self.samples)
+        latencies = sorted(
+            s["response_time_ms"] for s in samples if s["response_time_ms"] is not None
+        )
+        healthy = sum(1 for s in samples if s["status"] == HEALTHY)
+        flaps = sum(
+            1 for previous, current in zip(samples, samples[1:])
+            if previous["status"] != current["status"]
+        )
+
+        summary = {
+            "status": self.last_result.get("status", "unknown"),
+            "response_time_ms": self.last_result.get("response_time_ms"),
+            "last_check": self.last_result["checked_at"].isoformat() if self.last_result else None,
+            "last_status_change": self.last_change.isoformat() if self.last_change else None,
+            "consecutive_failures": self.consecutive_failures,
+            "window": {
+                "checks": len(samples),
+                "avg_response_time_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p95_response_time_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+                "max_response_time_ms": latencies[-1] if latencies else None,
+                "uptime_percentage": round(healthy / len(samples) * 100, 2) if samples else None,
+                "flap_count": flaps,
+                "flapping": flaps >= self.flap_threshold
+            },
+            "total_checks": self.total_checks,
+            "uptime_percentage": round(self.healthy_checks / self.total_checks * 100, 2) if self.total_checks else None
+        }
+
+        for key in ("http_status", "error", "details"):
+            if key in self.last_result:
+                summary[key] = self.last_result[key]
+
+        return summary
+
+
+class HealthMonitor:
+    """
+    ניטור בריאות שירותים ברקע - Background probing of all services
+
+    Probes every service concurrently each interval and keeps a rolling
+    window per service, so dashboard reads never wait on a slow service.
+    """
+
+    def __init__(
+        self,
+        targets: List[Tuple[str, str]],
+        interval_seconds: int = 60,
+        timeout_seconds: int = 5,
+        window_size: int = 60,
+        flap_threshold: int = 4
+    ):
+        self.targets = targets
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.histories = {
+            service_name: ServiceHealthHistory(window_size, flap_threshold)
+            for service_name, _ in targets
+        }
+        self.last_probe: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._probe_lock = asyncio.Lock()
+
+    def start(self):
+        """הפעלת לולאת הבדיקות - Start the background probe loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """עצירת לולאת הבדיקות - Stop the background probe loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def probe_all(self):
+        """בדיקת כל השירותים במקביל - Probe every service concurrently"""
+        async with self._probe_lock:
+            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                results = await asyncio.gather(*[
+                    self._probe(session, health_url) for _, health_url in self.targets
+                ])
+
+            for (service_name, _), result in zip(self.targets, results):
+                self.histories[service_name].record(result)
+            self.last_probe = datetime.utcnow()
+
+    async def _probe(self, session: aiohttp.ClientSession, health_url: str) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+
+        try:
+            async with session.get(health_url) as response:
+                response_time = round((time.perf_counter() - start_time) * 1000, 1)
+
+                if response.status == 200:
+                    try:
+                        details = await response.json()
+                    except Exception:
+                        details = None
+                    return {
+                        "status": HEALTHY,
+                        "response_time_ms": response_time,
+                        "checked_at": datetime.utcnow(),
+                        "details": details
+                    }
+
+                return {
+                    "status": "unhealthy",
+                    "response_time_ms": response_time,
+                    "checked_at": datetime.utcnow(),
+                    "http_status": response.status
+                }
+
+        except asyncio.TimeoutError:
+            return {
+                "status": "timeout",
+                "response_time_ms": self.timeout_seconds * 1000,
+                "checked_at": datetime.utcnow(),
+                "error": "Service timeout"
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "response_time_ms": None,
+                "checked_at": datetime.utcnow(),
+                "error": str(e)
+            }
+
+    async def get_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        קבלת תמונת מצב בריאות - Get the latest health of every service
+
+        Served from the rolling window; probes once only if no round has
+        completed yet (e.g. right after startup).
+        """
+        if self.last_probe is None:
+            await self.probe_all()
+
+        return {
+            service_name: history.summary()
+            for service_name, history in self.histories.items()
+        }
+
+
+_health_monitor: Optional[HealthMonitor] = None
+
+def get_health_monitor() -> HealthMonitor:
+    """Get the admin service health monitor"""
+    global _health_monitor
+
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(
+            targets=[
+                ("auth-service", f"{settings.AUTH_SERVICE_URL}/health"),
+                ("users-service", f"{settings.USERS_SERVICE_URL}/health"),
+                ("leads-service", f"{settings.LEADS_SERVICE_URL}/health"),
+                ("proposals-service", f"{settings.PROPOSALS_SERVICE_URL}/health"),
+                ("referrals-service", f"{settings.REFERRALS_SERVICE_URL}/health"),
+                ("payments-service", f"{settings.PAYMENTS_SERVICE_URL}/health"),
+                ("notifications-service", f"{settings.NOTIFICATIONS_SERVICE_URL}/health")
+            ],
+            interval_seconds=settings.SERVICE_MONITOR_INTERVAL,
+            timeout_seconds=settings.HEALTH_CHECK_TIMEOUT,
+            window_size=settings.HEALTH_HISTORY_SIZE,
+            flap_threshold=settings.HEALTH_FLAP_THRESHOLD
+        )
+
+    return _health_monitor
@@ -1,14 +1,127 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import asyncio
 import aiohttp
 import logging
+import time
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from python_shared.monitoring import get_request_metrics, histogram_quantile
 
 from database import get_database
 from config import settings
+from services.health_monitor import get_health_monitor
 
 logger = logging.getLogger(__name__)
 
+# Rates are computed between the current scrape and a baseline scrape at
+# least this old; without a baseline they cover the lifetime of the process
+RATE_WINDOW_SECONDS = 60
+
+# Baseline scrape per service
+_baseline_snapshots: Dict[str, Dict[str, Any]] = {}
+
+
+def _summarize_metrics(text: str) -> Dict[str, Any]:
+    """סיכום מטריקות שירות - Reduce a /metrics scrape to service-wide totals"""
+    snapshot = {
+        "taken_at": time.time(),
+        "started_at": None,
+        "in_flight": 0,
+        "requests": 0,
+        "errors": 0,
+        "duration_sum": 0.0,
+        "buckets": {},
+        "dependency_sum": {}
+    }
+
+    samples = (
+        (sample.name, sample.labels, sample.value)
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+    )
+
+    for name, labels, value in samples:
+        if name == "process_start_time_seconds":
+            snapshot["started_at"] = value
+        elif name == "http_requests_in_flight":
+            snapshot["in_flight"] += value
+        elif name == "http_requests_total":
+            snapshot["requests"] += value
+            if labels.get("status", "").startswith("5"):
+                snapshot["errors"] += value
+        elif name == "http_request_duration_seconds_bucket":
+            le = float(labels["le"])
+            snapshot["buckets"][le] = snapshot["buckets"].get(le, 0) + value
+        elif name == "http_request_duration_seconds_sum":
+            snapshot["duration_sum"] += value
+        elif name == "http_request_dependency_seconds_sum":
+            kind = labels.get("dependency", "other")
+            snapshot["dependency_sum"][kind] = snapshot["dependency_sum"].get(kind, 0.0) + value
+
+    return snapshot
+
+
+def _window_delta(current: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """הפרש בין שתי דגימות - Counter deltas between a baseline and the current scrape"""
+    restarted = (
+        baseline is None
+        or baseline["started_at"] != current["started_at"]
+        or baseline["requests"] > current["requests"]
+    )
+
+    if restarted:
+        # Counters start at zero with the process
+        elapsed = current["taken_at"] - (current["started_at"] or current["taken_at"])
+        return {
+            "elapsed": elapsed,
+            "requests": current["requests"],
+            "errors": current["errors"],
+            "duration_sum": current["duration_sum"],
+            "buckets": dict(current["buckets"]),
+            "dependency_sum": dict(current["dependency_sum"])
+        }
+
+    return {
+        "elapsed": current["taken_at"] - baseline["taken_at"],
+        "requests": current["requests"] - baseline["requests"],
+        "errors": current["errors"] - baseline["errors"],
+        "duration_sum": current["duration_sum"] - baseline["duration_sum"],
+        "buckets": {
+            le: count - baseline["buckets"].get(le, 0)
+            for le, count in current["buckets"].items()
+        },
+        "dependency_sum": {
+            kind: seconds - baseline["dependency_sum"].get(kind, 0.0)
+            for kind, seconds in current["dependency_sum"].items()
+        }
+    }
+
+
+def _request_stats(delta: Dict[str, Any], in_flight: float) -> Dict[str, Any]:
+    """חישוב מדדי בקשות - Rates, latency percentiles and error rate of a window"""
+    requests = delta["requests"]
+    buckets = list(delta["buckets"].items())
+
+    def percentile_ms(quantile: float) -> Optional[float]:
+        value = histogram_quantile(quantile, buckets)
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "window_seconds": round(delta["elapsed"], 1),
+        "requests": int(requests),
+        "requests_per_second": round(requests / delta["elapsed"], 2) if delta["elapsed"] > 0 else 0,
+        "avg_response_time_ms": round(delta["duration_sum"] / requests * 1000, 1) if requests else 0,
+        "p50_response_time_ms": percentile_ms(0.5),
+        "p95_response_time_ms": percentile_ms(0.95),
+        "p99_response_time_ms": percentile_ms(0.99),
+        "error_rate_percentage": round(delta["errors"] / requests * 100, 2) if requests else 0,
+        "in_flight_requests": int(in_flight),
+        "avg_db_time_ms": round(delta["dependency_sum"].get("db", 0.0) / requests * 1000, 1) if requests else 0,
+        "avg_redis_time_ms": round(delta["dependency_sum"].get("redis", 0.0) / requests * 1000, 1) if requests else 0
+    }
+
 class MetricsService:
     def __init__(self):
         self.db = get_database()
@@ -59,69 +172,25 @@ class MetricsService:
     
     async def _get_service_metrics(self) -> Dict[str, Any]:
         """קבלת מטריקות שירותים - Get service metrics"""
-        services = [
-            ("auth-service", f"{settings.AUTH_SERVICE_URL}/health"),
-            ("users-service", f"{settings.USERS_SERVICE_URL}/health"),
-            ("leads-service", f"{settings.LEADS_SERVICE_URL}/health"),
-            ("proposals-service", f"{settings.PROPOSALS_SERVICE_URL}/health"),
-            ("referrals-service", f"{settings.REFERRALS_SERVICE_URL}/health"),
-            ("payments-service", f"{settings.PAYMENTS_SERVICE_URL}/health"),
-            ("notifications-service", f"{settings.NOTIFICATIONS_SERVICE_URL}/health")
-        ]
-        
-        service_metrics = {}
-        
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-            for service_name, health_url in services:
-                try:
-                    start_time = datetime.utcnow()
-                    
-                    async with session.get(health_url) as response:
-                        end_time = datetime.utcnow()
-                        response_time = (end_time - start_time).total_seconds() * 1000
-                        
-                        if response.status == 200:
-                            health_data = await response.json()
-                            service_metrics[service_name] = {
-                                "status": "healthy",
-                                "response_time_ms": response_time,
-                                "last_check": end_time.isoformat(),
-                                "details": health_data
-                            }
-                        else:
-                            service_metrics[service_name] = {
-                                "status": "unhealthy",
-                                "response_time_ms": response_time,
-                                "last_check": end_time.isoformat(),
-                                "http_status": response.status
-                            }
-                            
-                except asyncio.TimeoutError:
-                    service_metrics[service_name] = {
-                        "status": "timeout",
-                        "response_time_ms": 5000,
-                        "last_check": datetime.utcnow().isoformat(),
-                        "error": "Service timeout"
-                    }
-                except Exception as e:
-                    service_metrics[service_name] = {
-                        "status": "error",
-                        "last_check": datetime.utcnow().isoformat(),
-                        "error": str(e)
-                    }
+        # Served from the background health monitor's rolling window
+        service_metrics = await get_health_monitor().get_snapshot()
         
         # Calculate overall service health
         healthy_services = len([s for s in service_metrics.values() if s["status"] == "healthy"])
         total_services = len(service_metrics)
+        response_times = [
+            s["response_time_ms"] for s in service_metrics.values()
+            if s.get("response_time_ms") is not None
+        ]
         
         service_metrics["summary"] = {
             "total_services": total_services,
             "healthy_services": healthy_services,
             "health_percentage": (healthy_services / total_services * 100) if total_services > 0 else 0,
-            "avg_response_time": sum(
-                s.get("response_time_ms", 0) for s in service_metrics.values() 
-                if isinstance(s, dict) and "response_time_ms" in s
-            ) / max(1, len([s for s in service_metrics.values() if isinstance(s, dict) and "response_time_ms" in s]))
+            "avg_response_time": sum(response_times) / max(1, len(response_times)),
+            "flapping_services": [
+                name for name, s in service_metrics.items() if s["window"]["flapping"]
+            ]
         }
         
         return service_metrics
@@ -339,12 +408,100 @@ class MetricsService:
             "generated_at": datetime.utcnow().isoformat()
         }
     
+    def _metrics_targets(self) -> List[Tuple[str, str]]:
+        """כתובות מטריקות של השירותים - /metrics endpoints of the other services"""
+        return [
+            ("auth-service", f"{settings.AUTH_SERVICE_URL}/metrics"),
+            ("users-service", f"{settings.USERS_SERVICE_URL}/metrics"),
+            ("leads-service", f"{settings.LEADS_SERVICE_URL}/metrics"),
+            ("proposals-service", f"{settings.PROPOSALS_SERVICE_URL}/metrics"),
+            ("referrals-service", f"{settings.REFERRALS_SERVICE_URL}/metrics"),
+            ("payments-service", f"{settings.PAYMENTS_SERVICE_URL}/metrics"),
+            ("notifications-service", f"{settings.NOTIFICATIONS_SERVICE_URL}/metrics")
+        ]
+
+    async def _scrape_metrics(self, session: aiohttp.ClientSession, service_name: str, url: str) -> Optional[str]:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return await response.text()
+                logger.warning(f"Metrics scrape of {service_name} returned {response.status}")
+        except Exception as e:
+            logger.warning(f"Metrics scrape of {service_name} failed: {e}")
+        return None
+
+    async def _get_request_metrics(self) -> Dict[str, Any]:
+        """
+        איסוף מטריקות בקשות מכל השירותים - Aggregate request metrics of all services
+        """
+        targets = self._metrics_targets()
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3)) as session:
+            texts = await asyncio.gather(*[
+                self._scrape_metrics(session, service_name, url)
+                for service_name, url in targets
+            ])
+
+        scrapes = {
+            service_name: text
+            for (service_name, _), text in zip(targets, texts)
+            if text is not None
+        }
+
+        # The admin service reads its own metrics directly
+        metrics = get_request_metrics()
+        if metrics is not None:
+            scrapes[metrics.service] = metrics.render().decode("utf-8")
+
+        overall = {
+            "elapsed": 0.0,
+            "requests": 0,
+            "errors": 0,
+            "duration_sum": 0.0,
+            "buckets": {},
+            "dependency_sum": {}
+        }
+        requests_per_second = 0.0
+        in_flight = 0
+        services = {}
+
+        for service_name, text in scrapes.items():
+            current = _summarize_metrics(text)
+            baseline = _baseline_snapshots.get(service_name)
+            delta = _window_delta(current, baseline)
+
+            if baseline is None or current["taken_at"] - baseline["taken_at"] >= RATE_WINDOW_SECONDS:
+                _baseline_snapshots[service_name] = current
+
+            stats = _request_stats(delta, current["in_flight"])
+            services[service_name] = stats
+
+            requests_per_second += stats["requests_per_second"]
+            in_flight += current["in_flight"]
+            overall["elapsed"] = max(overall["elapsed"], delta["elapsed"])
+            for key in ("requests", "errors", "duration_sum"):
+                overall[key] += delta[key]
+            for le, count in delta["buckets"].items():
+                overall["buckets"][le] = overall["buckets"].get(le, 0) + count
+            for kind, seconds in delta["dependency_sum"].items():
+                overall["dependency_sum"][kind] = overall["dependency_sum"].get(kind, 0.0) + seconds
+
+        # Services have separate windows, so the total rate is summed per service
+        overall_stats = _request_stats(overall, in_flight)
+        overall_stats["requests_per_second"] = round(requests_per_second, 2)
+        overall_stats["services_reporting"] = len(services)
+        overall_stats["services_total"] = len(targets) + 1
+
+        return {"overall": overall_stats, "services": services}
+
     async def get_real_time_metrics(self) -> Dict[str, Any]:
         """
         קבלת מטריקות זמן אמת - Get real-time metrics
         """
         try:
-            # These would normally come from real-time monitoring
+            request_metrics = await self._get_request_metrics()
+
+            # Load, session and queue figures would normally come from real-time monitoring
             return {
                 "timestamp": datetime.utcnow().isoformat(),
                 "current_load": {
@@ -359,12 +516,8 @@ class MetricsService:
                     "user_sessions": 1448,
                     "anonymous_sessions": 234
                 },
-                "request_metrics": {
-                    "requests_per_second": 45.2,
-                    "avg_response_time_ms": 158,
-                    "p95_response_time_ms": 420,
-                    "error_rate_percentage": 0.8
-                },
+                "request_metrics": request_metrics["overall"],
+                "service_request_metrics": request_metrics["services"],
                 "queue_metrics": {
                     "pending_notifications": 23,
                     "pending_payments": 5,
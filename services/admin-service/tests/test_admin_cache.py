@@ -0,0 +1,333 @@
+"""
+Admin principal cache and activity tracker tests.
+
+Test Coverage:
+- AdminPrincipalCache: TTL hits, one load per concurrent miss, invalidation
+  published on the admin channel and applied from other instances
+- Invalidation hook on admin row updates in AdminDatabase
+- AdminActivityTracker: touches coalesced per session and admin, one bulk
+  UPDATE per flush, failed flushes kept for the next one, flush on stop
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+import cache as cache_module
+from cache import AdminPrincipalCache, ADMIN_PRINCIPAL_INVALIDATION_CHANNEL
+from database import AdminDatabase
+from middleware import auth as auth_module
+from middleware.auth import AdminActivityTracker
+
+
+class FakePubSub:
+    """Subscription fed from a queue"""
+
+    def __init__(self, messages: asyncio.Queue):
+        self.messages = messages
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.published = []
+        self.fail = fail
+        self.messages = asyncio.Queue()
+        self.pubsubs = []
+
+    async def publish(self, channel, message):
+        if self.fail:
+            raise ConnectionError("redis unavailable")
+        self.published.append((channel, message))
+
+    def pubsub(self):
+        pubsub = FakePubSub(self.messages)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(cache_module, "get_redis_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the cache"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+class Loader:
+    """Admin rows by ID, held at `gate` until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self, admin_id):
+        self.calls.append(admin_id)
+        await self.gate.wait()
+        return {"id": admin_id, "role": "admin", "version": len(self.calls)}
+
+
+@pytest.mark.asyncio
+class TestAdminPrincipalCache:
+    """Cached admin rows and their invalidation"""
+
+    async def test_hits_within_the_ttl(self, clock):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+
+        first = await cache.get("a1", loader)
+        clock[0] += 29
+        second = await cache.get("a1", loader)
+
+        assert first == second
+        assert loader.calls == ["a1"]
+
+        clock[0] += 1
+        assert (await cache.get("a1", loader))["version"] == 2
+
+    async def test_returned_rows_are_copies(self):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+
+        (await cache.get("a1", loader))["role"] = "super_admin"
+
+        assert (await cache.get("a1", loader))["role"] == "admin"
+
+    async def test_concurrent_misses_share_one_load(self):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+
+        rows = await asyncio.gather(*[cache.get("a1", loader) for _ in range(5)])
+
+        assert loader.calls == ["a1"]
+        assert all(row == rows[0] for row in rows)
+
+    async def test_missing_admins_are_not_cached(self):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        calls = []
+
+        async def loader(admin_id):
+            calls.append(admin_id)
+            return None
+
+        assert await cache.get("gone", loader) is None
+        assert await cache.get("gone", loader) is None
+        assert calls == ["gone", "gone"]
+
+    async def test_oldest_entry_is_dropped_when_full(self):
+        cache = AdminPrincipalCache(ttl_seconds=30, max_entries=2)
+        loader = Loader()
+
+        for admin_id in ("a1", "a2", "a3"):
+            await cache.get(admin_id, loader)
+
+        assert list(cache._entries) == ["a2", "a3"]
+
+    async def test_invalidate_evicts_and_publishes(self, redis_client):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+        await cache.get("a1", loader)
+
+        await cache.invalidate("a1")
+
+        assert redis_client.published == [(ADMIN_PRINCIPAL_INVALIDATION_CHANNEL, "a1")]
+        assert (await cache.get("a1", loader))["version"] == 2
+
+    async def test_invalidation_during_a_load_is_not_overwritten(self, redis_client):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+        loader.gate.clear()
+
+        pending = asyncio.create_task(cache.get("a1", loader))
+        await asyncio.sleep(0)
+        await cache.invalidate("a1")
+        loader.gate.set()
+        await pending
+
+        assert "a1" not in cache._entries
+
+    async def test_failed_publish_still_evicts(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "get_redis_client", lambda: FakeRedis(fail=True))
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        await cache.get("a1", Loader())
+
+        await cache.invalidate("a1")
+
+        assert "a1" not in cache._entries
+
+    async def test_invalidations_from_other_instances(self, redis_client):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        loader = Loader()
+        cache.start()
+        await asyncio.sleep(0)
+        for admin_id in ("a1", "a2"):
+            await cache.get(admin_id, loader)
+
+        await redis_client.messages.put({"type": "subscribe", "data": 1})
+        await redis_client.messages.put({"type": "message", "data": "a1"})
+        await asyncio.sleep(0.01)
+
+        assert redis_client.pubsubs[0].channels == [ADMIN_PRINCIPAL_INVALIDATION_CHANNEL]
+        assert list(cache._entries) == ["a2"]
+        await cache.stop()
+        assert cache._listener is None
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, query, *args):
+        self.executed.append(args)
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+@pytest.mark.asyncio
+class TestInvalidationHook:
+    """Admin row updates evict the cached principal everywhere"""
+
+    @pytest.mark.parametrize("update", [
+        lambda db, admin_id: db.update_admin_user(admin_id, {"role": "viewer"}),
+        lambda db, admin_id: db.increment_failed_login(admin_id),
+        lambda db, admin_id: db.reset_failed_logins(admin_id),
+    ])
+    async def test_updates_invalidate(self, monkeypatch, redis_client, update):
+        cache = AdminPrincipalCache(ttl_seconds=30)
+        monkeypatch.setattr("database.get_admin_principal_cache", lambda: cache)
+        await cache.get("a1", Loader())
+        db = AdminDatabase()
+        db.pool = FakePool()
+
+        await update(db, "a1")
+
+        assert db.pool.connection.executed
+        assert "a1" not in cache._entries
+        assert redis_client.published == [(ADMIN_PRINCIPAL_INVALIDATION_CHANNEL, "a1")]
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.session_updates = []
+        self.admin_updates = []
+        self.fail = False
+
+    async def bulk_update_session_activity(self, activity):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.session_updates.append(dict(activity))
+
+    async def bulk_update_admin_last_activity(self, activity):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.admin_updates.append(dict(activity))
+
+
+@pytest.fixture
+def database(monkeypatch):
+    db = RecordingDatabase()
+    monkeypatch.setattr(auth_module, "get_database", lambda: db)
+    return db
+
+
+@pytest.fixture
+def times(monkeypatch):
+    """Touch times handed out in order"""
+    queue = [datetime(2024, 6, 1, 12, minute, tzinfo=timezone.utc) for minute in range(60)]
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return queue.pop(0)
+
+    monkeypatch.setattr(auth_module, "datetime", Clock)
+    return queue
+
+
+def _at(minute):
+    return datetime(2024, 6, 1, 12, minute, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+class TestAdminActivityTracker:
+    """Coalesced last-activity writes"""
+
+    async def test_touches_are_coalesced_per_key(self, database, times):
+        tracker = AdminActivityTracker(flush_interval_seconds=60)
+        tracker.touch_session("s1")
+        tracker.touch_admin("a1")
+        tracker.touch_session("s1")
+        tracker.touch_session("s2")
+        tracker.touch_admin("a1")
+
+        await tracker.flush()
+
+        assert database.session_updates == [{"s1": _at(2), "s2": _at(3)}]
+        assert database.admin_updates == [{"a1": _at(4)}]
+
+        await tracker.flush()
+
+        assert len(database.session_updates) == 1
+        assert len(database.admin_updates) == 1
+
+    async def test_failed_flush_is_retried_without_losing_newer_touches(self, database, times):
+        tracker = AdminActivityTracker(flush_interval_seconds=60)
+        tracker.touch_session("s1")
+        tracker.touch_admin("a1")
+        database.fail = True
+
+        await tracker.flush()
+        tracker.touch_session("s1")
+        database.fail = False
+        await tracker.flush()
+
+        assert database.session_updates == [{"s1": _at(2)}]
+        assert database.admin_updates == [{"a1": _at(1)}]
+
+    async def test_loop_flushes_every_interval(self, database):
+        tracker = AdminActivityTracker(flush_interval_seconds=0.01)
+        tracker.start()
+        tracker.touch_admin("a1")
+        await asyncio.sleep(0.05)
+        tracker.touch_admin("a2")
+        await asyncio.sleep(0.05)
+
+        assert [list(update) for update in database.admin_updates] == [["a1"], ["a2"]]
+        await tracker.stop()
+
+    async def test_stop_flushes_pending_activity(self, database):
+        tracker = AdminActivityTracker(flush_interval_seconds=60)
+        tracker.start()
+        tracker.touch_session("s1")
+
+        await tracker.stop()
+
+        assert [list(update) for update in database.session_updates] == [["s1"]]
+        assert tracker._task is None
@@ -0,0 +1,258 @@
+"""
+Analytics rollup tests against PostgreSQL.
+
+Test Coverage:
+- refresh_analytics_rollup facts per day and category
+- Lead status snapshot of the last rolled-up day
+- Incremental runs that only add new days
+- Range getters over the rolled-up facts
+
+Set TEST_DATABASE_URL to an empty database with the extensions from
+scripts/init_database.sql; the tests are skipped otherwise. The schema is
+recreated for every test.
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+asyncpg = pytest.importorskip("asyncpg")
+
+from database import AdminDatabase
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+INIT_SQL = Path(__file__).resolve().parents[3] / "scripts" / "init_database.sql"
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+TODAY = datetime.utcnow().date()
+YESTERDAY = TODAY - timedelta(days=1)
+DAY_2 = TODAY - timedelta(days=2)
+DAY_3 = TODAY - timedelta(days=3)
+
+
+def _at(day: date, hour: int) -> datetime:
+    return datetime.combine(day, time(hour))
+
+
+@pytest_asyncio.fixture
+async def db():
+    """AdminDatabase on a freshly created schema"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    await conn.execute(INIT_SQL.read_text())
+    await conn.close()
+
+    database = AdminDatabase()
+    database.pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=2)
+    await database._init_tables()
+
+    yield database
+
+    await database.pool.close()
+
+
+async def _fixture_data(conn):
+    """Three days of users, leads, proposals and money; plus today's, which is not rolled up"""
+    customer = await conn.fetchval(
+        "INSERT INTO users (phone, role, created_at) VALUES ('0501', 'customer', $1) RETURNING id",
+        _at(DAY_3, 8)
+    )
+    professional = await conn.fetchval(
+        "INSERT INTO users (phone, role, created_at) VALUES ('0502', 'professional', $1) RETURNING id",
+        _at(DAY_3, 9)
+    )
+    late_professional = await conn.fetchval(
+        "INSERT INTO users (phone, role, created_at) VALUES ('0503', 'professional', $1) RETURNING id",
+        _at(DAY_2, 9)
+    )
+    await conn.execute(
+        "INSERT INTO users (phone, role, created_at) VALUES ('0504', 'customer', $1)",
+        _at(TODAY, 0)
+    )
+
+    async def lead(category, created_at, status="open"):
+        return await conn.fetchval(
+            """
+            INSERT INTO leads (customer_id, title, description, category, status, created_at)
+            VALUES ($1, 'עבודה', 'תיאור', $2, $3, $4) RETURNING id
+            """,
+            customer, category, status, created_at
+        )
+
+    async def proposal(lead_id, professional_id, created_at, accepted_at=None):
+        return await conn.fetchval(
+            """
+            INSERT INTO proposals (lead_id, professional_id, price, description, created_at, accepted_at)
+            VALUES ($1, $2, 100, 'הצעה', $3, $4) RETURNING id
+            """,
+            lead_id, professional_id, created_at, accepted_at
+        )
+
+    plumbing = await lead("plumbing", _at(DAY_3, 10), status="completed")
+    electric = await lead("electric", _at(DAY_2, 9))
+    await lead("plumbing", _at(TODAY, 0))
+
+    # plumbing: answered 4 hours after creation, second proposal accepted yesterday
+    accepted = await proposal(plumbing, professional, _at(DAY_3, 14))
+    await proposal(plumbing, late_professional, _at(DAY_2, 11), accepted_at=_at(YESTERDAY, 10))
+    # electric: answered after 3 hours
+    await proposal(electric, professional, _at(DAY_2, 12))
+
+    await conn.executemany(
+        """
+        INSERT INTO transactions (user_id, lead_id, proposal_id, type, amount, status, processed_at, created_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $7)
+        """,
+        [
+            (customer, plumbing, accepted, "payment", Decimal("1000"), "completed", _at(YESTERDAY, 12)),
+            (customer, plumbing, accepted, "commission", Decimal("100"), "completed", _at(YESTERDAY, 12)),
+            (customer, electric, None, "commission", Decimal("50"), "pending", _at(YESTERDAY, 13)),
+            (customer, None, None, "commission", Decimal("20"), "completed", _at(DAY_2, 13)),
+        ]
+    )
+
+    referral = await conn.fetchval(
+        """
+        INSERT INTO referrals (referrer_id, lead_id, referred_professional_id)
+        VALUES ($1, $2, $3) RETURNING id
+        """,
+        late_professional, plumbing, professional
+    )
+    await conn.execute(
+        """
+        INSERT INTO commissions (referral_id, lead_value, commission_percentage, commission_amount,
+                                 net_amount, calculated_at)
+        VALUES ($1, 1000, 10, 100, 100, $2)
+        """,
+        referral, _at(YESTERDAY, 15)
+    )
+
+
+async def _facts(conn):
+    rows = await conn.fetch("SELECT * FROM analytics_daily_facts ORDER BY day, category")
+    return {(row["day"], row["category"]): dict(row) for row in rows}
+
+
+@pytest.mark.asyncio
+class TestRefreshAnalyticsRollup:
+    """Test the nightly rollup over a small fixture"""
+
+    async def test_rollup_facts(self, db):
+        async with db.pool.acquire() as conn:
+            await _fixture_data(conn)
+
+        assert await db.refresh_analytics_rollup() == YESTERDAY
+
+        async with db.pool.acquire() as conn:
+            facts = await _facts(conn)
+
+        assert all(day <= YESTERDAY for day, _ in facts)
+
+        users_day_3 = facts[(DAY_3, "")]
+        assert (users_day_3["new_users"], users_day_3["new_professionals"], users_day_3["new_customers"]) == (2, 1, 1)
+        assert facts[(DAY_2, "")]["new_professionals"] == 1
+        assert facts[(DAY_2, "")]["platform_revenue"] == Decimal("20.00")
+
+        plumbing_day_3 = facts[(DAY_3, "plumbing")]
+        assert plumbing_day_3["new_leads"] == 1
+        assert plumbing_day_3["new_proposals"] == 1
+        assert plumbing_day_3["leads_answered"] == 1
+        assert plumbing_day_3["response_hours"] == Decimal("4.00")
+
+        # A second proposal on an answered lead is not another answer
+        plumbing_day_2 = facts[(DAY_2, "plumbing")]
+        assert (plumbing_day_2["new_proposals"], plumbing_day_2["leads_answered"]) == (1, 0)
+
+        electric_day_2 = facts[(DAY_2, "electric")]
+        assert (electric_day_2["new_leads"], electric_day_2["leads_answered"]) == (1, 1)
+        assert electric_day_2["response_hours"] == Decimal("3.00")
+
+        plumbing_yesterday = facts[(YESTERDAY, "plumbing")]
+        assert plumbing_yesterday["accepted_proposals"] == 1
+        assert plumbing_yesterday["platform_revenue"] == Decimal("100.00")
+        assert plumbing_yesterday["payment_volume"] == Decimal("1000.00")
+        assert plumbing_yesterday["referral_commissions"] == Decimal("100.00")
+        # Pending transactions are not revenue
+        assert (YESTERDAY, "electric") not in facts
+
+    async def test_lead_status_snapshot(self, db):
+        async with db.pool.acquire() as conn:
+            await _fixture_data(conn)
+
+        await db.refresh_analytics_rollup()
+
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT day, status, lead_count FROM analytics_daily_lead_status")
+
+        # Today's lead is not part of yesterday's snapshot
+        assert {(row["day"], row["status"]): row["lead_count"] for row in rows} == {
+            (YESTERDAY, "completed"): 1,
+            (YESTERDAY, "open"): 1
+        }
+
+    async def test_rollup_is_incremental(self, db):
+        async with db.pool.acquire() as conn:
+            await _fixture_data(conn)
+
+        await db.refresh_analytics_rollup()
+        async with db.pool.acquire() as conn:
+            before = await _facts(conn)
+            await conn.execute(
+                "UPDATE analytics_rollup_state SET rolled_up_through = $1", DAY_2
+            )
+            # Rows of already rolled-up days are left alone
+            await conn.execute("UPDATE analytics_daily_facts SET new_users = 99 WHERE day = $1", DAY_3)
+
+        assert await db.refresh_analytics_rollup() == YESTERDAY
+        assert await db.refresh_analytics_rollup() == YESTERDAY
+
+        async with db.pool.acquire() as conn:
+            after = await _facts(conn)
+
+        assert after[(DAY_3, "")]["new_users"] == 99
+        assert {key: row for key, row in after.items() if key[0] == YESTERDAY} == {
+            key: row for key, row in before.items() if key[0] == YESTERDAY
+        }
+
+    async def test_range_getters(self, db):
+        async with db.pool.acquire() as conn:
+            await _fixture_data(conn)
+            await conn.execute(
+                "UPDATE users SET last_login = $1 WHERE phone = '0501'", _at(YESTERDAY, 20)
+            )
+            await conn.execute(
+                "UPDATE users SET last_login = $1 WHERE phone = '0502'", _at(DAY_3, 20)
+            )
+
+        await db.refresh_analytics_rollup()
+        start, end = _at(DAY_2, 0), _at(YESTERDAY, 0)
+
+        users = await db.get_user_analytics(start, end)
+        assert users["new_users"] == 1
+        assert users["total_users"] == 3
+        assert users["active_users"] == 1
+        # One of the two users seen since DAY_4 was last seen before the range
+        assert users["churn_rate"] == 50.0
+        assert users["data_through"] == YESTERDAY.isoformat()
+
+        leads = await db.get_lead_analytics(start, end)
+        assert (leads["new_leads"], leads["total_leads"]) == (1, 2)
+        assert leads["conversion_rate"] == 100.0
+        assert leads["avg_response_time"] == 3.0
+        assert leads["by_category"] == {"electric": 1}
+        assert leads["by_status"] == {"open": 1, "in_progress": 0, "closed": 1, "cancelled": 0}
+
+        revenue = await db.get_revenue_analytics(start, end)
+        assert revenue["commission_revenue"] == 120.0
+        assert revenue["total_revenue"] == 120.0
+        assert revenue["monthly_revenue"] == (120.0 if DAY_2.month == YESTERDAY.month else 100.0)
+        assert revenue["payment_volume"] == 1000.0
+        assert revenue["referral_commissions"] == 100.0
@@ -0,0 +1,230 @@
+"""
+Audit aggregation tests against PostgreSQL.
+
+Test Coverage:
+- get_audit_summary_counts against counting the raw rows in Python, with
+  and without the hourly rollup, over ranges that start and end mid-hour
+- refresh_audit_rollup recomputing the last rolled-up hour
+- get_failed_logins_by_ip, get_audit_activity_counts and
+  get_rapid_admin_actions against the Python checks they replaced
+
+Set TEST_DATABASE_URL to an empty database; the tests are skipped otherwise.
+The admin tables are recreated by AdminDatabase for every test.
+"""
+
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+
+asyncpg = pytest.importorskip("asyncpg")
+
+from database import AdminDatabase
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+NOW = datetime.now(timezone.utc)
+HOUR = NOW.replace(minute=0, second=0, microsecond=0)
+
+EVENT_TYPES = ["login", "data_access", "configuration", "system"]
+SEVERITIES = ["info", "low", "medium", "high", "critical"]
+ACTIONS = ["login_success", "login_failed", "view_user", "export_users", "Export_Leads", "update_settings"]
+IPS = ["10.0.0.1", "10.0.0.2", "192.168.1.7", None]
+
+
+@pytest_asyncio.fixture
+async def db():
+    """AdminDatabase on a freshly created schema"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    await conn.close()
+
+    database = AdminDatabase()
+    database.pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=2)
+    await database._init_tables()
+
+    yield database
+
+    await database.pool.close()
+
+
+@pytest_asyncio.fixture
+async def admins(db):
+    async with db.pool.acquire() as conn:
+        return [
+            str(await conn.fetchval(
+                """
+                INSERT INTO admin_users (username, email, full_name, password_hash)
+                VALUES ($1, $2, $3, 'x') RETURNING id
+                """,
+                f"admin{i}", f"admin{i}@ofair.co.il", f"מנהל {i}"
+            ))
+            for i in range(3)
+        ]
+
+
+def _log(timestamp, admin_id=None, action="view_user", ip=None, event_type="data_access", severity="info"):
+    return {
+        "admin_id": admin_id,
+        "event_type": event_type,
+        "action": action,
+        "resource_type": "user",
+        "ip_address": ip,
+        "timestamp": timestamp,
+        "severity": severity,
+    }
+
+
+@pytest_asyncio.fixture
+async def logs(db, admins):
+    """Two days of mixed audit rows, plus rows on the hour boundaries"""
+    rng = random.Random(42)
+    rows = [
+        _log(
+            NOW - timedelta(seconds=rng.randint(0, 50 * 3600)),
+            admin_id=rng.choice(admins + [None]),
+            action=rng.choice(ACTIONS),
+            ip=rng.choice(IPS),
+            event_type=rng.choice(EVENT_TYPES),
+            severity=rng.choice(SEVERITIES),
+        )
+        for _ in range(800)
+    ]
+    # Exactly on hour boundaries, where rollup and raw rows meet
+    rows += [_log(HOUR - timedelta(hours=h), admin_id=admins[0]) for h in (3, 10, 30, 40)]
+    # Bursts: one admin acting every second, another every three seconds
+    burst = NOW - timedelta(hours=5)
+    rows += [_log(burst + timedelta(seconds=i), admin_id=admins[1]) for i in range(12)]
+    rows += [_log(burst + timedelta(seconds=3 * i), admin_id=admins[2]) for i in range(12)]
+    # Brute force from one address
+    rows += [
+        _log(NOW - timedelta(minutes=20 + i), action="login_failed", ip="203.0.113.9", event_type="login")
+        for i in range(11)
+    ]
+
+    await db.insert_audit_logs(rows)
+    return rows
+
+
+def _in_range(rows, start, end):
+    return [row for row in rows if start <= row["timestamp"] <= end]
+
+
+def _python_summary(rows):
+    """The per-row counting get_audit_summary used to do"""
+    counts = {"total": len(rows), "event_type": {}, "severity": {}, "admin": {}, "day": {}, "action": {}}
+    for row in rows:
+        for dimension, key in (
+            ("event_type", row["event_type"]),
+            ("severity", row["severity"]),
+            ("admin", row["admin_id"]),
+            ("day", row["timestamp"].astimezone(timezone.utc).strftime("%Y-%m-%d")),
+            ("action", row["action"]),
+        ):
+            counts[dimension][key] = counts[dimension].get(key, 0) + 1
+    return counts
+
+
+@pytest.mark.asyncio
+class TestAuditSummaryCounts:
+    """GROUPING SETS summary over raw rows and the hourly rollup"""
+
+    @pytest.mark.parametrize("start_offset,end_offset", [
+        (timedelta(hours=48), timedelta(0)),
+        (timedelta(hours=40, minutes=-17), timedelta(hours=3, minutes=-5)),
+        (timedelta(hours=40), timedelta(hours=3)),
+        (timedelta(hours=2, minutes=30), timedelta(hours=2, minutes=10)),
+    ])
+    async def test_matches_python_counting(self, db, logs, start_offset, end_offset):
+        start, end = NOW - start_offset, NOW - end_offset
+        expected = _python_summary(_in_range(logs, start, end))
+
+        assert await db.get_audit_summary_counts(start, end) == expected
+
+        await db.refresh_audit_rollup(initial_days=3)
+
+        assert await db.get_audit_summary_counts(start, end) == expected
+
+    async def test_range_before_the_rollup_is_read_raw(self, db, logs):
+        await db.refresh_audit_rollup(initial_days=1)
+        start, end = NOW - timedelta(hours=49), NOW
+
+        assert await db.get_audit_summary_counts(start, end) == _python_summary(_in_range(logs, start, end))
+
+    async def test_refresh_recomputes_the_last_rolled_up_hour(self, db, logs, admins):
+        until = await db.refresh_audit_rollup(initial_days=3)
+        late = _log(until - timedelta(minutes=30), admin_id=admins[0], action="late_action")
+        await db.insert_audit_logs([late])
+
+        assert await db.refresh_audit_rollup() == until
+        start, end = NOW - timedelta(hours=48), NOW
+
+        counts = await db.get_audit_summary_counts(start, end)
+        assert counts == _python_summary(_in_range(logs + [late], start, end))
+        assert counts["action"]["late_action"] == 1
+
+
+@pytest.mark.asyncio
+class TestSuspiciousActivityQueries:
+    """SQL anomaly checks against the Python loops they replaced"""
+
+    async def test_failed_logins_by_ip(self, db, logs):
+        since = NOW - timedelta(hours=24)
+        failures = {}
+        for row in logs:
+            if row["action"] == "login_failed" and row["timestamp"] >= since:
+                ip = row["ip_address"] or "unknown"
+                failures[ip] = failures.get(ip, 0) + 1
+
+        for min_failures in (1, 10):
+            rows = await db.get_failed_logins_by_ip(since, min_failures)
+
+            assert {row["ip_address"]: row["count"] for row in rows} == {
+                ip: count for ip, count in failures.items() if count >= min_failures
+            }
+            assert [row["count"] for row in rows] == sorted((row["count"] for row in rows), reverse=True)
+
+        assert {row["ip_address"]: row["count"] for row in rows}["203.0.113.9"] == 11
+
+    async def test_night_and_export_counts(self, db, logs):
+        since = NOW - timedelta(hours=36)
+        recent = [row for row in logs if row["timestamp"] >= since]
+        night = [
+            row for row in recent
+            if row["admin_id"] and (row["timestamp"].hour >= 22 or row["timestamp"].hour <= 6)
+        ]
+        exports = [row for row in recent if "export" in row["action"].lower()]
+
+        assert await db.get_audit_activity_counts(since) == {
+            "night_actions": len(night),
+            "export_actions": len(exports),
+        }
+
+    async def test_rapid_admin_actions(self, db, logs, admins):
+        since = NOW - timedelta(hours=24)
+        by_admin = {}
+        for row in logs:
+            if row["admin_id"] and row["timestamp"] >= since:
+                by_admin.setdefault(row["admin_id"], []).append(row["timestamp"])
+        rapid = {}
+        for admin_id, timestamps in by_admin.items():
+            timestamps.sort()
+            rapid[admin_id] = sum(
+                1 for previous, current in zip(timestamps, timestamps[1:])
+                if (current - previous).total_seconds() < 2
+            )
+
+        rows = await db.get_rapid_admin_actions(since, 2, 10)
+
+        assert {row["admin_id"]: row["count"] for row in rows} == {
+            admin_id: count for admin_id, count in rapid.items() if count >= 10
+        }
+        assert admins[1] in {row["admin_id"] for row in rows}
+        assert admins[2] not in {row["admin_id"] for row in rows}
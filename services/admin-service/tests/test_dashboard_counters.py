@@ -0,0 +1,242 @@
+"""
+Dashboard counter trigger tests against PostgreSQL.
+
+Test Coverage:
+- Counters kept by the triggers in scripts/init_database.sql match COUNT(*)
+  and SUM() over the source tables after inserts, updates and deletes
+- Answered leads and response hours follow the first proposal
+- get_dashboard_snapshot over the counters
+- rebuild_dashboard_counters agrees with the incrementally kept counters
+
+Set TEST_DATABASE_URL to an empty database with the extensions from
+scripts/init_database.sql; the tests are skipped otherwise. The schema is
+recreated for every test.
+"""
+
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+asyncpg = pytest.importorskip("asyncpg")
+
+from database import AdminDatabase
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+INIT_SQL = Path(__file__).resolve().parents[3] / "scripts" / "init_database.sql"
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+NOW = datetime.utcnow().replace(microsecond=0)
+WINDOW_START = NOW - timedelta(days=30)
+
+# Source-table truth for every counter
+DIRECT_COUNTS = """
+SELECT
+    (SELECT count(*) FROM users) AS users_total,
+    (SELECT count(*) FROM users WHERE last_login >= $1::date) AS users_last_login,
+    (SELECT count(*) FROM leads) AS leads_total,
+    (SELECT count(*) FROM leads WHERE status = 'open') AS leads_open,
+    (SELECT count(*) FROM leads WHERE created_at >= $1::date) AS leads_created,
+    (SELECT count(*) FROM leads l
+     WHERE l.created_at >= $1::date
+       AND EXISTS (SELECT 1 FROM proposals p WHERE p.lead_id = l.id)) AS leads_answered,
+    (SELECT COALESCE(sum(dashboard_response_hours(
+         l.created_at, (SELECT min(p.created_at) FROM proposals p WHERE p.lead_id = l.id)
+     )), 0)
+     FROM leads l WHERE l.created_at >= $1::date) AS lead_response_hours,
+    (SELECT count(*) FROM proposals) AS proposals_total,
+    (SELECT count(*) FROM proposals WHERE status = 'pending') AS proposals_pending,
+    (SELECT COALESCE(sum(amount), 0) FROM transactions
+     WHERE status = 'completed' AND type = 'commission') AS revenue
+"""
+
+COUNTERS = """
+SELECT metric, sum(value) AS value
+FROM dashboard_counters
+WHERE bucket = DATE '1970-01-01' OR bucket >= $1::date
+GROUP BY metric
+"""
+
+COUNTERS_BY_BUCKET = """
+SELECT metric, bucket, sum(value) AS value
+FROM dashboard_counters
+GROUP BY metric, bucket
+HAVING sum(value) <> 0
+ORDER BY metric, bucket
+"""
+
+
+@pytest_asyncio.fixture
+async def db():
+    """AdminDatabase on a freshly created schema"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    await conn.execute(INIT_SQL.read_text())
+    await conn.close()
+
+    database = AdminDatabase()
+    database.pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=2)
+
+    yield database
+
+    await database.pool.close()
+
+
+async def _assert_counters_match(conn):
+    direct = dict(await conn.fetchrow(DIRECT_COUNTS, WINDOW_START))
+    counters = {row["metric"]: row["value"] for row in await conn.fetch(COUNTERS, WINDOW_START)}
+
+    for metric, expected in direct.items():
+        assert counters.get(metric, 0) == expected, metric
+
+
+async def _user(conn, phone, role="customer", last_login=None):
+    return await conn.fetchval(
+        "INSERT INTO users (phone, role, last_login) VALUES ($1, $2, $3) RETURNING id",
+        phone, role, last_login
+    )
+
+
+async def _lead(conn, customer, created_at, status="open"):
+    return await conn.fetchval(
+        """
+        INSERT INTO leads (customer_id, title, description, category, status, created_at)
+        VALUES ($1, 'עבודה', 'תיאור', 'plumbing', $2, $3) RETURNING id
+        """,
+        customer, status, created_at
+    )
+
+
+async def _proposal(conn, lead_id, professional, created_at, status="pending"):
+    return await conn.fetchval(
+        """
+        INSERT INTO proposals (lead_id, professional_id, price, description, status, created_at)
+        VALUES ($1, $2, 100, 'הצעה', $3, $4) RETURNING id
+        """,
+        lead_id, professional, status, created_at
+    )
+
+
+async def _transaction(conn, customer, amount, status, processed_at, type_="commission"):
+    return await conn.fetchval(
+        """
+        INSERT INTO transactions (user_id, type, amount, status, processed_at, created_at)
+        VALUES ($1, $2, $3, $4, $5, $5) RETURNING id
+        """,
+        customer, type_, Decimal(amount), status, processed_at
+    )
+
+
+@pytest.mark.asyncio
+class TestDashboardCounterTriggers:
+    """Trigger-kept counters against the source tables"""
+
+    async def test_inserts(self, db):
+        async with db.pool.acquire() as conn:
+            customer = await _user(conn, "0501", last_login=NOW - timedelta(days=2))
+            professional = await _user(conn, "0502", "professional", last_login=NOW - timedelta(days=40))
+            other = await _user(conn, "0503", "professional")
+
+            fresh = await _lead(conn, customer, NOW - timedelta(days=3))
+            await _lead(conn, customer, NOW - timedelta(days=1), status="in_progress")
+            old = await _lead(conn, customer, NOW - timedelta(days=45))
+
+            await _proposal(conn, fresh, professional, NOW - timedelta(days=3) + timedelta(hours=5))
+            await _proposal(conn, fresh, other, NOW - timedelta(days=2), status="accepted")
+            await _proposal(conn, old, professional, NOW - timedelta(days=44))
+
+            await _transaction(conn, customer, "120.50", "completed", NOW - timedelta(days=1))
+            await _transaction(conn, customer, "80", "pending", NOW)
+            await _transaction(conn, customer, "1000", "completed", NOW, type_="payment")
+
+            await _assert_counters_match(conn)
+
+    async def test_updates(self, db):
+        async with db.pool.acquire() as conn:
+            customer = await _user(conn, "0501", last_login=NOW - timedelta(days=40))
+            professional = await _user(conn, "0502", "professional")
+            lead = await _lead(conn, customer, NOW - timedelta(days=3))
+            proposal = await _proposal(conn, lead, professional, NOW - timedelta(days=2))
+            pending = await _transaction(conn, customer, "50", "pending", NOW - timedelta(days=1))
+            completed = await _transaction(conn, customer, "70", "completed", NOW - timedelta(days=1))
+
+            # Second login on the same day, then a login today
+            yesterday = (NOW - timedelta(days=1)).replace(hour=10, minute=0, second=0)
+            await conn.execute("UPDATE users SET last_login = $2 WHERE id = $1", customer, yesterday)
+            await conn.execute(
+                "UPDATE users SET last_login = $2 WHERE id = $1",
+                customer, yesterday + timedelta(minutes=5)
+            )
+            await conn.execute("UPDATE users SET last_login = $2 WHERE id = $1", professional, NOW)
+            await conn.execute("UPDATE leads SET status = 'assigned' WHERE id = $1", lead)
+            await conn.execute("UPDATE proposals SET status = 'accepted' WHERE id = $1", proposal)
+            await conn.execute("UPDATE transactions SET status = 'completed' WHERE id = $1", pending)
+            await conn.execute("UPDATE transactions SET amount = 90 WHERE id = $1", completed)
+            await conn.execute(
+                "UPDATE transactions SET status = 'refunded' WHERE id = $1 AND amount = 90", completed
+            )
+
+            await _assert_counters_match(conn)
+
+    async def test_deletes(self, db):
+        async with db.pool.acquire() as conn:
+            customer = await _user(conn, "0501", last_login=NOW)
+            professional = await _user(conn, "0502", "professional", last_login=NOW - timedelta(days=1))
+            other = await _user(conn, "0504", "professional")
+            gone = await _user(conn, "0503", last_login=NOW)
+
+            answered = await _lead(conn, customer, NOW - timedelta(days=4))
+            first = await _proposal(conn, answered, professional, NOW - timedelta(days=4) + timedelta(hours=2))
+            await _proposal(conn, answered, other, NOW - timedelta(days=3))
+            only = await _lead(conn, customer, NOW - timedelta(days=2))
+            last = await _proposal(conn, only, professional, NOW - timedelta(days=1))
+            removed = await _lead(conn, customer, NOW - timedelta(days=1))
+            await _proposal(conn, removed, professional, NOW)
+            revenue = await _transaction(conn, customer, "40", "completed", NOW)
+
+            # The first proposal moves to the next one; the last one clears it
+            await conn.execute("DELETE FROM proposals WHERE id = $1", first)
+            await conn.execute("DELETE FROM proposals WHERE id = $1", last)
+            # The lead's proposals go with it
+            await conn.execute("DELETE FROM leads WHERE id = $1", removed)
+            await conn.execute("DELETE FROM users WHERE id = $1", gone)
+            await conn.execute("DELETE FROM transactions WHERE id = $1", revenue)
+
+            await _assert_counters_match(conn)
+            assert await conn.fetchval(
+                "SELECT first_proposal_at FROM leads WHERE id = $1", only
+            ) is None
+
+    async def test_snapshot_and_rebuild_agree_with_the_triggers(self, db):
+        async with db.pool.acquire() as conn:
+            customer = await _user(conn, "0501", last_login=NOW)
+            professional = await _user(conn, "0502", "professional")
+            lead = await _lead(conn, customer, NOW - timedelta(days=2))
+            await _lead(conn, customer, NOW - timedelta(days=1))
+            await _proposal(conn, lead, professional, NOW - timedelta(days=2) + timedelta(hours=3))
+            await _transaction(conn, customer, "25", "completed", NOW)
+
+            incremental = [tuple(row) for row in await conn.fetch(COUNTERS_BY_BUCKET)]
+            await conn.execute("SELECT rebuild_dashboard_counters()")
+            rebuilt = [tuple(row) for row in await conn.fetch(COUNTERS_BY_BUCKET)]
+
+        assert incremental == rebuilt
+
+        snapshot = await db.get_dashboard_snapshot(NOW.replace(day=1, hour=0, minute=0, second=0), WINDOW_START)
+
+        assert snapshot["total_users"] == 2
+        assert snapshot["active_users"] == 1
+        assert snapshot["total_leads"] == 2
+        assert snapshot["open_leads"] == 2
+        assert snapshot["total_proposals"] == 1
+        assert snapshot["pending_proposals"] == 1
+        assert snapshot["total_revenue"] == 25.0
+        assert snapshot["conversion_rate"] == 50.0
+        assert snapshot["avg_response_time"] == 3.0
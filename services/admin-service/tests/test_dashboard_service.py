@@ -0,0 +1,120 @@
+"""
+Dashboard statistics cache tests.
+
+Test Coverage:
+- Fresh values served without loading
+- Stale values served while one background refresh runs
+- Expired or missing values loaded inline, shared by concurrent callers
+- Failed loads and invalidation
+"""
+
+import asyncio
+
+import pytest
+
+from services import dashboard_service
+from services.dashboard_service import StaleWhileRevalidate
+
+
+class Loader:
+    """Loader returning 1, 2, ... and held at `gate` until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return self.calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the cache"""
+    now = [1000.0]
+    monkeypatch.setattr(dashboard_service.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def loader():
+    return Loader()
+
+
+@pytest.fixture
+def cache(loader):
+    return StaleWhileRevalidate(loader, ttl_seconds=30, max_stale_seconds=300)
+
+
+@pytest.mark.asyncio
+class TestStaleWhileRevalidate:
+    """Fresh, stale and expired reads"""
+
+    async def test_fresh_value_is_served_from_memory(self, cache, loader, clock):
+        assert await cache.get() == 1
+        clock[0] += 29
+
+        assert await cache.get() == 1
+        assert loader.calls == 1
+
+    async def test_stale_value_is_served_while_one_refresh_runs(self, cache, loader, clock):
+        await cache.get()
+        clock[0] += 60
+        loader.gate.clear()
+
+        values = await asyncio.gather(*[cache.get() for _ in range(5)])
+
+        assert values == [1] * 5
+        await asyncio.sleep(0)
+        assert loader.calls == 2
+
+        loader.gate.set()
+        await cache._refreshing
+        assert await cache.get() == 2
+        assert loader.calls == 2
+
+    async def test_expired_value_is_loaded_inline_once(self, cache, loader, clock):
+        await cache.get()
+        clock[0] += 301
+
+        values = await asyncio.gather(*[cache.get() for _ in range(5)])
+
+        assert values == [2] * 5
+        assert loader.calls == 2
+
+    async def test_cold_cache_shares_one_load(self, cache, loader):
+        values = await asyncio.gather(*[cache.get() for _ in range(5)])
+
+        assert values == [1] * 5
+        assert loader.calls == 1
+
+    async def test_failed_refresh_keeps_the_stale_value(self, cache, loader, clock):
+        await cache.get()
+        clock[0] += 60
+        loader.fail = True
+
+        assert await cache.get() == 1
+        with pytest.raises(RuntimeError):
+            await cache._refreshing
+
+        assert await cache.get() == 1
+
+    async def test_failed_inline_load_raises(self, cache, loader):
+        loader.fail = True
+
+        with pytest.raises(RuntimeError):
+            await cache.get()
+
+        loader.fail = False
+        assert await cache.get() == 2
+
+    async def test_invalidate_forces_an_inline_load(self, cache, loader):
+        await cache.get()
+        cache.invalidate()
+
+        assert await cache.get() == 2
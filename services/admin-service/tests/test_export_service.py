@@ -0,0 +1,291 @@
+"""
+Data export tests.
+
+Test Coverage:
+- build_export_query columns, PII opt-in, date range, filters and limit
+- CSV, JSON and Parquet writers
+- Export status visible only to the requesting admin
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from services.export_service import (
+    CsvExportWriter,
+    ExportError,
+    ExportService,
+    JsonExportWriter,
+    ParquetExportWriter,
+    PartBuffer,
+    build_export_query,
+)
+
+
+# The writers only use the mapping interface of asyncpg records
+RECORDS = [
+    {
+        "id": uuid.UUID("8a4c1a46-1b5e-4c57-9d38-2b3c1d6e0f11"),
+        "title": "שיפוץ מטבח",
+        "budget_min": Decimal("1500.50"),
+        "views_count": 7,
+        "created_at": datetime(2024, 3, 15, 9, 30),
+        "completed_at": None
+    },
+    {
+        "id": uuid.UUID("0f4b7e1c-2d3a-4b5c-8d9e-0a1b2c3d4e5f"),
+        "title": 'Plumbing, "urgent"',
+        "budget_min": None,
+        "views_count": 0,
+        "created_at": datetime(2024, 3, 16, 18, 0),
+        "completed_at": datetime(2024, 3, 20, 12, 0)
+    }
+]
+COLUMNS = list(RECORDS[0])
+
+
+class TestBuildExportQuery:
+    """Test the export SELECT builder"""
+
+    def test_columns_and_order(self):
+        query, args = build_export_query("users")
+
+        assert query == (
+            "SELECT id, role, status, created_at, updated_at, last_login "
+            "FROM users ORDER BY created_at"
+        )
+        assert args == []
+
+    def test_pii_columns_only_on_request(self):
+        query, _ = build_export_query("users", include_pii=True)
+
+        assert query.startswith("SELECT id, role, status, created_at, updated_at, last_login, name, phone, email ")
+
+    def test_date_range_is_half_open_in_naive_utc(self):
+        start = datetime(2024, 3, 1, 2, 0, tzinfo=timezone(timedelta(hours=2)))
+        end = datetime(2024, 4, 1)
+
+        query, args = build_export_query("leads", start_date=start, end_date=end)
+
+        assert "WHERE created_at >= $1 AND created_at < $2" in query
+        assert args == [datetime(2024, 3, 1, 0, 0), datetime(2024, 4, 1)]
+
+    def test_filters_are_parameters(self):
+        query, args = build_export_query(
+            "payments",
+            start_date=datetime(2024, 1, 1),
+            filters={"status": "completed", "type": "commission"},
+            limit=1000
+        )
+
+        assert query.endswith(
+            "WHERE created_at >= $1 AND status::text = $2 AND type::text = $3 "
+            "ORDER BY created_at LIMIT $4"
+        )
+        assert args == [datetime(2024, 1, 1), "completed", "commission", 1000]
+
+    def test_analytics_orders_by_day(self):
+        query, _ = build_export_query("analytics", filters={"category": "plumbing"})
+
+        assert "FROM analytics_daily_facts WHERE category::text = $1 ORDER BY day" in query
+
+    def test_unknown_entity_rejected(self):
+        with pytest.raises(ExportError):
+            build_export_query("admin_users")
+
+    def test_unknown_filter_rejected(self):
+        with pytest.raises(ExportError):
+            build_export_query("users", filters={"phone": "0501234567"})
+
+    def test_filter_values_never_reach_the_sql(self):
+        query, args = build_export_query("leads", filters={"category": "x'; DROP TABLE leads; --"})
+
+        assert "DROP" not in query
+        assert args == ["x'; DROP TABLE leads; --"]
+
+
+class TestPartBuffer:
+    """Test the upload part buffer"""
+
+    def test_take_drains_but_position_keeps_counting(self):
+        sink = PartBuffer()
+        sink.write(b"abc")
+        assert sink.take() == b"abc"
+
+        sink.write(b"de")
+        assert sink.size == 2
+        assert sink.tell() == 5
+
+
+class TestCsvExportWriter:
+    """Test CSV output"""
+
+    def test_bom_header_and_rows(self):
+        sink = PartBuffer()
+        writer = CsvExportWriter(COLUMNS, sink)
+        writer.write_rows(RECORDS[:1])
+        writer.write_rows(RECORDS[1:])
+        writer.close()
+
+        data = sink.take()
+        assert data.startswith("\ufeff".encode("utf-8"))
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+        assert rows[0] == COLUMNS
+        assert rows[1] == [
+            "8a4c1a46-1b5e-4c57-9d38-2b3c1d6e0f11", "שיפוץ מטבח", "1500.50", "7",
+            "2024-03-15 09:30:00", ""
+        ]
+        assert rows[2][1] == 'Plumbing, "urgent"'
+        assert rows[2][2] == ""
+
+    def test_empty_export_has_header_only(self):
+        sink = PartBuffer()
+        CsvExportWriter(COLUMNS, sink).close()
+
+        assert sink.take().decode("utf-8-sig").splitlines() == [",".join(COLUMNS)]
+
+
+class TestJsonExportWriter:
+    """Test JSON output"""
+
+    def test_array_of_objects(self):
+        sink = PartBuffer()
+        writer = JsonExportWriter(COLUMNS, sink)
+        writer.write_rows(RECORDS[:1])
+        writer.write_rows(RECORDS[1:])
+        writer.close()
+
+        data = sink.take().decode("utf-8")
+        assert "שיפוץ מטבח" in data
+        assert json.loads(data) == [
+            {
+                "id": "8a4c1a46-1b5e-4c57-9d38-2b3c1d6e0f11",
+                "title": "שיפוץ מטבח",
+                "budget_min": "1500.50",
+                "views_count": 7,
+                "created_at": "2024-03-15T09:30:00",
+                "completed_at": None
+            },
+            {
+                "id": "0f4b7e1c-2d3a-4b5c-8d9e-0a1b2c3d4e5f",
+                "title": 'Plumbing, "urgent"',
+                "budget_min": None,
+                "views_count": 0,
+                "created_at": "2024-03-16T18:00:00",
+                "completed_at": "2024-03-20T12:00:00"
+            }
+        ]
+
+    def test_empty_export_is_valid_json(self):
+        sink = PartBuffer()
+        JsonExportWriter(COLUMNS, sink).close()
+
+        assert json.loads(sink.take()) == []
+
+
+class TestParquetExportWriter:
+    """Test Parquet output"""
+
+    ATTRIBUTES = [
+        SimpleNamespace(name="id", type=SimpleNamespace(name="uuid")),
+        SimpleNamespace(name="title", type=SimpleNamespace(name="varchar")),
+        SimpleNamespace(name="budget_min", type=SimpleNamespace(name="numeric")),
+        SimpleNamespace(name="views_count", type=SimpleNamespace(name="int4")),
+        SimpleNamespace(name="created_at", type=SimpleNamespace(name="timestamp")),
+        SimpleNamespace(name="completed_at", type=SimpleNamespace(name="timestamp")),
+    ]
+
+    def test_typed_columns_round_trip(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        sink = PartBuffer()
+        writer = ParquetExportWriter(self.ATTRIBUTES, sink)
+        writer.write_rows(RECORDS[:1])
+        writer.write_rows(RECORDS[1:])
+        writer.close()
+
+        parquet_file = pq.ParquetFile(io.BytesIO(sink.take()))
+        assert parquet_file.metadata.num_row_groups == 2
+
+        table = parquet_file.read()
+        assert str(table.schema.field("id").type) == "string"
+        assert str(table.schema.field("views_count").type) == "int32"
+        assert table.to_pylist() == [
+            {
+                "id": "8a4c1a46-1b5e-4c57-9d38-2b3c1d6e0f11",
+                "title": "שיפוץ מטבח",
+                "budget_min": Decimal("1500.5000000000"),
+                "views_count": 7,
+                "created_at": datetime(2024, 3, 15, 9, 30),
+                "completed_at": None
+            },
+            {
+                "id": "0f4b7e1c-2d3a-4b5c-8d9e-0a1b2c3d4e5f",
+                "title": 'Plumbing, "urgent"',
+                "budget_min": None,
+                "views_count": 0,
+                "created_at": datetime(2024, 3, 16, 18, 0),
+                "completed_at": datetime(2024, 3, 20, 12, 0)
+            }
+        ]
+
+    def test_date_columns(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        sink = PartBuffer()
+        writer = ParquetExportWriter([SimpleNamespace(name="day", type=SimpleNamespace(name="date"))], sink)
+        writer.write_rows([{"day": date(2024, 3, 15)}])
+        writer.close()
+
+        assert pq.read_table(io.BytesIO(sink.take())).to_pylist() == [{"day": date(2024, 3, 15)}]
+
+
+@pytest.mark.asyncio
+class TestExportStatus:
+    """Test who can see an export"""
+
+    @pytest.fixture
+    def service(self):
+        service = ExportService()
+        service.db = AsyncMock()
+        service.db.get_export_job.return_value = {
+            "id": uuid.uuid4(),
+            "admin_id": uuid.UUID("11111111-1111-1111-1111-111111111111"),
+            "status": "completed",
+            "entity_type": "leads",
+            "format": "csv",
+            "s3_key": "exports/leads/job.csv",
+            "estimated_rows": 10,
+            "rows_exported": 10,
+            "bytes_uploaded": 2048,
+            "parts_uploaded": 1,
+            "created_at": datetime(2024, 3, 15),
+            "started_at": datetime(2024, 3, 15),
+            "completed_at": datetime(2024, 3, 15),
+            "error_message": None
+        }
+        service._client = Mock()
+        service._client.generate_presigned_url.return_value = "https://s3/exports/leads/job.csv?sig"
+        return service
+
+    async def test_requesting_admin_gets_download_link(self, service):
+        export = await service.get_export_status("job", "11111111-1111-1111-1111-111111111111")
+
+        assert export["file_url"] == "https://s3/exports/leads/job.csv?sig"
+        assert export["progress_percentage"] == 100.0
+
+    async def test_other_admin_sees_nothing(self, service):
+        export = await service.get_export_status("job", "22222222-2222-2222-2222-222222222222")
+
+        assert export is None
+        service._client.generate_presigned_url.assert_not_called()
+
+    async def test_missing_job(self, service):
+        service.db.get_export_job.return_value = None
+
+        assert await service.get_export_status("job", "11111111-1111-1111-1111-111111111111") is None
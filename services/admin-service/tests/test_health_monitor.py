@@ -0,0 +1,199 @@
+"""
+Service health monitor tests.
+
+Test Coverage:
+- Rolling window of probe results per service
+- Flap counting, window and lifetime uptime
+- Concurrent probe rounds with one service timing out
+- Background probe loop and snapshots
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+web = pytest.importorskip("aiohttp.web")
+
+from services.health_monitor import HealthMonitor, ServiceHealthHistory
+
+
+START = datetime(2024, 6, 1, 12, 0)
+
+
+def _result(status: str, minute: int, response_time_ms=20.0):
+    return {
+        "status": status,
+        "response_time_ms": response_time_ms,
+        "checked_at": START + timedelta(minutes=minute),
+    }
+
+
+class TestServiceHealthHistory:
+    """Window statistics of one service"""
+
+    def test_window_keeps_the_latest_samples(self):
+        history = ServiceHealthHistory(window_size=3, flap_threshold=4)
+        for minute, latency in enumerate([500.0, 10.0, 20.0, 30.0]):
+            history.record(_result("healthy", minute, latency))
+
+        window = history.summary()["window"]
+
+        assert window["checks"] == 3
+        assert window["max_response_time_ms"] == 30.0
+        assert window["avg_response_time_ms"] == 20.0
+        assert window["p95_response_time_ms"] == 30.0
+        assert history.summary()["total_checks"] == 4
+
+    def test_window_and_lifetime_uptime(self):
+        history = ServiceHealthHistory(window_size=4, flap_threshold=4)
+        statuses = ["error", "error", "healthy", "healthy", "timeout", "healthy"]
+        for minute, status in enumerate(statuses):
+            history.record(_result(status, minute))
+
+        summary = history.summary()
+
+        # Window: healthy, healthy, timeout, healthy
+        assert summary["window"]["uptime_percentage"] == 75.0
+        assert summary["uptime_percentage"] == 50.0
+
+    def test_flaps_are_status_changes_in_the_window(self):
+        history = ServiceHealthHistory(window_size=10, flap_threshold=3)
+        for minute, status in enumerate(["healthy", "error", "healthy", "healthy"]):
+            history.record(_result(status, minute))
+
+        assert history.summary()["window"]["flap_count"] == 2
+        assert history.summary()["window"]["flapping"] is False
+
+        history.record(_result("timeout", 4))
+
+        assert history.summary()["window"]["flap_count"] == 3
+        assert history.summary()["window"]["flapping"] is True
+
+    def test_failures_and_last_change(self):
+        history = ServiceHealthHistory(window_size=10, flap_threshold=4)
+        history.record(_result("healthy", 0))
+        history.record(_result("error", 1))
+        history.record({**_result("error", 2, None), "error": "refused"})
+
+        summary = history.summary()
+
+        assert summary["status"] == "error"
+        assert summary["consecutive_failures"] == 2
+        assert summary["last_status_change"] == (START + timedelta(minutes=1)).isoformat()
+        assert summary["error"] == "refused"
+        assert summary["window"]["avg_response_time_ms"] == 20.0
+
+        history.record(_result("healthy", 3))
+
+        assert history.summary()["consecutive_failures"] == 0
+
+    def test_no_samples(self):
+        summary = ServiceHealthHistory(window_size=10, flap_threshold=4).summary()
+
+        assert summary["status"] == "unknown"
+        assert summary["last_check"] is None
+        assert summary["uptime_percentage"] is None
+        assert summary["window"]["uptime_percentage"] is None
+
+
+@pytest_asyncio.fixture
+async def services():
+    """Local health endpoints: one fine, one slow, one failing"""
+    calls = []
+
+    async def ok(request):
+        calls.append("ok")
+        return web.json_response({"status": "healthy"})
+
+    async def slow(request):
+        calls.append("slow")
+        await asyncio.sleep(2)
+        return web.json_response({"status": "healthy"})
+
+    async def failing(request):
+        calls.append("failing")
+        return web.Response(status=503)
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/failing", failing)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    yield f"http://127.0.0.1:{port}", calls
+
+    await runner.cleanup()
+
+
+def _monitor(base_url: str, **kwargs) -> HealthMonitor:
+    return HealthMonitor(
+        targets=[
+            ("ok-service", f"{base_url}/ok"),
+            ("slow-service", f"{base_url}/slow"),
+            ("failing-service", f"{base_url}/failing"),
+        ],
+        timeout_seconds=0.3,
+        **kwargs
+    )
+
+
+@pytest.mark.asyncio
+class TestHealthMonitor:
+    """Concurrent probing and the background loop"""
+
+    async def test_round_is_bounded_by_the_timeout(self, services):
+        base_url, _ = services
+        monitor = _monitor(base_url)
+
+        started = time.perf_counter()
+        await monitor.probe_all()
+        elapsed = time.perf_counter() - started
+
+        snapshot = await monitor.get_snapshot()
+        assert elapsed < 1.0
+        assert snapshot["ok-service"]["status"] == "healthy"
+        assert snapshot["ok-service"]["details"] == {"status": "healthy"}
+        assert snapshot["slow-service"]["status"] == "timeout"
+        assert snapshot["slow-service"]["response_time_ms"] == 300
+        assert snapshot["failing-service"]["status"] == "unhealthy"
+        assert snapshot["failing-service"]["http_status"] == 503
+
+    async def test_unreachable_service_is_an_error(self):
+        monitor = HealthMonitor(targets=[("gone-service", "http://127.0.0.1:1/health")])
+
+        snapshot = await monitor.get_snapshot()
+
+        assert snapshot["gone-service"]["status"] == "error"
+        assert snapshot["gone-service"]["response_time_ms"] is None
+
+    async def test_snapshot_probes_only_before_the_first_round(self, services):
+        base_url, calls = services
+        monitor = _monitor(base_url)
+
+        await monitor.get_snapshot()
+        await monitor.get_snapshot()
+
+        assert sorted(calls) == ["failing", "ok", "slow"]
+
+    async def test_loop_probes_every_interval(self, services):
+        base_url, _ = services
+        monitor = _monitor(base_url, interval_seconds=0.05, window_size=2)
+
+        monitor.start()
+        await asyncio.sleep(1.2)
+        await monitor.stop()
+
+        ok = monitor.histories["ok-service"].summary()
+        assert ok["total_checks"] >= 2
+        assert ok["window"]["checks"] == 2
+        assert ok["window"]["uptime_percentage"] == 100.0
+        assert monitor.histories["slow-service"].summary()["consecutive_failures"] == ok["total_checks"]
+        assert monitor._task is None
@@ -0,0 +1,82 @@
+"""
+Request metrics aggregation tests.
+
+Test Coverage:
+- Reducing a /metrics scrape to service-wide totals
+- Counter deltas between scrapes and restart detection
+- Rates, latency percentiles and dependency time of a window
+"""
+
+import pytest
+
+from python_shared.monitoring import RequestMetrics
+from services.metrics_service import _request_stats, _summarize_metrics, _window_delta
+
+
+def _scrape(metrics: RequestMetrics) -> str:
+    return metrics.render().decode("utf-8")
+
+
+@pytest.fixture
+def metrics():
+    metrics = RequestMetrics("leads-service")
+    for _ in range(8):
+        metrics.observe("GET", "/leads/{lead_id}", 200, 0.04, {"db": 0.01, "redis": 0.002})
+    metrics.observe("POST", "/leads", 201, 0.3, {"db": 0.2})
+    metrics.observe("POST", "/leads", 503, 2.0)
+    return metrics
+
+
+class TestSummarizeMetrics:
+    """A scrape reduced to totals over routes and status codes."""
+
+    def test_totals_over_routes(self, metrics):
+        snapshot = _summarize_metrics(_scrape(metrics))
+
+        assert snapshot["requests"] == 10
+        assert snapshot["errors"] == 1
+        assert snapshot["duration_sum"] == pytest.approx(8 * 0.04 + 0.3 + 2.0)
+        assert snapshot["dependency_sum"]["db"] == pytest.approx(0.28)
+        assert snapshot["dependency_sum"]["redis"] == pytest.approx(0.016)
+        assert snapshot["buckets"][0.05] == 8
+        assert snapshot["buckets"][float("inf")] == 10
+        assert snapshot["started_at"] is not None
+
+    def test_request_stats_of_the_whole_lifetime(self, metrics):
+        snapshot = _summarize_metrics(_scrape(metrics))
+        stats = _request_stats(_window_delta(snapshot, None), snapshot["in_flight"])
+
+        assert stats["requests"] == 10
+        assert stats["error_rate_percentage"] == 10.0
+        assert stats["p50_response_time_ms"] == 40.6
+        assert stats["avg_db_time_ms"] == 28.0
+        assert stats["in_flight_requests"] == 0
+
+
+class TestWindowDelta:
+    """Counter deltas between a baseline and the current scrape."""
+
+    def test_delta_since_baseline(self, metrics):
+        baseline = _summarize_metrics(_scrape(metrics))
+        metrics.observe("GET", "/leads/{lead_id}", 500, 0.1)
+        current = _summarize_metrics(_scrape(metrics))
+
+        delta = _window_delta(current, baseline)
+
+        assert delta["requests"] == 1
+        assert delta["errors"] == 1
+        assert delta["buckets"][0.1] == 1
+        assert delta["buckets"][0.05] == 0
+
+    def test_restart_reports_counters_since_start(self, metrics):
+        baseline = _summarize_metrics(_scrape(metrics))
+
+        restarted = RequestMetrics("leads-service")
+        restarted.observe("GET", "/leads/{lead_id}", 200, 0.01)
+        current = _summarize_metrics(_scrape(restarted))
+        current["started_at"] = baseline["started_at"] + 1
+
+        delta = _window_delta(current, baseline)
+
+        assert delta["requests"] == 1
+        assert delta["errors"] == 0
@@ -1,11 +1,10 @@
 """Authentication API endpoints."""
 
 import sys
-import json
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
 from fastapi import APIRouter, HTTPException, status, Depends, Request
 from slowapi import Limiter
@@ -13,6 +12,7 @@ from slowapi.util import get_remote_address
 
 # Import shared libraries
 from python_shared.config.settings import get_settings
+from python_shared.auth import revoke_token as revoke_token_id
 
 # Import local modules
 from ..models.auth import (
@@ -29,6 +29,8 @@ from ..deps import (
     mask_contact
 )
 from ..services.otp_service import otp_service
+from ..services.user_store import resolve_login_user
+from ..services.token_store import get_token_store
 
 logger = logging.getLogger(__name__)
 
@@ -163,7 +165,7 @@ async def verify_otp(
             )
         
         # Create user session and tokens
-        user_id = await _get_or_create_user(request.contact, is_new_user)
+        user_id, is_new_user = await _get_or_create_user(request.contact)
         
         # Determine contact type
         contact_type = "email" if "@" in request.contact else "phone"
@@ -184,12 +186,9 @@ async def verify_otp(
             "jti": jti
         }
         
-        # Create tokens
+        # Create tokens; refresh token and session are stored in one round trip
         access_token = create_access_token(token_claims)
-        refresh_token = await _create_refresh_token(user_id, jti)
-        
-        # Store session info
-        await _store_user_session(user_id, jti, request.device_info)
+        refresh_token = await _issue_refresh_token(user_id, jti, token_claims, request.device_info)
         
         token_data = TokenData(
             access_token=access_token,
@@ -236,9 +235,18 @@ async def refresh_token(
     try:
         redis_client = await get_redis_client()
         
-        # Verify refresh token
-        refresh_data = await redis_client.get(f"refresh_token:{request.refresh_token}")
-        if not refresh_data:
+        # Consume the refresh token and store its successor atomically
+        new_jti = str(uuid.uuid4())
+        rotation = await get_token_store(redis_client).rotate(request.refresh_token, new_jti)
+        
+        if rotation.status == "reused":
+            return RefreshTokenResponse(
+                success=False,
+                message="Refresh token was already used; please log in again",
+                message_he="אסימון הרענון כבר נוצל; יש להתחבר מחדש",
+                token_data=None
+            )
+        if rotation.status != "ok":
             return RefreshTokenResponse(
                 success=False,
                 message="Invalid or expired refresh token",
@@ -246,22 +254,21 @@ async def refresh_token(
                 token_data=None
             )
         
-        refresh_info = json.loads(refresh_data)
+        refresh_info = rotation.refresh_data
         user_id = refresh_info["user_id"]
-        old_jti = refresh_info["jti"]
+        new_refresh_token = rotation.refresh_token
         
         # Create new token claims
         now = datetime.utcnow()
         exp = now + timedelta(minutes=settings.jwt_expire_minutes)
-        new_jti = str(uuid.uuid4())
         
-        # Get user info (simplified - in real implementation, get from database)
         contact = refresh_info.get("contact", "")
         contact_type = refresh_info.get("contact_type", "phone")
-        role = refresh_info.get("role", UserRole.CONSUMER.value)
+        role = refresh_info.get("role") or UserRole.CONSUMER.value
         
         token_claims = {
             "sub": user_id,
+            "user_id": user_id,
             "contact": contact,
             "contact_type": contact_type,
             "role": role,
@@ -270,15 +277,8 @@ async def refresh_token(
             "jti": new_jti
         }
         
-        # Create new tokens
+        # The old access token was revoked with the rotation
         access_token = create_access_token(token_claims)
-        new_refresh_token = await _create_refresh_token(user_id, new_jti)
-        
-        # Revoke old refresh token
-        await redis_client.delete(f"refresh_token:{request.refresh_token}")
-        
-        # Revoke old access token (add to blacklist)
-        await redis_client.setex(f"revoked_token:{old_jti}", 3600, "1")
         
         token_data = TokenData(
             access_token=access_token,
@@ -326,7 +326,7 @@ async def revoke_token(
             # Revoke all tokens for the user
             # In a real implementation, you would need to track all active sessions
             # For now, we'll revoke the current token
-            await redis_client.setex(f"revoked_token:{current_user.jti}", 3600, "1")
+            await revoke_token_id(redis_client, current_user.jti, 3600)
             revoked_count = 1
             
             # Also revoke refresh tokens (pattern matching)
@@ -339,7 +339,7 @@ async def revoke_token(
             # Revoke specific token
             try:
                 token_claims = verify_token(request.token)
-                await redis_client.setex(f"revoked_token:{token_claims.jti}", 3600, "1")
+                await revoke_token_id(redis_client, token_claims.jti, 3600)
                 revoked_count = 1
             except Exception:
                 return RevokeTokenResponse(
@@ -350,7 +350,7 @@ async def revoke_token(
                 )
         else:
             # Revoke current token
-            await redis_client.setex(f"revoked_token:{current_user.jti}", 3600, "1")
+            await revoke_token_id(redis_client, current_user.jti, 3600)
             revoked_count = 1
         
         return RevokeTokenResponse(
@@ -405,7 +405,7 @@ async def logout(
         redis_client = await get_redis_client()
         
         # Revoke current token
-        await redis_client.setex(f"revoked_token:{current_user.jti}", 3600, "1")
+        await revoke_token_id(redis_client, current_user.jti, 3600)
         
         return {
             "success": True,
@@ -422,114 +422,17 @@ async def logout(
 
 
 # Helper functions
-async def _get_or_create_user(contact: str, is_new_user: bool) -> str:
-    """Get existing user or create new user in database."""
-    from python_shared.database.connection import get_db_engine
-    from sqlalchemy import text
-
-    try:
-        engine = await get_db_engine()
-
-        # Determine contact type
-        contact_type = "email" if "@" in contact else "phone"
-
-        # Check if user exists
-        if contact_type == "email":
-            query = text("SELECT id FROM users WHERE email = :contact LIMIT 1")
-        else:
-            query = text("SELECT id FROM users WHERE phone = :contact LIMIT 1")
-
-        async with engine.begin() as conn:
-            result = await conn.execute(query, {"contact": contact})
-            existing_user = result.fetchone()
-
-            if existing_user:
-                user_id = str(existing_user[0])
-                logger.info(f"Existing user found: {user_id}")
-                return user_id
-
-            # Create new user if is_new_user or doesn't exist
-            if is_new_user:
-                insert_data = {
-                    "role": "customer",
-                    "status": "pending_verification"
-                }
-
-                if contact_type == "email":
-                    insert_data["email"] = contact
-                    insert_query = text("""
-                        INSERT INTO users (email, role, status)
-                        VALUES (:email, :role, :status)
-                        RETURNING id
-                    """)
-                else:
-                    insert_data["phone"] = contact
-                    insert_query = text("""
-                        INSERT INTO users (phone, role, status)
-                        VALUES (:phone, :role, :status)
-                        RETURNING id
-                    """)
-
-                result = await conn.execute(insert_query, insert_data)
-                new_user = result.fetchone()
-                user_id = str(new_user[0])
-
-                logger.info(f"New user created: {user_id} for contact: {contact}")
-                return user_id
-            else:
-                # Fallback - shouldn't happen
-                logger.warning(f"User not found and is_new_user is False for {contact}")
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found"
-                )
-
-    except Exception as e:
-        logger.error(f"Error in _get_or_create_user: {e}")
-        # Generate a UUID as fallback
-        import uuid
-        user_id = str(uuid.uuid4())
-        logger.warning(f"Fallback UUID generated: {user_id}")
-        return user_id
-
-
-async def _create_refresh_token(user_id: str, jti: str) -> str:
-    """Create and store refresh token."""
-    redis_client = await get_redis_client()
-    
-    refresh_token = str(uuid.uuid4())
-    refresh_data = {
-        "user_id": user_id,
-        "jti": jti,
-        "created_at": datetime.utcnow().isoformat(),
-        "expires_at": (datetime.utcnow() + timedelta(days=30)).isoformat()
-    }
-    
-    # Store refresh token (30 days expiry)
-    await redis_client.setex(
-        f"refresh_token:{refresh_token}",
-        30 * 24 * 60 * 60,  # 30 days
-        json.dumps(refresh_data)
-    )
-    
-    return refresh_token
-
-
-async def _store_user_session(user_id: str, jti: str, device_info: Dict[str, Any] = None):
-    """Store user session information."""
+async def _get_or_create_user(contact: str) -> Tuple[str, bool]:
+    """Get existing user or create new user in database; returns (user_id, created)."""
+    return await resolve_login_user(contact)
+
+
+async def _issue_refresh_token(
+    user_id: str,
+    jti: str,
+    token_claims: Dict[str, Any],
+    device_info: Dict[str, Any] = None
+) -> str:
+    """Create and store refresh token and session information."""
     redis_client = await get_redis_client()
-    
-    session_data = {
-        "user_id": user_id,
-        "jti": jti,
-        "created_at": datetime.utcnow().isoformat(),
-        "device_info": device_info or {},
-        "last_activity": datetime.utcnow().isoformat()
-    }
-    
-    # Store session info
-    await redis_client.setex(
-        f"session:{jti}",
-        settings.jwt_expire_minutes * 60,
-        json.dumps(session_data)
-    )
\ No newline at end of file
+    return await get_token_store(redis_client).issue(user_id, jti, token_claims, device_info)
@@ -14,6 +14,8 @@ from slowapi.util import get_remote_address
 
 # Import shared libraries
 from python_shared.config.settings import get_settings, Settings
+from python_shared.monitoring import instrument_redis
+from python_shared.ratelimit import RateLimitRule, get_rate_limiter
 
 # Import local models
 from .models.auth import TokenClaims, UserRole, ContactType
@@ -49,6 +51,7 @@ async def get_redis_client() -> redis.Redis:
             decode_responses=True,
             health_check_interval=30
         )
+        instrument_redis(_redis_client)
     
     return _redis_client
 
@@ -192,29 +195,8 @@ async def check_rate_limit(
     Returns:
         (allowed, current_count, remaining_time)
     """
-    try:
-        # Use Redis pipeline for atomic operations
-        pipe = redis_client.pipeline()
-        
-        # Increment counter
-        pipe.incr(key)
-        pipe.expire(key, window)
-        
-        results = await pipe.execute()
-        current_count = results[0]
-        
-        if current_count > limit:
-            # Get remaining time
-            ttl = await redis_client.ttl(key)
-            remaining_time = max(ttl, 0)
-            return False, current_count, remaining_time
-        
-        return True, current_count, 0
-        
-    except Exception as e:
-        logger.error(f"Rate limit check failed: {e}")
-        # Allow request if Redis fails
-        return True, 0, 0
+    result = await get_rate_limiter(redis_client).check([RateLimitRule(key, limit, window)])
+    return result.allowed, result.counts[0], result.retry_after
 
 
 # OTP rate limiting
@@ -222,21 +204,15 @@ async def check_otp_rate_limit(contact: str) -> tuple[bool, Optional[int]]:
     """Check OTP sending rate limit."""
     redis_client = await get_redis_client()
     
-    # Different limits for different time windows
-    limits = [
-        ("otp_1min", 1, 60),      # 1 per minute
-        ("otp_1hour", 5, 3600),   # 5 per hour
-        ("otp_24hour", 10, 86400) # 10 per day
-    ]
+    # Different limits for different time windows, checked in one round trip
+    result = await get_rate_limiter(redis_client).check([
+        RateLimitRule(f"otp_1min:{contact}", 1, 60),       # 1 per minute
+        RateLimitRule(f"otp_1hour:{contact}", 5, 3600),    # 5 per hour
+        RateLimitRule(f"otp_24hour:{contact}", 10, 86400)  # 10 per day
+    ])
     
-    for limit_type, limit_count, window in limits:
-        key = f"{limit_type}:{contact}"
-        allowed, current, remaining_time = await check_rate_limit(
-            redis_client, key, limit_count, window
-        )
-        
-        if not allowed:
-            return False, remaining_time
+    if not result.allowed:
+        return False, result.retry_after
     
     return True, None
 
@@ -247,19 +223,13 @@ async def check_verification_rate_limit(contact: str) -> tuple[bool, Optional[in
     redis_client = await get_redis_client()
     
     # More permissive limits for verification
-    limits = [
-        ("verify_1min", 5, 60),     # 5 per minute
-        ("verify_1hour", 20, 3600), # 20 per hour
-    ]
+    result = await get_rate_limiter(redis_client).check([
+        RateLimitRule(f"verify_1min:{contact}", 5, 60),     # 5 per minute
+        RateLimitRule(f"verify_1hour:{contact}", 20, 3600)  # 20 per hour
+    ])
     
-    for limit_type, limit_count, window in limits:
-        key = f"{limit_type}:{contact}"
-        allowed, current, remaining_time = await check_rate_limit(
-            redis_client, key, limit_count, window
-        )
-        
-        if not allowed:
-            return False, remaining_time
+    if not result.allowed:
+        return False, result.retry_after
     
     return True, None
 
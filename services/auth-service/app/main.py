@@ -17,10 +17,12 @@ from slowapi.middleware import SlowAPIMiddleware
 
 # Import shared libraries
 from python_shared.config.settings import get_settings
+from python_shared.monitoring import setup_metrics
 
 # Import local modules
 from .api.auth import router as auth_router
 from .deps import get_redis_client, get_limiter
+from .services.otp_delivery import get_otp_delivery_worker
 
 # Configure logging
 logging.basicConfig(
@@ -54,10 +56,15 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to Redis: {e}")
         raise
     
+    # Start OTP delivery worker
+    get_otp_delivery_worker().start()
+    
     yield
     
     # Shutdown
     logger.info("Auth Service shutting down...")
+    await get_otp_delivery_worker().stop()
+    
     try:
         redis_client = await get_redis_client()
         await redis_client.close()
@@ -91,6 +98,9 @@ app.add_middleware(
     allowed_hosts=["*"] if settings.debug else ["*.ofair.co.il", "localhost"]
 )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "auth-service")
+
 # Rate limiting
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -0,0 +1,423 @@
+"""OTP delivery worker for Auth Service.
+
+`/send-otp` only persists the OTP and queues it here; provider calls happen
+in the background so their latency never reaches the API response.
+
+The worker keeps one HTTP/2 client for the SMS and WhatsApp providers and a
+small pool of logged-in SMTP connections, so a delivery costs one request
+instead of a TCP/TLS handshake (and a STARTTLS + LOGIN for email) each time.
+Deliveries are collected for a short window; SMS deliveries with identical
+text go to 019 as a single request with several `<destinations>`.
+"""
+
+import asyncio
+import logging
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, NamedTuple, Optional, Set
+from xml.sax.saxutils import escape
+
+import aiosmtplib
+import httpx
+
+# Import shared libraries
+from python_shared.config.settings import get_settings
+
+# Import local models
+from ..models.auth import ContactType
+from ..deps import mask_contact
+
+logger = logging.getLogger(__name__)
+
+SMS019_URL = "https://019sms.co.il/api"
+
+OTP_MESSAGES = {
+    'he': "הקוד שלך לכניסה ל-אפליקציית עופר הוא: {otp}\n\n@OFAIR#",
+    'en': "Your OFAIR app login code is: {otp}\n\n@OFAIR#",
+    'ar': "رمز دخولك لتطبيق أوفير هو: {otp}\n\n@OFAIR#"
+}
+
+EMAIL_SUBJECTS = {
+    'he': "קוד האימות שלך באופייר",
+    'en': "Your OFAIR Verification Code",
+    'ar': "رمز التحقق الخاص بك في أوفير"
+}
+
+EMAIL_TEMPLATES = {
+    'he': """
+                <div dir="rtl" style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                    <h2 style="color: #2E86AB;">קוד האימות שלך באופייר</h2>
+                    <p>שלום,</p>
+                    <p>קוד האימות שלך הוא:</p>
+                    <div style="font-size: 32px; font-weight: bold; color: #2E86AB; text-align: center; padding: 20px; background: #f5f5f5; border-radius: 8px; margin: 20px 0;">
+                        {otp}
+                    </div>
+                    <p>קוד זה תקף ל-{expiry_minutes} דקות בלבד.</p>
+                    <p>אם לא ביקשת קוד זה, אנא התעלם ממייל זה.</p>
+                    <hr style="margin: 30px 0;">
+                    <p style="color: #666; font-size: 12px;">
+                        מייל זה נשלח אוטומטית, אנא אל תשיב עליו.
+                    </p>
+                </div>
+                """,
+    'en': """
+                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                    <h2 style="color: #2E86AB;">Your OFAIR Verification Code</h2>
+                    <p>Hello,</p>
+                    <p>Your verification code is:</p>
+                    <div style="font-size: 32px; font-weight: bold; color: #2E86AB; text-align: center; padding: 20px; background: #f5f5f5; border-radius: 8px; margin: 20px 0;">
+                        {otp}
+                    </div>
+                    <p>This code is valid for {expiry_minutes} minutes only.</p>
+                    <p>If you didn't request this code, please ignore this email.</p>
+                    <hr style="margin: 30px 0;">
+                    <p style="color: #666; font-size: 12px;">
+                        This email was sent automatically, please do not reply.
+                    </p>
+                </div>
+                """
+}
+
+
+class OTPDelivery(NamedTuple):
+    contact: str
+    contact_type: ContactType
+    otp: str
+    language: str
+    expiry_minutes: int
+
+
+def format_019_phone(phone: str) -> str:
+    """Format an Israeli number the way 019 expects it (05xxxxxxxx)."""
+    if phone.startswith('+972'):
+        return '0' + phone[4:]  # +972545306380 → 0545306380
+    if phone.startswith('972'):
+        return '0' + phone[3:]  # 972545306380 → 0545306380
+    if phone.startswith('5'):
+        return '0' + phone  # 545306380 → 0545306380
+    return phone
+
+
+def otp_message(otp: str, language: str) -> str:
+    return OTP_MESSAGES.get(language, OTP_MESSAGES['he']).format(otp=otp)
+
+
+class SMTPPool:
+    """Logged-in SMTP connections reused across emails."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int = 2,
+        max_idle_seconds: float = 60.0
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_idle_seconds = max_idle_seconds
+        self._idle: List[tuple] = []  # (returned_at, connection)
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        use_tls = self.port == 465
+        connection = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=use_tls,
+            start_tls=not use_tls,
+            timeout=30
+        )
+        await connection.connect()
+        await connection.login(self.username, self.password)
+        return connection
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            returned_at, connection = self._idle.pop()
+            # Servers drop idle sessions; don't wait for a failed send to notice
+            if connection.is_connected and time.monotonic() - returned_at < self.max_idle_seconds:
+                return connection
+            await self._discard(connection)
+        return await self._connect()
+
+    async def _discard(self, connection: aiosmtplib.SMTP):
+        try:
+            if connection.is_connected:
+                await connection.quit()
+        except Exception:
+            connection.close()
+
+    async def send(self, message: MIMEMultipart):
+        async with self._slots:
+            connection = await self._acquire()
+            try:
+                try:
+                    await connection.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The pooled session went away between sends; retry once on a fresh one
+                    connection.close()
+                    connection = await self._connect()
+                    await connection.send_message(message)
+            except Exception:
+                await self._discard(connection)
+                raise
+            self._idle.append((time.monotonic(), connection))
+
+    async def close(self):
+        while self._idle:
+            _, connection = self._idle.pop()
+            await self._discard(connection)
+
+
+class OTPDeliveryWorker:
+    """Background sender for queued OTPs."""
+
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        batch_window_seconds: float = 0.05,
+        max_batch_size: int = 100,
+        max_concurrency: int = 20
+    ):
+        self.settings = get_settings()
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max_batch_size
+        self._queue: "asyncio.Queue[OTPDelivery]" = asyncio.Queue(maxsize=max_queue_size)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Set[asyncio.Task] = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._smtp: Optional[SMTPPool] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._http
+
+    @property
+    def smtp(self) -> SMTPPool:
+        if self._smtp is None:
+            self._smtp = SMTPPool(
+                self.settings.smtp_host,
+                self.settings.smtp_port,
+                self.settings.smtp_user,
+                self.settings.smtp_password
+            )
+        return self._smtp
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Send what is still queued, then close provider connections."""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            self._dispatch(remaining)
+
+        if self._in_flight:
+            _, pending = await asyncio.wait(self._in_flight, timeout=timeout)
+            if pending:
+                logger.warning(f"Dropping {len(pending)} OTP deliveries still in flight at shutdown")
+                for task in pending:
+                    task.cancel()
+
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._smtp is not None:
+            await self._smtp.close()
+            self._smtp = None
+
+    def enqueue(self, delivery: OTPDelivery) -> bool:
+        """Queue an OTP for delivery; False if the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(delivery)
+            return True
+        except asyncio.QueueFull:
+            logger.error("OTP delivery queue is full")
+            return False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window_seconds
+            try:
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            finally:
+                # stop() cancels the runner mid-window; what was pulled is still sent
+                self._dispatch(batch)
+
+    def _dispatch(self, batch: List[OTPDelivery]):
+        sms_groups: Dict[str, List[OTPDelivery]] = {}
+        for delivery in batch:
+            if delivery.contact_type == ContactType.EMAIL:
+                self._spawn(self._deliver_email(delivery))
+            else:
+                message = otp_message(delivery.otp, delivery.language)
+                sms_groups.setdefault(message, []).append(delivery)
+
+        for message, deliveries in sms_groups.items():
+            self._spawn(self._deliver_sms(message, deliveries))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(self._limited(coro))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _limited(self, coro):
+        async with self._slots:
+            try:
+                await coro
+            except Exception as e:
+                logger.error(f"OTP delivery failed: {e}")
+
+    async def _deliver_sms(self, message: str, deliveries: List[OTPDelivery]):
+        if await self.send_019_sms([delivery.contact for delivery in deliveries], message):
+            return
+
+        for delivery in deliveries:
+            if await self.send_whatsapp(delivery.contact, message):
+                continue
+            # Fallback - log the OTP (development only)
+            if self.settings.environment == "development":
+                logger.info(f"SMS OTP for {delivery.contact}: {delivery.otp}")
+            else:
+                logger.error(f"SMS OTP delivery failed for {mask_contact(delivery.contact, delivery.contact_type)}")
+
+    async def send_019_sms(self, phones: List[str], message: str) -> bool:
+        """Send one message to one or more phones in a single 019 request."""
+        if not all([self.settings.sms019_username, self.settings.sms019_password, self.settings.sms019_sender_number]):
+            logger.debug("019 SMS credentials not configured")
+            return False
+
+        destinations = "\n".join(
+            f"        <phone>{escape(format_019_phone(phone))}</phone>" for phone in phones
+        )
+        xml_payload = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sms>
+    <user>
+        <username>{escape(self.settings.sms019_username)}</username>
+        <password>{escape(self.settings.sms019_password)}</password>
+    </user>
+    <source>{escape(self.settings.sms019_sender_number)}</source>
+    <destinations>
+{destinations}
+    </destinations>
+    <message>{escape(message)}</message>
+</sms>"""
+
+        try:
+            response = await self.http.post(
+                SMS019_URL,
+                content=xml_payload.encode("utf-8"),
+                headers={"Content-Type": "application/xml; charset=UTF-8"}
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"019 SMS request failed: {e}")
+            return False
+
+        response_text = response.text.lower()
+        if response.status_code == 200 and (
+            '<status>0</status>' in response_text
+            or '<status>1</status>' in response_text
+            or 'sms will be sent' in response_text
+        ):
+            logger.info(f"019 SMS sent to {len(phones)} recipient(s)")
+            return True
+
+        logger.error(f"019 SMS API error: {response.status_code} - {response.text[:200]}")
+        return False
+
+    async def send_whatsapp(self, phone: str, message: str) -> bool:
+        """Send a message via WhatsApp using GreenAPI."""
+        if not self.settings.greenapi_id_instance or not self.settings.greenapi_api_token:
+            return False
+
+        url = f"https://api.green-api.com/waInstance{self.settings.greenapi_id_instance}/sendMessage/{self.settings.greenapi_api_token}"
+        payload = {
+            "chatId": phone.replace('+', '') + '@c.us',
+            "message": message
+        }
+
+        try:
+            response = await self.http.post(url, json=payload)
+        except httpx.HTTPError as e:
+            logger.error(f"WhatsApp request failed: {e}")
+            return False
+
+        if response.status_code == 200 and response.json().get('idMessage'):
+            logger.info(f"WhatsApp OTP sent to {mask_contact(phone, ContactType.PHONE)}")
+            return True
+
+        logger.error(f"WhatsApp API error: {response.status_code}")
+        return False
+
+    async def _deliver_email(self, delivery: OTPDelivery):
+        if not all([
+            self.settings.smtp_host,
+            self.settings.smtp_user,
+            self.settings.smtp_password
+        ]):
+            # Development fallback
+            if self.settings.environment == "development":
+                logger.info(f"Email OTP for {delivery.contact}: {delivery.otp}")
+            else:
+                logger.error("Email OTP delivery failed: SMTP is not configured")
+            return
+
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = EMAIL_SUBJECTS.get(delivery.language, EMAIL_SUBJECTS['he'])
+        msg['From'] = self.settings.smtp_user
+        msg['To'] = delivery.contact
+        template = EMAIL_TEMPLATES.get(delivery.language, EMAIL_TEMPLATES['he'])
+        msg.attach(MIMEText(
+            template.format(otp=delivery.otp, expiry_minutes=delivery.expiry_minutes),
+            'html',
+            'utf-8'
+        ))
+
+        await self.smtp.send(msg)
+        logger.info(f"Email OTP sent to {mask_contact(delivery.contact, delivery.contact_type)}")
+
+
+_delivery_worker: Optional[OTPDeliveryWorker] = None
+
+
+def get_otp_delivery_worker() -> OTPDeliveryWorker:
+    """Get the process-wide OTP delivery worker."""
+    global _delivery_worker
+
+    if _delivery_worker is None:
+        _delivery_worker = OTPDeliveryWorker()
+
+    return _delivery_worker
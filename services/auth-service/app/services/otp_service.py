@@ -1,18 +1,19 @@
-"""OTP Service for sending and verifying OTPs."""
+"""OTP Service for sending and verifying OTPs.
+
+Each OTP is a Redis hash at ``otp:<contact>`` that expires natively at its
+``expires_at``, so expired codes need no cleanup. Verification, including
+the attempt counter (HINCRBY on the same hash), is one Lua script call.
+``otp:expiry`` indexes live OTPs by expiry time for housekeeping that would
+otherwise have to scan the keyspace.
+"""
 
 import sys
-import json
 import secrets
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Tuple
-import asyncio
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
 
 import redis.asyncio as redis
-import httpx
 
 # Import shared libraries
 from python_shared.config.settings import get_settings, Settings
@@ -20,9 +21,49 @@ from python_shared.config.settings import get_settings, Settings
 # Import local models
 from ..models.auth import ContactType, OTPRecord
 from ..deps import get_redis_client
+from .otp_delivery import OTPDelivery, get_otp_delivery_worker
 
 logger = logging.getLogger(__name__)
 
+OTP_EXPIRY_INDEX = "otp:expiry"
+NEW_USER_MARKER_TTL = 86400 * 30  # 30 days
+
+# KEYS: OTP hash, expiry index, new-user marker
+# ARGV: submitted code, contact, new-user marker ttl
+# Returns {"ok", is_new_user} | {"invalid", remaining} | {"exhausted"} | {"not_found"}
+VERIFY_OTP_SCRIPT = """
+local function finish()
+    redis.call('DEL', KEYS[1])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+end
+
+if redis.call('TYPE', KEYS[1]).ok ~= 'hash' then
+    -- Missing, expired, or a record written in the old JSON format
+    redis.call('DEL', KEYS[1])
+    return {'not_found'}
+end
+
+local record = redis.call('HMGET', KEYS[1], 'otp', 'attempts', 'max_attempts')
+local max_attempts = tonumber(record[3])
+if tonumber(record[2]) >= max_attempts then
+    finish()
+    return {'exhausted'}
+end
+
+if record[1] == ARGV[1] then
+    finish()
+    local is_new = redis.call('SET', KEYS[3], '1', 'EX', ARGV[3], 'NX')
+    return {'ok', is_new and 1 or 0}
+end
+
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= max_attempts then
+    finish()
+    return {'exhausted'}
+end
+return {'invalid', max_attempts - attempts}
+"""
+
 
 class OTPService:
     """Service for handling OTP operations."""
@@ -32,6 +73,7 @@ class OTPService:
         self.otp_length = 6
         self.otp_expiry_minutes = 10
         self.max_attempts = 3
+        self._verify_script = None
     
     def generate_otp(self) -> str:
         """Generate a secure OTP."""
@@ -54,33 +96,40 @@ class OTPService:
             otp = self.generate_otp()
             
             # Create OTP record
-            expires_at = datetime.utcnow() + timedelta(minutes=self.otp_expiry_minutes)
+            created_at = datetime.utcnow()
+            expires_at = created_at + timedelta(minutes=self.otp_expiry_minutes)
             otp_record = OTPRecord(
                 contact=contact,
                 contact_type=contact_type,
                 otp=otp,
-                created_at=datetime.utcnow(),
+                max_attempts=self.max_attempts,
+                created_at=created_at,
                 expires_at=expires_at,
                 language=language
             )
             
-            # Store OTP in Redis
+            # Store OTP in Redis; the key expires with the code
             redis_client = await get_redis_client()
             key = f"otp:{contact}"
+            expires_at_ts = expires_at.replace(tzinfo=timezone.utc).timestamp()
             
-            await redis_client.setex(
-                key,
-                self.otp_expiry_minutes * 60,
-                json.dumps(otp_record.dict(), default=str)
-            )
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.hset(key, mapping=self._record_mapping(otp_record))
+            pipe.expireat(key, int(expires_at_ts))
+            pipe.zadd(OTP_EXPIRY_INDEX, {contact: expires_at_ts})
+            await pipe.execute()
             
-            # Send OTP based on contact type
-            if contact_type == ContactType.EMAIL:
-                success = await self._send_email_otp(contact, otp, language)
-            else:
-                success = await self._send_sms_otp(contact, otp, language)
+            # Delivery happens in the background; the OTP is already usable
+            queued = get_otp_delivery_worker().enqueue(OTPDelivery(
+                contact=contact,
+                contact_type=contact_type,
+                otp=otp,
+                language=language,
+                expiry_minutes=self.otp_expiry_minutes
+            ))
             
-            if success:
+            if queued:
                 return True, "OTP sent successfully", "קוד אימות נשלח בהצלחה"
             else:
                 return False, "Failed to send OTP", "שליחת קוד האימות נכשלה"
@@ -98,332 +147,79 @@ class OTPService:
         """
         try:
             redis_client = await get_redis_client()
-            key = f"otp:{contact}"
-            
-            # Get OTP record
-            otp_data = await redis_client.get(key)
-            if not otp_data:
-                return False, "OTP expired or not found", "קוד האימות פג תוקף או לא נמצא", None
             
-            otp_record_dict = json.loads(otp_data)
-            otp_record = OTPRecord(**otp_record_dict)
-            
-            # Check if OTP is expired
-            if datetime.utcnow() > otp_record.expires_at:
-                await redis_client.delete(key)
-                return False, "OTP expired", "קוד האימות פג תוקף", None
-            
-            # Check attempts
-            if otp_record.attempts >= otp_record.max_attempts:
-                await redis_client.delete(key)
-                return False, "Maximum attempts exceeded", "חריגה ממספר הניסיונות המותר", None
-            
-            # Verify OTP
-            if otp_record.otp != otp:
-                # Increment attempts
-                otp_record.attempts += 1
-                await redis_client.setex(
-                    key,
-                    int((otp_record.expires_at - datetime.utcnow()).total_seconds()),
-                    json.dumps(otp_record.dict(), default=str)
+            result = await self._get_verify_script(redis_client)(
+                keys=[f"otp:{contact}", OTP_EXPIRY_INDEX, f"user_exists:{contact}"],
+                args=[otp, contact, NEW_USER_MARKER_TTL]
+            )
+            status = result[0]
+            
+            if status == "ok":
+                is_new_user = bool(int(result[1]))
+                return True, "OTP verified successfully", "קוד האימות אומת בהצלחה", is_new_user
+            
+            if status == "invalid":
+                remaining_attempts = int(result[1])
+                return (
+                    False,
+                    f"Invalid OTP. {remaining_attempts} attempts remaining",
+                    f"קוד אימות שגוי. נותרו {remaining_attempts} ניסיונות",
+                    None
                 )
-                
-                remaining_attempts = otp_record.max_attempts - otp_record.attempts
-                if remaining_attempts > 0:
-                    return (
-                        False,
-                        f"Invalid OTP. {remaining_attempts} attempts remaining",
-                        f"קוד אימות שגוי. נותרו {remaining_attempts} ניסיונות",
-                        None
-                    )
-                else:
-                    await redis_client.delete(key)
-                    return False, "Maximum attempts exceeded", "חריגה ממספר הניסיונות המותר", None
-            
-            # OTP is valid - delete it
-            await redis_client.delete(key)
             
-            # Check if user exists (simplified - in real implementation, check database)
-            is_new_user = await self._is_new_user(contact)
+            if status == "exhausted":
+                return False, "Maximum attempts exceeded", "חריגה ממספר הניסיונות המותר", None
             
-            return True, "OTP verified successfully", "קוד האימות אומת בהצלחה", is_new_user
+            return False, "OTP expired or not found", "קוד האימות פג תוקף או לא נמצא", None
             
         except Exception as e:
             logger.error(f"Error verifying OTP for {contact}: {e}")
             return False, "OTP verification failed", "אימות הקוד נכשל", None
     
-    async def _send_sms_otp(self, phone: str, otp: str, language: str) -> bool:
-        """Send OTP via SMS using 019 SMS service."""
-        try:
-            # Try 019 SMS (Primary and only SMS provider)
-            if await self._send_019_sms(phone, otp, language):
-                return True
-
-            # Fallback - log the OTP (development only)
-            if self.settings.environment == "development":
-                logger.info(f"SMS OTP for {phone}: {otp}")
-                return True
-
-            return False
-
-        except Exception as e:
-            logger.error(f"Error sending SMS OTP: {e}")
-            return False
-
-    async def _send_019_sms(self, phone: str, otp: str, language: str) -> bool:
-        """Send OTP via 019 SMS service using correct API format."""
-        if not all([self.settings.sms019_username, self.settings.sms019_password, self.settings.sms019_sender_number]):
-            logger.debug("019 SMS credentials not configured")
-            return False
-
-        try:
-            # Format phone number for Israeli numbers (05xxxxxxx or 5xxxxxxx)
-            if phone.startswith('+972'):
-                formatted_phone = '0' + phone[4:]  # +972545306380 → 0545306380
-            elif phone.startswith('972'):
-                formatted_phone = '0' + phone[3:]  # 972545306380 → 0545306380
-            elif phone.startswith('0'):
-                formatted_phone = phone  # 0545306380 → 0545306380
-            elif phone.startswith('5'):
-                formatted_phone = '0' + phone  # 545306380 → 0545306380
-            else:
-                formatted_phone = phone
-
-            # Message templates
-            messages = {
-                'he': f"הקוד שלך לכניסה ל-אפליקציית עופר הוא: {otp}\n\n@OFAIR#",
-                'en': f"Your OFAIR app login code is: {otp}\n\n@OFAIR#",
-                'ar': f"رمز دخولك لتطبيق أوفير هو: {otp}\n\n@OFAIR#"
-            }
-
-            message = messages.get(language, messages['he'])
-
-            # 019 SMS API endpoint
-            url = "https://019sms.co.il/api"
-
-            # Prepare XML payload according to 019 SMS API specification
-            xml_payload = f"""<?xml version="1.0" encoding="UTF-8"?>
-<sms>
-    <user>
-        <username>{self.settings.sms019_username}</username>
-        <password>{self.settings.sms019_password}</password>
-    </user>
-    <source>{self.settings.sms019_sender_number}</source>
-    <destinations>
-        <phone>{formatted_phone}</phone>
-    </destinations>
-    <message>{message}</message>
-</sms>"""
-
-            logger.info(f"019 SMS Request - URL: {url}")
-            logger.info(f"019 SMS Request - Phone: {phone} → {formatted_phone}")
-            logger.info(f"019 SMS Request - Username: {self.settings.sms019_username}")
-            logger.info(f"019 SMS Request - Source: {self.settings.sms019_sender_number}")
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Send XML request with authentication
-                headers = {"Content-Type": "application/xml; charset=UTF-8"}
-                response = await client.post(url, data=xml_payload, headers=headers)
-
-                logger.info(f"019 SMS API Response - Status: {response.status_code}")
-                logger.info(f"019 SMS API Response Body: {response.text}")
-
-                if response.status_code == 200:
-                    try:
-                        # Parse XML response
-                        response_text = response.text.lower()
-
-                        # Check for success indicators in XML response
-                        if '<status>0</status>' in response_text or 'sms will be sent' in response_text:
-                            logger.info(f"019 SMS sent successfully to {phone}")
-                            return True
-                        elif '<status>1</status>' in response_text:
-                            logger.info(f"019 SMS sent successfully to {phone} (status 1)")
-                            return True
-                        else:
-                            logger.error(f"019 SMS API error: {response.text}")
-                            return False
-
-                    except Exception as e:
-                        logger.error(f"Failed to parse 019 SMS response: {e}")
-                        return False
-                else:
-                    logger.error(f"019 SMS API request failed: {response.status_code} - {response.text}")
-                    return False
-
-        except Exception as e:
-            logger.error(f"019 SMS sending failed: {e}")
-            return False
-
-    async def _send_whatsapp_otp(self, phone: str, otp: str, language: str) -> bool:
-        """Send OTP via WhatsApp using GreenAPI."""
-        if not self.settings.greenapi_id_instance or not self.settings.greenapi_api_token:
-            return False
-        
-        try:
-            # Format phone number for WhatsApp (remove + and add @c.us)
-            whatsapp_number = phone.replace('+', '') + '@c.us'
-            
-            # Message templates
-            messages = {
-                'he': f"הקוד שלך לכניסה ל-אפליקציית עופר הוא: {otp}\n\n@OFAIR#",
-                'en': f"Your OFAIR app login code is: {otp}\n\n@OFAIR#",
-                'ar': f"رمز دخولك لتطبيق أوفير هو: {otp}\n\n@OFAIR#"
-            }
-            
-            message = messages.get(language, messages['he'])
-            
-            url = f"https://api.green-api.com/waInstance{self.settings.greenapi_id_instance}/sendMessage/{self.settings.greenapi_api_token}"
-            
-            payload = {
-                "chatId": whatsapp_number,
-                "message": message
-            }
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('idMessage'):
-                        logger.info(f"WhatsApp OTP sent successfully to {phone}")
-                        return True
-                    else:
-                        logger.error(f"WhatsApp API error: {result}")
-                        return False
-                else:
-                    logger.error(f"WhatsApp API request failed: {response.status_code}")
-                    return False
-                    
-        except Exception as e:
-            logger.error(f"WhatsApp OTP sending failed: {e}")
-            return False
+    def _get_verify_script(self, redis_client: redis.Redis):
+        """Verification script, registered once per Redis client."""
+        if self._verify_script is None or self._verify_script.registered_client is not redis_client:
+            self._verify_script = redis_client.register_script(VERIFY_OTP_SCRIPT)
+        return self._verify_script
     
+    @staticmethod
+    def _record_mapping(otp_record: OTPRecord) -> Dict[str, str]:
+        """OTP record as flat hash fields."""
+        return {
+            "contact": otp_record.contact,
+            "contact_type": otp_record.contact_type.value,
+            "otp": otp_record.otp,
+            "attempts": str(otp_record.attempts),
+            "max_attempts": str(otp_record.max_attempts),
+            "created_at": otp_record.created_at.isoformat(),
+            "expires_at": otp_record.expires_at.isoformat(),
+            "language": otp_record.language
+        }
     
-    async def _send_email_otp(self, email: str, otp: str, language: str) -> bool:
-        """Send OTP via email."""
-        if not all([
-            self.settings.smtp_host,
-            self.settings.smtp_user,
-            self.settings.smtp_password
-        ]):
-            # Development fallback
-            if self.settings.environment == "development":
-                logger.info(f"Email OTP for {email}: {otp}")
-                return True
-            return False
-        
-        try:
-            # Email templates
-            subjects = {
-                'he': "קוד האימות שלך באופייר",
-                'en': "Your OFAIR Verification Code",
-                'ar': "رمز التحقق الخاص بك في أوفير"
-            }
-            
-            html_templates = {
-                'he': f"""
-                <div dir="rtl" style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <h2 style="color: #2E86AB;">קוד האימות שלך באופייר</h2>
-                    <p>שלום,</p>
-                    <p>קוד האימות שלך הוא:</p>
-                    <div style="font-size: 32px; font-weight: bold; color: #2E86AB; text-align: center; padding: 20px; background: #f5f5f5; border-radius: 8px; margin: 20px 0;">
-                        {otp}
-                    </div>
-                    <p>קוד זה תקף ל-{self.otp_expiry_minutes} דקות בלבד.</p>
-                    <p>אם לא ביקשת קוד זה, אנא התעלם ממייל זה.</p>
-                    <hr style="margin: 30px 0;">
-                    <p style="color: #666; font-size: 12px;">
-                        מייל זה נשלח אוטומטית, אנא אל תשיב עליו.
-                    </p>
-                </div>
-                """,
-                'en': f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <h2 style="color: #2E86AB;">Your OFAIR Verification Code</h2>
-                    <p>Hello,</p>
-                    <p>Your verification code is:</p>
-                    <div style="font-size: 32px; font-weight: bold; color: #2E86AB; text-align: center; padding: 20px; background: #f5f5f5; border-radius: 8px; margin: 20px 0;">
-                        {otp}
-                    </div>
-                    <p>This code is valid for {self.otp_expiry_minutes} minutes only.</p>
-                    <p>If you didn't request this code, please ignore this email.</p>
-                    <hr style="margin: 30px 0;">
-                    <p style="color: #666; font-size: 12px;">
-                        This email was sent automatically, please do not reply.
-                    </p>
-                </div>
-                """
-            }
-            
-            subject = subjects.get(language, subjects['he'])
-            html_content = html_templates.get(language, html_templates['he'])
-            
-            # Run email sending in thread pool
-            def send_email():
-                msg = MIMEMultipart('alternative')
-                msg['Subject'] = subject
-                msg['From'] = self.settings.smtp_user
-                msg['To'] = email
-                
-                html_part = MIMEText(html_content, 'html', 'utf-8')
-                msg.attach(html_part)
-                
-                with smtplib.SMTP(self.settings.smtp_host, self.settings.smtp_port) as server:
-                    server.starttls()
-                    server.login(self.settings.smtp_user, self.settings.smtp_password)
-                    server.send_message(msg)
-                
-                return True
-            
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, send_email)
-            
-            logger.info(f"Email OTP sent successfully to {email}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Email OTP sending failed: {e}")
-            return False
-    
-    async def _is_new_user(self, contact: str) -> bool:
-        """Check if this is a new user (simplified implementation)."""
-        # In a real implementation, this would check the database
-        # For now, we'll use Redis to track seen contacts
-        redis_client = await get_redis_client()
-        key = f"user_exists:{contact}"
-        
-        exists = await redis_client.get(key)
-        if exists:
-            return False
+    async def cleanup_expired_otps(self) -> int:
+        """
+        Trim expired entries from the OTP expiry index (called periodically).
         
-        # Mark as seen (this would normally be done after successful user creation)
-        await redis_client.setex(key, 86400 * 30, "1")  # 30 days
-        return True
-    
-    async def cleanup_expired_otps(self):
-        """Cleanup expired OTP records (called periodically)."""
+        OTP records expire on their own; only index entries for codes that
+        expired without being verified are left to remove.
+        """
         try:
             redis_client = await get_redis_client()
-            pattern = "otp:*"
-            
-            async for key in redis_client.scan_iter(match=pattern):
-                try:
-                    otp_data = await redis_client.get(key)
-                    if otp_data:
-                        otp_record_dict = json.loads(otp_data)
-                        expires_at = datetime.fromisoformat(otp_record_dict['expires_at'])
-                        
-                        if datetime.utcnow() > expires_at:
-                            await redis_client.delete(key)
-                            logger.debug(f"Cleaned up expired OTP: {key}")
-                            
-                except Exception as e:
-                    logger.error(f"Error cleaning up OTP {key}: {e}")
-                    
+            now = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
+            removed = await redis_client.zremrangebyscore(OTP_EXPIRY_INDEX, "-inf", now)
+            if removed:
+                logger.debug(f"Trimmed {removed} expired OTP index entries")
+            return removed
         except Exception as e:
             logger.error(f"Error during OTP cleanup: {e}")
+            return 0
+    
+    async def count_active_otps(self) -> int:
+        """Number of OTPs sent and not yet verified or expired."""
+        redis_client = await get_redis_client()
+        now = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
+        return await redis_client.zcount(OTP_EXPIRY_INDEX, f"({now}", "+inf")
 
 
 # Global OTP service instance
-otp_service = OTPService()
\ No newline at end of file
+otp_service = OTPService()
@@ -0,0 +1,275 @@
+"""Refresh token and session storage for Auth Service.
+
+Refresh tokens have the form ``<family>.<secret>``. A family starts at login
+and follows the token through every rotation; ``refresh_family:<family>``
+holds the family's current token and access token id. Rotation reads the
+presented token and its family, then runs one Lua script that consumes the
+token, revokes the access token it was issued with, and writes the new
+refresh token and session. Every key the script touches is passed in KEYS;
+if the family moved on between the read and the script, the script asks for
+a retry instead of acting on stale key names.
+
+Presenting a token the family has already rotated past means it was used
+twice (e.g. stolen and replayed): the script ends the whole family, so both
+the legitimate client and the attacker must log in again. The one exception
+is the immediately previous token within ``ROTATION_GRACE_SECONDS`` of its
+rotation, which is a client retrying a refresh whose response it lost; that
+retry is handed the family's current token instead, with a new access token
+that replaces (and revokes) the one in the lost response, so later rotations
+and reuse detection revoke it like any other.
+"""
+
+import json
+import logging
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, NamedTuple, Optional
+
+import redis.asyncio as redis
+
+# Import shared libraries
+from python_shared.auth import REVOKED_TOKENS_CHANNEL, REVOKED_TOKENS_INDEX
+from python_shared.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_TTL = 30 * 24 * 60 * 60  # 30 days
+ROTATION_GRACE_SECONDS = 30
+ROTATION_ATTEMPTS = 3
+
+# KEYS: presented refresh token, its family, new refresh token, new session,
+#       revoked token index, revocation key of the presented token's access
+#       token, family's current refresh token, revocation key of the family's
+#       current access token
+# ARGV: presented token, new token, new jti, refresh ttl, session ttl,
+#       revocation ttl, revocation expires_at, session json, rotated_at,
+#       revoked token channel, expected current token, presented jti,
+#       current jti, now (epoch seconds), grace seconds
+# Returns {"ok", refresh data, refresh token} | {"reused"} | {"invalid"}
+#       | {"retry"}
+ROTATE_REFRESH_TOKEN_SCRIPT = """
+local function revoke(key, jti)
+    if jti == '' then
+        return
+    end
+    redis.call('SET', key, '1', 'EX', ARGV[6])
+    redis.call('ZADD', KEYS[5], ARGV[7], jti)
+    redis.call('PUBLISH', ARGV[10], jti .. ':' .. ARGV[7])
+end
+
+local function start_session(user_id)
+    local session = cjson.decode(ARGV[8])
+    session.user_id = user_id
+    redis.call('SET', KEYS[4], cjson.encode(session), 'EX', ARGV[5])
+end
+
+local current = redis.call('HGET', KEYS[2], 'token') or ''
+if current ~= ARGV[11] then
+    return {'retry'}
+end
+
+local data = redis.call('GET', KEYS[1])
+
+if not data then
+    if current == '' or current == ARGV[1] then
+        return {'invalid'}
+    end
+    local previous = redis.call('HMGET', KEYS[2], 'prev_token', 'rotated_at')
+    if previous[1] == ARGV[1]
+            and tonumber(ARGV[14]) - tonumber(previous[2]) <= tonumber(ARGV[15]) then
+        local successor = redis.call('GET', KEYS[7])
+        if not successor then
+            return {'invalid'}
+        end
+        -- The access token of the lost response is replaced by the new one,
+        -- which the family tracks from now on
+        revoke(KEYS[8], ARGV[13])
+        local successor_info = cjson.decode(successor)
+        successor_info.jti = ARGV[3]
+        successor = cjson.encode(successor_info)
+        redis.call('SET', KEYS[7], successor, 'KEEPTTL')
+        redis.call('HSET', KEYS[2], 'jti', ARGV[3])
+        start_session(successor_info.user_id)
+        return {'ok', successor, current}
+    end
+    revoke(KEYS[8], ARGV[13])
+    redis.call('DEL', KEYS[7], KEYS[2])
+    return {'reused'}
+end
+
+local info = cjson.decode(data)
+redis.call('DEL', KEYS[1])
+revoke(KEYS[6], ARGV[12])
+
+info.jti = ARGV[3]
+info.rotated_at = ARGV[9]
+redis.call('SET', KEYS[3], cjson.encode(info), 'EX', ARGV[4])
+redis.call('HSET', KEYS[2], 'token', ARGV[2], 'jti', ARGV[3], 'user_id', info.user_id,
+           'prev_token', ARGV[1], 'rotated_at', ARGV[14])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+start_session(info.user_id)
+
+return {'ok', data, ARGV[2]}
+"""
+
+
+class RotationResult(NamedTuple):
+    status: str  # "ok", "reused" or "invalid"
+    refresh_token: Optional[str] = None
+    refresh_data: Optional[Dict[str, Any]] = None
+
+
+def _family_of(refresh_token: str) -> Optional[str]:
+    family, separator, _ = refresh_token.partition(".")
+    return family if separator else None
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _new_refresh_token(family: str) -> str:
+    return f"{family}.{secrets.token_urlsafe(32)}"
+
+
+def _session_data(jti: str, device_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    now = datetime.utcnow().isoformat()
+    return {
+        "jti": jti,
+        "created_at": now,
+        "device_info": device_info or {},
+        "last_activity": now
+    }
+
+
+class TokenStore:
+    """Issues and rotates refresh tokens and sessions in one round trip each."""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        self.settings = get_settings()
+        self._rotate = redis_client.register_script(ROTATE_REFRESH_TOKEN_SCRIPT)
+
+    @property
+    def session_ttl(self) -> int:
+        return self.settings.jwt_expire_minutes * 60
+
+    async def issue(
+        self,
+        user_id: str,
+        jti: str,
+        claims: Dict[str, Any],
+        device_info: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Start a token family at login: refresh token, family and session in one transaction."""
+        family = uuid.uuid4().hex
+        refresh_token = _new_refresh_token(family)
+        now = datetime.utcnow()
+
+        refresh_data = {
+            "user_id": user_id,
+            "jti": jti,
+            "family": family,
+            "contact": claims.get("contact", ""),
+            "contact_type": claims.get("contact_type", "phone"),
+            "role": claims.get("role"),
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=REFRESH_TOKEN_TTL)).isoformat()
+        }
+        session_data = {"user_id": user_id, **_session_data(jti, device_info)}
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.setex(f"refresh_token:{refresh_token}", REFRESH_TOKEN_TTL, json.dumps(refresh_data))
+        pipe.hset(f"refresh_family:{family}", mapping={
+            "token": refresh_token, "jti": jti, "user_id": user_id
+        })
+        pipe.expire(f"refresh_family:{family}", REFRESH_TOKEN_TTL)
+        pipe.setex(f"session:{jti}", self.session_ttl, json.dumps(session_data))
+        await pipe.execute()
+
+        return refresh_token
+
+    async def rotate(
+        self,
+        refresh_token: str,
+        new_jti: str,
+        device_info: Optional[Dict[str, Any]] = None
+    ) -> RotationResult:
+        """Consume a refresh token and issue its successor atomically."""
+        # Tokens issued before families existed start one on first rotation
+        family = _family_of(refresh_token) or uuid.uuid4().hex
+        new_refresh_token = _new_refresh_token(family)
+        revoke_ttl = self.session_ttl
+
+        for _ in range(ROTATION_ATTEMPTS):
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(f"refresh_token:{refresh_token}")
+            pipe.hmget(f"refresh_family:{family}", "token", "jti")
+            data, (current, current_jti) = await pipe.execute()
+
+            presented_jti = json.loads(data).get("jti") if data else None
+            current, current_jti, presented_jti = (
+                _text(current), _text(current_jti), _text(presented_jti)
+            )
+
+            result = await self._rotate(
+                keys=[
+                    f"refresh_token:{refresh_token}",
+                    f"refresh_family:{family}",
+                    f"refresh_token:{new_refresh_token}",
+                    f"session:{new_jti}",
+                    REVOKED_TOKENS_INDEX,
+                    f"revoked_token:{presented_jti}",
+                    f"refresh_token:{current}",
+                    f"revoked_token:{current_jti}"
+                ],
+                args=[
+                    refresh_token,
+                    new_refresh_token,
+                    new_jti,
+                    REFRESH_TOKEN_TTL,
+                    self.session_ttl,
+                    revoke_ttl,
+                    time.time() + revoke_ttl,
+                    json.dumps(_session_data(new_jti, device_info)),
+                    datetime.utcnow().isoformat(),
+                    REVOKED_TOKENS_CHANNEL,
+                    current,
+                    presented_jti,
+                    current_jti,
+                    int(time.time()),
+                    ROTATION_GRACE_SECONDS
+                ]
+            )
+
+            status = _text(result[0])
+            if status != "retry":
+                break
+        else:
+            logger.warning(f"Refresh token family {family} kept changing, giving up")
+            return RotationResult("invalid")
+
+        if status == "reused":
+            logger.warning(f"Refresh token reuse detected, revoked token family {family}")
+            return RotationResult("reused")
+        if status != "ok":
+            return RotationResult("invalid")
+
+        return RotationResult("ok", _text(result[2]), json.loads(result[1]))
+
+
+_token_store: Optional[TokenStore] = None
+
+
+def get_token_store(redis_client: redis.Redis) -> TokenStore:
+    """Get the token store, rebuilt if the Redis client changes."""
+    global _token_store
+
+    if _token_store is None or _token_store.redis is not redis_client:
+        _token_store = TokenStore(redis_client)
+
+    return _token_store
@@ -0,0 +1,46 @@
+"""Login user resolution for Auth Service."""
+
+import logging
+from typing import Tuple
+
+from sqlalchemy import text
+
+# Import shared libraries
+from python_shared.database.connection import async_engine
+
+logger = logging.getLogger(__name__)
+
+# One statement resolves or creates the user and records the login. Concurrent
+# logins for the same contact serialize on the unique index: one inserts, the
+# others update the row it inserted. xmax = 0 only for a freshly inserted row.
+_UPSERT_LOGIN_USER = """
+    INSERT INTO users ({column}, role, status, last_login)
+    VALUES (:contact, 'customer', 'pending_verification', CURRENT_TIMESTAMP)
+    ON CONFLICT ({column}) DO UPDATE SET last_login = EXCLUDED.last_login
+    RETURNING id, (xmax = 0) AS created
+"""
+
+UPSERT_BY_PHONE = text(_UPSERT_LOGIN_USER.format(column="phone"))
+UPSERT_BY_EMAIL = text(_UPSERT_LOGIN_USER.format(column="email"))
+
+
+async def resolve_login_user(contact: str) -> Tuple[str, bool]:
+    """
+    Get or create the user for a verified contact.
+
+    Runs on the shared long-lived async engine, so a burst of logins queues
+    for its pooled connections instead of opening new ones.
+
+    Returns:
+        (user_id, created)
+    """
+    statement = UPSERT_BY_EMAIL if "@" in contact else UPSERT_BY_PHONE
+
+    async with async_engine.begin() as conn:
+        result = await conn.execute(statement, {"contact": contact})
+        user_id, created = result.one()
+
+    if created:
+        logger.info(f"New user created: {user_id}")
+
+    return str(user_id), created
@@ -4,7 +4,7 @@ import json
 import pytest
 import asyncio
 from datetime import datetime, timedelta
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import Mock, MagicMock, patch, AsyncMock
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
 
@@ -17,7 +17,7 @@ from app.main import app
 from app.deps import get_redis_client, create_access_token, verify_token
 from app.models.auth import (
     SendOTPRequest, VerifyOTPRequest, ContactType,
-    TokenClaims, UserRole, OTPRecord
+    TokenClaims, UserRole
 )
 from app.services.otp_service import otp_service
 
@@ -168,16 +168,20 @@ class TestOTPService:
         assert otp.isdigit()
     
     @patch('services.otp_service.get_redis_client')
-    @patch('services.otp_service.OTPService._send_sms_otp')
-    async def test_send_otp_sms_success(self, mock_send_sms, mock_get_redis, otp_service_instance):
+    @patch('services.otp_service.get_otp_delivery_worker')
+    async def test_send_otp_sms_success(self, mock_get_worker, mock_get_redis, otp_service_instance):
         """Test successful SMS OTP sending."""
         # Mock Redis
-        mock_redis = AsyncMock()
-        mock_redis.setex = AsyncMock(return_value=True)
+        mock_pipe = MagicMock()
+        mock_pipe.execute = AsyncMock(return_value=[0, 8, True, 1])
+        mock_redis = MagicMock()
+        mock_redis.pipeline.return_value = mock_pipe
         mock_get_redis.return_value = mock_redis
         
-        # Mock SMS sending
-        mock_send_sms.return_value = True
+        # Mock delivery queue
+        mock_worker = MagicMock()
+        mock_worker.enqueue.return_value = True
+        mock_get_worker.return_value = mock_worker
         
         success, msg_en, msg_he = await otp_service_instance.send_otp(
             "+972501234567", ContactType.PHONE, "he"
@@ -185,20 +189,26 @@ class TestOTPService:
         
         assert success is True
         assert "successfully" in msg_en.lower()
-        mock_redis.setex.assert_called_once()
-        mock_send_sms.assert_called_once()
+        mock_pipe.hset.assert_called_once()
+        mock_pipe.expireat.assert_called_once()
+        mock_worker.enqueue.assert_called_once()
+        assert mock_worker.enqueue.call_args[0][0].contact == "+972501234567"
     
     @patch('services.otp_service.get_redis_client')
-    @patch('services.otp_service.OTPService._send_email_otp')
-    async def test_send_otp_email_success(self, mock_send_email, mock_get_redis, otp_service_instance):
+    @patch('services.otp_service.get_otp_delivery_worker')
+    async def test_send_otp_email_success(self, mock_get_worker, mock_get_redis, otp_service_instance):
         """Test successful email OTP sending."""
         # Mock Redis
-        mock_redis = AsyncMock()
-        mock_redis.setex = AsyncMock(return_value=True)
+        mock_pipe = MagicMock()
+        mock_pipe.execute = AsyncMock(return_value=[0, 8, True, 1])
+        mock_redis = MagicMock()
+        mock_redis.pipeline.return_value = mock_pipe
         mock_get_redis.return_value = mock_redis
         
-        # Mock email sending
-        mock_send_email.return_value = True
+        # Mock delivery queue
+        mock_worker = MagicMock()
+        mock_worker.enqueue.return_value = True
+        mock_get_worker.return_value = mock_worker
         
         success, msg_en, msg_he = await otp_service_instance.send_otp(
             "test@example.com", ContactType.EMAIL, "he"
@@ -206,55 +216,42 @@ class TestOTPService:
         
         assert success is True
         assert "successfully" in msg_en.lower()
-        mock_redis.setex.assert_called_once()
-        mock_send_email.assert_called_once()
+        mock_pipe.hset.assert_called_once()
+        mock_pipe.expireat.assert_called_once()
+        mock_worker.enqueue.assert_called_once()
+        assert mock_worker.enqueue.call_args[0][0].contact == "test@example.com"
+    
+    @staticmethod
+    def _mock_verify_script(mock_get_redis, otp_service_instance, result):
+        """Mock Redis whose verification script returns `result`."""
+        mock_script = AsyncMock(return_value=result)
+        mock_redis = MagicMock()
+        mock_redis.register_script.return_value = mock_script
+        mock_get_redis.return_value = mock_redis
+        otp_service_instance._verify_script = None
+        return mock_script
     
     @patch('services.otp_service.get_redis_client')
     async def test_verify_otp_success(self, mock_get_redis, otp_service_instance):
         """Test successful OTP verification."""
-        # Mock Redis with valid OTP record
-        otp_record = OTPRecord(
-            contact="+972501234567",
-            contact_type=ContactType.PHONE,
-            otp="123456",
-            attempts=0,
-            created_at=datetime.utcnow(),
-            expires_at=datetime.utcnow() + timedelta(minutes=10)
-        )
+        mock_script = self._mock_verify_script(mock_get_redis, otp_service_instance, ["ok", 0])
         
-        mock_redis = AsyncMock()
-        mock_redis.get = AsyncMock(return_value=json.dumps(otp_record.dict(), default=str))
-        mock_redis.delete = AsyncMock(return_value=True)
-        mock_get_redis.return_value = mock_redis
-        
-        # Mock _is_new_user
-        with patch.object(otp_service_instance, '_is_new_user', return_value=False):
-            success, msg_en, msg_he, is_new_user = await otp_service_instance.verify_otp(
-                "+972501234567", "123456"
-            )
+        success, msg_en, msg_he, is_new_user = await otp_service_instance.verify_otp(
+            "+972501234567", "123456"
+        )
         
         assert success is True
         assert "successfully" in msg_en.lower()
         assert is_new_user is False
-        mock_redis.delete.assert_called_once()
+        mock_script.assert_called_once()
+        assert mock_script.call_args.kwargs["keys"][0] == "otp:+972501234567"
+        assert mock_script.call_args.kwargs["args"][0] == "123456"
     
     @patch('services.otp_service.get_redis_client')
     async def test_verify_otp_expired(self, mock_get_redis, otp_service_instance):
         """Test OTP verification with expired OTP."""
-        # Mock Redis with expired OTP record
-        otp_record = OTPRecord(
-            contact="+972501234567",
-            contact_type=ContactType.PHONE,
-            otp="123456",
-            attempts=0,
-            created_at=datetime.utcnow() - timedelta(minutes=20),
-            expires_at=datetime.utcnow() - timedelta(minutes=10)
-        )
-        
-        mock_redis = AsyncMock()
-        mock_redis.get = AsyncMock(return_value=json.dumps(otp_record.dict(), default=str))
-        mock_redis.delete = AsyncMock(return_value=True)
-        mock_get_redis.return_value = mock_redis
+        # Expired records are removed by Redis key expiry
+        self._mock_verify_script(mock_get_redis, otp_service_instance, ["not_found"])
         
         success, msg_en, msg_he, is_new_user = await otp_service_instance.verify_otp(
             "+972501234567", "123456"
@@ -262,25 +259,11 @@ class TestOTPService:
         
         assert success is False
         assert "expired" in msg_en.lower()
-        mock_redis.delete.assert_called_once()
     
     @patch('services.otp_service.get_redis_client')
     async def test_verify_otp_invalid_code(self, mock_get_redis, otp_service_instance):
         """Test OTP verification with invalid code."""
-        # Mock Redis with valid OTP record
-        otp_record = OTPRecord(
-            contact="+972501234567",
-            contact_type=ContactType.PHONE,
-            otp="123456",
-            attempts=0,
-            created_at=datetime.utcnow(),
-            expires_at=datetime.utcnow() + timedelta(minutes=10)
-        )
-        
-        mock_redis = AsyncMock()
-        mock_redis.get = AsyncMock(return_value=json.dumps(otp_record.dict(), default=str))
-        mock_redis.setex = AsyncMock(return_value=True)
-        mock_get_redis.return_value = mock_redis
+        self._mock_verify_script(mock_get_redis, otp_service_instance, ["invalid", 2])
         
         success, msg_en, msg_he, is_new_user = await otp_service_instance.verify_otp(
             "+972501234567", "654321"  # Wrong OTP
@@ -288,7 +271,19 @@ class TestOTPService:
         
         assert success is False
         assert "invalid" in msg_en.lower()
-        mock_redis.setex.assert_called_once()  # Should update attempts
+        assert "2 attempts" in msg_en
+    
+    @patch('services.otp_service.get_redis_client')
+    async def test_verify_otp_attempts_exhausted(self, mock_get_redis, otp_service_instance):
+        """Test OTP verification after the last allowed attempt."""
+        self._mock_verify_script(mock_get_redis, otp_service_instance, ["exhausted"])
+        
+        success, msg_en, msg_he, is_new_user = await otp_service_instance.verify_otp(
+            "+972501234567", "654321"
+        )
+        
+        assert success is False
+        assert "maximum attempts" in msg_en.lower()
 
 
 class TestAuthAPIEndpoints:
@@ -338,10 +333,9 @@ class TestAuthAPIEndpoints:
     @patch('api.auth.check_verification_rate_limit')
     @patch('api.auth.otp_service.verify_otp')
     @patch('api.auth._get_or_create_user')
-    @patch('api.auth._create_refresh_token')
-    @patch('api.auth._store_user_session')
+    @patch('api.auth._issue_refresh_token')
     def test_verify_otp_success(
-        self, mock_store_session, mock_create_refresh, mock_get_user,
+        self, mock_create_refresh, mock_get_user,
         mock_verify_otp, mock_rate_limit
     ):
         """Test successful OTP verification."""
@@ -354,9 +348,8 @@ class TestAuthAPIEndpoints:
         )
         
         # Mock user creation/retrieval
-        mock_get_user.return_value = "user123"
+        mock_get_user.return_value = ("user123", False)
         mock_create_refresh.return_value = "refresh_token_123"
-        mock_store_session.return_value = None
         
         response = self.client.post("/auth/verify-otp", json={
             "contact": "+972501234567",
@@ -448,46 +441,60 @@ class TestTokenOperations:
 class TestRateLimiting:
     """Test rate limiting functionality."""
     
-    @patch('deps.get_redis_client')
-    async def test_check_rate_limit_allowed(self, mock_get_redis):
+    @patch('deps.get_rate_limiter')
+    async def test_check_rate_limit_allowed(self, mock_get_limiter):
         """Test rate limiting when requests are allowed."""
         from deps import check_rate_limit
+        from python_shared.ratelimit import RateLimitResult
         
-        mock_redis = AsyncMock()
-        mock_redis.pipeline.return_value = mock_redis
-        mock_redis.incr = AsyncMock(return_value=mock_redis)
-        mock_redis.expire = AsyncMock(return_value=mock_redis)
-        mock_redis.execute = AsyncMock(return_value=[1, True])  # First request
-        mock_get_redis.return_value = mock_redis
+        mock_limiter = AsyncMock()
+        mock_limiter.check.return_value = RateLimitResult(True, 0, (1,), "redis")  # First request
+        mock_get_limiter.return_value = mock_limiter
         
         allowed, count, remaining = await check_rate_limit(
-            mock_redis, "test_key", 5, 60
+            AsyncMock(), "test_key", 5, 60
         )
         
         assert allowed is True
         assert count == 1
         assert remaining == 0
     
-    @patch('deps.get_redis_client')
-    async def test_check_rate_limit_exceeded(self, mock_get_redis):
+    @patch('deps.get_rate_limiter')
+    async def test_check_rate_limit_exceeded(self, mock_get_limiter):
         """Test rate limiting when limit is exceeded."""
         from deps import check_rate_limit
+        from python_shared.ratelimit import RateLimitResult
         
-        mock_redis = AsyncMock()
-        mock_redis.pipeline.return_value = mock_redis
-        mock_redis.incr = AsyncMock(return_value=mock_redis)
-        mock_redis.expire = AsyncMock(return_value=mock_redis)
-        mock_redis.execute = AsyncMock(return_value=[6, True])  # Exceeded limit of 5
-        mock_redis.ttl = AsyncMock(return_value=45)
-        mock_get_redis.return_value = mock_redis
+        mock_limiter = AsyncMock()
+        mock_limiter.check.return_value = RateLimitResult(False, 45, (5,), "redis")  # Limit of 5 reached
+        mock_get_limiter.return_value = mock_limiter
         
         allowed, count, remaining = await check_rate_limit(
-            mock_redis, "test_key", 5, 60
+            AsyncMock(), "test_key", 5, 60
         )
         
         assert allowed is False
-        assert count == 6
+        assert count == 5
         assert remaining == 45
+    
+    @patch('deps.get_redis_client')
+    @patch('deps.get_rate_limiter')
+    async def test_check_otp_rate_limit_single_check(self, mock_get_limiter, mock_get_redis):
+        """All OTP windows are checked together in one limiter call."""
+        from deps import check_otp_rate_limit
+        from python_shared.ratelimit import RateLimitResult
+        
+        mock_limiter = AsyncMock()
+        mock_limiter.check.return_value = RateLimitResult(False, 30, (1, 1, 1), "redis")
+        mock_get_limiter.return_value = mock_limiter
+        
+        allowed, retry_after = await check_otp_rate_limit("+972501234567")
+        
+        assert allowed is False
+        assert retry_after == 30
+        mock_limiter.check.assert_awaited_once()
+        rules = mock_limiter.check.await_args.args[0]
+        assert [rule.window_seconds for rule in rules] == [60, 3600, 86400]
 
 
 class TestHelperFunctions:
@@ -523,6 +530,144 @@ class TestHelperFunctions:
         assert "*" in masked
 
 
+@pytest.mark.asyncio
+class TestTokenStore:
+    """Test refresh token rotation against a Lua-capable fake Redis."""
+
+    @pytest.fixture
+    def fake_redis(self):
+        """Fake Redis with Lua scripting support."""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    @pytest.fixture
+    def token_store(self, fake_redis):
+        """Token store bound to the fake Redis."""
+        from app.services.token_store import TokenStore
+        return TokenStore(fake_redis)
+
+    @pytest.fixture
+    def claims(self):
+        return {"contact": "+972501234567", "contact_type": "phone", "role": "consumer"}
+
+    async def test_rotate_ok(self, token_store, fake_redis, claims):
+        """Rotation consumes the token, revokes its access token and issues a successor."""
+        from python_shared.auth import REVOKED_TOKENS_INDEX
+        refresh_token = await token_store.issue("user123", "jti-1", claims)
+
+        rotation = await token_store.rotate(refresh_token, "jti-2")
+
+        assert rotation.status == "ok"
+        assert rotation.refresh_data["user_id"] == "user123"
+        assert rotation.refresh_token != refresh_token
+        assert rotation.refresh_token.split(".")[0] == refresh_token.split(".")[0]
+        assert await fake_redis.get(f"refresh_token:{refresh_token}") is None
+        assert await fake_redis.exists(f"refresh_token:{rotation.refresh_token}")
+        assert await fake_redis.exists("revoked_token:jti-1")
+        assert await fake_redis.zscore(REVOKED_TOKENS_INDEX, "jti-1") is not None
+        session = json.loads(await fake_redis.get("session:jti-2"))
+        assert session["user_id"] == "user123"
+
+        family = await fake_redis.hgetall(f"refresh_family:{refresh_token.split('.')[0]}")
+        assert family["token"] == rotation.refresh_token
+        assert family["jti"] == "jti-2"
+
+    async def test_rotate_invalid(self, token_store):
+        """Unknown tokens are rejected without side effects."""
+        rotation = await token_store.rotate("nofamily.unknown", "jti-2")
+        assert rotation.status == "invalid"
+        assert rotation.refresh_token is None
+
+    async def test_rotate_reused_ends_family(self, token_store, fake_redis, claims):
+        """Replaying a token the family has rotated past ends the family."""
+        first = await token_store.issue("user123", "jti-1", claims)
+        second = (await token_store.rotate(first, "jti-2")).refresh_token
+        third = (await token_store.rotate(second, "jti-3")).refresh_token
+
+        rotation = await token_store.rotate(first, "jti-4")
+
+        assert rotation.status == "reused"
+        assert await fake_redis.get(f"refresh_token:{third}") is None
+        assert not await fake_redis.exists(f"refresh_family:{first.split('.')[0]}")
+        assert await fake_redis.exists("revoked_token:jti-3")
+        assert (await token_store.rotate(third, "jti-5")).status == "invalid"
+
+    async def test_rotate_retry_within_grace(self, token_store, fake_redis, claims):
+        """A retry of the previous token within the grace window gets the current token."""
+        first = await token_store.issue("user123", "jti-1", claims)
+        second = (await token_store.rotate(first, "jti-2")).refresh_token
+
+        retry = await token_store.rotate(first, "jti-3")
+
+        assert retry.status == "ok"
+        assert retry.refresh_token == second
+        assert await fake_redis.exists("session:jti-3")
+        assert await fake_redis.exists(f"refresh_token:{second}")
+        assert (await token_store.rotate(second, "jti-4")).status == "ok"
+
+    async def test_rotate_retry_replaces_lost_access_token(self, token_store, fake_redis, claims):
+        """The grace retry's access token replaces the lost one and is revoked on the next rotation."""
+        first = await token_store.issue("user123", "jti-1", claims)
+        second = (await token_store.rotate(first, "jti-2")).refresh_token
+
+        retry = await token_store.rotate(first, "jti-3")
+
+        assert retry.refresh_data["jti"] == "jti-3"
+        assert await fake_redis.exists("revoked_token:jti-2")
+        assert (await fake_redis.hget(f"refresh_family:{first.split('.')[0]}", "jti")) == "jti-3"
+        assert await fake_redis.ttl(f"refresh_token:{second}") > 0
+
+        assert (await token_store.rotate(second, "jti-4")).status == "ok"
+        assert await fake_redis.exists("revoked_token:jti-3")
+
+    async def test_rotate_reuse_after_retry_revokes_retry_token(self, token_store, fake_redis, claims):
+        """Ending the family after a grace retry revokes the access token issued to the retry."""
+        from app.services import token_store as token_store_module
+        first = await token_store.issue("user123", "jti-1", claims)
+        second = (await token_store.rotate(first, "jti-2")).refresh_token
+        await token_store.rotate(first, "jti-3")
+
+        family = f"refresh_family:{first.split('.')[0]}"
+        rotated_at = int(await fake_redis.hget(family, "rotated_at"))
+        await fake_redis.hset(
+            family, "rotated_at", rotated_at - token_store_module.ROTATION_GRACE_SECONDS - 1
+        )
+
+        assert (await token_store.rotate(first, "jti-4")).status == "reused"
+        assert await fake_redis.exists("revoked_token:jti-3")
+        assert await fake_redis.get(f"refresh_token:{second}") is None
+
+    async def test_rotate_retry_after_grace_is_reuse(self, token_store, fake_redis, claims):
+        """The previous token counts as reuse once the grace window has passed."""
+        from app.services import token_store as token_store_module
+        first = await token_store.issue("user123", "jti-1", claims)
+        await token_store.rotate(first, "jti-2")
+
+        family = f"refresh_family:{first.split('.')[0]}"
+        rotated_at = int(await fake_redis.hget(family, "rotated_at"))
+        await fake_redis.hset(
+            family, "rotated_at", rotated_at - token_store_module.ROTATION_GRACE_SECONDS - 1
+        )
+
+        assert (await token_store.rotate(first, "jti-3")).status == "reused"
+
+    async def test_rotate_legacy_token_starts_family(self, token_store, fake_redis):
+        """Tokens issued before families existed start one on first rotation."""
+        await fake_redis.set("refresh_token:legacytoken", json.dumps({
+            "user_id": "user123", "jti": "jti-1", "role": "consumer"
+        }))
+
+        rotation = await token_store.rotate("legacytoken", "jti-2")
+
+        assert rotation.status == "ok"
+        assert rotation.refresh_data["user_id"] == "user123"
+        assert await fake_redis.exists("revoked_token:jti-1")
+        family = rotation.refresh_token.split(".")[0]
+        assert (await fake_redis.hget(f"refresh_family:{family}", "token")) == rotation.refresh_token
+        assert (await token_store.rotate(rotation.refresh_token, "jti-3")).status == "ok"
+
+
 @pytest.mark.asyncio
 class TestAsyncOperations:
     """Test async operations."""
@@ -0,0 +1,181 @@
+"""Tests for the background OTP delivery worker."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from xml.etree import ElementTree
+
+import aiosmtplib
+import httpx
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models.auth import ContactType
+from app.services import otp_delivery
+from app.services.otp_delivery import OTPDelivery, OTPDeliveryWorker, SMTPPool, SMS019_URL
+
+
+def _phone(contact: str, otp: str = "123456") -> OTPDelivery:
+    return OTPDelivery(contact, ContactType.PHONE, otp, "he", 5)
+
+
+@pytest.fixture
+def requests():
+    """Provider requests seen by the worker's HTTP client."""
+    return []
+
+
+@pytest.fixture
+def responses():
+    """Response per provider host; tests override them."""
+    return {
+        "019sms.co.il": httpx.Response(200, text="<status>0</status>"),
+        "api.green-api.com": httpx.Response(200, json={"idMessage": "wa-1"}),
+    }
+
+
+@pytest.fixture
+def worker(requests, responses):
+    """Worker with provider credentials and a mocked HTTP transport."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses[request.url.host]
+
+    worker = OTPDeliveryWorker(batch_window_seconds=0.05)
+    worker.settings = Mock(
+        environment="production",
+        sms019_username="user", sms019_password="pass", sms019_sender_number="OFAIR",
+        greenapi_id_instance="1101", greenapi_api_token="token",
+        smtp_host=None, smtp_user=None, smtp_password=None
+    )
+    worker._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return worker
+
+
+def _019_phones(request: httpx.Request) -> list:
+    return [phone.text for phone in ElementTree.fromstring(request.content).iter("phone")]
+
+
+@pytest.mark.asyncio
+class TestOTPDeliveryWorker:
+    """Batching, fallback and shutdown."""
+
+    async def test_identical_messages_share_one_019_request(self, worker, requests):
+        for contact in ("+972501111111", "972502222222", "0503333333"):
+            assert worker.enqueue(_phone(contact))
+        worker.enqueue(_phone("+972504444444", otp="654321"))
+
+        await asyncio.sleep(0.1)
+        await worker.stop()
+
+        assert len(requests) == 2
+        phones = sorted(_019_phones(request) for request in requests)
+        assert phones == [["0501111111", "0502222222", "0503333333"], ["0504444444"]]
+        assert all(str(request.url) == SMS019_URL for request in requests)
+
+    async def test_019_failure_falls_back_to_whatsapp_per_phone(self, worker, requests, responses):
+        responses["019sms.co.il"] = httpx.Response(500, text="error")
+        worker.enqueue(_phone("+972501111111"))
+        worker.enqueue(_phone("+972502222222"))
+
+        await asyncio.sleep(0.1)
+        await worker.stop()
+
+        assert [request.url.host for request in requests] == [
+            "019sms.co.il", "api.green-api.com", "api.green-api.com"
+        ]
+        chats = sorted(json.loads(request.content)["chatId"] for request in requests[1:])
+        assert chats == ["972501111111@c.us", "972502222222@c.us"]
+
+    async def test_stop_sends_a_batch_pulled_mid_window(self, worker, requests):
+        worker.batch_window_seconds = 10
+        worker.enqueue(_phone("+972501111111"))
+        await asyncio.sleep(0.01)
+        assert worker._queue.empty()
+
+        await worker.stop()
+
+        assert len(requests) == 1
+        assert _019_phones(requests[0]) == ["0501111111"]
+
+    async def test_stop_sends_what_is_still_queued(self, worker, requests):
+        worker.batch_window_seconds = 10
+        worker.max_batch_size = 1
+        worker.enqueue(_phone("+972501111111"))
+        worker.enqueue(_phone("+972502222222", otp="654321"))
+
+        await worker.stop()
+
+        assert sorted(phone for request in requests for phone in _019_phones(request)) == [
+            "0501111111", "0502222222"
+        ]
+
+    async def test_full_queue_rejects_deliveries(self, worker):
+        worker._queue = asyncio.Queue(maxsize=1)
+        worker.batch_window_seconds = 10
+
+        assert worker.enqueue(_phone("+972501111111")) is True
+        assert worker.enqueue(_phone("+972502222222")) is False
+
+        await worker.stop()
+
+
+def _smtp_connection(send_error=None):
+    connection = MagicMock()
+    connection.is_connected = True
+    connection.connect = AsyncMock()
+    connection.login = AsyncMock()
+    connection.quit = AsyncMock()
+    connection.send_message = AsyncMock(side_effect=send_error)
+    return connection
+
+
+@pytest.mark.asyncio
+class TestSMTPPool:
+    """Logged-in SMTP sessions reused across emails."""
+
+    async def test_session_is_reused(self):
+        connection = _smtp_connection()
+        with patch.object(otp_delivery.aiosmtplib, "SMTP", return_value=connection) as smtp:
+            pool = SMTPPool("smtp.example.com", 587, "user", "pass")
+            await pool.send(MagicMock())
+            await pool.send(MagicMock())
+
+        assert smtp.call_count == 1
+        connection.login.assert_awaited_once_with("user", "pass")
+        assert connection.send_message.await_count == 2
+
+    async def test_dropped_session_is_replaced_and_the_send_retried(self):
+        dropped = _smtp_connection(aiosmtplib.SMTPServerDisconnected("gone"))
+        fresh = _smtp_connection()
+        message = MagicMock()
+        with patch.object(otp_delivery.aiosmtplib, "SMTP", side_effect=[dropped, fresh]):
+            pool = SMTPPool("smtp.example.com", 587, "user", "pass")
+            await pool.send(message)
+
+        dropped.close.assert_called_once()
+        fresh.send_message.assert_awaited_once_with(message)
+        assert [connection for _, connection in pool._idle] == [fresh]
+
+    async def test_idle_session_is_not_reused_after_max_idle(self):
+        stale, fresh = _smtp_connection(), _smtp_connection()
+        with patch.object(otp_delivery.aiosmtplib, "SMTP", side_effect=[stale, fresh]):
+            pool = SMTPPool("smtp.example.com", 587, "user", "pass", max_idle_seconds=0)
+            await pool.send(MagicMock())
+            await pool.send(MagicMock())
+
+        stale.quit.assert_awaited_once()
+        fresh.send_message.assert_awaited_once()
+
+    async def test_failed_send_discards_the_session(self):
+        broken = _smtp_connection(aiosmtplib.SMTPDataError(554, "rejected"))
+        with patch.object(otp_delivery.aiosmtplib, "SMTP", return_value=broken):
+            pool = SMTPPool("smtp.example.com", 587, "user", "pass")
+            with pytest.raises(aiosmtplib.SMTPDataError):
+                await pool.send(MagicMock())
+
+        broken.quit.assert_awaited_once()
+        assert pool._idle == []
@@ -3,12 +3,13 @@
 import logging
 from typing import Optional, Dict, Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 
 import sys
 sys.path.append("/app/libs")
 from python_shared.database.connection import get_db
+from python_shared.cache import LeadBoardCache, bump_professional_board_version
 
 from deps import get_current_professional, get_redis_client
 from models.leads import LeadBoardResponse, LeadErrorResponse
@@ -33,7 +34,7 @@ async def get_personalized_lead_board(
     limit: int = Query(50, ge=1, le=100, description="Maximum leads to return"),
     current_professional_data: tuple = Depends(get_current_professional),
     db: Session = Depends(get_db)
-) -> LeadBoardResponse:
+) -> Response:
     """
     Get personalized Lead Board for the authenticated professional.
     
@@ -69,6 +70,10 @@ async def get_personalized_lead_board(
     - Excludes already-proposed leads
     - Active leads only
     - Respects professional status requirements
+    
+    **Caching:** Boards are cached per professional and filters, and go stale
+    when leads change or the professional sends a proposal. A stale board is
+    served while one request rebuilds it.
     """
     try:
         token_claims, user, professional = current_professional_data
@@ -78,21 +83,31 @@ async def get_personalized_lead_board(
         geo_service = IsraeliGeoService(redis_client)
         board_service = LeadBoardService(db, geo_service)
         
-        # Generate personalized Lead Board
-        lead_board = await board_service.get_personalized_lead_board(
-            professional=professional,
-            user=user,
-            limit=limit,
-            category_filter=category,
-            location_radius_km=radius_km
-        )
+        async def build_lead_board() -> str:
+            # Generate personalized Lead Board
+            lead_board = await board_service.get_personalized_lead_board(
+                professional=professional,
+                user=user,
+                limit=limit,
+                category_filter=category,
+                location_radius_km=radius_km
+            )
+            
+            logger.info(
+                f"Generated Lead Board for professional {professional.id}: "
+                f"{len(lead_board.leads)} leads, subscription={lead_board.subscription_benefits_applied}"
+            )
+            
+            return lead_board.model_dump_json()
         
-        logger.info(
-            f"Generated Lead Board for professional {professional.id}: "
-            f"{len(lead_board.leads)} leads, subscription={lead_board.subscription_benefits_applied}"
+        # Cached boards are already serialized, so they are returned as is
+        payload = await LeadBoardCache(redis_client).get_or_compute(
+            professional.id,
+            {"category": category, "radius_km": radius_km, "limit": limit},
+            build_lead_board
         )
         
-        return lead_board
+        return Response(content=payload, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Failed to generate Lead Board for professional {professional.id}: {e}")
@@ -178,12 +193,12 @@ async def get_category_recommendations(
     **Recommendation Logic:**
     - **Local Demand Analysis**: Recent lead volume by category in area
     - **Budget Analysis**: Average project values by category
-    - **Competition Assessment**: Professional density per category
+    - **Competition Assessment**: Proposals per lead in each category
     - **Specialization Gaps**: Underserved categories identification
     
     **Data Points Per Category:**
     - Recent lead count (30 days)
-    - Average budget range
+    - Average, median and 90th percentile budgets
     - Current specialty status
     - Hebrew category names
     - Growth potential score
@@ -369,30 +384,21 @@ async def refresh_lead_board_cache(
         # Initialize Redis client
         redis_client = await get_redis_client()
         
+        # Cached boards are superseded by bumping the professional's board version
+        await bump_professional_board_version(redis_client, professional.id)
+        
         # Clear professional-specific caches
         cache_keys = [
-            f"lead_board:{professional.id}:*",
             f"geocode:{professional.location.lower().strip()}" if professional.location else None,
             f"professional_location:{professional.id}",
             f"board_preferences:{professional.id}"
         ]
         
         cleared_keys = 0
-        for key_pattern in cache_keys:
-            if key_pattern:
-                try:
-                    if '*' in key_pattern:
-                        # Pattern-based deletion
-                        keys = await redis_client.keys(key_pattern)
-                        if keys:
-                            deleted = await redis_client.delete(*keys)
-                            cleared_keys += deleted
-                    else:
-                        # Single key deletion
-                        deleted = await redis_client.delete(key_pattern)
-                        cleared_keys += deleted
-                except Exception as cache_error:
-                    logger.warning(f"Failed to clear cache key {key_pattern}: {cache_error}")
+        try:
+            cleared_keys = await redis_client.delete(*[key for key in cache_keys if key])
+        except Exception as cache_error:
+            logger.warning(f"Failed to clear Lead Board caches: {cache_error}")
         
         logger.info(f"Refreshed Lead Board cache for professional {professional.id}: {cleared_keys} keys cleared")
         
@@ -5,12 +5,12 @@ import uuid
 from typing import Optional, List
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 
 import sys
 sys.path.append("/app/libs")
-from python_shared.database.connection import get_db
+from python_shared.database.connection import SessionLocal, get_db
 from python_shared.database.models import User, Professional
 
 from deps import (
@@ -43,6 +43,7 @@ router = APIRouter(prefix="/leads", tags=["leads"])
 )
 async def create_lead(
     lead_data: LeadCreateRequest,
+    background_tasks: BackgroundTasks,
     current_user_data: tuple = Depends(get_current_user),
     _: None = Depends(check_lead_creation_rate_limit),
     db: Session = Depends(get_db)
@@ -56,6 +57,8 @@ async def create_lead(
     **Rate Limits:**
     - Consumers: 3 per hour, 10 per day
     - Professionals: 5 per hour, 20 per day
+    
+    Matching professionals are notified in the background once the lead is saved.
     """
     try:
         token_claims, user = current_user_data
@@ -75,6 +78,9 @@ async def create_lead(
         # Create lead
         lead = await lead_service.create_lead(lead_data, user, professional)
         
+        # Notify professionals after the response, on a session of its own
+        background_tasks.add_task(_fan_out_lead_notifications, lead.id)
+        
         return lead
         
     except ValueError as e:
@@ -102,8 +108,10 @@ async def get_public_leads(
     min_budget: Optional[Decimal] = Query(None, ge=0, description="Minimum budget filter"),
     max_budget: Optional[Decimal] = Query(None, ge=0, description="Maximum budget filter"),
     subscription_filter: Optional[bool] = Query(None, description="Filter for subscribers only"),
+    q: Optional[str] = Query(None, max_length=200, description="Free text search"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (next_cursor)"),
     current_user_data: Optional[tuple] = Depends(get_current_user_optional),
     db: Session = Depends(get_db)
 ) -> LeadSearchResponse:
@@ -117,12 +125,17 @@ async def get_public_leads(
     - radius_km: Search radius from location (1-100 km)
     - min_budget/max_budget: Budget range for professional referrals
     - subscription_filter: Show leads prioritized for subscribers
+    - q: Free text over title, description and location (Hebrew prefixes match)
+    
+    **Pagination:** Pass next_cursor as cursor for the following page; page is
+    still accepted but deep pages are cheaper with the cursor.
     
     **PII Protection:** Client details are masked in public view.
     """
     try:
         # Build filters
         filters = LeadSearchFilters(
+            query=q,
             category=category,
             location=location,
             radius_km=radius_km,
@@ -142,25 +155,28 @@ async def get_public_leads(
         lead_service = LeadService(db, geo_service)
         
         # Search leads
-        leads, total_count = await lead_service.search_leads(
+        result = await lead_service.search_leads(
             filters.dict(exclude_unset=True),
             page,
             page_size,
-            requesting_user
+            requesting_user,
+            cursor=cursor
         )
         
         # Calculate pagination info
-        total_pages = (total_count + page_size - 1) // page_size
+        total_pages = (result.total + page_size - 1) // page_size
         
         return LeadSearchResponse(
-            leads=leads,
-            total=total_count,
+            leads=result.leads,
+            total=result.total,
             page=page,
             page_size=page_size,
             total_pages=total_pages,
-            has_next=page < total_pages,
-            has_previous=page > 1,
-            filters=filters
+            has_next=result.next_cursor is not None,
+            has_previous=page > 1 or cursor is not None,
+            filters=filters,
+            facets=result.facets,
+            next_cursor=result.next_cursor
         )
         
     except ValueError as e:
@@ -419,8 +435,10 @@ async def advanced_lead_search(
     created_after: Optional[str] = Query(None, description="Created after date (ISO)"),
     created_before: Optional[str] = Query(None, description="Created before date (ISO)"),
     subscription_filter: Optional[bool] = Query(None, description="Subscription filter"),
+    q: Optional[str] = Query(None, max_length=200, description="Free text search"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (next_cursor)"),
     sort_by: Optional[str] = Query("created_at", description="Sort field"),
     sort_order: Optional[str] = Query("desc", description="Sort order"),
     current_user_data: Optional[tuple] = Depends(get_current_user_optional),
@@ -439,8 +457,9 @@ async def advanced_lead_search(
     - **subscription_filter**: Priority for subscribers
     
     **Sorting:** created_at, budget, location (with custom sort orders)
-    **Pagination:** Standard page-based pagination
-    **Hebrew Support:** Location and category text search
+    **Pagination:** Keyset cursor (next_cursor), or page-based
+    **Facets:** Matching counts per category and lead type
+    **Hebrew Support:** Full-text search over title, description and location
     """
     try:
         from datetime import datetime
@@ -463,6 +482,7 @@ async def advanced_lead_search(
         
         # Build comprehensive filters
         filters = LeadSearchFilters(
+            query=q,
             category=category,
             location=location,
             radius_km=radius_km,
@@ -493,25 +513,28 @@ async def advanced_lead_search(
         })
         
         # Perform search
-        leads, total_count = await lead_service.search_leads(
+        result = await lead_service.search_leads(
             search_filters,
             page,
             page_size,
-            requesting_user
+            requesting_user,
+            cursor=cursor
         )
         
         # Calculate pagination
-        total_pages = (total_count + page_size - 1) // page_size
+        total_pages = (result.total + page_size - 1) // page_size
         
         return LeadSearchResponse(
-            leads=leads,
-            total=total_count,
+            leads=result.leads,
+            total=result.total,
             page=page,
             page_size=page_size,
             total_pages=total_pages,
-            has_next=page < total_pages,
-            has_previous=page > 1,
-            filters=filters
+            has_next=result.next_cursor is not None,
+            has_previous=page > 1 or cursor is not None,
+            filters=filters,
+            facets=result.facets,
+            next_cursor=result.next_cursor
         )
         
     except ValueError as e:
@@ -658,4 +681,18 @@ async def get_my_leads(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve user leads"
-        )
\ No newline at end of file
+        )
+
+
+async def _fan_out_lead_notifications(lead_id: uuid.UUID) -> None:
+    """Notify the professionals matching a newly created lead."""
+    db = SessionLocal()
+    try:
+        redis_client = await get_redis_client()
+        lead_service = LeadService(db, IsraeliGeoService(redis_client))
+        await lead_service.notify_relevant_professionals(lead_id)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to notify professionals about lead {lead_id}: {e}")
+    finally:
+        db.close()
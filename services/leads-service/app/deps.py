@@ -3,6 +3,7 @@
 import sys
 import logging
 from functools import lru_cache
+from datetime import datetime, timezone
 from typing import Optional, Generator, Tuple
 import uuid
 
@@ -19,6 +20,10 @@ from slowapi.util import get_remote_address
 sys.path.append("/app/libs")
 from python_shared.config.settings import get_settings
 from python_shared.database.connection import get_db, set_rls_context
+from python_shared.auth import get_principal_resolver
+from python_shared.audit import get_audit_sink
+from python_shared.monitoring import instrument_redis
+from python_shared.ratelimit import RateLimitRule, get_rate_limiter
 from python_shared.database.models import (
     User, Professional, Lead, ConsumerLead, ProfessionalLead,
     UserRole, ProfessionalStatus
@@ -77,6 +82,7 @@ async def get_redis_client() -> redis.Redis:
             decode_responses=True,
             health_check_interval=30
         )
+        instrument_redis(_redis_client)
     
     return _redis_client
 
@@ -89,16 +95,20 @@ async def close_redis_client():
         _redis_client = None
 
 
+def _decode_token(token: str) -> dict:
+    settings = get_settings()
+    return jwt.decode(
+        token,
+        settings.jwt_secret_key,
+        algorithms=[settings.jwt_algorithm]
+    )
+
+
 def verify_token(token: str) -> TokenClaims:
     """Verify and decode JWT token."""
-    settings = get_settings()
-    
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret_key,
-            algorithms=[settings.jwt_algorithm]
-        )
+        # Verified payloads are cached per token until it expires
+        payload = get_principal_resolver().verify_token(token, _decode_token)
         
         return TokenClaims(**payload)
         
@@ -126,10 +136,11 @@ async def get_current_user(
     
     token = credentials.credentials
     token_claims = verify_token(token)
+    resolver = get_principal_resolver()
     
-    # Check if token is revoked
+    # Check if token is revoked (locally while the revoked set is in sync)
     redis_client = await get_redis_client()
-    revoked = await redis_client.get(f"revoked_token:{token_claims.jti}")
+    revoked = await resolver.is_revoked(redis_client, token_claims.jti)
     
     if revoked:
         raise HTTPException(
@@ -138,18 +149,19 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = db.query(User).filter(User.id == token_claims.user_id).first()
+    # Set RLS context; it is applied with the first statement of each
+    # transaction this session opens, without a commit of its own
+    professional_id = token_claims.professional_id if token_claims.role == "professional" else None
+    set_rls_context(db, token_claims.user_id, professional_id)
+    
+    # Get user from the principal cache or the database
+    user = resolver.get_user(db, token_claims.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
     
-    # Set RLS context
-    professional_id = token_claims.professional_id if token_claims.role == "professional" else None
-    set_rls_context(db, token_claims.user_id, professional_id)
-    
     return token_claims, user
 
 
@@ -182,9 +194,7 @@ async def get_current_professional(
             detail="Professional access required"
         )
     
-    professional = db.query(Professional).filter(
-        Professional.user_id == user.id
-    ).first()
+    professional = get_principal_resolver().get_professional(db, user)
     
     if not professional:
         raise HTTPException(
@@ -359,32 +369,25 @@ async def check_lead_creation_rate_limit(
     if token_claims.role == UserRole.CONSUMER.value:
         # Consumers: 3 leads per hour, 10 per day
         limits = [
-            (f"lead_creation_1h:{user.id}", 3, 3600),
-            (f"lead_creation_24h:{user.id}", 10, 86400)
+            RateLimitRule(f"lead_creation_1h:{user.id}", 3, 3600),
+            RateLimitRule(f"lead_creation_24h:{user.id}", 10, 86400)
         ]
     elif token_claims.role == UserRole.PROFESSIONAL.value:
         # Professionals: 5 leads per hour, 20 per day  
         limits = [
-            (f"lead_creation_1h:{user.id}", 5, 3600),
-            (f"lead_creation_24h:{user.id}", 20, 86400)
+            RateLimitRule(f"lead_creation_1h:{user.id}", 5, 3600),
+            RateLimitRule(f"lead_creation_24h:{user.id}", 20, 86400)
         ]
     else:
         return  # No limits for admin
     
-    for key, limit, window in limits:
-        try:
-            current_count = await redis_client.incr(key)
-            await redis_client.expire(key, window)
-            
-            if current_count > limit:
-                ttl = await redis_client.ttl(key)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded. Try again in {ttl} seconds."
-                )
-        except Exception as e:
-            logger.error(f"Rate limit check failed: {e}")
-            # Continue if Redis fails
+    result = await get_rate_limiter(redis_client).check(limits)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded. Try again in {result.retry_after} seconds.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 
 async def check_referral_rate_limit(
@@ -397,50 +400,17 @@ async def check_referral_rate_limit(
     
     # Referral limits: 5 per hour, 20 per day
     limits = [
-        (f"referral_creation_1h:{professional.id}", 5, 3600),
-        (f"referral_creation_24h:{professional.id}", 20, 86400)
+        RateLimitRule(f"referral_creation_1h:{professional.id}", 5, 3600),
+        RateLimitRule(f"referral_creation_24h:{professional.id}", 20, 86400)
     ]
     
-    for key, limit, window in limits:
-        try:
-            current_count = await redis_client.incr(key)
-            await redis_client.expire(key, window)
-            
-            if current_count > limit:
-                ttl = await redis_client.ttl(key)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Referral rate limit exceeded. Try again in {ttl} seconds."
-                )
-        except Exception as e:
-            logger.error(f"Referral rate limit check failed: {e}")
-
-
-# Cache helpers
-async def cache_lead_board_result(
-    key: str,
-    data: dict,
-    ttl: int = 300  # 5 minutes
-) -> None:
-    """Cache lead board result."""
-    try:
-        redis_client = await get_redis_client()
-        await redis_client.setex(key, ttl, str(data))
-    except Exception as e:
-        logger.error(f"Failed to cache lead board result: {e}")
-
-
-async def get_cached_lead_board_result(key: str) -> Optional[dict]:
-    """Get cached lead board result."""
-    try:
-        redis_client = await get_redis_client()
-        cached = await redis_client.get(key)
-        if cached:
-            return eval(cached)  # In production, use proper JSON serialization
-    except Exception as e:
-        logger.error(f"Failed to get cached lead board result: {e}")
-    
-    return None
+    result = await get_rate_limiter(redis_client).check(limits)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Referral rate limit exceeded. Try again in {result.retry_after} seconds.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 
 # Audit logging
@@ -451,7 +421,11 @@ async def log_pii_access(
     request: Request,
     db: Session
 ) -> None:
-    """Log PII access for audit purposes."""
+    """Log PII access for audit purposes.
+    
+    The record is queued on the shared audit sink and written in the next
+    batch; `db` is not used and the request's transaction is left alone.
+    """
     try:
         from python_shared.database.models import ContactAccessLog, ContactAccessType
         
@@ -462,21 +436,18 @@ async def log_pii_access(
             "full": ContactAccessType.FULL_CONTACT
         }.get(access_type, ContactAccessType.FULL_CONTACT)
         
-        # Create log entry
-        log_entry = ContactAccessLog(
-            accessor_user_id=user_id,
-            target_lead_id=lead_id,
-            access_type=access_type_enum,
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent", "")
-        )
-        
-        db.add(log_entry)
-        db.commit()
+        # Queue log entry
+        await get_audit_sink().submit(ContactAccessLog.__tablename__, {
+            "accessor_user_id": user_id,
+            "target_lead_id": lead_id,
+            "access_type": access_type_enum,
+            "ip_address": request.client.host,
+            "user_agent": request.headers.get("user-agent", ""),
+            "created_at": datetime.now(timezone.utc)
+        })
         
     except Exception as e:
         logger.error(f"Failed to log PII access: {e}")
-        db.rollback()
 
 
 # Health check helpers
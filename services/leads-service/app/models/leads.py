@@ -383,6 +383,7 @@ class LeadCategoriesResponse(BaseLeadModel):
 class LeadSearchFilters(BaseLeadModel):
     """Lead search filters."""
     
+    query: Optional[str] = Field(None, max_length=200, description="Free text over title, description and location")
     category: Optional[str] = None
     location: Optional[str] = None
     radius_km: Optional[int] = Field(None, ge=1, le=100, description="Search radius in kilometers")
@@ -415,6 +416,13 @@ class LeadSearchFilters(BaseLeadModel):
         return self
 
 
+class LeadSearchFacets(BaseLeadModel):
+    """Matching lead counts per category and per lead type."""
+    
+    categories: Dict[str, int] = Field(default_factory=dict)
+    types: Dict[str, int] = Field(default_factory=dict)
+
+
 class LeadSearchResponse(BaseLeadModel):
     """Lead search response."""
     
@@ -426,6 +434,8 @@ class LeadSearchResponse(BaseLeadModel):
     has_next: bool
     has_previous: bool
     filters: LeadSearchFilters
+    facets: LeadSearchFacets = Field(default_factory=LeadSearchFacets)
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to fetch the next page")
 
 
 class LeadBoardResponse(BaseLeadModel):
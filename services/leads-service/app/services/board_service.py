@@ -5,13 +5,14 @@ import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy import and_, desc, func
 
 import sys
 sys.path.append("/app/libs")
 from python_shared.database.models import (
-    User, Professional, Lead, ConsumerLead, ProfessionalLead,
-    LeadStatus, ProfessionalStatus, Proposal, ProposalStatus
+    User, Professional, Lead, ConsumerLead,
+    LeadStatus, ProfessionalStatus, Proposal,
+    LeadCategoryStats, LeadCategoryDay, ProfessionalActivityDay
 )
 
 from models.leads import (
@@ -432,36 +433,30 @@ class LeadBoardService:
         """Get Lead Board statistics for professional."""
         
         try:
-            since_date = datetime.utcnow() - timedelta(days=days_back)
-            
-            # Total active leads in their categories
-            category_leads = self.db.query(Lead).filter(
-                and_(
-                    Lead.status == LeadStatus.ACTIVE,
-                    Lead.created_at >= since_date,
-                    or_(
-                        Lead.category == professional.profession,
-                        Lead.category.in_(professional.specialties or [])
-                    )
-                )
-            ).count()
-            
-            # Leads they've proposed to
-            proposed_count = self.db.query(Proposal).join(Lead).filter(
+            # Rolling window of whole UTC days, today included
+            since = datetime.utcnow().date() - timedelta(days=days_back - 1)
+            categories = [professional.profession] + (professional.specialties or [])
+            
+            # Active leads in their categories, from the per-day category rollup
+            category_leads = self.db.query(
+                func.coalesce(func.sum(LeadCategoryDay.active_leads_count), 0)
+            ).filter(
                 and_(
-                    Proposal.professional_id == professional.id,
-                    Lead.created_at >= since_date
+                    LeadCategoryDay.category.in_(categories),
+                    LeadCategoryDay.day >= since
                 )
-            ).count()
+            ).scalar()
             
-            # Accepted proposals
-            accepted_count = self.db.query(Proposal).join(Lead).filter(
+            # Proposals sent and accepted, from the trigger-maintained daily counters
+            proposed_count, accepted_count = self.db.query(
+                func.coalesce(func.sum(ProfessionalActivityDay.proposals_count), 0),
+                func.coalesce(func.sum(ProfessionalActivityDay.accepted_proposals_count), 0)
+            ).filter(
                 and_(
-                    Proposal.professional_id == professional.id,
-                    Proposal.status == ProposalStatus.ACCEPTED,
-                    Lead.created_at >= since_date
+                    ProfessionalActivityDay.professional_id == professional.id,
+                    ProfessionalActivityDay.day >= since
                 )
-            ).count()
+            ).one()
             
             # Calculate conversion rate
             conversion_rate = (accepted_count / proposed_count * 100) if proposed_count > 0 else 0
@@ -472,7 +467,7 @@ class LeadBoardService:
                 "proposals_accepted": accepted_count,
                 "conversion_rate": round(conversion_rate, 1),
                 "days_period": days_back,
-                "professional_categories": [professional.profession] + (professional.specialties or []),
+                "professional_categories": categories,
                 "has_subscription": await self._check_subscription_status(professional)
             }
             
@@ -488,35 +483,24 @@ class LeadBoardService:
         """Get category recommendations based on local demand."""
         
         try:
-            # Get professional location
-            professional_location = None
-            if professional.location:
-                professional_location = await self.geo_service.geocode_location(
-                    professional.location
-                )
+            # Demand of the last 30 days, precomputed per category
+            category_stats = self.db.query(LeadCategoryStats).order_by(
+                desc(LeadCategoryStats.recent_leads_count)
+            ).limit(10).all()
             
-            # Get recent leads by category in area
-            since_date = datetime.utcnow() - timedelta(days=30)
-            
-            category_stats = self.db.query(
-                Lead.category,
-                func.count(Lead.id).label('lead_count'),
-                func.avg(ProfessionalLead.estimated_budget).label('avg_budget')
-            ).outerjoin(ProfessionalLead).filter(
-                and_(
-                    Lead.status == LeadStatus.ACTIVE,
-                    Lead.created_at >= since_date
-                )
-            ).group_by(Lead.category).order_by(desc('lead_count')).limit(10).all()
+            categories = [professional.profession] + (professional.specialties or [])
             
             recommendations = []
-            for category, count, avg_budget in category_stats:
+            for stats in category_stats:
                 recommendations.append({
-                    "category": category,
-                    "category_hebrew": HebrewCategories.get_hebrew_name(category),
-                    "recent_leads": count,
-                    "average_budget": float(avg_budget) if avg_budget else None,
-                    "is_current_specialty": category in ([professional.profession] + (professional.specialties or []))
+                    "category": stats.category,
+                    "category_hebrew": HebrewCategories.get_hebrew_name(stats.category),
+                    "recent_leads": stats.recent_leads_count,
+                    "average_budget": float(stats.avg_budget) if stats.avg_budget else None,
+                    "median_budget": float(stats.median_budget) if stats.median_budget else None,
+                    "p90_budget": float(stats.p90_budget) if stats.p90_budget else None,
+                    "proposals_per_lead": float(stats.competition_ratio),
+                    "is_current_specialty": stats.category in categories
                 })
                 
             return recommendations
@@ -0,0 +1,86 @@
+"""Periodic refresh of the lead category rollups.
+
+The Lead Board stats and category recommendations read ``lead_category_stats``
+and ``lead_category_days`` instead of grouping the leads table per request.
+Both are rebuilt by ``refresh_lead_category_stats()`` in the database; this
+task calls it once a minute. A short Redis lock makes a single replica do
+the work each minute, the others skip it.
+"""
+
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from sqlalchemy import text
+
+sys.path.append("/app/libs")
+from python_shared.database.connection import async_engine
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60  # seconds
+REFRESH_LOCK_KEY = "lead_category_stats:refresh"
+
+
+class CategoryStatsRefresher:
+    """Background task rebuilding the lead category rollups every minute."""
+
+    def __init__(self, interval_seconds: int = REFRESH_INTERVAL):
+        self.interval_seconds = interval_seconds
+        self._redis_client = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self, redis_client) -> None:
+        """Start refreshing, right away and then every interval."""
+        self._redis_client = redis_client
+        if not self.running:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self._claim():
+                    await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh lead category stats: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _claim(self) -> bool:
+        """Whether this replica refreshes this interval; refresh anyway without Redis."""
+        try:
+            return bool(await self._redis_client.set(
+                REFRESH_LOCK_KEY, "1", nx=True, ex=max(self.interval_seconds - 5, 1)
+            ))
+        except Exception as e:
+            logger.warning(f"Lead category stats lock unavailable: {e}")
+            return True
+
+    async def refresh(self) -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(text("SELECT refresh_lead_category_stats()"))
+
+
+_refresher: Optional[CategoryStatsRefresher] = None
+
+
+def get_category_stats_refresher() -> CategoryStatsRefresher:
+    global _refresher
+    if _refresher is None:
+        _refresher = CategoryStatsRefresher()
+    return _refresher
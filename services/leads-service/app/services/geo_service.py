@@ -1,5 +1,6 @@
 """Geographic service for location-based matching and calculations."""
 
+import asyncio
 import logging
 import re
 from typing import Optional, List, Tuple, Dict, Any
@@ -68,6 +69,9 @@ class IsraeliGeoService:
         "ramat gan": (32.0678, 34.8245)
     }
     
+    # Geocoder lookups in flight at once during batch_geocode
+    BATCH_GEOCODE_CONCURRENCY = 5
+    
     # Regional centers
     REGIONS = {
         "צפון": ["חיפה", "נצרת", "עכו", "קריית שמונה", "צפת"],
@@ -120,7 +124,9 @@ class IsraeliGeoService:
             # Add "Israel" to improve results
             search_address = f"{address}, Israel"
             
-            location = self.geolocator.geocode(
+            # geopy is blocking; keep the event loop free while it waits
+            location = await asyncio.to_thread(
+                self.geolocator.geocode,
                 search_address,
                 country_codes="IL",
                 language="he"
@@ -405,7 +411,9 @@ class IsraeliGeoService:
         use_cache: bool = True
     ) -> Dict[str, Optional[LocationInfo]]:
         """
-        Geocode multiple addresses efficiently.
+        Geocode multiple addresses concurrently.
+        
+        At most BATCH_GEOCODE_CONCURRENCY lookups are in flight at once.
         
         Args:
             addresses: List of address strings
@@ -414,17 +422,18 @@ class IsraeliGeoService:
         Returns:
             Dictionary mapping address to LocationInfo (or None if failed)
         """
-        results = {}
-        
-        for address in addresses:
-            try:
-                location_info = await self.geocode_location(address, use_cache)
-                results[address] = location_info
-            except Exception as e:
-                logger.error(f"Batch geocoding failed for '{address}': {e}")
-                results[address] = None
-                
-        return results
+        semaphore = asyncio.Semaphore(self.BATCH_GEOCODE_CONCURRENCY)
+        
+        async def geocode(address: str) -> Optional[LocationInfo]:
+            async with semaphore:
+                try:
+                    return await self.geocode_location(address, use_cache)
+                except Exception as e:
+                    logger.error(f"Batch geocoding failed for '{address}': {e}")
+                    return None
+                    
+        locations = await asyncio.gather(*(geocode(address) for address in addresses))
+        return dict(zip(addresses, locations))
         
     def get_distance_score(self, distance_km: float, max_distance: float = 50.0) -> float:
         """
@@ -0,0 +1,231 @@
+"""Lead search backend.
+
+Free text and location match the trigger-maintained ``search_vector`` of the
+leads table (title A, description B, location C) with prefix terms, so Hebrew
+words are found while being typed and a location filter only hits the
+location part of the document. Results are ordered newest first by
+(created_at, id), read backwards from ``idx_leads_status_created_at_id``, and
+paginate with an opaque keyset cursor so deep pages cost the same as the first.
+
+The total and the category / type facets come from a single GROUPING SETS
+query and are cached in Redis per filter set for a short while, so following
+the cursor through a large result set does not recount it on every page.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import re
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, func, literal_column, select, tuple_
+from sqlalchemy.orm import Session, joinedload
+
+sys.path.append("/app/libs")
+from python_shared.database.models import Lead, LeadStatus, ProfessionalLead
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "simple"
+
+FACETS_CACHE_PREFIX = "lead_search:facets:"
+FACETS_CACHE_TTL = 60  # seconds
+
+# Filters that narrow the result set; anything else (paging, sorting) is ignored
+FILTER_KEYS = (
+    "query", "category", "location", "lead_type", "status",
+    "min_budget", "max_budget", "created_after", "created_before"
+)
+
+# Mirrors professional_search_text() in the database
+_HEBREW_MARKS = re.compile("[\u0591-\u05BD\u05BF-\u05C7]")
+_TERM = re.compile(r"\w+")
+
+
+class LeadSearchPage(NamedTuple):
+    leads: List[Any]  # Lead rows, or list items once converted by LeadService
+    total: int
+    facets: Dict[str, Dict[str, int]]
+    next_cursor: Optional[str]
+
+
+def build_tsquery_text(text: str, weights: str = "") -> Optional[str]:
+    """Prefix-match every word, optionally within the given weights: 'תל אביב' -> 'תל:*C & אביב:*C'."""
+    terms = _TERM.findall(_HEBREW_MARKS.sub("", text.lower()))
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*{weights}" for term in terms)
+
+
+def encode_cursor(created_at: datetime, lead_id: uuid.UUID) -> str:
+    payload = json.dumps([created_at.isoformat(), str(lead_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a cursor into (created_at, id); ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(lead_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def build_conditions(filters: Dict[str, Any]) -> List[Any]:
+    """Translate search filters into WHERE conditions on the leads table."""
+    conditions = [Lead.status == (filters.get("status") or LeadStatus.ACTIVE)]
+
+    if filters.get("query"):
+        tsquery_text = build_tsquery_text(filters["query"])
+        if tsquery_text:
+            conditions.append(
+                Lead.search_vector.op("@@")(func.to_tsquery(SEARCH_CONFIG, tsquery_text))
+            )
+
+    if filters.get("location"):
+        tsquery_text = build_tsquery_text(filters["location"], weights="C")
+        if tsquery_text:
+            conditions.append(
+                Lead.search_vector.op("@@")(func.to_tsquery(SEARCH_CONFIG, tsquery_text))
+            )
+
+    if filters.get("category"):
+        conditions.append(Lead.category == filters["category"])
+
+    if filters.get("lead_type"):
+        conditions.append(Lead.type == filters["lead_type"])
+
+    # Both budget bounds in one EXISTS over the referral details
+    budget_bounds = []
+    if filters.get("min_budget"):
+        budget_bounds.append(ProfessionalLead.estimated_budget >= filters["min_budget"])
+    if filters.get("max_budget"):
+        budget_bounds.append(ProfessionalLead.estimated_budget <= filters["max_budget"])
+    if budget_bounds:
+        conditions.append(Lead.professional_details.has(and_(*budget_bounds)))
+
+    if filters.get("created_after"):
+        conditions.append(Lead.created_at >= filters["created_after"])
+
+    if filters.get("created_before"):
+        conditions.append(Lead.created_at <= filters["created_before"])
+
+    return conditions
+
+
+def count_facets(db: Session, conditions: List[Any]) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """Total plus per-category and per-type counts of the matching leads, in one query."""
+    stmt = (
+        select(
+            Lead.category,
+            Lead.type,
+            func.grouping(Lead.category).label("category_grouped"),
+            func.grouping(Lead.type).label("type_grouped"),
+            func.count().label("count")
+        )
+        .where(and_(*conditions))
+        .group_by(func.grouping_sets(tuple_(Lead.category), tuple_(Lead.type), literal_column("()")))
+    )
+
+    total = 0
+    facets: Dict[str, Dict[str, int]] = {"categories": {}, "types": {}}
+    for row in db.execute(stmt):
+        if row.category_grouped and row.type_grouped:
+            total = row.count
+        elif row.type_grouped:
+            facets["categories"][row.category] = row.count
+        else:
+            facets["types"][row.type.value] = row.count
+    return total, facets
+
+
+def _facets_cache_key(filters: Dict[str, Any]) -> str:
+    selected = {key: filters.get(key) for key in FILTER_KEYS if filters.get(key) is not None}
+    digest = hashlib.sha1(
+        json.dumps(selected, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{FACETS_CACHE_PREFIX}{digest}"
+
+
+async def get_facets(
+    db: Session,
+    redis_client,
+    filters: Dict[str, Any],
+    conditions: List[Any]
+) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """Cached total and facets for a filter set; counted on a cache miss."""
+    cache_key = _facets_cache_key(filters)
+
+    if redis_client:
+        try:
+            cached = await redis_client.get(cache_key)
+            if cached:
+                data = json.loads(cached)
+                return data["total"], data["facets"]
+        except Exception as e:
+            logger.warning(f"Failed to read cached lead search facets: {e}")
+
+    total, facets = count_facets(db, conditions)
+
+    if redis_client:
+        try:
+            await redis_client.setex(
+                cache_key, FACETS_CACHE_TTL, json.dumps({"total": total, "facets": facets})
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache lead search facets: {e}")
+
+    return total, facets
+
+
+async def search_leads(
+    db: Session,
+    redis_client,
+    filters: Dict[str, Any],
+    cursor: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 20
+) -> LeadSearchPage:
+    """
+    Search leads newest first.
+
+    Args:
+        db: Database session
+        redis_client: Redis client for the facet cache (optional)
+        filters: Search filters (see FILTER_KEYS)
+        cursor: Cursor returned with the previous page
+        page: Page number, only used without a cursor (kept for older clients)
+        page_size: Items per page
+
+    Returns:
+        The page of leads, the total, the facets and the next page's cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    conditions = build_conditions(filters)
+    total, facets = await get_facets(db, redis_client, filters, conditions)
+
+    stmt = (
+        select(Lead)
+        .options(joinedload(Lead.professional_details))
+        .where(and_(*conditions))
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .limit(page_size + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(Lead.created_at, Lead.id) < tuple_(*decode_cursor(cursor)))
+    elif page > 1:
+        stmt = stmt.offset((page - 1) * page_size)
+
+    leads = list(db.execute(stmt).scalars().unique())
+    has_more = len(leads) > page_size
+    leads = leads[:page_size]
+
+    next_cursor = encode_cursor(leads[-1].created_at, leads[-1].id) if has_more and leads else None
+    return LeadSearchPage(leads, total, facets, next_cursor)
@@ -2,11 +2,11 @@
 
 import logging
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Optional, List, Dict, Any, Tuple
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, asc, func
+from sqlalchemy import and_, or_, desc, asc, func, insert, select
 
 import sys
 sys.path.append("/app/libs")
@@ -22,9 +22,37 @@ from models.leads import (
     HebrewCategories
 )
 from services.geo_service import IsraeliGeoService, LocationInfo
+from services import lead_search
+from services.lead_search import LeadSearchPage
+from services.notifications_client import get_notifications_client
+from python_shared.config.settings import get_settings
+from python_shared.cache import bump_leads_version
 
 logger = logging.getLogger(__name__)
 
+# Service radius for professionals who have not set one
+DEFAULT_SERVICE_RADIUS_KM = 25
+
+# Professionals without a geocoded service area located per fan-out
+LOCATE_BATCH_SIZE = 50
+
+# Locations the geocoder could not resolve are not retried before this
+GEOCODE_RETRY_AFTER = timedelta(days=1)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _distance_km(latitude: float, longitude: float):
+    """Haversine distance between a professional and a point, as SQL."""
+    dlat = func.radians(Professional.latitude - latitude) / 2
+    dlon = func.radians(Professional.longitude - longitude) / 2
+    a = (
+        func.power(func.sin(dlat), 2)
+        + func.cos(func.radians(latitude)) * func.cos(func.radians(Professional.latitude))
+        * func.power(func.sin(dlon), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
+
 
 class LeadService:
     """Lead service for business logic and data management."""
@@ -95,9 +123,10 @@ class LeadService:
                 self.db.add(professional_details)
             
             self.db.commit()
+            await self._invalidate_lead_boards()
             
-            # Create notifications for relevant professionals
-            await self._notify_relevant_professionals(lead, location_info)
+            # Professionals are notified after the commit by the caller
+            # (notify_relevant_professionals), outside this request
             
             # Log lead creation
             logger.info(
@@ -265,6 +294,7 @@ class LeadService:
                     
             lead.updated_at = datetime.utcnow()
             self.db.commit()
+            await self._invalidate_lead_boards()
             
             logger.info(f"Lead updated: {lead.id} by user {requesting_user.id}")
             
@@ -371,73 +401,43 @@ class LeadService:
         filters: Dict[str, Any],
         page: int = 1,
         page_size: int = 20,
-        requesting_user: Optional[User] = None
-    ) -> Tuple[List[LeadListItem], int]:
+        requesting_user: Optional[User] = None,
+        cursor: Optional[str] = None
+    ) -> LeadSearchPage:
         """
-        Search leads with filters and pagination.
+        Search leads with filters, facets and keyset pagination.
         
         Args:
             filters: Search filters
-            page: Page number (1-based)
+            page: Page number (1-based), used when no cursor is given
             page_size: Items per page
             requesting_user: User making the request
+            cursor: Cursor of the next page from a previous search
             
         Returns:
-            Tuple of (leads, total_count)
+            Page of list items with the total, facet counts and next cursor
+            
+        Raises:
+            ValueError: If the cursor is malformed
         """
         try:
-            query = self.db.query(Lead).options(
-                joinedload(Lead.professional_details)
-            )
-            
-            # Apply filters
-            if filters.get("category"):
-                query = query.filter(Lead.category == filters["category"])
-                
-            if filters.get("location"):
-                # Simple text search, in production use full-text search
-                query = query.filter(Lead.location.ilike(f"%{filters['location']}%"))
-                
-            if filters.get("lead_type"):
-                query = query.filter(Lead.type == filters["lead_type"])
-                
-            if filters.get("status"):
-                query = query.filter(Lead.status == filters["status"])
-            else:
-                # Default to active leads only
-                query = query.filter(Lead.status == LeadStatus.ACTIVE)
-                
-            if filters.get("min_budget"):
-                query = query.join(ProfessionalLead).filter(
-                    ProfessionalLead.estimated_budget >= filters["min_budget"]
-                )
-                
-            if filters.get("max_budget"):
-                query = query.join(ProfessionalLead).filter(
-                    ProfessionalLead.estimated_budget <= filters["max_budget"]
-                )
-                
-            if filters.get("created_after"):
-                query = query.filter(Lead.created_at >= filters["created_after"])
-                
-            if filters.get("created_before"):
-                query = query.filter(Lead.created_at <= filters["created_before"])
-                
             # Subscription filter
             if filters.get("subscription_filter") and requesting_user:
                 # In production, check actual subscription status
                 pass
                 
-            # Get total count
-            total_count = query.count()
-            
-            # Apply pagination and ordering
-            offset = (page - 1) * page_size
-            leads = query.order_by(desc(Lead.created_at)).offset(offset).limit(page_size).all()
+            result = await lead_search.search_leads(
+                self.db,
+                self.geo_service.redis_client,
+                filters,
+                cursor=cursor,
+                page=page,
+                page_size=page_size
+            )
             
             # Convert to response format
             lead_items = []
-            for lead in leads:
+            for lead in result.leads:
                 item_data = {
                     "id": lead.id,
                     "type": lead.type,
@@ -458,8 +458,10 @@ class LeadService:
                     
                 lead_items.append(LeadListItem(**item_data))
                 
-            return lead_items, total_count
+            return result._replace(leads=lead_items)
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Failed to search leads: {e}")
             raise
@@ -502,6 +504,7 @@ class LeadService:
             lead.updated_at = datetime.utcnow()
             
             self.db.commit()
+            await self._invalidate_lead_boards()
             
             logger.info(f"Lead closed: {lead.id} by user {requesting_user.id}")
             
@@ -512,53 +515,161 @@ class LeadService:
             logger.error(f"Failed to close lead {lead_id}: {e}")
             raise
             
-    async def _notify_relevant_professionals(
+    async def _invalidate_lead_boards(self) -> None:
+        """Mark cached Lead Boards stale after a lead changed."""
+        if self.geo_service.redis_client:
+            await bump_leads_version(self.geo_service.redis_client)
+            
+    async def notify_relevant_professionals(self, lead_id: uuid.UUID) -> int:
+        """
+        Fan a committed lead out to the professionals serving its category and area.
+        
+        Candidates come from an indexed (region / city, category) lookup and
+        are kept when the lead lies within their service radius. Their
+        notifications are inserted in one statement and handed to the
+        notifications service in one bulk call.
+        
+        Args:
+            lead_id: ID of the new lead
+            
+        Returns:
+            Number of professionals notified
+        """
+        lead = self.db.query(Lead).filter(Lead.id == lead_id).first()
+        if not lead:
+            return 0
+            
+        location_info = await self.geo_service.geocode_location(lead.location)
+        if not location_info:
+            logger.warning(f"Lead {lead_id} location could not be geocoded, nobody notified")
+            return 0
+            
+        category_match = or_(
+            Professional.profession == lead.category,
+            Professional.specialties.op('&&')([lead.category])
+        )
+        
+        await self._locate_professionals(category_match)
+        
+        user_ids = self._select_lead_recipients(lead, location_info, category_match)
+        if not user_ids:
+            return 0
+            
+        title = f"עבודה חדשה ב{HebrewCategories.get_hebrew_name(lead.category)}"
+        message = f"עבודה חדשה זמינה באזור {lead.location}: {lead.title}"
+        data = {
+            "lead_id": str(lead.id),
+            "category": lead.category,
+            "location": lead.location
+        }
+        
+        self.db.execute(
+            insert(Notification),
+            [
+                {
+                    "user_id": user_id,
+                    "type": NotificationType.NEW_LEAD,
+                    "title": title,
+                    "message": message,
+                    "data": data
+                }
+                for user_id in user_ids
+            ]
+        )
+        self.db.commit()
+        
+        # Channel delivery; the in-app notifications above are already saved
+        template_id = get_settings().new_lead_notification_template_id
+        if template_id:
+            try:
+                await get_notifications_client().send_bulk(
+                    [str(user_id) for user_id in user_ids],
+                    template_id,
+                    variables={**data, "title": lead.title}
+                )
+            except Exception as e:
+                logger.error(f"Failed to hand lead {lead_id} notifications to delivery: {e}")
+                
+        logger.info(f"Lead {lead_id} fanned out to {len(user_ids)} professionals")
+        return len(user_ids)
+        
+    async def _locate_professionals(self, category_match) -> None:
+        """
+        Geocode active professionals of the category lacking a service area.
+        
+        Every attempt is stamped on the professional, failed or not. Those
+        never tried come first and recent failures are skipped, so a batch of
+        unresolvable addresses cannot starve the rest of the category.
+        """
+        professionals = self.db.query(Professional).filter(
+            and_(
+                Professional.status == ProfessionalStatus.ACTIVE,
+                Professional.latitude.is_(None),
+                or_(
+                    Professional.geocode_attempted_at.is_(None),
+                    Professional.geocode_attempted_at < func.now() - GEOCODE_RETRY_AFTER
+                ),
+                category_match
+            )
+        ).order_by(
+            Professional.geocode_attempted_at.asc().nulls_first(),
+            Professional.id
+        ).limit(LOCATE_BATCH_SIZE).all()
+        
+        if not professionals:
+            return
+            
+        locations = await self.geo_service.batch_geocode(
+            list({professional.location for professional in professionals})
+        )
+        
+        for professional in professionals:
+            professional.geocode_attempted_at = func.now()
+            location_info = locations.get(professional.location)
+            if not location_info:
+                continue
+                
+            professional.city = location_info.city.lower().strip() if location_info.city else None
+            professional.region = location_info.region
+            professional.latitude = location_info.latitude
+            professional.longitude = location_info.longitude
+            if professional.service_radius_km is None:
+                professional.service_radius_km = await self.geo_service.get_professional_service_radius(
+                    location_info, DEFAULT_SERVICE_RADIUS_KM
+                )
+                
+        self.db.commit()
+        
+    def _select_lead_recipients(
         self,
         lead: Lead,
-        location_info: LocationInfo
-    ) -> None:
-        """Create notifications for professionals who might be interested."""
-        try:
-            # Find professionals in the same category and nearby location
-            professionals = self.db.query(Professional).filter(
-                and_(
-                    Professional.status == ProfessionalStatus.ACTIVE,
-                    or_(
-                        Professional.profession == lead.category,
-                        Professional.specialties.op('&&')([lead.category])
-                    )
-                )
-            ).limit(50).all()  # Limit to prevent spam
-            
-            for professional in professionals:
-                # Basic location matching (in production, use proper geo queries)
-                if professional.location and location_info.city:
-                    prof_location_info = await self.geo_service.geocode_location(
-                        professional.location
-                    )
-                    
-                    if prof_location_info and self.geo_service.is_same_city(
-                        location_info, prof_location_info
-                    ):
-                        # Create notification
-                        notification = Notification(
-                            user_id=professional.user_id,
-                            type=NotificationType.NEW_LEAD,
-                            title=f"עבודה חדשה ב{HebrewCategories.get_hebrew_name(lead.category)}",
-                            message=f"עבודה חדשה זמינה באזור {lead.location}: {lead.title}",
-                            data={
-                                "lead_id": str(lead.id),
-                                "category": lead.category,
-                                "location": lead.location
-                            }
-                        )
-                        
-                        self.db.add(notification)
-                        
-            self.db.commit()
+        location_info: LocationInfo,
+        category_match
+    ) -> List[uuid.UUID]:
+        """User IDs of active professionals whose service radius covers the lead."""
+        area = []
+        if location_info.region:
+            area.append(Professional.region == location_info.region)
+        if location_info.city:
+            area.append(Professional.city == location_info.city.lower().strip())
+        if not area:
+            return []
+            
+        conditions = [
+            Professional.status == ProfessionalStatus.ACTIVE,
+            or_(*area),
+            category_match,
+            _distance_km(location_info.latitude, location_info.longitude)
+            <= func.coalesce(Professional.service_radius_km, DEFAULT_SERVICE_RADIUS_KM)
+        ]
+        
+        # The creator does not need to hear about their own lead
+        if lead.created_by_professional_id:
+            conditions.append(Professional.id != lead.created_by_professional_id)
             
-        except Exception as e:
-            logger.error(f"Failed to create professional notifications: {e}")
+        return list(self.db.execute(
+            select(Professional.user_id).where(and_(*conditions))
+        ).scalars())
             
     async def _create_referral_notification(
         self,
@@ -645,6 +756,9 @@ class LeadService:
                 
             return lead_items, total_count
             
+        except ValueError:
+            raise
+            
         except Exception as e:
             logger.error(f"Failed to get user leads: {e}")
             raise
\ No newline at end of file
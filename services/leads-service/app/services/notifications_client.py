@@ -0,0 +1,89 @@
+"""Client for the notifications service."""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from jose import jwt
+
+import sys
+sys.path.append("/app/libs")
+from python_shared.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# BulkNotificationRequest accepts at most this many users per call
+BULK_MAX_RECIPIENTS = 1000
+SERVICE_TOKEN_TTL = timedelta(minutes=5)
+REQUEST_TIMEOUT = 10.0
+
+
+class NotificationsClient:
+    """Hands notifications to the notifications service for channel delivery."""
+
+    def __init__(self, base_url: str, jwt_secret_key: str, jwt_algorithm: str = "HS256"):
+        self.base_url = base_url.rstrip("/")
+        self.jwt_secret_key = jwt_secret_key
+        self.jwt_algorithm = jwt_algorithm
+
+    def _service_token(self) -> str:
+        """Short-lived token with the system role required for bulk sends."""
+        claims = {
+            "sub": "leads-service",
+            "role": "system",
+            "exp": datetime.utcnow() + SERVICE_TOKEN_TTL
+        }
+        return jwt.encode(claims, self.jwt_secret_key, algorithm=self.jwt_algorithm)
+
+    async def send_bulk(
+        self,
+        user_ids: List[str],
+        template_id: str,
+        variables: Optional[Dict[str, Any]] = None,
+        channels: Optional[List[str]] = None,
+        priority: str = "normal"
+    ) -> int:
+        """
+        Send one templated notification to many users.
+
+        Args:
+            user_ids: Recipients
+            template_id: Notifications service template
+            variables: Template variables, shared by all recipients
+            channels: Delivery channels (push by default)
+            priority: Delivery priority
+
+        Returns:
+            Number of notifications the service accepted
+        """
+        headers = {"Authorization": f"Bearer {self._service_token()}"}
+        accepted = 0
+
+        async with httpx.AsyncClient(
+            base_url=self.base_url, headers=headers, timeout=REQUEST_TIMEOUT
+        ) as client:
+            for i in range(0, len(user_ids), BULK_MAX_RECIPIENTS):
+                response = await client.post(
+                    "/notifications/send-bulk",
+                    json={
+                        "user_ids": user_ids[i:i + BULK_MAX_RECIPIENTS],
+                        "template_id": template_id,
+                        "channels": channels or ["push"],
+                        "variables": variables or {},
+                        "priority": priority
+                    }
+                )
+                response.raise_for_status()
+                accepted += len(response.json())
+
+        return accepted
+
+
+def get_notifications_client() -> NotificationsClient:
+    settings = get_settings()
+    return NotificationsClient(
+        settings.notifications_service_url,
+        settings.jwt_secret_key,
+        settings.jwt_algorithm
+    )
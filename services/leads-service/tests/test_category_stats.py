@@ -0,0 +1,341 @@
+"""
+Lead category rollup tests.
+
+Test Coverage:
+- refresh_lead_category_stats() against the GROUP BY / COUNT queries the
+  Lead Board stats and recommendations used to run per request
+- Budget percentiles and proposals per lead
+- CategoryStatsRefresher: one replica per interval through the Redis lock,
+  refreshing without Redis, surviving failed refreshes, start and stop
+
+The rollup tests need PostgreSQL: set TEST_DATABASE_URL to an empty database
+with the extensions from scripts/init_database.sql to run them. They are
+skipped otherwise.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import and_, cast, create_engine, Date, func, text
+from sqlalchemy.orm import Session
+
+import sys
+sys.path.append("/app/libs")
+from python_shared.database.base import Base
+from python_shared.database.models import (
+    User, Professional, Lead, ProfessionalLead, Proposal,
+    LeadCategoryStats, LeadCategoryDay,
+    UserRole, LeadType, LeadStatus, ProfessionalStatus, ProposalStatus
+)
+
+from app.services.category_stats import CategoryStatsRefresher, REFRESH_LOCK_KEY
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+requires_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+# The function compares with now(), so the leads are placed relative to it,
+# away from the edges of the 30 and 366 day windows
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Engine on a freshly created schema."""
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Session whose commits are rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def consumer(db_session):
+    user = User(id=uuid.uuid4(), name="לקוח", role=UserRole.CONSUMER)
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+@pytest.fixture
+def professionals(db_session):
+    result = []
+    for i in range(3):
+        user = User(id=uuid.uuid4(), name=f"בעל מקצוע {i}", role=UserRole.PROFESSIONAL)
+        db_session.add(user)
+        db_session.flush()
+        professional = Professional(
+            id=uuid.uuid4(), user_id=user.id, profession="renovation",
+            location="תל אביב", status=ProfessionalStatus.ACTIVE
+        )
+        db_session.add(professional)
+        result.append(professional)
+    db_session.flush()
+    return result
+
+
+def _lead(db_session, creator, category, created_at, status=LeadStatus.ACTIVE, budget=None):
+    lead = Lead(
+        id=uuid.uuid4(),
+        type=LeadType.PROFESSIONAL_REFERRAL if budget is not None else LeadType.CONSUMER,
+        title="עבודה",
+        short_description="מחפש בעל מקצוע",
+        category=category,
+        location="תל אביב",
+        status=status,
+        created_by_user_id=creator.id,
+        created_at=created_at
+    )
+    db_session.add(lead)
+    db_session.flush()
+
+    if budget is not None:
+        db_session.add(ProfessionalLead(
+            id=uuid.uuid4(), lead_id=lead.id, client_name="לקוח", client_phone="0501234567",
+            estimated_budget=Decimal(budget)
+        ))
+        db_session.flush()
+    return lead
+
+
+def _proposal(db_session, lead, professional, status=ProposalStatus.PENDING):
+    db_session.add(Proposal(
+        id=uuid.uuid4(), lead_id=lead.id, professional_id=professional.id,
+        price=Decimal("500"), description="הצעה", status=status
+    ))
+    db_session.flush()
+
+
+@pytest.fixture
+def leads(db_session, consumer, professionals):
+    """Leads across categories, ages, statuses and budgets, some with proposals."""
+    created = []
+    for days, category, status, budget in [
+        (0, "renovation", LeadStatus.ACTIVE, "1000"),
+        (1, "renovation", LeadStatus.ACTIVE, "2500"),
+        (1, "renovation", LeadStatus.ACTIVE, None),
+        (5, "renovation", LeadStatus.ACTIVE, "4000"),
+        (12, "renovation", LeadStatus.ACTIVE, "10000"),
+        (20, "renovation", LeadStatus.CLOSED, "99999"),
+        (2, "plumbing", LeadStatus.ACTIVE, None),
+        (2, "plumbing", LeadStatus.ACTIVE, None),
+        (29, "plumbing", LeadStatus.ACTIVE, "300"),
+        (3, "electricity", LeadStatus.ACTIVE, "750.50"),
+        (45, "electricity", LeadStatus.ACTIVE, "5000"),
+        (200, "painting", LeadStatus.ACTIVE, None),
+        (400, "painting", LeadStatus.ACTIVE, None),
+    ]:
+        created.append(_lead(
+            db_session, consumer, category, NOW - timedelta(days=days, hours=1), status, budget
+        ))
+
+    for lead_index, professional_count in [(0, 3), (1, 1), (6, 2), (9, 1), (10, 2), (5, 1)]:
+        for professional in professionals[:professional_count]:
+            _proposal(db_session, created[lead_index], professional)
+
+    db_session.execute(text("SELECT refresh_lead_category_stats()"))
+    return created
+
+
+def _percentile(values, fraction):
+    """percentile_cont: linear interpolation between the closest ranks."""
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@requires_postgres
+class TestCategoryStatsRollup:
+    """Rollups rebuilt by refresh_lead_category_stats()."""
+
+    def test_stats_match_the_group_by_query(self, db_session, leads):
+        since = NOW - timedelta(days=30)
+        # The recommendations query before the rollup
+        expected = {
+            category: (count, round(avg_budget, 2) if avg_budget is not None else None)
+            for category, count, avg_budget in db_session.query(
+                Lead.category,
+                func.count(Lead.id),
+                func.avg(ProfessionalLead.estimated_budget)
+            ).outerjoin(ProfessionalLead).filter(
+                and_(
+                    Lead.status == LeadStatus.ACTIVE,
+                    Lead.created_at >= since
+                )
+            ).group_by(Lead.category).all()
+        }
+
+        stats = {
+            row.category: (row.recent_leads_count, row.avg_budget)
+            for row in db_session.query(LeadCategoryStats).all()
+        }
+
+        assert stats == expected
+        assert stats["renovation"] == (5, Decimal("4375.00"))
+        assert stats["plumbing"] == (3, Decimal("300.00"))
+        assert "painting" not in stats
+
+    def test_days_match_the_stats_count_per_window(self, db_session, leads):
+        today = NOW.date()
+        for days_back in (1, 3, 7, 30, 365):
+            since = today - timedelta(days=days_back - 1)
+            for category in ("renovation", "plumbing", "electricity", "painting"):
+                # The Lead Board stats count, over whole UTC days
+                expected = db_session.query(func.count(Lead.id)).filter(
+                    and_(
+                        Lead.status == LeadStatus.ACTIVE,
+                        Lead.category == category,
+                        cast(func.timezone("UTC", Lead.created_at), Date) >= since
+                    )
+                ).scalar()
+
+                rolled_up = db_session.query(
+                    func.coalesce(func.sum(LeadCategoryDay.active_leads_count), 0)
+                ).filter(
+                    and_(
+                        LeadCategoryDay.category == category,
+                        LeadCategoryDay.day >= since
+                    )
+                ).scalar()
+
+                assert rolled_up == expected, (category, days_back)
+
+    def test_budget_percentiles_and_competition(self, db_session, leads):
+        renovation = db_session.query(LeadCategoryStats).filter_by(category="renovation").one()
+        budgets = [1000.0, 2500.0, 4000.0, 10000.0]
+
+        assert float(renovation.median_budget) == round(_percentile(budgets, 0.5), 2)
+        assert float(renovation.p90_budget) == round(_percentile(budgets, 0.9), 2)
+        # Proposals on the five recent active leads: 3 + 1 + 0 + 0 + 0
+        assert renovation.proposals_count == 4
+        assert renovation.competition_ratio == Decimal("0.80")
+
+        plumbing = db_session.query(LeadCategoryStats).filter_by(category="plumbing").one()
+        assert plumbing.proposals_count == 2
+        assert plumbing.competition_ratio == Decimal("0.67")
+
+    def test_refresh_replaces_the_previous_rows(self, db_session, leads, consumer):
+        _lead(db_session, consumer, "gardening", NOW - timedelta(hours=2), budget="800")
+        leads[6].status = LeadStatus.CLOSED
+        db_session.flush()
+
+        db_session.execute(text("SELECT refresh_lead_category_stats()"))
+
+        stats = {row.category: row.recent_leads_count for row in db_session.query(LeadCategoryStats).all()}
+        assert stats["gardening"] == 1
+        assert stats["plumbing"] == 2
+        assert db_session.query(func.count(LeadCategoryStats.id)).scalar() == len(stats)
+
+
+class FakeRedis:
+    """SET NX shared by the replicas; expiry is left to the test."""
+
+    def __init__(self):
+        self.keys = {}
+        self.expiries = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        self.expiries.append(ex)
+        return True
+
+
+class BrokenRedis:
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("redis unavailable")
+
+
+async def _run_for(refreshers, redis_client, seconds=0.05):
+    for refresher in refreshers:
+        refresher.start(redis_client)
+    await asyncio.sleep(seconds)
+    for refresher in refreshers:
+        await refresher.stop()
+
+
+@pytest.mark.asyncio
+class TestCategoryStatsRefresher:
+    """Lock, skip and lifecycle of the background refresh."""
+
+    async def test_one_replica_refreshes_per_interval(self):
+        redis_client = FakeRedis()
+        replicas = [CategoryStatsRefresher(interval_seconds=60) for _ in range(3)]
+        for replica in replicas:
+            replica.refresh = AsyncMock()
+
+        await _run_for(replicas, redis_client)
+
+        assert sum(replica.refresh.await_count for replica in replicas) == 1
+        assert redis_client.keys == {REFRESH_LOCK_KEY: "1"}
+        # The lock expires before the next interval starts
+        assert redis_client.expiries == [55]
+
+    async def test_held_lock_skips_the_refresh(self):
+        redis_client = FakeRedis()
+        redis_client.keys[REFRESH_LOCK_KEY] = "1"
+        refresher = CategoryStatsRefresher(interval_seconds=60)
+        refresher.refresh = AsyncMock()
+
+        await _run_for([refresher], redis_client)
+
+        refresher.refresh.assert_not_awaited()
+
+    async def test_refreshes_without_redis(self):
+        refresher = CategoryStatsRefresher(interval_seconds=60)
+        refresher.refresh = AsyncMock()
+
+        await _run_for([refresher], BrokenRedis())
+
+        refresher.refresh.assert_awaited_once()
+
+    async def test_failed_refresh_keeps_the_loop_running(self):
+        refresher = CategoryStatsRefresher(interval_seconds=0.01)
+        refresher.refresh = AsyncMock(side_effect=RuntimeError("deadlock"))
+
+        refresher.start(BrokenRedis())
+        while refresher.refresh.await_count < 3:
+            await asyncio.sleep(0.01)
+
+        assert refresher.running
+        await refresher.stop()
+
+    async def test_start_and_stop(self):
+        refresher = CategoryStatsRefresher(interval_seconds=60)
+        refresher.refresh = AsyncMock()
+
+        await refresher.stop()
+        refresher.start(FakeRedis())
+        worker = refresher._worker
+        refresher.start(FakeRedis())
+
+        assert refresher._worker is worker
+        await refresher.stop()
+        assert not refresher.running
+        assert refresher._worker is None
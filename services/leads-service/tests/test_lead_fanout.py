@@ -0,0 +1,274 @@
+"""
+New-lead fan-out tests against PostgreSQL.
+
+Test Coverage:
+- Recipient selection by category, area, service radius and status
+- One bulk INSERT of in-app notifications per lead
+- Geocoding of professionals without a service area, including failures
+
+Recipient selection uses PostgreSQL array operators, so these tests need a
+real database: set TEST_DATABASE_URL to an empty database with the
+extensions from scripts/init_database.sql. They are skipped otherwise.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import sys
+sys.path.append("/root/repos/ofair_mvp/libs")
+from python_shared.database.base import Base
+from python_shared.database.models import (
+    User, Professional, Lead, Notification,
+    UserRole, LeadType, LeadStatus, ProfessionalStatus, NotificationType
+)
+
+from app.services import lead_service as lead_service_module
+from app.services.lead_service import LeadService
+from app.services.geo_service import LocationInfo
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+TEL_AVIV = LocationInfo(latitude=32.0853, longitude=34.7818, address="תל אביב", city="תל אביב", region="מרכז")
+RAMAT_GAN = LocationInfo(latitude=32.0678, longitude=34.8245, address="רמת גן", city="רמת גן", region="מרכז")
+HAIFA = LocationInfo(latitude=32.7940, longitude=34.9896, address="חיפה", city="חיפה", region="צפון")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Engine on a freshly created schema."""
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Session whose commits are rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def geo_service():
+    """Geo service that resolves known test locations only."""
+    known = {"תל אביב": TEL_AVIV, "רמת גן": RAMAT_GAN, "חיפה": HAIFA}
+
+    async def batch_geocode(addresses, use_cache=True):
+        return {address: known.get(address) for address in addresses}
+
+    geo_service = Mock()
+    geo_service.redis_client = None
+    geo_service.geocode_location = AsyncMock(side_effect=lambda address, *args: known.get(address))
+    geo_service.batch_geocode = AsyncMock(side_effect=batch_geocode)
+    geo_service.get_professional_service_radius = AsyncMock(return_value=25)
+    return geo_service
+
+
+@pytest.fixture
+def lead_service(db_session, geo_service):
+    """Lead service without channel delivery."""
+    settings = Mock(new_lead_notification_template_id=None)
+    with patch.object(lead_service_module, "get_settings", return_value=settings):
+        yield LeadService(db_session, geo_service)
+
+
+def _professional(db_session, location, profession="renovation", located=None,
+                  status=ProfessionalStatus.ACTIVE, **fields):
+    user = User(id=uuid.uuid4(), name="בעל מקצוע", role=UserRole.PROFESSIONAL)
+    db_session.add(user)
+    db_session.flush()
+
+    professional = Professional(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        profession=profession,
+        location=location,
+        status=status,
+        **fields
+    )
+    if located:
+        professional.city = located.city
+        professional.region = located.region
+        professional.latitude = located.latitude
+        professional.longitude = located.longitude
+    db_session.add(professional)
+    db_session.flush()
+    return professional
+
+
+def _lead(db_session, location="תל אביב", category="renovation", created_by_professional=None):
+    user = User(id=uuid.uuid4(), name="לקוח", role=UserRole.CONSUMER)
+    db_session.add(user)
+    db_session.flush()
+
+    lead = Lead(
+        id=uuid.uuid4(),
+        type=LeadType.CONSUMER,
+        title="שיפוץ דירה",
+        short_description="מחפש קבלן",
+        category=category,
+        location=location,
+        status=LeadStatus.ACTIVE,
+        created_by_user_id=user.id,
+        created_by_professional_id=created_by_professional.id if created_by_professional else None
+    )
+    db_session.add(lead)
+    db_session.commit()
+    return lead
+
+
+def _notified_user_ids(db_session, lead):
+    notifications = db_session.execute(select(Notification)).scalars().all()
+    return {
+        notification.user_id for notification in notifications
+        if notification.data and notification.data.get("lead_id") == str(lead.id)
+    }
+
+
+class TestRecipientSelection:
+    """Test which professionals hear about a new lead."""
+
+    @pytest.mark.asyncio
+    async def test_notifies_matching_professionals_only(self, db_session, lead_service):
+        nearby = _professional(db_session, "תל אביב", located=TEL_AVIV)
+        specialist = _professional(
+            db_session, "רמת גן", profession="handyman", specialties=["renovation"], located=RAMAT_GAN
+        )
+        far_away = _professional(
+            db_session, "חיפה", located=LocationInfo(
+                latitude=HAIFA.latitude, longitude=HAIFA.longitude,
+                address="חיפה", city="תל אביב", region="מרכז"
+            )
+        )
+        other_category = _professional(db_session, "תל אביב", profession="plumbing", located=TEL_AVIV)
+        inactive = _professional(
+            db_session, "תל אביב", status=ProfessionalStatus.SUSPENDED, located=TEL_AVIV
+        )
+        lead = _lead(db_session)
+
+        notified = await lead_service.notify_relevant_professionals(lead.id)
+
+        assert notified == 2
+        recipients = _notified_user_ids(db_session, lead)
+        assert recipients == {nearby.user_id, specialist.user_id}
+        assert far_away.user_id not in recipients
+        assert other_category.user_id not in recipients
+        assert inactive.user_id not in recipients
+
+    @pytest.mark.asyncio
+    async def test_creator_is_not_notified(self, db_session, lead_service):
+        creator = _professional(db_session, "תל אביב", located=TEL_AVIV)
+        colleague = _professional(db_session, "תל אביב", located=TEL_AVIV)
+        lead = _lead(db_session, created_by_professional=creator)
+
+        await lead_service.notify_relevant_professionals(lead.id)
+
+        assert _notified_user_ids(db_session, lead) == {colleague.user_id}
+
+    @pytest.mark.asyncio
+    async def test_notifications_are_inserted_in_bulk(self, db_session, lead_service):
+        professionals = [_professional(db_session, "תל אביב", located=TEL_AVIV) for _ in range(3)]
+        lead = _lead(db_session)
+
+        statements = []
+        execute = db_session.execute
+
+        def record(statement, *args, **kwargs):
+            statements.append((statement, args))
+            return execute(statement, *args, **kwargs)
+
+        with patch.object(db_session, "execute", side_effect=record):
+            await lead_service.notify_relevant_professionals(lead.id)
+
+        inserts = [
+            args for statement, args in statements
+            if getattr(statement, "is_insert", False) and statement.table.name == "notifications"
+        ]
+        assert len(inserts) == 1
+        assert len(inserts[0][0]) == 3
+
+        notifications = db_session.execute(select(Notification)).scalars().all()
+        assert {n.user_id for n in notifications} == {p.user_id for p in professionals}
+        assert all(n.type == NotificationType.NEW_LEAD for n in notifications)
+
+    @pytest.mark.asyncio
+    async def test_ungeocodable_lead_notifies_nobody(self, db_session, lead_service):
+        _professional(db_session, "תל אביב", located=TEL_AVIV)
+        lead = _lead(db_session, location="מקום לא ידוע")
+
+        assert await lead_service.notify_relevant_professionals(lead.id) == 0
+
+
+class TestLocateProfessionals:
+    """Test geocoding of professionals without a service area."""
+
+    @pytest.mark.asyncio
+    async def test_professionals_are_located_on_first_use(self, db_session, lead_service):
+        professional = _professional(db_session, "רמת גן")
+        lead = _lead(db_session)
+
+        await lead_service.notify_relevant_professionals(lead.id)
+
+        db_session.refresh(professional)
+        assert professional.latitude == RAMAT_GAN.latitude
+        assert professional.region == "מרכז"
+        assert professional.service_radius_km == 25
+        assert professional.geocode_attempted_at is not None
+        assert _notified_user_ids(db_session, lead) == {professional.user_id}
+
+    @pytest.mark.asyncio
+    async def test_failed_geocode_is_recorded_and_not_retried(self, db_session, lead_service, geo_service):
+        unresolvable = _professional(db_session, "כתובת שגויה")
+        lead = _lead(db_session)
+
+        await lead_service.notify_relevant_professionals(lead.id)
+
+        db_session.refresh(unresolvable)
+        assert unresolvable.latitude is None
+        assert unresolvable.geocode_attempted_at is not None
+
+        geo_service.batch_geocode.reset_mock()
+        await lead_service.notify_relevant_professionals(lead.id)
+        geo_service.batch_geocode.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failures_do_not_starve_the_category(self, db_session, lead_service, geo_service):
+        stale_failure = _professional(
+            db_session, "כתובת שגויה",
+            geocode_attempted_at=datetime.now(timezone.utc) - timedelta(days=2)
+        )
+        never_tried = _professional(db_session, "רמת גן")
+        category_match = Professional.profession == "renovation"
+
+        with patch.object(lead_service_module, "LOCATE_BATCH_SIZE", 1):
+            await lead_service._locate_professionals(category_match)
+            geo_service.batch_geocode.assert_awaited_once_with(["רמת גן"])
+
+            await lead_service._locate_professionals(category_match)
+            geo_service.batch_geocode.assert_awaited_with(["כתובת שגויה"])
+
+        db_session.refresh(never_tried)
+        db_session.refresh(stale_failure)
+        assert never_tried.latitude == RAMAT_GAN.latitude
+        assert stale_failure.geocode_attempted_at > datetime.now(timezone.utc) - timedelta(hours=1)
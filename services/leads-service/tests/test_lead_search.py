@@ -0,0 +1,355 @@
+"""
+Lead search tests.
+
+Test Coverage:
+- tsquery text, cursors and filter conditions (no database needed)
+- Total and category / type facets from one GROUPING SETS query
+- Keyset pages over ties in created_at, and the facet cache
+- LeadService.search_leads and get_user_leads list items
+
+Full-text matching, GROUPING SETS and row comparison need PostgreSQL: set
+TEST_DATABASE_URL to an empty database with the extensions from
+scripts/init_database.sql to run those tests. They are skipped otherwise.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import and_, create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+import sys
+sys.path.append("/app/libs")
+from python_shared.database.base import Base
+from python_shared.database.models import (
+    User, Lead, ProfessionalLead, UserRole, LeadType, LeadStatus
+)
+
+from app.services import lead_search
+from app.services.lead_search import (
+    build_conditions,
+    build_tsquery_text,
+    count_facets,
+    decode_cursor,
+    encode_cursor,
+)
+from app.services.lead_service import LeadService
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+requires_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(conditions) -> str:
+    return str(
+        select(Lead.id).where(and_(*conditions)).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+class TestTsqueryText:
+    """Free text to prefix tsquery terms."""
+
+    def test_every_word_is_a_prefix_term(self):
+        assert build_tsquery_text("שיפוץ מטבח") == "שיפוץ:* & מטבח:*"
+
+    def test_weights_restrict_terms(self):
+        assert build_tsquery_text("תל אביב", weights="C") == "תל:*C & אביב:*C"
+
+    def test_niqqud_case_and_punctuation_are_dropped(self):
+        assert build_tsquery_text("שִׁיפּוּץ, Kitchen!") == "שיפוץ:* & kitchen:*"
+
+    def test_text_without_words(self):
+        assert build_tsquery_text("  ?! ") is None
+        assert build_tsquery_text("") is None
+
+
+class TestCursor:
+    """Opaque keyset cursors."""
+
+    def test_round_trip(self):
+        lead_id = uuid.uuid4()
+        cursor = encode_cursor(NOW, lead_id)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (NOW, lead_id)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(NOW, uuid.uuid4())[:-4]])
+    def test_malformed_cursor(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestBuildConditions:
+    """Search filters to WHERE conditions."""
+
+    def test_active_leads_by_default(self):
+        sql = _sql(build_conditions({}))
+
+        assert "leads.status = 'ACTIVE'" in sql
+        assert "@@" not in sql
+
+    def test_requested_status(self):
+        assert "leads.status = 'CLOSED'" in _sql(build_conditions({"status": LeadStatus.CLOSED}))
+
+    def test_query_and_location_match_the_search_document(self):
+        compiled = select(Lead.id).where(
+            and_(*build_conditions({"query": "שיפוץ", "location": "תל אביב"}))
+        ).compile(dialect=postgresql.dialect())
+
+        assert str(compiled).count("leads.search_vector @@ to_tsquery") == 2
+        assert {"שיפוץ:*", "תל:*C & אביב:*C"} <= set(compiled.params.values())
+
+    def test_query_without_words_is_ignored(self):
+        assert "@@" not in _sql(build_conditions({"query": "!!"}))
+
+    def test_budget_bounds_share_one_exists(self):
+        sql = _sql(build_conditions({"min_budget": 1000, "max_budget": 5000}))
+
+        assert sql.count("EXISTS") == 1
+        assert "professional_leads.estimated_budget >= 1000" in sql
+        assert "professional_leads.estimated_budget <= 5000" in sql
+
+    def test_exact_filters(self):
+        sql = _sql(build_conditions({
+            "category": "plumbing",
+            "lead_type": LeadType.PROFESSIONAL_REFERRAL,
+            "created_after": NOW - timedelta(days=7),
+            "created_before": NOW
+        }))
+
+        assert "leads.category = 'plumbing'" in sql
+        assert "leads.type = 'PROFESSIONAL_REFERRAL'" in sql
+        assert "leads.created_at >=" in sql
+        assert "leads.created_at <=" in sql
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Engine on a freshly created schema."""
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Session whose commits are rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def consumer(db_session):
+    user = User(id=uuid.uuid4(), name="לקוח", role=UserRole.CONSUMER)
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+def _lead(db_session, creator, title="שיפוץ דירה", category="renovation",
+          location="תל אביב", lead_type=LeadType.CONSUMER, status=LeadStatus.ACTIVE,
+          created_at=NOW, budget=None):
+    lead = Lead(
+        id=uuid.uuid4(),
+        type=lead_type,
+        title=title,
+        short_description="מחפש בעל מקצוע",
+        category=category,
+        location=location,
+        status=status,
+        created_by_user_id=creator.id,
+        created_at=created_at
+    )
+    db_session.add(lead)
+    db_session.flush()
+
+    if budget is not None:
+        db_session.add(ProfessionalLead(
+            id=uuid.uuid4(), lead_id=lead.id, client_name="לקוח", client_phone="0501234567",
+            estimated_budget=Decimal(budget)
+        ))
+        db_session.flush()
+    return lead
+
+
+async def _search(db_session, filters, cursor=None, page_size=20, redis_client=None):
+    return await lead_search.search_leads(
+        db_session, redis_client, filters, cursor=cursor, page_size=page_size
+    )
+
+
+@requires_postgres
+class TestFacets:
+    """Total and facets from one GROUPING SETS query."""
+
+    def test_facets_match_group_by_counts(self, db_session, consumer):
+        for category, lead_type in [
+            ("renovation", LeadType.CONSUMER),
+            ("renovation", LeadType.PROFESSIONAL_REFERRAL),
+            ("renovation", LeadType.CONSUMER),
+            ("plumbing", LeadType.CONSUMER),
+            ("electricity", LeadType.PROFESSIONAL_REFERRAL),
+        ]:
+            _lead(db_session, consumer, category=category, lead_type=lead_type)
+        _lead(db_session, consumer, category="plumbing", status=LeadStatus.CLOSED)
+        db_session.commit()
+
+        total, facets = count_facets(db_session, build_conditions({}))
+
+        assert total == 5
+        assert facets == {
+            "categories": {"renovation": 3, "plumbing": 1, "electricity": 1},
+            "types": {"consumer": 3, "professional_referral": 2}
+        }
+
+    def test_facets_follow_the_filters(self, db_session, consumer):
+        _lead(db_session, consumer, title="תיקון נזילה", category="plumbing")
+        _lead(db_session, consumer, title="תיקון חשמל", category="electricity", location="חיפה")
+        _lead(db_session, consumer, title="צביעת דירה", category="painting")
+        db_session.commit()
+
+        total, facets = count_facets(db_session, build_conditions({"query": "תיק", "location": "תל"}))
+
+        assert total == 1
+        assert facets == {"categories": {"plumbing": 1}, "types": {"consumer": 1}}
+
+    def test_no_matches(self, db_session):
+        total, facets = count_facets(db_session, build_conditions({"query": "אין"}))
+
+        assert total == 0
+        assert facets == {"categories": {}, "types": {}}
+
+
+@requires_postgres
+@pytest.mark.asyncio
+class TestKeysetPages:
+    """Newest first, continued by cursor."""
+
+    async def test_pages_cover_every_lead_once_in_order(self, db_session, consumer):
+        # Pairs of leads share a created_at, so the id breaks ties
+        leads = [
+            _lead(db_session, consumer, created_at=NOW - timedelta(minutes=i // 2))
+            for i in range(7)
+        ]
+        _lead(db_session, consumer, category="plumbing")
+        db_session.commit()
+
+        expected = [
+            lead.id for lead in sorted(leads, key=lambda lead: (lead.created_at, lead.id), reverse=True)
+        ]
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = await _search(db_session, {"category": "renovation"}, cursor=cursor, page_size=3)
+            seen += [lead.id for lead in page.leads]
+            pages += 1
+            assert page.total == 7
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == expected
+        assert pages == 3
+
+    async def test_last_full_page_has_no_cursor(self, db_session, consumer):
+        for i in range(3):
+            _lead(db_session, consumer, created_at=NOW - timedelta(minutes=i))
+        db_session.commit()
+
+        page = await _search(db_session, {}, page_size=3)
+
+        assert len(page.leads) == 3
+        assert page.next_cursor is None
+
+    async def test_budget_filter(self, db_session, consumer):
+        cheap = _lead(db_session, consumer, budget="800")
+        mid = _lead(db_session, consumer, budget="3000")
+        _lead(db_session, consumer, budget="9000")
+        _lead(db_session, consumer)
+        db_session.commit()
+
+        page = await _search(db_session, {"min_budget": 500, "max_budget": 5000})
+
+        assert {lead.id for lead in page.leads} == {cheap.id, mid.id}
+        assert page.total == 2
+
+    async def test_facets_are_cached_per_filter_set(self, db_session, consumer):
+        fakeredis = pytest.importorskip("fakeredis")
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        _lead(db_session, consumer)
+        db_session.commit()
+
+        first = await _search(db_session, {}, redis_client=redis_client)
+        _lead(db_session, consumer)
+        db_session.commit()
+        second = await _search(db_session, {}, redis_client=redis_client)
+        other = await _search(db_session, {"category": "renovation"}, redis_client=redis_client)
+
+        assert first.total == second.total == 1
+        assert len(second.leads) == 2
+        assert other.total == 2
+
+
+@requires_postgres
+@pytest.mark.asyncio
+class TestLeadServiceListings:
+    """List items returned by LeadService."""
+
+    @pytest.fixture
+    def service(self, db_session):
+        return LeadService(db_session, Mock(redis_client=None))
+
+    async def test_search_leads_returns_masked_items(self, service, db_session, consumer):
+        _lead(db_session, consumer, title="שיפוץ מטבח", budget="2500")
+        db_session.commit()
+
+        result = await service.search_leads({"query": "מטבח"})
+
+        assert result.total == 1
+        assert result.leads[0].title == "שיפוץ מטבח"
+        assert result.leads[0].creator_masked is True
+        assert result.leads[0].estimated_budget == Decimal("2500.00")
+
+    async def test_get_user_leads_returns_own_leads_and_total(self, service, db_session, consumer):
+        other = User(id=uuid.uuid4(), name="אחר", role=UserRole.CONSUMER)
+        db_session.add(other)
+        db_session.flush()
+
+        _lead(db_session, consumer, title="שיפוץ מטבח", created_at=NOW)
+        _lead(db_session, consumer, title="תיקון חשמל", created_at=NOW - timedelta(hours=1))
+        _lead(db_session, consumer, title="צביעה", status=LeadStatus.CLOSED)
+        _lead(db_session, other, title="צביעת דירה")
+        db_session.commit()
+
+        items, total = await service.get_user_leads(consumer, status=LeadStatus.ACTIVE, page_size=1)
+
+        assert total == 2
+        assert [item.title for item in items] == ["שיפוץ מטבח"]
+        assert items[0].creator_masked is False
+
+        items, total = await service.get_user_leads(consumer, page=2, page_size=2)
+
+        assert total == 3
+        assert len(items) == 1
@@ -4,6 +4,8 @@ from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, timedelta
 import logging
 
+from python_shared.monitoring import asyncpg_connection_class
+
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -23,7 +25,8 @@ class NotificationsDatabase:
                 database=settings.POSTGRES_DB,
                 min_size=5,
                 max_size=20,
-                command_timeout=30
+                command_timeout=30,
+                connection_class=asyncpg_connection_class()
             )
             logger.info("Connected to notifications database")
         except Exception as e:
@@ -27,6 +27,7 @@ from services.delivery_service import DeliveryService
 from services.preferences_service import PreferencesService
 from middleware.auth import verify_jwt_token
 from config import settings
+from python_shared.monitoring import setup_metrics
 
 app = FastAPI(
     title="OFAIR Notifications Service",
@@ -34,6 +35,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "notifications-service")
+
 security = HTTPBearer()
 
 @app.post("/notifications/send", response_model=NotificationResponse)
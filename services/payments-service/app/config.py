@@ -44,6 +44,12 @@ class Settings(BaseSettings):
     # Balance settings
     minimum_payout_amount: float = 100.0  # Minimum ₪100 for payout
     settlement_hold_days: int = 7  # Hold payments for 7 days
+
+    # Bulk payout settings
+    payout_batch_size: int = 500  # Payouts claimed per UPDATE statement
+    payout_files_dir: Optional[str] = None  # Defaults to the system temp dir
+    masav_institution_code: str = "00000000"
+    masav_sender_name: str = "OFAIR"
     
     # File storage
     s3_bucket_name: str = "ofair-documents"
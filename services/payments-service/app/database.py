@@ -5,6 +5,8 @@ from datetime import datetime
 import os
 from contextlib import asynccontextmanager
 
+from python_shared.monitoring import asyncpg_connection_class
+
 class DatabaseConnection:
     def __init__(self):
         self.pool = None
@@ -26,7 +28,8 @@ class DatabaseConnection:
             self.connection_string,
             min_size=5,
             max_size=20,
-            command_timeout=60
+            command_timeout=60,
+            connection_class=asyncpg_connection_class()
         )
     
     async def close_pool(self):
@@ -319,6 +322,157 @@ class DatabaseConnection:
             )
             return dict(row) if row else None
     
+    # Payout operations
+    async def get_pending_payouts_page(
+        self,
+        limit: int,
+        after: Optional[tuple] = None,
+        payout_method: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        קבלת עמוד תשלומים יוצאים בהמתנה - Keyset page of pending payouts
+
+        Rows are ordered by (bank_code, created_at, id) so that consecutive
+        pages stay grouped by destination bank. `after` is the key of the last
+        row of the previous page.
+        """
+        async with self.get_connection() as conn:
+            where_clauses = ["p.status = 'pending'"]
+            params: List[Any] = []
+            param_count = 1
+
+            if payout_method:
+                where_clauses.append(f"p.payout_method = ${param_count}")
+                params.append(payout_method)
+                param_count += 1
+
+            if after:
+                where_clauses.append(
+                    f"(COALESCE(p.bank_details->>'bank_code', ''), p.created_at, p.id) > "
+                    f"(${param_count}, ${param_count + 1}, ${param_count + 2})"
+                )
+                params.extend(after)
+                param_count += 3
+
+            params.append(limit)
+
+            query = f"""
+                SELECT p.*, COALESCE(p.bank_details->>'bank_code', '') AS bank_code
+                FROM payouts p
+                WHERE {' AND '.join(where_clauses)}
+                ORDER BY bank_code, p.created_at, p.id
+                LIMIT ${param_count}
+            """
+
+            rows = await conn.fetch(query, *params)
+            return [self._decode_payout_row(row) for row in rows]
+
+    async def claim_pending_payouts(
+        self,
+        payout_ids: List[str],
+        processed_by: str,
+        processed_at: datetime,
+        batch_reference: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        נעילת קבוצת תשלומים לעיבוד - Move a batch of pending payouts to processing
+
+        Runs as a single UPDATE. Only rows that are still pending are claimed,
+        so concurrent runs never pick up the same payout twice.
+        """
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                UPDATE payouts
+                SET status = 'processing', processed_at = $2,
+                    processed_by = $3, reference = COALESCE($4, reference)
+                WHERE id = ANY($1::uuid[]) AND status = 'pending'
+                RETURNING *, COALESCE(bank_details->>'bank_code', '') AS bank_code
+            """, payout_ids, processed_at, processed_by, batch_reference)
+            return [self._decode_payout_row(row) for row in rows]
+
+    async def update_payouts_status(
+        self,
+        payout_ids: List[str],
+        status: str,
+        reference: Optional[str] = None
+    ) -> int:
+        """עדכון סטטוס לקבוצת תשלומים - Update the status of a payout batch"""
+        async with self.get_connection() as conn:
+            result = await conn.execute("""
+                UPDATE payouts
+                SET status = $2, reference = COALESCE($3, reference)
+                WHERE id = ANY($1::uuid[])
+            """, payout_ids, status, reference)
+            return int(result.split()[-1])
+
+    async def release_payout_batch(self, batch_reference: str) -> int:
+        """
+        שחרור אצוות שלא נכתבה - Return a batch's claimed payouts to pending
+
+        Used when the transfer file could not be written, so a later cycle
+        picks the payouts up again.
+        """
+        async with self.get_connection() as conn:
+            result = await conn.execute("""
+                UPDATE payouts
+                SET status = 'pending', processed_at = NULL,
+                    processed_by = NULL, reference = NULL
+                WHERE reference = $1 AND status = 'processing'
+            """, batch_reference)
+            return int(result.split()[-1])
+
+    async def complete_payout_batch(
+        self,
+        batch_reference: str,
+        failed_payout_ids: List[str],
+        performed_by: str
+    ) -> Dict[str, int]:
+        """
+        סגירת אצוות העברה - Settle a transfer batch after bank confirmation
+
+        The status change and its audit rows are written by one statement, so
+        a batch is never settled without being logged.
+        """
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                WITH settled AS (
+                    UPDATE payouts
+                    SET status = CASE WHEN id = ANY($2::uuid[]) THEN 'failed' ELSE 'completed' END
+                    WHERE reference = $1 AND status = 'processing'
+                    RETURNING id, status
+                )
+                INSERT INTO payout_audit_logs (payout_id, action, performed_by, timestamp)
+                SELECT id, 'payout_' || status, $3, $4 FROM settled
+                RETURNING action
+            """, batch_reference, failed_payout_ids, performed_by, datetime.utcnow())
+            failed = sum(1 for row in rows if row["action"] == "payout_failed")
+            return {"completed": len(rows) - failed, "failed": failed}
+
+    async def insert_bulk_payout_log(self, log_data: Dict[str, Any]):
+        """רישום עיבוד תשלומים מרוכז"""
+        async with self.get_connection() as conn:
+            await conn.execute("""
+                INSERT INTO bulk_payout_logs (
+                    batch_reference, processed_count, successful_count,
+                    failed_count, total_amount, processed_by, processed_at
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7)
+            """,
+                log_data.get("batch_reference"),
+                log_data["processed_count"],
+                log_data["successful_count"],
+                log_data["failed_count"],
+                log_data.get("total_amount"),
+                log_data["processed_by"],
+                log_data["processed_at"]
+            )
+
+    @staticmethod
+    def _decode_payout_row(row) -> Dict[str, Any]:
+        payout = dict(row)
+        if isinstance(payout.get("bank_details"), str):
+            payout["bank_details"] = json.loads(payout["bank_details"])
+        return payout
+
     # External data operations
     async def get_professional_info(self, professional_id: str) -> Dict[str, Any]:
         """קבלת מידע מקצוען"""
@@ -348,6 +502,20 @@ class DatabaseConnection:
                 log_data.get("ip_address")
             )
     
+    async def insert_payout_log(self, log_data: Dict[str, Any]):
+        """רישום פעולת תשלום יוצא"""
+        async with self.get_connection() as conn:
+            await conn.execute("""
+                INSERT INTO payout_audit_logs (
+                    payout_id, action, performed_by, timestamp
+                ) VALUES ($1, $2, $3, $4)
+            """,
+                log_data["payout_id"],
+                log_data["action"],
+                log_data["performed_by"],
+                log_data["timestamp"]
+            )
+    
     async def insert_balance_log(self, log_data: Dict[str, Any]):
         """רישום עדכון יתרה"""
         async with self.get_connection() as conn:
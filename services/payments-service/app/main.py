@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Body
 from fastapi.security import HTTPBearer
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -27,6 +27,7 @@ from .services.payment_gateway_service import PaymentGatewayService
 from .services.settlement_service import SettlementService
 from .middleware.auth import verify_jwt_token
 from .config import settings
+from python_shared.monitoring import setup_metrics
 
 app = FastAPI(
     title="OFAIR Payments Service",
@@ -34,6 +35,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "payments-service")
+
 security = HTTPBearer()
 
 @app.post("/commissions/record", response_model=CommissionResponse)
@@ -213,6 +217,49 @@ async def create_payout(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"שגיאה ביצירת תשלום יוצא: {str(e)}")
 
+@app.post("/payouts/bulk/run", response_model=dict)
+async def run_bulk_payout_cycle(
+    current_user: dict = Depends(verify_jwt_token)
+):
+    """
+    הרצת מחזור תשלומים יוצאים - Run bulk payout cycle
+    Batches all pending bank transfers into a single Masav file
+    """
+    if current_user.get("role") not in ["admin", "finance"]:
+        raise HTTPException(status_code=403, detail="אין הרשאה לעיבוד תשלומים יוצאים")
+
+    settlement_service = SettlementService()
+
+    try:
+        return await settlement_service.run_bulk_payout_cycle(
+            processed_by=current_user["user_id"]
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"שגיאה בעיבוד תשלומים יוצאים: {str(e)}")
+
+@app.post("/payouts/bulk/{batch_reference}/complete", response_model=dict)
+async def complete_payout_batch(
+    batch_reference: str,
+    failed_payout_ids: List[str] = Body(default_factory=list),
+    current_user: dict = Depends(verify_jwt_token)
+):
+    """
+    אישור אצוות העברה - Confirm a bank transfer batch
+    """
+    if current_user.get("role") not in ["admin", "finance"]:
+        raise HTTPException(status_code=403, detail="אין הרשאה לעיבוד תשלומים יוצאים")
+
+    settlement_service = SettlementService()
+
+    try:
+        return await settlement_service.complete_payout_batch(
+            batch_reference, failed_payout_ids, current_user["user_id"]
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"שגיאה באישור אצוות העברה: {str(e)}")
+
 @app.post("/settlements/offset", response_model=SettlementResponse)
 async def process_balance_offset(
     request: SettlementRequest,
@@ -143,6 +143,7 @@ class PaymentResponse(BaseModel):
 
 class BankDetails(BaseModel):
     bank_name: str = Field(..., description="שם בנק")
+    bank_code: Optional[str] = Field(None, description="קוד בנק (מס\"ב)")
     branch_number: str = Field(..., description="מספר סניף")
     account_number: str = Field(..., description="מספר חשבון")
     account_holder_name: str = Field(..., description="שם בעל החשבון")
@@ -1,7 +1,9 @@
 import asyncio
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+import os
+import tempfile
 import uuid
 
 from ..models.payments import (
@@ -9,6 +11,8 @@ from ..models.payments import (
     BankDetails, InvoiceResponse
 )
 from ..database import get_database
+from ..config import settings
+from ..utils.masav_writer import MasavFileWriter
 
 class SettlementService:
     def __init__(self):
@@ -171,41 +175,136 @@ class SettlementService:
     ) -> List[Dict[str, Any]]:
         """
         עיבוד קבוצת תשלומים יוצאים - Process bulk payouts
+        Payouts are claimed with one UPDATE per batch and all bank transfers
+        are written to a single Masav transfer file.
         """
+        batch_reference = self._new_batch_reference()
+        batch_size = settings.payout_batch_size
         results = []
         
-        for payout_id in payout_ids:
-            try:
-                result = await self._process_single_payout(payout_id, processed_by)
-                results.append({
-                    "payout_id": payout_id,
-                    "success": True,
-                    "status": result["status"]
-                })
+        file_path = self._transfer_file_path(batch_reference)
+        try:
+            with open(file_path, "wb") as stream, self._transfer_writer(stream) as writer:
+                for start in range(0, len(payout_ids), batch_size):
+                    chunk = payout_ids[start:start + batch_size]
                 
-            except Exception as e:
-                results.append({
-                    "payout_id": payout_id,
-                    "success": False,
-                    "error": str(e)
-                })
-        
-        # Log bulk processing
-        await self.db.insert_bulk_payout_log({
-            "processed_count": len(results),
-            "successful_count": sum(1 for r in results if r["success"]),
-            "failed_count": sum(1 for r in results if not r["success"]),
-            "processed_by": processed_by,
-            "processed_at": datetime.utcnow()
-        })
+                    claimed = await self.db.claim_pending_payouts(
+                        chunk, processed_by, datetime.utcnow(), batch_reference
+                    )
+                    claimed.sort(key=lambda p: (p['bank_code'], p['created_at']))
+                    results.extend(await self._export_claimed_payouts(claimed, writer))
+                
+                    claimed_ids = {str(p['id']) for p in claimed}
+                    results.extend(
+                        {
+                            "payout_id": payout_id,
+                            "success": False,
+                            "error": f"תשלום יוצא {payout_id} לא נמצא או אינו בהמתנה"
+                        }
+                        for payout_id in chunk if payout_id not in claimed_ids
+                    )
+        except Exception:
+            await self._abort_transfer_batch(batch_reference, file_path)
+            raise
+        
+        summary = writer.close()
+        await self._finish_transfer_batch(
+            batch_reference, file_path, results, summary, processed_by
+        )
         
         return results
     
-    async def get_pending_payouts(self) -> List[PayoutResponse]:
+    async def run_bulk_payout_cycle(
+        self,
+        processed_by: str,
+        payment_date: Optional[date] = None
+    ) -> Dict[str, Any]:
         """
-        קבלת תשלומים יוצאים בהמתנה - Get pending payouts
+        הרצת מחזור תשלומים יוצאים - Run the end-of-cycle bank transfer batch
+        Pages through all pending bank transfers with keyset pagination,
+        grouped by destination bank, and streams them into one Masav file.
         """
-        payouts_data = await self.db.get_pending_payouts()
+        batch_reference = self._new_batch_reference()
+        results = []
+        by_bank: Dict[str, Dict[str, Any]] = {}
+        after = None
+        
+        file_path = self._transfer_file_path(batch_reference)
+        try:
+            with open(file_path, "wb") as stream, \
+                    self._transfer_writer(stream, payment_date) as writer:
+                while True:
+                    page = await self.db.get_pending_payouts_page(
+                        limit=settings.payout_batch_size,
+                        after=after,
+                        payout_method=PayoutMethod.BANK_TRANSFER.value
+                    )
+                    if not page:
+                        break
+                
+                    last = page[-1]
+                    after = (last['bank_code'], last['created_at'], last['id'])
+                
+                    claimed = await self.db.claim_pending_payouts(
+                        [p['id'] for p in page], processed_by,
+                        datetime.utcnow(), batch_reference
+                    )
+                    claimed.sort(key=lambda p: (p['bank_code'], p['created_at']))
+                    page_results = await self._export_claimed_payouts(claimed, writer)
+                    results.extend(page_results)
+                
+                    exported = {r['payout_id'] for r in page_results if r['success']}
+                    for payout in claimed:
+                        if str(payout['id']) not in exported:
+                            continue
+                        bank = by_bank.setdefault(
+                            payout['bank_code'], {"count": 0, "total_amount": Decimal('0')}
+                        )
+                        bank["count"] += 1
+                        bank["total_amount"] += Decimal(str(payout['amount']))
+        except Exception:
+            await self._abort_transfer_batch(batch_reference, file_path)
+            raise
+        
+        summary = writer.close()
+        await self._finish_transfer_batch(
+            batch_reference, file_path, results, summary, processed_by
+        )
+        
+        return {
+            "batch_reference": batch_reference,
+            "file_path": file_path if summary["record_count"] else None,
+            "processed_count": len(results),
+            "successful_count": summary["record_count"],
+            "failed_count": sum(1 for r in results if not r["success"]),
+            "total_amount": summary["total_amount"],
+            "by_bank": by_bank
+        }
+    
+    async def complete_payout_batch(
+        self,
+        batch_reference: str,
+        failed_payout_ids: List[str],
+        processed_by: str
+    ) -> Dict[str, int]:
+        """
+        אישור אצוות העברה - Settle a transfer batch after bank confirmation
+        """
+        return await self.db.complete_payout_batch(
+            batch_reference, failed_payout_ids, processed_by
+        )
+    
+    async def get_pending_payouts(
+        self,
+        limit: int = 100,
+        after: Optional[tuple] = None
+    ) -> List[PayoutResponse]:
+        """
+        קבלת תשלומים יוצאים בהמתנה - Get a page of pending payouts
+        `after` is the (bank_code, created_at, id) key of the previous page's
+        last payout.
+        """
+        payouts_data = await self.db.get_pending_payouts_page(limit=limit, after=after)
         
         payouts = []
         for payout_data in payouts_data:
@@ -215,8 +314,8 @@ class SettlementService:
                 bank_details = BankDetails(**payout_data['bank_details'])
             
             payouts.append(PayoutResponse(
-                id=payout_data['id'],
-                professional_id=payout_data['professional_id'],
+                id=str(payout_data['id']),
+                professional_id=str(payout_data['professional_id']),
                 amount=payout_data['amount'],
                 payout_method=PayoutMethod(payout_data['payout_method']),
                 status=payout_data['status'],
@@ -224,7 +323,7 @@ class SettlementService:
                 processed_at=payout_data.get('processed_at'),
                 bank_details=bank_details,
                 reference=payout_data.get('reference'),
-                created_by=payout_data['created_by']
+                created_by=str(payout_data['created_by'])
             ))
         
         return payouts
@@ -335,51 +434,102 @@ class SettlementService:
         
         await self.db.insert_invoice_credit(credit_data)
     
-    async def _process_single_payout(
-        self, 
-        payout_id: str, 
-        processed_by: str
-    ) -> Dict[str, Any]:
-        """Process a single payout"""
-        payout_data = await self.db.get_payout(payout_id)
-        if not payout_data:
-            raise ValueError(f"תשלום יוצא {payout_id} לא נמצא")
-        
-        if payout_data['status'] != 'pending':
-            raise ValueError(f"תשלום יוצא בסטטוס {payout_data['status']} לא ניתן לעיבוד")
-        
-        # Mark as processing
-        await self.db.update_payout(payout_id, {
-            "status": "processing",
-            "processed_at": datetime.utcnow(),
-            "processed_by": processed_by
-        })
-        
-        # Simulate processing based on method
-        payout_method = PayoutMethod(payout_data['payout_method'])
+    async def _export_claimed_payouts(
+        self,
+        claimed: List[Dict[str, Any]],
+        writer: MasavFileWriter
+    ) -> List[Dict[str, Any]]:
+        """Write claimed bank transfers to the batch file and settle the rest"""
+        results = []
+        completed_ids = []
+        failed_ids = []
         
-        if payout_method == PayoutMethod.BANK_TRANSFER:
-            # Simulate bank transfer (would integrate with banking API)
-            import random
-            success = random.choice([True, True, True, False])  # 75% success
+        for payout in claimed:
+            payout_id = str(payout['id'])
+            
+            if payout['payout_method'] != PayoutMethod.BANK_TRANSFER.value:
+                # Non-bank payouts need no transfer file entry
+                completed_ids.append(payout_id)
+                results.append({"payout_id": payout_id, "success": True, "status": "completed"})
+                continue
             
-            if success:
-                status = "completed"
-                reference = f"bank_transfer_{uuid.uuid4().hex[:8]}"
-            else:
-                status = "failed"
-                reference = None
-        else:
-            status = "completed"
-            reference = None
-        
-        # Update payout with final status
-        await self.db.update_payout(payout_id, {
-            "status": status,
-            "reference": reference
+            bank_details = payout.get('bank_details') or {}
+            try:
+                if not bank_details.get('bank_code'):
+                    raise ValueError("חסר קוד בנק להעברה")
+                
+                writer.write_payment(
+                    bank_code=bank_details['bank_code'],
+                    branch_number=bank_details.get('branch_number', ''),
+                    account_number=bank_details.get('account_number', ''),
+                    payee_name=bank_details.get('account_holder_name', ''),
+                    amount=payout['amount'],
+                    reference=uuid.UUID(payout_id).hex[:20]
+                )
+                results.append({"payout_id": payout_id, "success": True, "status": "processing"})
+                
+            except ValueError as e:
+                failed_ids.append(payout_id)
+                results.append({"payout_id": payout_id, "success": False, "error": str(e)})
+        
+        if completed_ids:
+            await self.db.update_payouts_status(completed_ids, "completed")
+        if failed_ids:
+            await self.db.update_payouts_status(failed_ids, "failed")
+        
+        return results
+    
+    async def _finish_transfer_batch(
+        self,
+        batch_reference: str,
+        file_path: str,
+        results: List[Dict[str, Any]],
+        summary: Dict[str, Any],
+        processed_by: str
+    ):
+        """Drop empty transfer files and log the bulk run"""
+        if not summary["record_count"] and os.path.exists(file_path):
+            os.remove(file_path)
+        
+        await self.db.insert_bulk_payout_log({
+            "batch_reference": batch_reference,
+            "processed_count": len(results),
+            "successful_count": sum(1 for r in results if r["success"]),
+            "failed_count": sum(1 for r in results if not r["success"]),
+            "total_amount": summary["total_amount"],
+            "processed_by": processed_by,
+            "processed_at": datetime.utcnow()
         })
+    
+    async def _abort_transfer_batch(self, batch_reference: str, file_path: str):
+        """Release a batch whose transfer file could not be written"""
+        if os.path.exists(file_path):
+            os.remove(file_path)
         
-        return {"status": status, "reference": reference}
+        await self.db.release_payout_batch(batch_reference)
+    
+    def _transfer_writer(
+        self,
+        stream,
+        payment_date: Optional[date] = None
+    ) -> MasavFileWriter:
+        """Create a Masav writer for the platform's institution"""
+        return MasavFileWriter(
+            stream,
+            institution_code=settings.masav_institution_code,
+            sender_name=settings.masav_sender_name,
+            payment_date=payment_date or date.today()
+        )
+    
+    @staticmethod
+    def _transfer_file_path(batch_reference: str) -> str:
+        """Location of the Masav file for a batch"""
+        directory = settings.payout_files_dir or tempfile.gettempdir()
+        return os.path.join(directory, f"masav_{batch_reference}.txt")
+    
+    @staticmethod
+    def _new_batch_reference() -> str:
+        return f"PAYOUT-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
     
     async def _log_monthly_settlement(
         self, 
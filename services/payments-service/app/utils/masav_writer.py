@@ -0,0 +1,168 @@
+from typing import BinaryIO, Dict, Any, Optional
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+RECORD_LENGTH = 128
+RECORD_SEPARATOR = b"\r\n"
+
+class MasavFileWriter:
+    """
+    כותב קובץ מס"ב - Streaming writer for Masav-style bank transfer files
+
+    Every record is a fixed-width 128 character line. Records are written to
+    the underlying stream as soon as they are added, so a batch of any size
+    is produced without holding it in memory.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        institution_code: str,
+        sender_name: str,
+        payment_date: date,
+        serial_number: int = 1,
+        encoding: str = "cp862"
+    ):
+        self.stream = stream
+        self.institution_code = institution_code
+        self.sender_name = sender_name
+        self.payment_date = payment_date
+        self.serial_number = serial_number
+        self.encoding = encoding
+
+        self.record_count = 0
+        self.total_agorot = 0
+        self._header_written = False
+        self._closed = False
+
+    def __enter__(self) -> "MasavFileWriter":
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write_header(self):
+        """כתיבת רשומת כותרת - Write the K header record"""
+        if self._header_written:
+            return
+
+        record = (
+            "K"
+            + self._numeric(self.institution_code, 8)
+            + "00"
+            + self.payment_date.strftime("%y%m%d")
+            + "0"
+            + self._numeric(self.serial_number, 3)
+            + "0"
+            + date.today().strftime("%y%m%d")
+            + self._numeric(self.institution_code, 8)[:5]
+            + "0" * 6
+            + self._alpha(self.sender_name, 30)
+            + " " * 56
+            + "KOT"
+        )
+        self._write_record(record)
+        self._header_written = True
+
+    def write_payment(
+        self,
+        bank_code: str,
+        branch_number: str,
+        account_number: str,
+        payee_name: str,
+        amount: Decimal,
+        reference: str,
+        payee_id: Optional[str] = None
+    ) -> int:
+        """
+        כתיבת רשומת תנועה - Write a single credit movement record
+
+        Returns the amount written, in agorot.
+        """
+        if not self._header_written:
+            self.write_header()
+
+        amount_agorot = to_agorot(amount)
+        if amount_agorot <= 0:
+            raise ValueError("סכום התשלום חייב להיות חיובי")
+
+        record = (
+            "1"
+            + self._numeric(self.institution_code, 8)
+            + "00"
+            + "0" * 6
+            + self._numeric(bank_code, 2)
+            + self._numeric(branch_number, 3)
+            + "0" * 4
+            + self._numeric(account_number, 9)
+            + "0"
+            + self._numeric(payee_id or 0, 9)
+            + self._alpha(payee_name, 16)
+            + self._numeric(amount_agorot, 13)
+            + self._alpha(reference, 20)
+            + "0" * 8
+            + "000"
+            + "006"
+            + "0" * 18
+            + " " * 2
+        )
+        self._write_record(record)
+
+        self.record_count += 1
+        self.total_agorot += amount_agorot
+        return amount_agorot
+
+    def close(self) -> Dict[str, Any]:
+        """
+        סגירת הקובץ - Write the total and end records and return a summary
+        """
+        if not self._closed:
+            if not self._header_written:
+                self.write_header()
+
+            total_record = (
+                "5"
+                + self._numeric(self.institution_code, 8)
+                + "00"
+                + self.payment_date.strftime("%y%m%d")
+                + "0"
+                + self._numeric(self.serial_number, 3)
+                + self._numeric(self.total_agorot, 15)
+                + "0" * 15
+                + self._numeric(self.record_count, 7)
+                + "0" * 7
+                + " " * 63
+            )
+            self._write_record(total_record)
+            self._write_record("9" * RECORD_LENGTH)
+            self.stream.flush()
+            self._closed = True
+
+        return {
+            "record_count": self.record_count,
+            "total_agorot": self.total_agorot,
+            "total_amount": Decimal(self.total_agorot) / 100
+        }
+
+    def _write_record(self, record: str):
+        encoded = record.encode(self.encoding, errors="replace")
+        if len(encoded) != RECORD_LENGTH:
+            raise ValueError(f"אורך רשומה שגוי: {len(encoded)}")
+        self.stream.write(encoded + RECORD_SEPARATOR)
+
+    @staticmethod
+    def _numeric(value: Any, width: int) -> str:
+        digits = "".join(ch for ch in str(value) if ch.isdigit())
+        if len(digits) > width:
+            raise ValueError(f"הערך {value} חורג מאורך השדה ({width})")
+        return digits.rjust(width, "0")
+
+    @staticmethod
+    def _alpha(value: Optional[str], width: int) -> str:
+        return (value or "")[:width].ljust(width)
+
+def to_agorot(amount: Decimal) -> int:
+    """המרת סכום בשקלים לאגורות - Convert a shekel amount to integer agorot"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
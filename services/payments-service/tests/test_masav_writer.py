@@ -0,0 +1,175 @@
+"""
+Tests for the streaming Masav transfer file writer.
+
+Test Coverage:
+- Fixed-width record layout (header, movement, total and end records)
+- Numeric zero padding and alphanumeric space padding
+- Batch totals in agorot
+- Validation of amounts and field widths
+"""
+
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.utils.masav_writer import MasavFileWriter, RECORD_LENGTH, to_agorot
+
+
+PAYMENT_DATE = date(2024, 3, 15)
+
+
+def _writer(stream):
+    return MasavFileWriter(
+        stream,
+        institution_code="12345678",
+        sender_name="OFAIR",
+        payment_date=PAYMENT_DATE
+    )
+
+
+def _records(stream):
+    lines = stream.getvalue().split(b"\r\n")
+    assert lines[-1] == b""
+    return lines[:-1]
+
+
+class TestRecordLayout:
+    """Test the fixed-width layout of every record type."""
+
+    def test_all_records_are_fixed_width(self):
+        stream = io.BytesIO()
+        with _writer(stream) as writer:
+            writer.write_payment("12", "345", "678901", "Test Payee", Decimal("10.00"), "REF1")
+            writer.write_payment("10", "1", "1", "משה כהן", Decimal("20.50"), "REF2")
+
+        records = _records(stream)
+        assert len(records) == 5
+        assert all(len(record) == RECORD_LENGTH for record in records)
+
+    def test_header_record(self):
+        stream = io.BytesIO()
+        _writer(stream).close()
+
+        header = _records(stream)[0].decode("cp862")
+        assert header[0] == "K"
+        assert header[1:9] == "12345678"
+        assert header[11:17] == "240315"
+        assert header[18:21] == "001"
+        assert "OFAIR".ljust(30) in header
+        assert header.endswith("KOT")
+
+    def test_payment_record_fields(self):
+        stream = io.BytesIO()
+        with _writer(stream) as writer:
+            writer.write_payment("12", "345", "678901", "Test Payee", Decimal("1234.56"), "REF1")
+
+        record = _records(stream)[1].decode("cp862")
+        assert record[0] == "1"
+        assert record[1:9] == "12345678"
+        assert record[17:19] == "12"
+        assert record[19:22] == "345"
+        assert record[26:35] == "000678901"
+        assert record[45:61] == "Test Payee      "
+        assert record[61:74] == "0000000123456"
+        assert record[74:94] == "REF1".ljust(20)
+
+    def test_short_values_are_padded(self):
+        stream = io.BytesIO()
+        with _writer(stream) as writer:
+            writer.write_payment("4", "7", "12", "A", Decimal("1"), "R")
+
+        record = _records(stream)[1].decode("cp862")
+        assert record[17:19] == "04"
+        assert record[19:22] == "007"
+        assert record[26:35] == "000000012"
+        assert record[45:61] == "A".ljust(16)
+
+    def test_long_names_are_truncated(self):
+        stream = io.BytesIO()
+        with _writer(stream) as writer:
+            writer.write_payment("12", "345", "678901", "A" * 40, Decimal("1"), "R" * 30)
+
+        record = _records(stream)[1].decode("cp862")
+        assert record[45:61] == "A" * 16
+        assert record[74:94] == "R" * 20
+        assert len(record) == RECORD_LENGTH
+
+    def test_end_record(self):
+        stream = io.BytesIO()
+        _writer(stream).close()
+
+        assert _records(stream)[-1] == b"9" * RECORD_LENGTH
+
+
+class TestTotals:
+    """Test the batch total record and summary."""
+
+    def test_total_record_and_summary(self):
+        stream = io.BytesIO()
+        with _writer(stream) as writer:
+            writer.write_payment("12", "345", "678901", "A", Decimal("100.10"), "R1")
+            writer.write_payment("12", "345", "678902", "B", Decimal("0.05"), "R2")
+            writer.write_payment("10", "800", "111111", "C", Decimal("250"), "R3")
+
+        summary = writer.close()
+        assert summary == {
+            "record_count": 3,
+            "total_agorot": 35015,
+            "total_amount": Decimal("350.15")
+        }
+
+        total = _records(stream)[-2].decode("cp862")
+        assert total[0] == "5"
+        assert total[21:36] == "000000000035015"
+        assert total[51:58] == "0000003"
+
+    def test_close_is_idempotent(self):
+        stream = io.BytesIO()
+        writer = _writer(stream)
+        writer.write_payment("12", "345", "678901", "A", Decimal("1"), "R")
+        writer.close()
+        writer.close()
+
+        assert len(_records(stream)) == 4
+
+    def test_empty_batch(self):
+        stream = io.BytesIO()
+        summary = _writer(stream).close()
+
+        assert summary["record_count"] == 0
+        assert summary["total_amount"] == Decimal("0")
+        assert len(_records(stream)) == 3
+
+    def test_failed_batch_is_not_closed(self):
+        stream = io.BytesIO()
+        with pytest.raises(RuntimeError):
+            with _writer(stream):
+                raise RuntimeError("boom")
+
+        # Only the header was written; no totals for a partial batch
+        assert len(_records(stream)) == 1
+
+
+class TestValidation:
+    """Test amount and field validation."""
+
+    @pytest.mark.parametrize("amount", [Decimal("0"), Decimal("-5"), Decimal("0.004")])
+    def test_non_positive_amount_rejected(self, amount):
+        writer = _writer(io.BytesIO())
+        with pytest.raises(ValueError):
+            writer.write_payment("12", "345", "678901", "A", amount, "R")
+
+        assert writer.record_count == 0
+        assert writer.total_agorot == 0
+
+    def test_numeric_overflow_rejected(self):
+        writer = _writer(io.BytesIO())
+        with pytest.raises(ValueError):
+            writer.write_payment("12", "345", "1234567890", "A", Decimal("1"), "R")
+
+    def test_to_agorot_rounds_half_up(self):
+        assert to_agorot(Decimal("10.005")) == 1001
+        assert to_agorot(Decimal("10.004")) == 1000
+        assert to_agorot(19.99) == 1999
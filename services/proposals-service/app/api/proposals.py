@@ -18,6 +18,7 @@ import sys
 sys.path.append("/root/repos/ofair_mvp/libs")
 from python_shared.database.connection import get_db
 from python_shared.database.models import User, Professional, Lead, Proposal, ProposalStatus
+from python_shared.cache import bump_professional_board_version
 
 from deps import (
     get_current_user, get_current_professional, get_current_user_optional,
@@ -25,7 +26,7 @@ from deps import (
     check_proposal_creation_rate_limit, check_proposal_update_rate_limit,
     check_media_upload_rate_limit, validate_media_file, log_proposal_action,
     log_pii_revelation, validate_proposal_status_transition, can_modify_proposal,
-    can_upload_media_to_proposal, get_limiter
+    can_upload_media_to_proposal, get_limiter, get_redis_client
 )
 from models.proposals import (
     ProposalCreateRequest, ProposalUpdateRequest, ProposalActionRequest,
@@ -98,6 +99,9 @@ async def create_proposal(
             proposal_data, professional, user
         )
         
+        # The lead leaves this professional's Lead Board
+        await bump_professional_board_version(await get_redis_client(), professional.id)
+        
         # Log action
         await log_proposal_action(
             user_id=user.id,
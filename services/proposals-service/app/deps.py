@@ -3,6 +3,7 @@
 import sys
 import logging
 from functools import lru_cache
+from datetime import datetime, timezone
 from typing import Optional, Generator, Tuple
 import uuid
 
@@ -19,6 +20,10 @@ from slowapi.util import get_remote_address
 sys.path.append("/root/repos/ofair_mvp/libs")
 from python_shared.config.settings import get_settings
 from python_shared.database.connection import get_db, set_rls_context
+from python_shared.auth import get_principal_resolver
+from python_shared.audit import get_audit_sink
+from python_shared.monitoring import instrument_redis
+from python_shared.ratelimit import RateLimitRule, get_rate_limiter
 from python_shared.database.models import (
     User, Professional, Lead, ConsumerLead, ProfessionalLead, Proposal,
     UserRole, ProfessionalStatus, ProposalStatus
@@ -77,6 +82,7 @@ async def get_redis_client() -> redis.Redis:
             decode_responses=True,
             health_check_interval=30
         )
+        instrument_redis(_redis_client)
     
     return _redis_client
 
@@ -89,16 +95,20 @@ async def close_redis_client():
         _redis_client = None
 
 
+def _decode_token(token: str) -> dict:
+    settings = get_settings()
+    return jwt.decode(
+        token,
+        settings.jwt_secret_key,
+        algorithms=[settings.jwt_algorithm]
+    )
+
+
 def verify_token(token: str) -> TokenClaims:
     """Verify and decode JWT token."""
-    settings = get_settings()
-    
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret_key,
-            algorithms=[settings.jwt_algorithm]
-        )
+        # Verified payloads are cached per token until it expires
+        payload = get_principal_resolver().verify_token(token, _decode_token)
         
         return TokenClaims(**payload)
         
@@ -126,10 +136,11 @@ async def get_current_user(
     
     token = credentials.credentials
     token_claims = verify_token(token)
+    resolver = get_principal_resolver()
     
-    # Check if token is revoked
+    # Check if token is revoked (locally while the revoked set is in sync)
     redis_client = await get_redis_client()
-    revoked = await redis_client.get(f"revoked_token:{token_claims.jti}")
+    revoked = await resolver.is_revoked(redis_client, token_claims.jti)
     
     if revoked:
         raise HTTPException(
@@ -138,18 +149,19 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = db.query(User).filter(User.id == token_claims.user_id).first()
+    # Set RLS context; it is applied with the first statement of each
+    # transaction this session opens, without a commit of its own
+    professional_id = token_claims.professional_id if token_claims.role == "professional" else None
+    set_rls_context(db, token_claims.user_id, professional_id)
+    
+    # Get user from the principal cache or the database
+    user = resolver.get_user(db, token_claims.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
     
-    # Set RLS context
-    professional_id = token_claims.professional_id if token_claims.role == "professional" else None
-    set_rls_context(db, token_claims.user_id, professional_id)
-    
     return token_claims, user
 
 
@@ -182,9 +194,7 @@ async def get_current_professional(
             detail="Professional access required"
         )
     
-    professional = db.query(Professional).filter(
-        Professional.user_id == user.id
-    ).first()
+    professional = get_principal_resolver().get_professional(db, user)
     
     if not professional:
         raise HTTPException(
@@ -357,23 +367,17 @@ async def check_proposal_creation_rate_limit(
     
     # Proposal limits: 5 per hour, 15 per day for professionals
     limits = [
-        (f"proposal_creation_1h:{professional.id}", 5, 3600),
-        (f"proposal_creation_24h:{professional.id}", 15, 86400)
+        RateLimitRule(f"proposal_creation_1h:{professional.id}", 5, 3600),
+        RateLimitRule(f"proposal_creation_24h:{professional.id}", 15, 86400)
     ]
     
-    for key, limit, window in limits:
-        try:
-            current_count = await redis_client.incr(key)
-            await redis_client.expire(key, window)
-            
-            if current_count > limit:
-                ttl = await redis_client.ttl(key)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Proposal creation rate limit exceeded. Try again in {ttl} seconds."
-                )
-        except Exception as e:
-            logger.error(f"Rate limit check failed: {e}")
+    result = await get_rate_limiter(redis_client).check(limits)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Proposal creation rate limit exceeded. Try again in {result.retry_after} seconds.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 
 async def check_proposal_update_rate_limit(
@@ -385,22 +389,15 @@ async def check_proposal_update_rate_limit(
     redis_client = await get_redis_client()
     
     # Update limits: 20 per hour for professionals
-    key = f"proposal_update_1h:{professional.id}"
-    limit = 20
-    window = 3600
+    limits = [RateLimitRule(f"proposal_update_1h:{professional.id}", 20, 3600)]
     
-    try:
-        current_count = await redis_client.incr(key)
-        await redis_client.expire(key, window)
-        
-        if current_count > limit:
-            ttl = await redis_client.ttl(key)
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Proposal update rate limit exceeded. Try again in {ttl} seconds."
-            )
-    except Exception as e:
-        logger.error(f"Proposal update rate limit check failed: {e}")
+    result = await get_rate_limiter(redis_client).check(limits)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Proposal update rate limit exceeded. Try again in {result.retry_after} seconds.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 
 async def check_media_upload_rate_limit(
@@ -412,22 +409,15 @@ async def check_media_upload_rate_limit(
     redis_client = await get_redis_client()
     
     # Media upload limits: 10 per hour per professional
-    key = f"media_upload_1h:{professional.id}"
-    limit = 10
-    window = 3600
+    limits = [RateLimitRule(f"media_upload_1h:{professional.id}", 10, 3600)]
     
-    try:
-        current_count = await redis_client.incr(key)
-        await redis_client.expire(key, window)
-        
-        if current_count > limit:
-            ttl = await redis_client.ttl(key)
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Media upload rate limit exceeded. Try again in {ttl} seconds."
-            )
-    except Exception as e:
-        logger.error(f"Media upload rate limit check failed: {e}")
+    result = await get_rate_limiter(redis_client).check(limits)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Media upload rate limit exceeded. Try again in {result.retry_after} seconds.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 
 # Media validation helpers
@@ -483,26 +473,27 @@ async def log_proposal_action(
     request: Request,
     db: Session
 ) -> None:
-    """Log proposal action for audit purposes."""
+    """Log proposal action for audit purposes.
+    
+    The record is queued on the shared audit sink and written in the next
+    batch; `db` is not used and the request's transaction is left alone.
+    """
     try:
         from python_shared.database.models import AdminAuditLog
         
-        # Create audit log entry
-        log_entry = AdminAuditLog(
-            admin_user_id=user_id,
-            action=action,
-            entity_type="proposal",
-            entity_id=proposal_id,
-            changes=details,
-            ip_address=request.client.host if request.client else "unknown"
-        )
-        
-        db.add(log_entry)
-        db.commit()
+        # Queue audit log entry
+        await get_audit_sink().submit(AdminAuditLog.__tablename__, {
+            "admin_user_id": user_id,
+            "action": action,
+            "entity_type": "proposal",
+            "entity_id": proposal_id,
+            "changes": details,
+            "ip_address": request.client.host if request.client else "unknown",
+            "created_at": datetime.now(timezone.utc)
+        })
         
     except Exception as e:
         logger.error(f"Failed to log proposal action: {e}")
-        db.rollback()
 
 
 async def log_pii_revelation(
@@ -512,25 +503,25 @@ async def log_pii_revelation(
     request: Request,
     db: Session
 ) -> None:
-    """Log PII revelation for audit purposes."""
+    """Log PII revelation for audit purposes.
+    
+    Queued on the shared audit sink like `log_proposal_action`.
+    """
     try:
         from python_shared.database.models import ContactAccessLog, ContactAccessType
         
-        # Create PII access log
-        log_entry = ContactAccessLog(
-            accessor_user_id=user_id,
-            target_lead_id=lead_id,
-            access_type=ContactAccessType.FULL_CONTACT,
-            ip_address=request.client.host if request.client else "unknown",
-            user_agent=request.headers.get("user-agent", "")
-        )
-        
-        db.add(log_entry)
-        db.commit()
+        # Queue PII access log
+        await get_audit_sink().submit(ContactAccessLog.__tablename__, {
+            "accessor_user_id": user_id,
+            "target_lead_id": lead_id,
+            "access_type": ContactAccessType.FULL_CONTACT,
+            "ip_address": request.client.host if request.client else "unknown",
+            "user_agent": request.headers.get("user-agent", ""),
+            "created_at": datetime.now(timezone.utc)
+        })
         
     except Exception as e:
         logger.error(f"Failed to log PII revelation: {e}")
-        db.rollback()
 
 
 # Business validation helpers
@@ -16,6 +16,7 @@ Key Features:
 
 import logging
 import sys
+import time
 from contextlib import asynccontextmanager
 from typing import Dict, Any
 
@@ -36,7 +37,11 @@ from python_shared.config.settings import get_settings
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from deps import get_limiter, close_redis_client, check_database_health, check_redis_health
+from deps import get_limiter, get_redis_client, close_redis_client, check_database_health, check_redis_health
+from python_shared.auth import get_principal_resolver
+from python_shared.audit import get_audit_sink
+from python_shared.database.connection import engine, async_engine
+from python_shared.monitoring import setup_metrics
 from api import proposals
 
 # Configure logging
@@ -70,6 +75,12 @@ async def lifespan(app: FastAPI):
         logger.error("Database health check failed!")
     if not redis_healthy:
         logger.error("Redis health check failed!")
+    
+    # Keep the principal cache and revoked token set in sync with Redis
+    get_principal_resolver().start(await get_redis_client())
+    
+    # Batch audit/PII access log writes off the request path
+    get_audit_sink().start()
         
     logger.info("Proposals Service startup complete")
     
@@ -77,6 +88,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down OFAIR Proposals Service")
+    await get_audit_sink().stop()  # Flush queued audit records
+    await get_principal_resolver().stop()
     await close_redis_client()
     logger.info("Proposals Service shutdown complete")
 
@@ -226,6 +239,9 @@ if settings.environment == "production":
         allowed_hosts=["*.ofair.co.il", "ofair.co.il"]
     )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "proposals-service", engines=[engine, async_engine])
+
 # Include routers
 app.include_router(proposals.router)
 
@@ -391,7 +407,7 @@ async def root() -> Dict[str, Any]:
 async def log_requests(request: Request, call_next):
     """Log all HTTP requests for monitoring and debugging."""
     
-    start_time = "2024-01-01T00:00:00Z"  # In production, use real timestamp
+    start_time = time.perf_counter()
     
     # Log request
     logger.info(
@@ -404,7 +420,7 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     
     # Log response
-    process_time = 0.1  # In production, calculate actual time
+    process_time = time.perf_counter() - start_time
     logger.info(
         f"Response: {request.method} {request.url} "
         f"Status: {response.status_code} "
@@ -412,7 +428,7 @@ async def log_requests(request: Request, call_next):
     )
     
     # Add custom headers
-    response.headers["X-Process-Time"] = str(process_time)
+    response.headers["X-Process-Time"] = f"{process_time:.6f}"
     response.headers["X-Service"] = "ofair-proposals-service"
     response.headers["X-Version"] = "1.0.0"
     
@@ -1,10 +1,53 @@
 import asyncpg
 import json
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 import os
 from contextlib import asynccontextmanager
 
+from python_shared.monitoring import asyncpg_connection_class
+
+# Maximum number of referrals in a chain (the referral itself plus ancestors)
+MAX_CHAIN_DEPTH = 10
+
+# Adds a delta to the monthly rollup row of a referral's referrer, month and
+# lead category: $1 referral id, $2 timestamp, $3-$8 the counters
+ROLLUP_DELTA_SQL = """
+    INSERT INTO referral_monthly_stats (
+        user_id, month, category, referral_count, active_count,
+        completed_count, commission_earned, commission_paid,
+        commission_pending, updated_at
+    )
+    SELECT r.referrer_id, DATE_TRUNC('month', $2::timestamp)::date,
+        COALESCE(l.category, 'general'), $3, $4, $5, $6, $7, $8, NOW()
+    FROM referrals r
+    LEFT JOIN leads l ON l.id = r.lead_id
+    WHERE r.id = $1
+    ON CONFLICT (user_id, month, category) DO UPDATE SET
+        referral_count = referral_monthly_stats.referral_count + EXCLUDED.referral_count,
+        active_count = referral_monthly_stats.active_count + EXCLUDED.active_count,
+        completed_count = referral_monthly_stats.completed_count + EXCLUDED.completed_count,
+        commission_earned = referral_monthly_stats.commission_earned + EXCLUDED.commission_earned,
+        commission_paid = referral_monthly_stats.commission_paid + EXCLUDED.commission_paid,
+        commission_pending = referral_monthly_stats.commission_pending + EXCLUDED.commission_pending,
+        updated_at = NOW()
+"""
+
+# Advisory lock namespace for referral_monthly_stats months. Deltas hold the
+# month's lock shared, a rebuild holds it exclusively.
+ROLLUP_LOCK_NAMESPACE = 7305
+
+def rollup_month_key(occurred_at) -> int:
+    """Advisory lock key of the rollup month containing `occurred_at`"""
+    return occurred_at.year * 12 + occurred_at.month - 1
+
+async def lock_rollup_months(conn, occurred_ats, exclusive: bool = False):
+    """Take the rollup locks of every month in `occurred_ats`, in key order"""
+    function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    for key in sorted({rollup_month_key(occurred_at) for occurred_at in occurred_ats}):
+        await conn.execute(f"SELECT {function}($1, $2)", ROLLUP_LOCK_NAMESPACE, key)
+
 class DatabaseConnection:
     def __init__(self):
         self.pool = None
@@ -26,7 +69,8 @@ class DatabaseConnection:
             self.connection_string,
             min_size=5,
             max_size=20,
-            command_timeout=60
+            command_timeout=60,
+            connection_class=asyncpg_connection_class()
         )
     
     async def close_pool(self):
@@ -42,13 +86,35 @@ class DatabaseConnection:
     
     # Referral operations
     async def insert_referral(self, referral_data: Dict[str, Any]):
-        """הכנסת הפניה חדשה"""
+        """
+        הכנסת הפניה חדשה
+
+        The referral's chain path is materialized in the same statement: its
+        ancestors are the parent referral (the one that brought the referrer
+        in) followed by the parent's own ancestors, capped at the maximum
+        chain depth.
+        """
         async with self.get_connection() as conn:
             await conn.execute("""
                 INSERT INTO referrals (
                     id, referrer_id, referred_user_id, lead_id, proposal_id,
-                    status, commission_rate, context, created_at, updated_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                    status, commission_rate, context, created_at, updated_at,
+                    ancestor_ids, chain_length
+                )
+                SELECT $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
+                    path.ancestor_ids, cardinality(path.ancestor_ids) + 1
+                FROM (
+                    SELECT COALESCE(
+                        (
+                            SELECT (p.id || COALESCE(p.ancestor_ids, '{}'::uuid[]))[1:$11 - 1]
+                            FROM referrals p
+                            WHERE p.referred_user_id = $2
+                            ORDER BY p.created_at DESC
+                            LIMIT 1
+                        ),
+                        '{}'::uuid[]
+                    ) AS ancestor_ids
+                ) AS path
             """, 
                 referral_data["id"],
                 referral_data["referrer_id"],
@@ -59,7 +125,8 @@ class DatabaseConnection:
                 referral_data["commission_rate"],
                 json.dumps(referral_data.get("context")),
                 referral_data["created_at"],
-                referral_data["updated_at"]
+                referral_data["updated_at"],
+                MAX_CHAIN_DEPTH
             )
     
     async def get_referral(self, referral_id: str) -> Optional[Dict[str, Any]]:
@@ -139,6 +206,61 @@ class DatabaseConnection:
             )
             return dict(row) if row else None
     
+    async def get_referral_chain(
+        self,
+        referral_id: str,
+        max_depth: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        קבלת שרשרת הפניות - Resolve the referral chain in a single query
+
+        Walks from the referral up through the referrals that brought each
+        referrer in, joining referrer names on the way. Rows are ordered by
+        level (0 = the referral itself).
+        """
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                WITH RECURSIVE chain AS (
+                    SELECT r.*, 0 AS level, ARRAY[r.id] AS visited
+                    FROM referrals r
+                    WHERE r.id = $1
+                    
+                    UNION ALL
+                    
+                    SELECT parent.*, chain.level + 1, chain.visited || parent.id
+                    FROM chain
+                    JOIN LATERAL (
+                        SELECT p.*
+                        FROM referrals p
+                        WHERE p.referred_user_id = chain.referrer_id
+                        ORDER BY p.created_at DESC
+                        LIMIT 1
+                    ) AS parent ON TRUE
+                    WHERE chain.level + 1 < $2
+                    AND NOT parent.id = ANY(chain.visited)
+                )
+                SELECT chain.*, u.full_name AS referrer_name
+                FROM chain
+                LEFT JOIN users u ON u.id = chain.referrer_id
+                ORDER BY chain.level
+            """, referral_id, max_depth or MAX_CHAIN_DEPTH)
+            
+            chain = []
+            for row in rows:
+                node = dict(row)
+                node.pop("visited", None)
+                chain.append(node)
+            return chain
+    
+    async def get_referral_chain_path(self, referral_id: str) -> Optional[Dict[str, Any]]:
+        """קבלת נתיב שרשרת שמור - Materialized chain length and ancestors"""
+        async with self.get_connection() as conn:
+            row = await conn.fetchrow("""
+                SELECT chain_length, ancestor_ids
+                FROM referrals WHERE id = $1
+            """, referral_id)
+            return dict(row) if row else None
+    
     # Commission operations
     async def insert_commission_calculation(self, calculation_data: Dict[str, Any]):
         """הכנסת חישוב עמלה"""
@@ -224,6 +346,183 @@ class DatabaseConnection:
                     WHERE id = $2
                 """, status, commission_id)
     
+    # Commission rate operations
+    async def get_active_commission_rate_version(self) -> Optional[int]:
+        """גרסת תעריפים פעילה"""
+        async with self.get_connection() as conn:
+            return await conn.fetchval("""
+                SELECT version FROM commission_rate_versions
+                WHERE is_active = TRUE
+                ORDER BY version DESC
+                LIMIT 1
+            """)
+    
+    async def get_commission_rates(self, version: int) -> List[Dict[str, Any]]:
+        """תעריפי עמלות לפי גרסה"""
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT rate_type, rate_key, rate_field, rate_value
+                FROM commission_rates
+                WHERE version = $1
+            """, version)
+            return [dict(row) for row in rows]
+    
+    async def activate_commission_rate_version(self, version: int) -> bool:
+        """
+        הפעלת גרסת תעריפים - Make `version` the only active rate version
+
+        Returns False when the version does not exist.
+        """
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                exists = await conn.fetchval(
+                    "SELECT 1 FROM commission_rate_versions WHERE version = $1 FOR UPDATE",
+                    version
+                )
+                if not exists:
+                    return False
+                await conn.execute("""
+                    UPDATE commission_rate_versions
+                    SET is_active = (version = $1)
+                    WHERE is_active OR version = $1
+                """, version)
+                return True
+    
+    async def get_commission_repricing_inputs(
+        self,
+        start_date: datetime,
+        end_date: datetime
+    ) -> List[Dict[str, Any]]:
+        """
+        נתוני תמחור מחדש - All inputs needed to reprice calculations in one query
+        
+        Referrer performance is aggregated once per referrer instead of once
+        per calculation.
+        """
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                WITH period AS (
+                    SELECT cc.id, cc.referral_id, cc.lead_value, cc.total_commission,
+                           cc.status, cc.calculated_at, r.referrer_id, r.commission_rate,
+                           COALESCE(r.chain_length, 1) AS chain_length,
+                           COALESCE(l.category, 'general') AS category
+                    FROM commission_calculations cc
+                    JOIN referrals r ON r.id = cc.referral_id
+                    LEFT JOIN leads l ON l.id = r.lead_id
+                    WHERE cc.calculated_at >= $1 AND cc.calculated_at < $2
+                ),
+                performance AS (
+                    SELECT referrer_id,
+                           COUNT(*) FILTER (WHERE status = 'completed') AS total_completed_referrals,
+                           COUNT(*) FILTER (WHERE status = 'completed')::float
+                               / NULLIF(COUNT(*), 0) AS success_rate
+                    FROM referrals
+                    WHERE referrer_id IN (SELECT DISTINCT referrer_id FROM period)
+                    GROUP BY referrer_id
+                )
+                SELECT p.*,
+                       COALESCE(perf.total_completed_referrals, 0) AS total_completed_referrals,
+                       COALESCE(perf.success_rate, 0) AS success_rate
+                FROM period p
+                LEFT JOIN performance perf ON perf.referrer_id = p.referrer_id
+                ORDER BY p.id
+            """, start_date, end_date)
+            return [dict(row) for row in rows]
+    
+    async def apply_commission_repricing(self, repricings: List[Dict[str, Any]]) -> int:
+        """
+        שמירת תמחור מחדש - Write repriced calculations in one transaction
+
+        Each item carries the calculation, its referral, the old and new
+        totals and the new breakdown. Only calculations that are still
+        pending, with no paid or disputed commission, are locked and
+        rewritten: the calculation, its commission records, the referral's
+        commission totals and the monthly rollup. Returns how many were
+        written.
+        """
+        if not repricings:
+            return 0
+        
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch("""
+                    SELECT cc.id FROM commission_calculations cc
+                    WHERE cc.id = ANY($1)
+                      AND cc.status IN ('calculated', 'approved')
+                      AND NOT EXISTS (
+                          SELECT 1 FROM commissions c
+                          WHERE c.calculation_id = cc.id
+                            AND c.status NOT IN ('calculated', 'approved')
+                      )
+                    FOR UPDATE OF cc
+                """, [item["calculation_id"] for item in repricings])
+                pending = {row["id"] for row in rows}
+                applied = [item for item in repricings if item["calculation_id"] in pending]
+                if not applied:
+                    return 0
+                
+                await conn.executemany("""
+                    UPDATE commission_calculations
+                    SET total_commission = $2, breakdown = $3
+                    WHERE id = $1
+                """, [
+                    (item["calculation_id"], item["new_total"], json.dumps(item["breakdown"], default=str))
+                    for item in applied
+                ])
+                await conn.executemany("""
+                    UPDATE commissions
+                    SET amount = $4, percentage = $5, updated_at = NOW()
+                    WHERE calculation_id = $1 AND recipient_type = $2 AND level = $3
+                """, [
+                    (item["calculation_id"], share["recipient_type"], share["level"],
+                     share["amount"], share["percentage"])
+                    for item in applied
+                    for share in item["breakdown"]
+                ])
+                
+                # The latest calculation of a referral sets its totals
+                latest = {}
+                for item in sorted(applied, key=lambda item: item["calculated_at"]):
+                    latest[item["referral_id"]] = item
+                await conn.executemany("""
+                    UPDATE referrals
+                    SET total_commission_amount = $2, referrer_commission = $3,
+                        platform_commission = $4, updated_at = NOW()
+                    WHERE id = $1
+                """, [
+                    (referral_id, item["new_total"],
+                     sum((s["amount"] for s in item["breakdown"] if s["recipient_type"] == "referrer"), Decimal('0')),
+                     sum((s["amount"] for s in item["breakdown"] if s["recipient_type"] == "platform"), Decimal('0')))
+                    for referral_id, item in latest.items()
+                ])
+                
+                # Pending commissions count as earned and pending
+                deltas = [item for item in applied if item["new_total"] != item["old_total"]]
+                await lock_rollup_months(conn, [item["calculated_at"] for item in deltas])
+                await conn.executemany(ROLLUP_DELTA_SQL, [
+                    (item["referral_id"], item["calculated_at"], 0, 0, 0,
+                     item["new_total"] - item["old_total"], Decimal('0'),
+                     item["new_total"] - item["old_total"])
+                    for item in deltas
+                ])
+                return len(applied)
+    
+    async def get_user_referral_performance(self, user_id: str) -> Dict[str, Any]:
+        """ביצועי מפנה לקביעת דרגה"""
+        async with self.get_connection() as conn:
+            row = await conn.fetchrow("""
+                SELECT 
+                    COUNT(*) FILTER (WHERE status = 'completed') AS total_completed_referrals,
+                    COALESCE(
+                        COUNT(*) FILTER (WHERE status = 'completed')::float
+                            / NULLIF(COUNT(*), 0),
+                        0
+                    ) AS success_rate
+                FROM referrals
+                WHERE referrer_id = $1
+            """, user_id)
+            return dict(row) if row else {}
+    
     # User and external data operations
     async def get_user_basic_info(self, user_id: str) -> Dict[str, Any]:
         """קבלת מידע בסיסי על משתמש"""
@@ -352,6 +651,119 @@ class DatabaseConnection:
             
             return [dict(row) for row in rows]
     
+    # Rollup operations
+    async def apply_referral_rollup_delta(
+        self,
+        referral_id: str,
+        occurred_at: datetime,
+        referral_count: int = 0,
+        active_count: int = 0,
+        completed_count: int = 0,
+        commission_earned: Decimal = Decimal('0'),
+        commission_paid: Decimal = Decimal('0'),
+        commission_pending: Decimal = Decimal('0')
+    ):
+        """
+        עדכון מצטבר של סיכום חודשי - Apply a delta to the monthly rollup
+
+        The row is keyed by the referral's referrer, the month of
+        `occurred_at` and the lead category, and is upserted in one statement
+        under the month's shared lock, so it waits for a running rebuild.
+        """
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                await lock_rollup_months(conn, [occurred_at])
+                await conn.execute(
+                    ROLLUP_DELTA_SQL,
+                    referral_id, occurred_at, referral_count, active_count,
+                    completed_count, commission_earned, commission_paid,
+                    commission_pending
+                )
+    
+    async def get_user_rollup_stats(
+        self,
+        user_id: str,
+        start_month: date,
+        end_month: date
+    ) -> List[Dict[str, Any]]:
+        """סיכומים חודשיים לפי קטגוריה - Rollup rows for [start_month, end_month)"""
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT month, category, referral_count, active_count,
+                    completed_count, commission_earned, commission_paid,
+                    commission_pending
+                FROM referral_monthly_stats
+                WHERE user_id = $1 AND month >= $2 AND month < $3
+            """, user_id, start_month, end_month)
+            
+            return [dict(row) for row in rows]
+    
+    async def get_rollup_covered_from(self) -> Optional[date]:
+        """החודש הראשון המכוסה בסיכומים - First month fully covered by rollups"""
+        async with self.get_connection() as conn:
+            return await conn.fetchval(
+                "SELECT covered_from FROM referral_rollup_coverage WHERE id = 1"
+            )
+    
+    async def rebuild_referral_rollups(self, month: date):
+        """
+        בנייה מחדש של סיכום חודשי - Rebuild one month of rollups from raw data
+
+        Runs in a single transaction holding the month's exclusive lock, so
+        deltas for the month wait and are added on top of the rebuilt rows.
+        The covered range is only extended back to `month` once the month is
+        over; the open month keeps being answered from raw data.
+        """
+        async with self.get_connection() as conn:
+            async with conn.transaction():
+                await lock_rollup_months(conn, [month], exclusive=True)
+                await conn.execute(
+                    "DELETE FROM referral_monthly_stats WHERE month = $1", month
+                )
+                await conn.execute("""
+                    INSERT INTO referral_monthly_stats (
+                        user_id, month, category, referral_count, active_count,
+                        completed_count, commission_earned, commission_paid,
+                        commission_pending, updated_at
+                    )
+                    SELECT user_id, $1::date, category,
+                        SUM(referral_count), SUM(active_count), SUM(completed_count),
+                        SUM(commission_earned), SUM(commission_paid),
+                        SUM(commission_pending), NOW()
+                    FROM (
+                        SELECT r.referrer_id AS user_id,
+                            COALESCE(l.category, 'general') AS category,
+                            1 AS referral_count,
+                            (r.status = 'active')::int AS active_count,
+                            (r.status = 'completed')::int AS completed_count,
+                            0 AS commission_earned, 0 AS commission_paid,
+                            0 AS commission_pending
+                        FROM referrals r
+                        LEFT JOIN leads l ON l.id = r.lead_id
+                        WHERE r.created_at >= $1 AND r.created_at < $1 + INTERVAL '1 month'
+                        
+                        UNION ALL
+                        
+                        SELECT r.referrer_id, COALESCE(l.category, 'general'),
+                            0, 0, 0,
+                            c.amount,
+                            CASE WHEN c.status = 'paid' THEN c.amount ELSE 0 END,
+                            CASE WHEN c.status IN ('calculated', 'approved') THEN c.amount ELSE 0 END
+                        FROM commissions c
+                        JOIN referrals r ON r.id = c.referral_id
+                        LEFT JOIN leads l ON l.id = r.lead_id
+                        WHERE c.calculated_at >= $1 AND c.calculated_at < $1 + INTERVAL '1 month'
+                    ) AS facts
+                    GROUP BY user_id, category
+                """, month)
+                await conn.execute("""
+                    INSERT INTO referral_rollup_coverage (id, covered_from)
+                    SELECT 1, $1::date
+                    WHERE $1::date < DATE_TRUNC('month', CURRENT_DATE)::date
+                    ON CONFLICT (id) DO UPDATE SET
+                        covered_from = LEAST(referral_rollup_coverage.covered_from, EXCLUDED.covered_from)
+                """, month)
+    
     # Audit and logging
     async def insert_referral_log(self, log_data: Dict[str, Any]):
         """הכנסת רישום ביקורת"""
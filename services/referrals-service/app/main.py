@@ -8,7 +8,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.security import HTTPBearer
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import asyncio
 from decimal import Decimal
 
@@ -28,6 +28,7 @@ from services.referral_service import ReferralService
 from services.commission_service import CommissionService
 from middleware.auth import verify_jwt_token
 from config import settings
+from python_shared.monitoring import setup_metrics
 
 app = FastAPI(
     title="OFAIR Referrals Service",
@@ -35,6 +36,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Request metrics, served at /metrics
+setup_metrics(app, "referrals-service")
+
 security = HTTPBearer()
 
 @app.post("/referrals", response_model=ReferralResponse)
@@ -220,6 +224,64 @@ async def get_referral_stats(
     
     return stats
 
+@app.post("/stats/rollups/rebuild")
+async def rebuild_stats_rollups(
+    start_month: date,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(verify_jwt_token)
+):
+    """
+    בנייה מחדש של סיכומים חודשיים - Backfill monthly stats rollups
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="אין הרשאה לבניית סיכומים")
+    
+    referral_service = ReferralService()
+    background_tasks.add_task(referral_service.rebuild_monthly_rollups, start_month)
+    
+    return {"message": "בניית הסיכומים החודשיים החלה"}
+
+@app.post("/commissions/recalculate")
+async def recalculate_commissions(
+    start_date: datetime,
+    end_date: datetime,
+    apply: bool = False,
+    current_user: dict = Depends(verify_jwt_token)
+):
+    """
+    תמחור מחדש של עמלות - Reprice a period with the active rate version
+    Reports the difference; with apply=true pending calculations are updated
+    """
+    if current_user.get("role") not in ["admin", "finance"]:
+        raise HTTPException(status_code=403, detail="אין הרשאה לתמחור מחדש של עמלות")
+    if apply and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="אין הרשאה לעדכון עמלות")
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="טווח תאריכים לא תקין")
+
+    commission_service = CommissionService()
+    return await commission_service.recalculate_commissions(start_date, end_date, apply)
+
+@app.put("/commissions/rates/{version}/activate")
+async def activate_commission_rates(
+    version: int,
+    current_user: dict = Depends(verify_jwt_token)
+):
+    """
+    הפעלת גרסת תעריפים - Activate a commission rate version
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="אין הרשאה לשינוי תעריפי עמלות")
+
+    commission_service = CommissionService()
+
+    try:
+        await commission_service.activate_rate_version(version)
+        return {"message": "גרסת התעריפים הופעלה", "version": version}
+
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.get("/commissions/pending", response_model=List[CommissionCalculationResponse])
 async def get_pending_commissions(
     limit: int = 50,
@@ -9,7 +9,23 @@ from models.referrals import (
     CommissionStatus, PaymentMethod, CommissionDB
 )
 from database import get_database
-from utils.commission_calculator import CommissionCalculator
+from utils.commission_calculator import (
+    CommissionCalculator, invalidate_rate_table, load_rate_table
+)
+
+# Commission statuses counted as pending in the stats rollup
+PENDING_STATUSES = ('calculated', 'approved')
+
+def referrer_tier(total_referrals: int, success_rate: float) -> str:
+    """Map referrer performance to a commission tier"""
+    if total_referrals >= 100 and success_rate >= 0.8:
+        return "premium"
+    elif total_referrals >= 50 and success_rate >= 0.7:
+        return "gold"
+    elif total_referrals >= 20 and success_rate >= 0.6:
+        return "silver"
+    else:
+        return "bronze"
 
 class CommissionService:
     def __init__(self):
@@ -34,7 +50,8 @@ class CommissionService:
         lead = await self.db.get_lead(referral['lead_id'])
         proposal = await self.db.get_proposal(referral['proposal_id'])
         
-        # Calculate commission breakdown
+        # Calculate commission breakdown with the active rate version
+        self.calculator = CommissionCalculator(await load_rate_table(self.db))
         breakdown = await self.calculator.calculate_commission_breakdown(
             lead_value=lead_value,
             commission_rate=referral['commission_rate'],
@@ -116,6 +133,92 @@ class CommissionService:
             # Log error but don't raise to avoid disrupting the main flow
             await self.db.log_error(f"Commission chain calculation failed for {referral_id}: {str(e)}")
     
+    async def recalculate_commissions(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        apply: bool = False
+    ) -> Dict[str, Any]:
+        """
+        תמחור מחדש של עמלות - Reprice all calculations in a period
+        
+        Loads every input in one query and runs the integer batch path, so a
+        full month is repriced without per-referral round trips, always with
+        the currently active rate version. Returns the repriced totals next
+        to the stored ones. With `apply`, changed calculations that are still
+        pending are written back; paid ones keep their amounts.
+        """
+        invalidate_rate_table()
+        calculator = CommissionCalculator(await load_rate_table(self.db))
+        rows = await self.db.get_commission_repricing_inputs(start_date, end_date)
+        
+        tiers = [
+            referrer_tier(row['total_completed_referrals'], row['success_rate'])
+            for row in rows
+        ]
+        results = calculator.calculate_batch(
+            [Decimal(str(row['lead_value'])) for row in rows],
+            [Decimal(str(row['commission_rate'])) for row in rows],
+            [row['category'] for row in rows],
+            tiers,
+            [row['chain_length'] for row in rows]
+        )
+        
+        stored_agorot = 0
+        repriced_agorot = 0
+        changed = []
+        repricings = []
+        for row, tier, shares in zip(rows, tiers, results):
+            new_total = sum(share.amount_agorot for share in shares)
+            old_total = int(
+                (Decimal(str(row['total_commission'] or 0)) * 100).to_integral_value(ROUND_HALF_UP)
+            )
+            stored_agorot += old_total
+            repriced_agorot += new_total
+            if new_total != old_total:
+                changed.append({
+                    "calculation_id": str(row['id']),
+                    "referral_id": str(row['referral_id']),
+                    "status": row['status'],
+                    "stored_total": Decimal(old_total) / 100,
+                    "repriced_total": Decimal(new_total) / 100
+                })
+                if row['status'] in PENDING_STATUSES:
+                    breakdown = calculator.to_breakdown(
+                        shares, row['category'], tier, row['chain_length']
+                    )
+                    repricings.append({
+                        "calculation_id": row['id'],
+                        "referral_id": row['referral_id'],
+                        "calculated_at": row['calculated_at'],
+                        "old_total": Decimal(old_total) / 100,
+                        "new_total": Decimal(new_total) / 100,
+                        "breakdown": [item.dict() for item in breakdown]
+                    })
+        
+        applied = await self.db.apply_commission_repricing(repricings) if apply else 0
+        
+        return {
+            "rate_version": calculator.rate_table.version,
+            "calculations": len(rows),
+            "stored_total": Decimal(stored_agorot) / 100,
+            "repriced_total": Decimal(repriced_agorot) / 100,
+            "difference": Decimal(repriced_agorot - stored_agorot) / 100,
+            "changed": changed,
+            "applied": applied
+        }
+    
+    async def activate_rate_version(self, version: int):
+        """
+        הפעלת גרסת תעריפים - Switch the active commission rate version
+        
+        This process drops its cached table at once; other workers pick the
+        new version up within the rate cache's check interval.
+        """
+        if not await self.db.activate_commission_rate_version(version):
+            raise ValueError("גרסת תעריפים לא נמצאה")
+        invalidate_rate_table()
+    
     async def process_payment(
         self,
         commission_id: str,
@@ -158,6 +261,14 @@ class CommissionService:
         # Record payment details
         await self.db.insert_payment_record(payment_data)
         
+        # Move the amount from pending to paid in the monthly rollup
+        await self.db.apply_referral_rollup_delta(
+            commission['referral_id'],
+            commission['calculated_at'],
+            commission_paid=commission['amount'],
+            commission_pending=-commission['amount'] if commission['status'] in PENDING_STATUSES else Decimal('0')
+        )
+        
         # Update referral statistics
         await self._update_referral_payment_stats(commission['referral_id'])
         
@@ -256,6 +367,13 @@ class CommissionService:
         # Update commission status
         await self.db.update_commission_status(commission_id, "disputed")
         
+        if commission['status'] in PENDING_STATUSES:
+            await self.db.apply_referral_rollup_delta(
+                commission['referral_id'],
+                commission['calculated_at'],
+                commission_pending=-commission['amount']
+            )
+        
         # Create dispute record
         await self.db.insert_commission_dispute(dispute_data)
         
@@ -287,6 +405,14 @@ class CommissionService:
         }
         
         await self.db.insert_commission_record(commission_data)
+        
+        # Keep the monthly stats rollup current
+        await self.db.apply_referral_rollup_delta(
+            referral_id,
+            commission_data["calculated_at"],
+            commission_earned=breakdown_item.amount,
+            commission_pending=breakdown_item.amount if status.value in PENDING_STATUSES else Decimal('0')
+        )
         return commission_id
     
     async def _update_referral_commissions(
@@ -324,35 +450,22 @@ class CommissionService:
         success_rate = user_stats.get('success_rate', 0)
         
         # Determine referrer level based on performance
-        if total_referrals >= 100 and success_rate >= 0.8:
-            return "premium"
-        elif total_referrals >= 50 and success_rate >= 0.7:
-            return "gold"
-        elif total_referrals >= 20 and success_rate >= 0.6:
-            return "silver"
-        else:
-            return "bronze"
+        return referrer_tier(total_referrals, success_rate)
     
     async def _get_chain_length(self, referral_id: str) -> int:
         """Get the length of the referral chain"""
+        # Chain paths are materialized when the referral is created
+        path = await self.db.get_referral_chain_path(referral_id)
+        if path and path.get('chain_length'):
+            return path['chain_length']
+        
+        # Referrals created before materialization fall back to the CTE
         chain_data = await self._get_referral_chain_data(referral_id)
         return len(chain_data)
     
     async def _get_referral_chain_data(self, referral_id: str) -> List[Dict]:
         """Get referral chain data for calculations"""
-        chain = []
-        current_referral = await self.db.get_referral(referral_id)
-        
-        while current_referral and len(chain) < 10:  # Max 10 levels
-            chain.append(current_referral)
-            
-            # Find parent referral
-            parent = await self.db.get_referral_by_referred_user(
-                current_referral['referrer_id']
-            )
-            current_referral = parent
-        
-        return chain
+        return await self.db.get_referral_chain(referral_id)
     
     async def _get_lead_value(self, lead_id: str) -> Decimal:
         """Get the monetary value of a lead"""
@@ -1,6 +1,6 @@
 import asyncio
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 import uuid
 
@@ -59,6 +59,9 @@ class ReferralService:
         # Insert into database
         await self.db.insert_referral(referral_data)
         
+        # Keep the monthly stats rollup current
+        await self.db.apply_referral_rollup_delta(referral_id, now, referral_count=1)
+        
         # Log referral creation for audit
         await self._log_referral_action(referral_id, "created", referrer_id)
         
@@ -95,44 +98,31 @@ class ReferralService:
         """
         קבלת שרשרת הפניות - Get complete referral chain
         """
-        # Get the root referral
-        root_referral = await self.get_referral(referral_id)
-        if not root_referral:
+        # Resolve the whole chain, with referrer names, in one query
+        chain_data = await self.db.get_referral_chain(referral_id)
+        if not chain_data:
             raise ValueError("הפניה לא נמצאה")
         
-        # Build the referral chain
+        root_referral = ReferralResponse(**chain_data[0])
+        
         chain_nodes = []
-        current_referral = root_referral
-        level = 0
         total_commission = Decimal('0')
         
-        while current_referral:
-            # Get referrer details
-            referrer_info = await self.db.get_user_basic_info(current_referral.referrer_id)
-            
+        for referral_data in chain_data:
             node = ReferralChainNode(
-                referral_id=current_referral.id,
-                referrer_id=current_referral.referrer_id,
-                referrer_name=referrer_info.get("name", "משתמש לא זמין"),
-                level=level,
-                commission_rate=current_referral.commission_rate,
-                commission_amount=current_referral.referrer_commission,
-                status=current_referral.status
+                referral_id=str(referral_data['id']),
+                referrer_id=str(referral_data['referrer_id']),
+                referrer_name=referral_data.get('referrer_name') or "משתמש לא זמין",
+                level=referral_data['level'],
+                commission_rate=referral_data['commission_rate'],
+                commission_amount=referral_data.get('referrer_commission'),
+                status=referral_data['status']
             )
             
             chain_nodes.append(node)
             
-            if current_referral.referrer_commission:
-                total_commission += current_referral.referrer_commission
-            
-            # Look for parent referral (who referred the current referrer)
-            parent_referral = await self._find_parent_referral(current_referral.referrer_id)
-            current_referral = parent_referral
-            level += 1
-            
-            # Prevent infinite loops
-            if level > 10:
-                break
+            if referral_data.get('referrer_commission'):
+                total_commission += referral_data['referrer_commission']
         
         return ReferralChainResponse(
             root_referral_id=referral_id,
@@ -172,6 +162,14 @@ class ReferralService:
         
         await self.db.update_referral(referral_id, update_data)
         
+        # Move the referral between status counters in its creation month
+        await self.db.apply_referral_rollup_delta(
+            referral_id,
+            referral.created_at,
+            active_count=_status_delta(ReferralStatus.ACTIVE, referral.status, new_status),
+            completed_count=_status_delta(ReferralStatus.COMPLETED, referral.status, new_status)
+        )
+        
         # Log status change
         await self._log_referral_action(
             referral_id, 
@@ -187,34 +185,39 @@ class ReferralService:
     ) -> ReferralStatsResponse:
         """
         סטטיסטיקות הפניות משתמש - Get user referral statistics
+        Whole months covered by the monthly rollups are answered with a
+        single rollup query; the remaining edges are computed from the raw
+        tables with the four aggregate queries running concurrently.
         """
-        # Get basic referral counts
-        referral_stats = await self.db.get_user_referral_stats(
-            user_id, start_date, end_date
-        )
-        
-        # Get commission information
-        commission_stats = await self.db.get_user_commission_stats(
-            user_id, start_date, end_date
-        )
-        
-        # Get category performance
-        category_stats = await self.db.get_user_category_performance(
-            user_id, start_date, end_date
-        )
+        rollup_start, rollup_end = await self._get_rollup_window(start_date, end_date)
         
-        # Get monthly breakdown
-        monthly_stats = await self.db.get_user_monthly_stats(
-            user_id, start_date, end_date
-        )
+        parts = []
+        if rollup_start < rollup_end:
+            rollup_rows = await self.db.get_user_rollup_stats(
+                user_id, rollup_start, rollup_end
+            )
+            parts.append(self._stats_from_rollups(rollup_rows))
+            
+            head_end = datetime.combine(rollup_start, time(), tzinfo=start_date.tzinfo)
+            tail_start = datetime.combine(rollup_end, time(), tzinfo=end_date.tzinfo)
+            if start_date < head_end:
+                parts.append(await self._get_raw_stats(
+                    user_id, start_date, head_end - timedelta(microseconds=1)
+                ))
+            if tail_start <= end_date:
+                parts.append(await self._get_raw_stats(user_id, tail_start, end_date))
+        else:
+            parts.append(await self._get_raw_stats(user_id, start_date, end_date))
+        
+        stats = self._merge_stats(parts)
         
         # Calculate success rate
-        total_referrals = referral_stats.get('total_referrals', 0)
-        completed_referrals = referral_stats.get('completed_referrals', 0)
+        total_referrals = stats['total_referrals']
+        completed_referrals = stats['completed_referrals']
         success_rate = (completed_referrals / total_referrals * 100) if total_referrals > 0 else 0
         
         # Calculate average commission
-        total_commission = commission_stats.get('total_commission_earned', Decimal('0'))
+        total_commission = stats['total_commission_earned']
         avg_commission = (total_commission / total_referrals) if total_referrals > 0 else Decimal('0')
         
         return ReferralStatsResponse(
@@ -222,17 +225,168 @@ class ReferralService:
             period_start=start_date,
             period_end=end_date,
             total_referrals=total_referrals,
-            active_referrals=referral_stats.get('active_referrals', 0),
+            active_referrals=stats['active_referrals'],
             completed_referrals=completed_referrals,
             total_commission_earned=total_commission,
-            total_commission_paid=commission_stats.get('total_commission_paid', Decimal('0')),
-            pending_commission=commission_stats.get('pending_commission', Decimal('0')),
+            total_commission_paid=stats['total_commission_paid'],
+            pending_commission=stats['pending_commission'],
             success_rate=success_rate,
             average_commission_per_referral=avg_commission,
-            top_performing_categories=category_stats,
-            monthly_breakdown=monthly_stats
+            top_performing_categories=stats['categories'],
+            monthly_breakdown=stats['monthly']
         )
     
+    async def rebuild_monthly_rollups(self, start_month: date):
+        """
+        בנייה מחדש של סיכומים חודשיים - Backfill monthly rollups
+        Months are rebuilt newest first so the covered range only ever grows
+        backwards over complete months. The current month is rebuilt too but
+        is not marked as covered until it is over.
+        """
+        month = date.today().replace(day=1)
+        start_month = start_month.replace(day=1)
+        
+        while month >= start_month:
+            await self.db.rebuild_referral_rollups(month)
+            month = (month - timedelta(days=1)).replace(day=1)
+    
+    async def _get_rollup_window(
+        self,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[date, date]:
+        """Whole months inside [start_date, end_date] that rollups can answer"""
+        covered_from = await self.db.get_rollup_covered_from()
+        if not covered_from:
+            return date.min, date.min
+        
+        first_month = start_date.date().replace(day=1)
+        if start_date > datetime.combine(first_month, time(), tzinfo=start_date.tzinfo):
+            first_month = _next_month(first_month)
+        first_month = max(first_month, covered_from)
+        
+        # end_date is inclusive, so its month only counts once it is over
+        last_month = _next_month(end_date.date().replace(day=1))
+        if end_date < datetime.combine(last_month, time(), tzinfo=end_date.tzinfo) - timedelta(microseconds=1):
+            last_month = end_date.date().replace(day=1)
+        
+        return first_month, last_month
+    
+    async def _get_raw_stats(
+        self,
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """Compute stats from the raw tables, running the four queries concurrently"""
+        referral_stats, commission_stats, category_stats, monthly_stats = await asyncio.gather(
+            self.db.get_user_referral_stats(user_id, start_date, end_date),
+            self.db.get_user_commission_stats(user_id, start_date, end_date),
+            self.db.get_user_category_performance(user_id, start_date, end_date),
+            self.db.get_user_monthly_stats(user_id, start_date, end_date)
+        )
+        
+        return {
+            'total_referrals': referral_stats.get('total_referrals', 0),
+            'active_referrals': referral_stats.get('active_referrals', 0),
+            'completed_referrals': referral_stats.get('completed_referrals', 0),
+            'total_commission_earned': commission_stats.get('total_commission_earned', Decimal('0')),
+            'total_commission_paid': commission_stats.get('total_commission_paid', Decimal('0')),
+            'pending_commission': commission_stats.get('pending_commission', Decimal('0')),
+            'categories': category_stats,
+            'monthly': monthly_stats
+        }
+    
+    def _stats_from_rollups(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fold (month, category) rollup rows into the raw stats shape"""
+        stats = {
+            'total_referrals': 0,
+            'active_referrals': 0,
+            'completed_referrals': 0,
+            'total_commission_earned': Decimal('0'),
+            'total_commission_paid': Decimal('0'),
+            'pending_commission': Decimal('0'),
+            'categories': [],
+            'monthly': []
+        }
+        categories: Dict[str, Dict[str, Any]] = {}
+        months: Dict[Any, Dict[str, Any]] = {}
+        
+        for row in rows:
+            stats['total_referrals'] += row['referral_count']
+            stats['active_referrals'] += row['active_count']
+            stats['completed_referrals'] += row['completed_count']
+            stats['total_commission_earned'] += row['commission_earned']
+            stats['total_commission_paid'] += row['commission_paid']
+            stats['pending_commission'] += row['commission_pending']
+            
+            category = categories.setdefault(row['category'], {
+                'category': row['category'],
+                'referral_count': 0,
+                'total_commission': Decimal('0')
+            })
+            category['referral_count'] += row['referral_count']
+            category['total_commission'] += row['commission_earned']
+            
+            month = months.setdefault(row['month'], {
+                'month': datetime.combine(row['month'], time()),
+                'referral_count': 0,
+                'completed_count': 0,
+                'commission_earned': Decimal('0')
+            })
+            month['referral_count'] += row['referral_count']
+            month['completed_count'] += row['completed_count']
+            month['commission_earned'] += row['commission_earned']
+        
+        stats['categories'] = list(categories.values())
+        stats['monthly'] = list(months.values())
+        return stats
+    
+    def _merge_stats(self, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine stats computed over disjoint date ranges"""
+        merged = {
+            'total_referrals': 0,
+            'active_referrals': 0,
+            'completed_referrals': 0,
+            'total_commission_earned': Decimal('0'),
+            'total_commission_paid': Decimal('0'),
+            'pending_commission': Decimal('0')
+        }
+        categories: Dict[str, Dict[str, Any]] = {}
+        months: Dict[Any, Dict[str, Any]] = {}
+        
+        for part in parts:
+            for key in merged:
+                merged[key] += part[key] or 0
+            
+            for row in part['categories']:
+                category = categories.setdefault(row['category'], {
+                    'category': row['category'],
+                    'referral_count': 0,
+                    'total_commission': Decimal('0')
+                })
+                category['referral_count'] += row['referral_count']
+                category['total_commission'] += row['total_commission']
+            
+            for row in part['monthly']:
+                month = months.setdefault(row['month'], {
+                    'month': row['month'],
+                    'referral_count': 0,
+                    'completed_count': 0,
+                    'commission_earned': Decimal('0')
+                })
+                month['referral_count'] += row['referral_count']
+                month['completed_count'] += row['completed_count']
+                month['commission_earned'] += row['commission_earned']
+        
+        merged['categories'] = sorted(
+            categories.values(), key=lambda c: c['total_commission'], reverse=True
+        )
+        merged['monthly'] = sorted(
+            months.values(), key=lambda m: m['month'], reverse=True
+        )
+        return merged
+    
     async def _validate_referral_creation(
         self,
         referrer_id: str,
@@ -298,16 +452,6 @@ class ReferralService:
             if not validate_hebrew_content(context['notes']):
                 raise ValueError("הערות ההפניה חייבות להכיל תוכן בעברית תקין")
     
-    async def _find_parent_referral(self, user_id: str) -> Optional[ReferralResponse]:
-        """Find if this user was referred by someone else"""
-        # Look for referrals where this user is the referred_user
-        parent_data = await self.db.get_referral_by_referred_user(user_id)
-        
-        if parent_data:
-            return ReferralResponse(**parent_data)
-        
-        return None
-    
     def _is_valid_status_transition(
         self,
         current_status: ReferralStatus,
@@ -339,4 +483,16 @@ class ReferralService:
             "ip_address": None  # Would be populated from request context
         }
         
-        await self.db.insert_referral_log(log_data)
\ No newline at end of file
+        await self.db.insert_referral_log(log_data)
+
+def _next_month(month: date) -> date:
+    """First day of the month after `month`"""
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _status_delta(
+    status: ReferralStatus,
+    old_status: ReferralStatus,
+    new_status: ReferralStatus
+) -> int:
+    """Change in the count of referrals in `status` for a transition"""
+    return int(new_status == status) - int(old_status == status)
@@ -1,53 +1,154 @@
+import time
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence
 from models.referrals import CommissionBreakdown
 
+# Fixed-point scale used by the integer fast path (rates in millionths)
+RATE_SCALE = 1_000_000
+
+# Default rate configuration, used until a rate table is loaded from the DB
+DEFAULT_TIER_MULTIPLIERS = {
+    'bronze': Decimal('1.0'),
+    'silver': Decimal('1.1'),
+    'gold': Decimal('1.2'),
+    'premium': Decimal('1.3')
+}
+
+DEFAULT_CATEGORY_RATES = {
+    'renovation': {
+        'base_commission': Decimal('0.10'),
+        'platform_rate': Decimal('0.10')
+    },
+    'plumbing': {
+        'base_commission': Decimal('0.08'),
+        'platform_rate': Decimal('0.08')
+    },
+    'electrical': {
+        'base_commission': Decimal('0.08'),
+        'platform_rate': Decimal('0.08')
+    },
+    'cleaning': {
+        'base_commission': Decimal('0.06'),
+        'platform_rate': Decimal('0.05')
+    },
+    'tutoring': {
+        'base_commission': Decimal('0.12'),
+        'platform_rate': Decimal('0.10')
+    },
+    'general': {
+        'base_commission': Decimal('0.05'),
+        'platform_rate': Decimal('0.05')
+    }
+}
+
+# Multi-level commission distribution
+DEFAULT_LEVEL_RATES = {
+    0: Decimal('0.60'),  # 60% to direct referrer
+    1: Decimal('0.25'),  # 25% to 2nd level
+    2: Decimal('0.10'),  # 10% to 3rd level
+    3: Decimal('0.05')   # 5% to 4th+ levels
+}
+
+class CommissionRateTable:
+    """
+    טבלת תעריפי עמלות - Versioned commission rate configuration
+    """
+    
+    def __init__(
+        self,
+        version: int = 0,
+        tier_multipliers: Optional[Dict[str, Decimal]] = None,
+        category_rates: Optional[Dict[str, Dict[str, Decimal]]] = None,
+        level_rates: Optional[Dict[int, Decimal]] = None
+    ):
+        self.version = version
+        self.tier_multipliers = tier_multipliers or dict(DEFAULT_TIER_MULTIPLIERS)
+        self.category_rates = category_rates or dict(DEFAULT_CATEGORY_RATES)
+        self.level_rates = level_rates or dict(DEFAULT_LEVEL_RATES)
+    
+    @classmethod
+    def from_rows(cls, version: int, rows: List[Dict[str, Any]]) -> "CommissionRateTable":
+        """
+        Build a table from `commission_rates` rows of
+        (rate_type, rate_key, rate_field, rate_value). Anything the rows do
+        not define keeps its default.
+        """
+        tier_multipliers = dict(DEFAULT_TIER_MULTIPLIERS)
+        category_rates = {k: dict(v) for k, v in DEFAULT_CATEGORY_RATES.items()}
+        level_rates = dict(DEFAULT_LEVEL_RATES)
+        
+        for row in rows:
+            value = Decimal(str(row['rate_value']))
+            if row['rate_type'] == 'tier':
+                tier_multipliers[row['rate_key']] = value
+            elif row['rate_type'] == 'category':
+                category = category_rates.setdefault(
+                    row['rate_key'], dict(DEFAULT_CATEGORY_RATES['general'])
+                )
+                category[row['rate_field']] = value
+            elif row['rate_type'] == 'level':
+                level_rates[int(row['rate_key'])] = value
+        
+        return cls(version, tier_multipliers, category_rates, level_rates)
+
+class AgorotShare(NamedTuple):
+    """Single commission share from the integer path"""
+    recipient_type: str  # "referrer" or "platform"
+    level: int
+    amount_agorot: int
+    percentage_hundredths: int  # Percent of lead value, in hundredths
+
+# Process-wide rate table cache, refreshed when the DB version changes
+_rate_cache: Dict[str, Any] = {
+    "table": CommissionRateTable(),
+    "checked_at": 0.0
+}
+
+async def load_rate_table(db, max_age_seconds: float = 60.0) -> CommissionRateTable:
+    """
+    טעינת טבלת תעריפים - Get the active rate table, cached with versioning
+    
+    The active version number is checked at most every `max_age_seconds`;
+    the full table is only reloaded when that version changes.
+    """
+    now = time.monotonic()
+    if now - _rate_cache["checked_at"] < max_age_seconds:
+        return _rate_cache["table"]
+    
+    version = await db.get_active_commission_rate_version()
+    _rate_cache["checked_at"] = now
+    
+    if version is not None and version != _rate_cache["table"].version:
+        rows = await db.get_commission_rates(version)
+        _rate_cache["table"] = CommissionRateTable.from_rows(version, rows)
+    
+    return _rate_cache["table"]
+
+def invalidate_rate_table():
+    """Force the next `load_rate_table` call to re-check the DB version"""
+    _rate_cache["checked_at"] = 0.0
+
 class CommissionCalculator:
     """
     מחשבון עמלות מתקדם - Advanced commission calculator
     Handles complex multi-level referral commission calculations
     """
     
-    def __init__(self):
+    def __init__(self, rate_table: Optional[CommissionRateTable] = None):
+        self.rate_table = rate_table or _rate_cache["table"]
+        
         # Platform base commission rates
         self.platform_base_rate = Decimal('0.05')  # 5% platform fee
         self.platform_premium_rate = Decimal('0.10')  # 10% for premium categories
         
         # Referrer tier multipliers
-        self.tier_multipliers = {
-            'bronze': Decimal('1.0'),
-            'silver': Decimal('1.1'),
-            'gold': Decimal('1.2'),
-            'premium': Decimal('1.3')
-        }
+        self.tier_multipliers = self.rate_table.tier_multipliers
         
         # Category-specific rates
-        self.category_rates = {
-            'renovation': {
-                'base_commission': Decimal('0.10'),
-                'platform_rate': Decimal('0.10')
-            },
-            'plumbing': {
-                'base_commission': Decimal('0.08'),
-                'platform_rate': Decimal('0.08')
-            },
-            'electrical': {
-                'base_commission': Decimal('0.08'),
-                'platform_rate': Decimal('0.08')
-            },
-            'cleaning': {
-                'base_commission': Decimal('0.06'),
-                'platform_rate': Decimal('0.05')
-            },
-            'tutoring': {
-                'base_commission': Decimal('0.12'),
-                'platform_rate': Decimal('0.10')
-            },
-            'general': {
-                'base_commission': Decimal('0.05'),
-                'platform_rate': Decimal('0.05')
-            }
-        }
+        self.category_rates = self.rate_table.category_rates
+        
+        # Multi-level distribution
+        self.level_rates = self.rate_table.level_rates
     
     async def calculate_commission_breakdown(
         self,
@@ -144,13 +245,7 @@ class CommissionCalculator:
         """Calculate commission for multi-level referral chain"""
         breakdown = []
         
-        # Multi-level commission distribution
-        level_rates = {
-            0: Decimal('0.60'),  # 60% to direct referrer
-            1: Decimal('0.25'),  # 25% to 2nd level
-            2: Decimal('0.10'),  # 10% to 3rd level
-            3: Decimal('0.05')   # 5% to 4th+ levels
-        }
+        level_rates = self.level_rates
         
         remaining_commission = base_commission
         
@@ -195,6 +290,159 @@ class CommissionCalculator:
         
         return breakdown
     
+    def calculate_batch(
+        self,
+        lead_values: Sequence[Decimal],
+        commission_rates: Sequence[Decimal],
+        categories: Sequence[str],
+        tiers: Sequence[str],
+        chain_lengths: Sequence[int]
+    ) -> List[List[AgorotShare]]:
+        """
+        חישוב עמלות באצווה - Batch commission calculation in integer agorot
+        
+        Takes parallel arrays, one entry per referral, and returns each
+        referral's shares in the same order as `calculate_commission_breakdown`.
+        Rates are fixed-point millionths and every amount is rounded once,
+        half-up to the agora, exactly as the Decimal path quantizes. Rows whose
+        lead value or rates do not fit the fixed-point scale are computed with
+        the Decimal path so results are always identical.
+        """
+        if not (len(lead_values) == len(commission_rates) == len(categories)
+                == len(tiers) == len(chain_lengths)):
+            raise ValueError("כל מערכי הקלט חייבים להיות באותו אורך")
+        
+        general = self.category_rates['general']
+        level_micros = {
+            level: _to_fixed(rate, RATE_SCALE) for level, rate in self.level_rates.items()
+        }
+        default_level_micro = _to_fixed(Decimal('0.05'), RATE_SCALE)
+        coefficient_cache: Dict[tuple, Optional[tuple]] = {}
+        
+        results = []
+        for lead_value, rate, category, tier, chain_length in zip(
+            lead_values, commission_rates, categories, tiers, chain_lengths
+        ):
+            lead_agorot = _to_fixed(lead_value, 100)
+            key = (rate, category, tier)
+            if key not in coefficient_cache:
+                category_config = self.category_rates.get(category, general)
+                coefficient_cache[key] = _fixed_tuple(
+                    rate,
+                    self.tier_multipliers.get(tier, Decimal('1.0')),
+                    category_config['platform_rate']
+                )
+            coefficients = coefficient_cache[key]
+            
+            if lead_agorot is None or lead_agorot <= 0 or coefficients is None or (
+                chain_length != 1 and None in level_micros.values()
+            ):
+                results.append(self._decimal_row_shares(
+                    lead_value, rate, category, tier, chain_length
+                ))
+                continue
+            
+            rate_micro, tier_micro, platform_micro = coefficients
+            shares = []
+            
+            if chain_length == 1:
+                shares.append(AgorotShare(
+                    "referrer", 0,
+                    _div_half_up(lead_agorot * rate_micro * tier_micro, RATE_SCALE ** 2),
+                    _div_half_up(rate_micro * tier_micro, RATE_SCALE ** 2 // 10_000)
+                ))
+            else:
+                # Remaining commission, in agorot scaled by RATE_SCALE ** 2
+                remaining = lead_agorot * rate_micro * RATE_SCALE
+                for level in range(min(chain_length, 4)):
+                    level_micro = level_micros.get(level, default_level_micro)
+                    level_commission = min(lead_agorot * rate_micro * level_micro, remaining)
+                    
+                    shares.append(AgorotShare(
+                        "referrer", level,
+                        _div_half_up(level_commission, RATE_SCALE ** 2),
+                        _div_half_up(level_commission, lead_agorot * RATE_SCALE ** 2 // 10_000)
+                    ))
+                    
+                    remaining -= level_commission
+                    if remaining <= RATE_SCALE ** 2:  # One agora
+                        break
+            
+            shares.append(AgorotShare(
+                "platform", 0,
+                _div_half_up(lead_agorot * platform_micro, RATE_SCALE),
+                _div_half_up(platform_micro, RATE_SCALE // 10_000)
+            ))
+            results.append(shares)
+        
+        return results
+    
+    def to_breakdown(
+        self,
+        shares: List[AgorotShare],
+        category: str,
+        tier: str,
+        chain_length: int
+    ) -> List[CommissionBreakdown]:
+        """המרה לפירוט עמלות - Convert integer shares to CommissionBreakdown items"""
+        breakdown = []
+        for share in shares:
+            if share.recipient_type == "platform":
+                recipient_id = "platform"
+                description = (
+                    f"עמלת פלטפורמה - {category}" if chain_length == 1
+                    else f"עמלת פלטפורמה - רב-רמתי {category}"
+                )
+            elif chain_length == 1:
+                recipient_id = "referrer"
+                description = f"עמלת מפנה רמת {tier} - {category}"
+            else:
+                recipient_id = f"referrer_level_{share.level}"
+                description = f"עמלת מפנה רמה {share.level + 1} - {category}"
+            
+            breakdown.append(CommissionBreakdown(
+                recipient_id=recipient_id,
+                recipient_type=share.recipient_type,
+                amount=Decimal(share.amount_agorot) / 100,
+                percentage=Decimal(share.percentage_hundredths) / 100,
+                description=description,
+                level=share.level
+            ))
+        
+        return breakdown
+    
+    def _decimal_row_shares(
+        self,
+        lead_value: Decimal,
+        commission_rate: Decimal,
+        category: str,
+        tier: str,
+        chain_length: int
+    ) -> List[AgorotShare]:
+        """Fallback for rows the fixed-point path cannot represent exactly"""
+        category_config = self.category_rates.get(category, self.category_rates['general'])
+        base_commission = lead_value * commission_rate
+        platform_commission = lead_value * category_config['platform_rate']
+        
+        shares = []
+        if chain_length == 1:
+            referrer = base_commission * self.tier_multipliers.get(tier, Decimal('1.0'))
+            shares.append(_decimal_share("referrer", 0, referrer, lead_value))
+        else:
+            remaining = base_commission
+            for level in range(min(chain_length, 4)):
+                level_commission = min(
+                    base_commission * self.level_rates.get(level, Decimal('0.05')),
+                    remaining
+                )
+                shares.append(_decimal_share("referrer", level, level_commission, lead_value))
+                remaining -= level_commission
+                if remaining <= Decimal('0.01'):
+                    break
+        
+        shares.append(_decimal_share("platform", 0, platform_commission, lead_value))
+        return shares
+    
     def calculate_referrer_bonus(
         self,
         total_referrals: int,
@@ -289,4 +537,36 @@ class CommissionCalculator:
         multiplier = category_adjustments.get(month, Decimal('1.0'))
         
         adjusted_commission = base_commission * multiplier
-        return adjusted_commission.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
\ No newline at end of file
+        return adjusted_commission.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def _to_fixed(value: Any, scale: int) -> Optional[int]:
+    """Exact fixed-point integer for `value`, or None if it does not fit the scale"""
+    scaled = Decimal(str(value)) * scale
+    if scaled != scaled.to_integral_value():
+        return None
+    return int(scaled)
+
+def _fixed_tuple(*values: Decimal) -> Optional[tuple]:
+    fixed = tuple(_to_fixed(value, RATE_SCALE) for value in values)
+    return None if None in fixed else fixed
+
+def _div_half_up(numerator: int, denominator: int) -> int:
+    """Integer division rounding half away from zero, like ROUND_HALF_UP"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return -quotient if numerator < 0 else quotient
+
+def _decimal_share(
+    recipient_type: str,
+    level: int,
+    amount: Decimal,
+    lead_value: Decimal
+) -> AgorotShare:
+    percentage = (amount / lead_value * 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return AgorotShare(
+        recipient_type,
+        level,
+        int(amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100),
+        int(percentage * 100)
+    )
@@ -0,0 +1,220 @@
+"""
+Referral monthly rollup tests against PostgreSQL.
+
+Test Coverage:
+- Rebuilding a month from referrals and commissions
+- Coverage only extends over completed months
+- Deltas wait for a running rebuild and land on top of it
+- A rebuild waits for in-flight deltas instead of failing on their rows
+
+Set TEST_DATABASE_URL to an empty database with the extensions from
+scripts/init_database.sql; the tests are skipped otherwise. The schema is
+recreated for every test.
+"""
+
+import asyncio
+import os
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+asyncpg = pytest.importorskip("asyncpg")
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import (
+    DatabaseConnection, ROLLUP_LOCK_NAMESPACE, rollup_month_key
+)
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+INIT_SQL = Path(__file__).resolve().parents[3] / "scripts" / "init_database.sql"
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+THIS_MONTH = date.today().replace(day=1)
+LAST_MONTH = (THIS_MONTH - timedelta(days=1)).replace(day=1)
+
+# The service writes commission records per recipient
+COMMISSIONS_DDL = """
+    DROP TABLE commissions;
+    CREATE TABLE commissions (
+        id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+        calculation_id UUID,
+        referral_id UUID NOT NULL REFERENCES referrals(id),
+        recipient_id VARCHAR(100),
+        recipient_type VARCHAR(20),
+        amount DECIMAL(10,2) NOT NULL,
+        percentage DECIMAL(6,2),
+        status VARCHAR(50) NOT NULL,
+        calculated_at TIMESTAMP NOT NULL,
+        level INTEGER DEFAULT 0,
+        description TEXT,
+        paid_at TIMESTAMP,
+        updated_at TIMESTAMP
+    );
+"""
+
+
+@pytest_asyncio.fixture
+async def db():
+    """DatabaseConnection on a freshly created schema"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    await conn.execute(INIT_SQL.read_text())
+    await conn.execute(COMMISSIONS_DDL)
+    await conn.close()
+
+    database = DatabaseConnection()
+    database.pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=4)
+
+    yield database
+
+    await database.pool.close()
+
+
+@pytest_asyncio.fixture
+async def referral(db):
+    """One renovation referral created last month, with two commissions"""
+    async with db.get_connection() as conn:
+        referrer = await conn.fetchval(
+            "INSERT INTO users (phone, role) VALUES ('0501', 'professional') RETURNING id"
+        )
+        professional = await conn.fetchval(
+            "INSERT INTO users (phone, role) VALUES ('0502', 'professional') RETURNING id"
+        )
+        lead = await conn.fetchval(
+            """
+            INSERT INTO leads (customer_id, title, description, category)
+            VALUES ($1, 'שיפוץ', 'תיאור', 'renovation') RETURNING id
+            """,
+            referrer
+        )
+        referral_id = await conn.fetchval(
+            """
+            INSERT INTO referrals (referrer_id, lead_id, referred_professional_id, status, created_at)
+            VALUES ($1, $2, $3, 'completed', $4) RETURNING id
+            """,
+            referrer, lead, professional, datetime.combine(LAST_MONTH, datetime.min.time())
+        )
+        await conn.executemany(
+            """
+            INSERT INTO commissions (referral_id, amount, status, calculated_at)
+            VALUES ($1, $2, $3, $4)
+            """,
+            [
+                (referral_id, Decimal("100.00"), "paid", datetime.combine(LAST_MONTH, datetime.min.time())),
+                (referral_id, Decimal("40.00"), "calculated", datetime.combine(LAST_MONTH, datetime.min.time())),
+            ]
+        )
+    return referral_id
+
+
+async def _rollup(db, month):
+    async with db.get_connection() as conn:
+        return await conn.fetchrow(
+            """
+            SELECT referral_count, completed_count, commission_earned,
+                commission_paid, commission_pending
+            FROM referral_monthly_stats WHERE month = $1
+            """,
+            month
+        )
+
+
+@pytest.mark.asyncio
+class TestRebuild:
+    """Rebuilding one month from raw data"""
+
+    async def test_month_is_rebuilt_and_covered(self, db, referral):
+        await db.rebuild_referral_rollups(LAST_MONTH)
+
+        row = await _rollup(db, LAST_MONTH)
+        assert row["referral_count"] == 1
+        assert row["completed_count"] == 1
+        assert row["commission_earned"] == Decimal("140.00")
+        assert row["commission_paid"] == Decimal("100.00")
+        assert row["commission_pending"] == Decimal("40.00")
+        assert await db.get_rollup_covered_from() == LAST_MONTH
+
+    async def test_rebuild_replaces_drifted_rows(self, db, referral):
+        await db.rebuild_referral_rollups(LAST_MONTH)
+        await db.apply_referral_rollup_delta(
+            referral, datetime.combine(LAST_MONTH, datetime.min.time()), referral_count=5
+        )
+
+        await db.rebuild_referral_rollups(LAST_MONTH)
+
+        assert (await _rollup(db, LAST_MONTH))["referral_count"] == 1
+
+    async def test_open_month_is_not_covered(self, db, referral):
+        await db.rebuild_referral_rollups(THIS_MONTH)
+
+        assert await db.get_rollup_covered_from() is None
+
+        await db.rebuild_referral_rollups(LAST_MONTH)
+        await db.rebuild_referral_rollups(THIS_MONTH)
+
+        assert await db.get_rollup_covered_from() == LAST_MONTH
+
+
+@pytest.mark.asyncio
+class TestConcurrentDeltas:
+    """Deltas and rebuilds of the same month are serialized"""
+
+    async def test_delta_waits_for_a_running_rebuild(self, db, referral):
+        occurred_at = datetime.combine(LAST_MONTH, datetime.min.time())
+        async with db.get_connection() as rebuild_conn:
+            async with rebuild_conn.transaction():
+                await rebuild_conn.execute(
+                    "SELECT pg_advisory_xact_lock($1, $2)",
+                    ROLLUP_LOCK_NAMESPACE, rollup_month_key(LAST_MONTH)
+                )
+                delta = asyncio.create_task(db.apply_referral_rollup_delta(
+                    referral, occurred_at, commission_earned=Decimal("10.00")
+                ))
+                await asyncio.sleep(0.2)
+                assert not delta.done()
+
+        await delta
+        await db.rebuild_referral_rollups(LAST_MONTH)
+        await db.apply_referral_rollup_delta(
+            referral, occurred_at, commission_earned=Decimal("10.00")
+        )
+
+        assert (await _rollup(db, LAST_MONTH))["commission_earned"] == Decimal("150.00")
+
+    async def test_rebuild_waits_for_an_in_flight_delta(self, db, referral):
+        occurred_at = datetime.combine(LAST_MONTH, datetime.min.time())
+        async with db.get_connection() as delta_conn:
+            async with delta_conn.transaction():
+                await delta_conn.execute(
+                    "SELECT pg_advisory_xact_lock_shared($1, $2)",
+                    ROLLUP_LOCK_NAMESPACE, rollup_month_key(occurred_at)
+                )
+                rebuild = asyncio.create_task(db.rebuild_referral_rollups(LAST_MONTH))
+                await asyncio.sleep(0.2)
+                assert not rebuild.done()
+
+                # The delta's row exists before the rebuild inserts the same key
+                await delta_conn.execute(
+                    """
+                    INSERT INTO referral_monthly_stats (user_id, month, category, commission_earned)
+                    SELECT referrer_id, $2, 'renovation', 10 FROM referrals WHERE id = $1
+                    """,
+                    referral, LAST_MONTH
+                )
+
+        await rebuild
+
+        assert (await _rollup(db, LAST_MONTH))["commission_earned"] == Decimal("140.00")
+
+    async def test_month_keys(self):
+        assert rollup_month_key(date(2024, 1, 31)) == rollup_month_key(datetime(2024, 1, 1))
+        assert rollup_month_key(date(2024, 2, 1)) == rollup_month_key(date(2023, 12, 1)) + 2
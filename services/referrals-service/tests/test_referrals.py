@@ -200,6 +200,114 @@ class TestCommissionCalculation:
         )
         assert march_cleaning > base_commission  # Passover boost
 
+    @pytest.mark.asyncio
+    async def test_batch_matches_decimal_breakdown(self):
+        """בדיקת התאמה בין חישוב אצווה לחישוב עשרוני"""
+        calculator = CommissionCalculator()
+
+        cases = [
+            (Decimal(lead_value), Decimal(rate), category, tier, chain_length)
+            for lead_value in ('0.01', '99.99', '1234.57', '5000', '10000.05')
+            for rate in ('0.05', '0.08', '0.125', '0.0333333')
+            for category in ('renovation', 'cleaning', 'unknown')
+            for tier in ('bronze', 'silver', 'premium')
+            for chain_length in (1, 2, 4, 6)
+        ]
+
+        results = calculator.calculate_batch(*zip(*cases))
+
+        for (lead_value, rate, category, tier, chain_length), shares in zip(cases, results):
+            expected = await calculator.calculate_commission_breakdown(
+                lead_value, rate, category, tier, chain_length
+            )
+            actual = calculator.to_breakdown(shares, category, tier, chain_length)
+            assert [b.dict() for b in actual] == [b.dict() for b in expected]
+
+class TestCommissionRepricing:
+    """בדיקות תמחור מחדש ותעריפים"""
+    
+    @pytest.fixture
+    def repricing_db(self, mock_database):
+        # The service imports the calculator through the app directory
+        from utils.commission_calculator import _rate_cache, CommissionRateTable
+        
+        def row(calculation_id, status, total):
+            return {
+                "id": calculation_id, "referral_id": f"ref-{calculation_id}",
+                "lead_value": Decimal('5000'), "total_commission": Decimal(total),
+                "status": status, "calculated_at": datetime(2024, 3, 5),
+                "referrer_id": "user-referrer", "commission_rate": Decimal('0.08'),
+                "chain_length": 1, "category": "renovation",
+                "total_completed_referrals": 0, "success_rate": 0
+            }
+        
+        # Version 2 of the rates is active in the DB; the cache still holds version 1
+        _rate_cache["table"] = CommissionRateTable(version=1)
+        _rate_cache["checked_at"] = float("inf")
+        mock_database.get_active_commission_rate_version = AsyncMock(return_value=2)
+        mock_database.get_commission_rates = AsyncMock(return_value=[
+            {"rate_type": "tier", "rate_key": "bronze", "rate_field": "value", "rate_value": Decimal('1.5')}
+        ])
+        mock_database.get_commission_repricing_inputs = AsyncMock(return_value=[
+            row("calc-pending", "calculated", "1.00"),
+            row("calc-paid", "paid", "1.00")
+        ])
+        mock_database.apply_commission_repricing = AsyncMock(return_value=1)
+        yield mock_database
+        _rate_cache["table"] = CommissionRateTable()
+        _rate_cache["checked_at"] = 0.0
+    
+    @pytest.mark.asyncio
+    async def test_report_uses_the_active_version_and_writes_nothing(self, repricing_db):
+        service = CommissionService()
+        service.db = repricing_db
+        
+        report = await service.recalculate_commissions(datetime(2024, 3, 1), datetime(2024, 4, 1))
+        
+        assert report["rate_version"] == 2
+        assert report["calculations"] == 2
+        assert [c["calculation_id"] for c in report["changed"]] == ["calc-pending", "calc-paid"]
+        assert report["applied"] == 0
+        repricing_db.apply_commission_repricing.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_apply_writes_only_pending_calculations(self, repricing_db):
+        service = CommissionService()
+        service.db = repricing_db
+        
+        report = await service.recalculate_commissions(
+            datetime(2024, 3, 1), datetime(2024, 4, 1), apply=True
+        )
+        
+        repricings = repricing_db.apply_commission_repricing.await_args.args[0]
+        assert [r["calculation_id"] for r in repricings] == ["calc-pending"]
+        pending = next(c for c in report["changed"] if c["calculation_id"] == "calc-pending")
+        assert repricings[0]["old_total"] == Decimal('1.00')
+        assert repricings[0]["new_total"] == pending["repriced_total"]
+        assert sum(item["amount"] for item in repricings[0]["breakdown"]) == pending["repriced_total"]
+        assert report["applied"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_activating_a_version_invalidates_the_rate_cache(self, repricing_db):
+        from utils.commission_calculator import _rate_cache
+        service = CommissionService()
+        service.db = repricing_db
+        repricing_db.activate_commission_rate_version = AsyncMock(return_value=True)
+        
+        await service.activate_rate_version(2)
+        
+        repricing_db.activate_commission_rate_version.assert_awaited_once_with(2)
+        assert _rate_cache["checked_at"] == 0.0
+    
+    @pytest.mark.asyncio
+    async def test_activating_a_missing_version(self, repricing_db):
+        service = CommissionService()
+        service.db = repricing_db
+        repricing_db.activate_commission_rate_version = AsyncMock(return_value=False)
+        
+        with pytest.raises(ValueError):
+            await service.activate_rate_version(9)
+
 class TestReferralService:
     """בדיקות שירות הפניות"""
     
@@ -207,18 +315,46 @@ class TestReferralService:
     async def test_referral_chain_building(self, mock_database):
         """בדיקת בניית שרשרת הפניות"""
         service = ReferralService()
-        
-        # Mock chain data
-        mock_database.get_referral_by_referred_user.side_effect = [
-            {"id": "ref-parent", "referrer_id": "parent-referrer"},
-            None  # End of chain
-        ]
+        service.db = mock_database
+        
+        # Mock chain data as returned by the recursive CTE
+        root = await mock_database.get_referral("ref-123")
+        mock_database.get_referral_chain = AsyncMock(return_value=[
+            {**root, "level": 0, "referrer_name": "יוסי כהן"},
+            {
+                **root,
+                "id": "ref-parent",
+                "referrer_id": "parent-referrer",
+                "referred_user_id": "user-referrer",
+                "referrer_commission": Decimal('100.00'),
+                "level": 1,
+                "referrer_name": None
+            }
+        ])
         
         chain = await service.get_referral_chain("ref-123")
         
         assert chain.root_referral_id == "ref-123"
-        assert chain.total_chain_length >= 1
-        assert len(chain.nodes) >= 1
+        assert chain.total_chain_length == 2
+        assert [node.level for node in chain.nodes] == [0, 1]
+        assert chain.nodes[0].referrer_name == "יוסי כהן"
+        assert chain.nodes[1].referrer_name == "משתמש לא זמין"
+        assert chain.total_commission_distributed == Decimal('420.00')
+        mock_database.get_referral_chain.assert_awaited_once_with("ref-123")
+    
+    @pytest.mark.asyncio
+    async def test_chain_length_uses_materialized_path(self, mock_database):
+        """בדיקת אורך שרשרת מנתיב שמור"""
+        service = CommissionService()
+        service.db = mock_database
+        mock_database.get_referral_chain_path = AsyncMock(return_value={
+            "chain_length": 3,
+            "ancestor_ids": ["ref-parent", "ref-grandparent"]
+        })
+        mock_database.get_referral_chain = AsyncMock()
+        
+        assert await service._get_chain_length("ref-123") == 3
+        mock_database.get_referral_chain.assert_not_awaited()
     
     @pytest.mark.asyncio
     async def test_referral_status_validation(self):
@@ -452,6 +588,60 @@ class TestReferralStatistics:
         assert data["completed_referrals"] == 7
         assert float(data["success_rate"]) > 0  # Should calculate success rate
         assert "top_performing_categories" in data
+    
+    @pytest.mark.asyncio
+    async def test_user_stats_from_rollups(self, mock_database):
+        """בדיקת סטטיסטיקות מסיכומים חודשיים"""
+        from datetime import date
+        
+        service = ReferralService()
+        service.db = mock_database
+        
+        mock_database.get_rollup_covered_from = AsyncMock(return_value=date(2024, 1, 1))
+        mock_database.get_user_rollup_stats = AsyncMock(return_value=[
+            {
+                "month": date(2024, 2, 1), "category": "renovation",
+                "referral_count": 4, "active_count": 1, "completed_count": 3,
+                "commission_earned": Decimal('900.00'), "commission_paid": Decimal('600.00'),
+                "commission_pending": Decimal('300.00')
+            },
+            {
+                "month": date(2024, 3, 1), "category": "cleaning",
+                "referral_count": 2, "active_count": 2, "completed_count": 0,
+                "commission_earned": Decimal('100.00'), "commission_paid": Decimal('0'),
+                "commission_pending": Decimal('100.00')
+            }
+        ])
+        mock_database.get_user_referral_stats = AsyncMock(return_value={
+            "total_referrals": 1, "active_referrals": 0, "completed_referrals": 1
+        })
+        mock_database.get_user_commission_stats = AsyncMock(return_value={
+            "total_commission_earned": Decimal('50.00'),
+            "total_commission_paid": Decimal('50.00'),
+            "pending_commission": Decimal('0')
+        })
+        mock_database.get_user_category_performance = AsyncMock(return_value=[
+            {"category": "cleaning", "referral_count": 1, "total_commission": Decimal('50.00')}
+        ])
+        mock_database.get_user_monthly_stats = AsyncMock(return_value=[])
+        
+        stats = await service.get_user_stats(
+            "user-stats", datetime(2024, 1, 15), datetime(2024, 4, 10)
+        )
+        
+        # February and March come from rollups; both edges are computed raw
+        mock_database.get_user_rollup_stats.assert_awaited_once_with(
+            "user-stats", date(2024, 2, 1), date(2024, 4, 1)
+        )
+        assert mock_database.get_user_referral_stats.await_count == 2
+        
+        assert stats.total_referrals == 8
+        assert stats.completed_referrals == 5
+        assert stats.total_commission_earned == Decimal('1100.00')
+        assert stats.pending_commission == Decimal('400.00')
+        assert stats.top_performing_categories[0]["category"] == "renovation"
+        cleaning = next(c for c in stats.top_performing_categories if c["category"] == "cleaning")
+        assert cleaning["referral_count"] == 4
 
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
\ No newline at end of file
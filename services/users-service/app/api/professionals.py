@@ -4,9 +4,8 @@ import sys
 import uuid
 import logging
 from typing import List, Optional
-from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func, and_, or_
 from sqlalchemy.orm import joinedload
@@ -25,6 +24,7 @@ from ..deps import (
     get_db_session, 
     set_row_level_security,
     TokenClaims,
+    invalidate_principal,
     require_admin,
     require_professional,
     validate_hebrew_text,
@@ -46,6 +46,7 @@ from ..models.professionals import (
 )
 from ..services.s3_service import S3Service
 from ..services.professional_service import ProfessionalService
+from ..services.professional_search import search_professionals
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -53,8 +54,11 @@ router = APIRouter()
 
 @router.get("", response_model=List[ProfessionalPublic])
 async def get_professionals_public(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of records to skip (prefer cursor)"),
     limit: int = Query(50, ge=1, le=100, description="Number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    q: Optional[str] = Query(None, max_length=200, description="Free-text search"),
     profession: Optional[str] = Query(None, description="Filter by profession"),
     location: Optional[str] = Query(None, description="Filter by location"),
     specialties: Optional[List[str]] = Query(None, description="Filter by specialties"),
@@ -67,40 +71,34 @@ async def get_professionals_public(
     
     Public endpoint that returns professional profiles without PII.
     No phone numbers or sensitive information is exposed.
+    With `q`, results are ranked by relevance; otherwise verified and
+    top-rated professionals come first. When more results exist, the
+    X-Next-Cursor response header holds the cursor of the next page.
     """
     try:
-        # Build query
-        query = (
-            select(Professional)
-            .where(Professional.status == ProfessionalStatus.ACTIVE)
-            .order_by(Professional.is_verified.desc(), Professional.rating.desc())
+        page = await search_professionals(
+            db,
+            query=q,
+            profession=profession,
+            location=location,
+            specialties=specialties,
+            verified_only=verified_only,
+            min_rating=min_rating,
+            cursor=cursor,
+            skip=skip,
+            limit=limit
         )
         
-        # Apply filters
-        if profession:
-            query = query.where(Professional.profession.ilike(f"%{profession}%"))
-        
-        if location:
-            query = query.where(Professional.location.ilike(f"%{location}%"))
-        
-        if specialties:
-            for specialty in specialties:
-                query = query.where(Professional.specialties.any(specialty))
-        
-        if verified_only:
-            query = query.where(Professional.is_verified == True)
-        
-        if min_rating is not None:
-            query = query.where(Professional.rating >= Decimal(str(min_rating)))
-        
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
-        
-        result = await db.execute(query)
-        professionals = result.scalars().all()
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
         
-        return [ProfessionalPublic.from_orm(prof) for prof in professionals]
+        return [ProfessionalPublic.from_orm(prof) for prof in page.professionals]
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error fetching public professionals: {e}")
         raise HTTPException(
@@ -209,6 +207,8 @@ async def create_professional_profile(
             await db.execute(user_update)
             await db.commit()
         
+        await invalidate_principal(current_user.user_id)
+        
         logger.info(f"Professional profile created for user {current_user.user_id}")
         return ProfessionalModel.from_orm(new_professional)
         
@@ -292,6 +292,7 @@ async def update_professional_profile(
         
         await db.execute(update_query)
         await db.commit()
+        await invalidate_principal(current_user.user_id)
         
         # Fetch updated professional
         result = await db.execute(query)
@@ -392,6 +393,7 @@ async def verify_professional(
             admin_user_id=current_user.user_id,
             notes=verification.admin_notes
         )
+        await invalidate_principal(professional.user_id)
         
         logger.info(f"Professional {professional_id} verified by admin {current_user.user_id}")
         return {
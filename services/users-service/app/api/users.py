@@ -19,6 +19,7 @@ from ..deps import (
     get_db_session, 
     set_row_level_security,
     TokenClaims,
+    invalidate_principal,
     validate_hebrew_text,
     normalize_israeli_phone
 )
@@ -120,6 +121,7 @@ async def update_current_user_profile(
         
         await db.execute(update_query)
         await db.commit()
+        await invalidate_principal(current_user.user_id)
         
         # Fetch updated user
         query = (
@@ -20,6 +20,8 @@ sys.path.append("/app/libs")
 from python_shared.config.settings import get_settings, Settings
 from python_shared.database.connection import get_async_session
 from python_shared.database.models import UserRole
+from python_shared.auth import publish_principal_invalidation
+from python_shared.monitoring import instrument_redis
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +54,7 @@ async def get_redis_client() -> redis.Redis:
             decode_responses=True,
             health_check_interval=30
         )
+        instrument_redis(_redis_client)
     
     return _redis_client
 
@@ -64,6 +67,15 @@ async def close_redis_client():
         _redis_client = None
 
 
+async def invalidate_principal(user_id) -> None:
+    """Drop a user's cached principal in every service after a profile or status change."""
+    try:
+        redis_client = await get_redis_client()
+        await publish_principal_invalidation(redis_client, str(user_id))
+    except Exception as e:
+        logger.error(f"Failed to publish principal invalidation for {user_id}: {e}")
+
+
 # Token Claims Model
 class TokenClaims:
     """JWT token claims."""
@@ -18,7 +18,8 @@ from slowapi.middleware import SlowAPIMiddleware
 sys.path.append("/app/libs")
 
 from python_shared.config.settings import get_settings
-from python_shared.database.connection import get_db_engine
+from python_shared.database.connection import get_db_engine, async_engine
+from python_shared.monitoring import setup_metrics
 from .deps import get_limiter, close_redis_client
 
 # Import API routers
@@ -81,6 +82,9 @@ limiter = get_limiter()
 app.state.limiter = limiter
 app.add_middleware(SlowAPIMiddleware)
 
+# Request metrics, served at /metrics
+setup_metrics(app, "users-service", engines=[async_engine])
+
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
@@ -0,0 +1,209 @@
+"""Professional search backend.
+
+Text search matches the trigger-maintained ``search_vector`` (prefix terms,
+so "אינסטלט" finds "אינסטלטור") or a substring of profession / company name
+through their trigram indexes, which also catches words carrying Hebrew
+prefixes (ה, ו, ב, ל, ...). Results are ranked by text relevance, rating and
+verification. Without a text query the directory is ordered by verification,
+rating and review count, served backwards from ``idx_professionals_directory``.
+
+Both orders paginate with an opaque keyset cursor holding the last row's sort
+key, so deep pages cost the same as the first one.
+"""
+
+import sys
+import base64
+import json
+import re
+import uuid
+from decimal import Decimal
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import (
+    Boolean, Integer, Numeric, and_, case, cast, func, literal, literal_column, or_, select, tuple_
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Add libs to path
+sys.path.append("/app/libs")
+from python_shared.database.models import Professional, ProfessionalStatus
+
+SEARCH_CONFIG = "simple"
+
+# Score = relevance * RELEVANCE_WEIGHT + rating / 5 * RATING_WEIGHT + VERIFIED_BONUS
+RELEVANCE_WEIGHT = 1.0
+RATING_WEIGHT = 0.3
+VERIFIED_BONUS = 0.2
+
+# Mirrors professional_search_text() in the database
+_HEBREW_MARKS = re.compile("[\u0591-\u05BD\u05BF-\u05C7]")
+_TERM = re.compile(r"\w+")
+
+
+class SearchPage(NamedTuple):
+    professionals: List[Professional]
+    next_cursor: Optional[str]
+
+
+def normalize_search_text(value: str) -> str:
+    """Lowercase and strip niqqud, as the search document is built."""
+    return _HEBREW_MARKS.sub("", value.lower()).strip()
+
+
+def build_tsquery_text(query: str) -> Optional[str]:
+    """Prefix-match every word of the query: 'חשמלאי ת"א' -> 'חשמלאי:* & ת:* & א:*'."""
+    terms = _TERM.findall(normalize_search_text(query))
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _contains(column, value: str):
+    return column.ilike(f"%{escape_like(value.strip())}%", escape="\\")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([str(value) if isinstance(value, (Decimal, uuid.UUID)) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Any]) -> List[Any]:
+    """Decode a cursor into literals typed like the sort key; ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor does not match this search")
+
+        parsed = []
+        for value, type_ in zip(values, types):
+            if isinstance(type_, Numeric):
+                value = Decimal(value)
+            elif isinstance(type_, UUID):
+                value = uuid.UUID(value)
+            elif isinstance(type_, Boolean):
+                value = bool(value)
+            else:
+                value = int(value)
+            parsed.append(literal(value, type_))
+        return parsed
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+async def search_professionals(
+    db: AsyncSession,
+    query: Optional[str] = None,
+    profession: Optional[str] = None,
+    location: Optional[str] = None,
+    specialties: Optional[List[str]] = None,
+    verified_only: bool = False,
+    min_rating: Optional[float] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> SearchPage:
+    """
+    Search active professionals.
+
+    Args:
+        db: Database session
+        query: Free-text query (profession, company name, specialties, location)
+        profession: Profession substring filter
+        location: Location substring filter
+        specialties: Professionals must have all of these specialties
+        verified_only: Only return verified professionals
+        min_rating: Minimum rating filter
+        cursor: Cursor returned with the previous page
+        skip: Offset, only used without a cursor (kept for older clients)
+        limit: Number of records to return
+
+    Returns:
+        The page of professionals and the cursor of the next page, if any
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another kind of search
+    """
+    stmt_filters = [Professional.status == ProfessionalStatus.ACTIVE]
+    query = (query or "").strip()
+
+    if query:
+        tsquery_text = build_tsquery_text(query)
+        normalized = normalize_search_text(query)
+        matches = [
+            _contains(Professional.profession, query),
+            _contains(Professional.company_name, query)
+        ]
+        relevance = func.greatest(
+            func.similarity(Professional.profession, normalized),
+            func.similarity(func.coalesce(Professional.company_name, ""), normalized)
+        )
+        if tsquery_text:
+            tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+            matches.append(Professional.search_vector.op("@@")(tsquery))
+            relevance = relevance + func.coalesce(func.ts_rank_cd(Professional.search_vector, tsquery), 0)
+        stmt_filters.append(or_(*matches))
+
+        score = func.round(
+            cast(
+                relevance * RELEVANCE_WEIGHT
+                + func.coalesce(Professional.rating, 0) / 5 * RATING_WEIGHT
+                + case((Professional.is_verified == True, VERIFIED_BONUS), else_=0),
+                Numeric
+            ),
+            6
+        )
+        sort_key = [score, Professional.id]
+        key_types = [Numeric(), UUID(as_uuid=True)]
+    else:
+        sort_key = [
+            Professional.is_verified,
+            # Literal zeros, so the expressions match the index definition
+            func.coalesce(Professional.rating, literal_column("0")),
+            func.coalesce(Professional.review_count, literal_column("0")),
+            Professional.id
+        ]
+        key_types = [Boolean(), Numeric(), Integer(), UUID(as_uuid=True)]
+
+    if profession:
+        stmt_filters.append(_contains(Professional.profession, profession))
+
+    if location:
+        stmt_filters.append(_contains(Professional.location, location))
+
+    if specialties:
+        # One GIN-indexed containment check for all requested specialties
+        stmt_filters.append(Professional.specialties.contains(specialties))
+
+    if verified_only:
+        stmt_filters.append(Professional.is_verified == True)
+
+    if min_rating is not None:
+        stmt_filters.append(Professional.rating >= Decimal(str(min_rating)))
+
+    if cursor:
+        stmt_filters.append(tuple_(*sort_key) < tuple_(*decode_cursor(cursor, key_types)))
+
+    # The sort key is selected too, to build the next cursor from the last row
+    stmt = (
+        select(Professional, *[key.label(f"sort_key_{i}") for i, key in enumerate(sort_key)])
+        .where(and_(*stmt_filters))
+        .order_by(*[key.desc() for key in sort_key])
+        .limit(limit + 1)
+    )
+    if skip and not cursor:
+        stmt = stmt.offset(skip)
+
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(list(rows[-1][1:])) if has_more and rows else None
+    return SearchPage([row[0] for row in rows], next_cursor)
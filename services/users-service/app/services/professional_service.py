@@ -3,12 +3,11 @@
 import sys
 import uuid
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-from decimal import Decimal
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func, and_, or_, desc, text
+from sqlalchemy import select, update, func, and_, desc, cast, Numeric
 from sqlalchemy.orm import joinedload
 
 # Add libs to path
@@ -18,13 +17,10 @@ from python_shared.database.models import (
     User,
     ProfessionalStatus,
     AdminAuditLog,
-    Proposal,
-    Project,
-    ProjectStatus,
-    LeadPayment,
-    ProfessionalRating,
     Wallet,
-    WalletTransaction
+    WalletTransaction,
+    ProfessionalScorecard,
+    ProfessionalActivityDay
 )
 
 from ..models.professionals import ProfessionalStats
@@ -32,6 +28,15 @@ from ..models.professionals import ProfessionalStats
 logger = logging.getLogger(__name__)
 
 
+def _activity_window(professional_id: uuid.UUID, days: int):
+    """Daily activity rows of the last `days` UTC days, today included."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return and_(
+        ProfessionalActivityDay.professional_id == professional_id,
+        ProfessionalActivityDay.day >= since
+    )
+
+
 class ProfessionalService:
     """Service for professional-related business logic."""
     
@@ -137,59 +142,31 @@ class ProfessionalService:
             Professional statistics object
         """
         try:
-            # Get professional with ratings
-            prof_query = (
-                select(Professional)
+            # Professional with its trigger-maintained scorecard, one key lookup
+            query = (
+                select(Professional.rating, Professional.review_count, ProfessionalScorecard)
+                .outerjoin(
+                    ProfessionalScorecard,
+                    ProfessionalScorecard.professional_id == Professional.id
+                )
                 .where(Professional.id == professional_id)
             )
-            result = await db.execute(prof_query)
-            professional = result.scalar_one_or_none()
+            result = await db.execute(query)
+            row = result.one_or_none()
             
-            if not professional:
+            if not row:
                 raise ValueError(f"Professional {professional_id} not found")
             
-            stats = ProfessionalStats()
-            
-            # Get total leads (from proposals)
-            leads_query = (
-                select(func.count(Proposal.id.distinct()))
-                .where(Proposal.professional_id == professional_id)
-            )
-            result = await db.execute(leads_query)
-            stats.total_leads = result.scalar() or 0
-            
-            # Get project statistics
-            projects_query = (
-                select(
-                    func.count(Project.id),
-                    func.count(func.nullif(Project.status == ProjectStatus.ACTIVE, False)),
-                    func.count(func.nullif(Project.status == ProjectStatus.COMPLETED, False))
-                )
-                .where(Project.professional_id == professional_id)
-            )
-            result = await db.execute(projects_query)
-            total_projects, active_projects, completed_projects = result.one()
-            
-            stats.active_projects = active_projects or 0
-            stats.completed_projects = completed_projects or 0
+            rating, review_count, scorecard = row
             
-            # Get earnings from completed projects
-            earnings_query = (
-                select(func.coalesce(func.sum(LeadPayment.professional_net_amount), 0))
-                .join(Project, LeadPayment.proposal_id == Project.proposal_id)
-                .where(
-                    and_(
-                        Project.professional_id == professional_id,
-                        Project.status == ProjectStatus.COMPLETED
-                    )
-                )
-            )
-            result = await db.execute(earnings_query)
-            stats.total_earnings = result.scalar() or Decimal('0.00')
+            stats = ProfessionalStats(average_rating=rating, total_reviews=review_count or 0)
             
-            # Set rating information from professional record
-            stats.average_rating = professional.rating
-            stats.total_reviews = professional.review_count
+            # No scorecard yet means no proposals, projects or payments
+            if scorecard:
+                stats.total_leads = scorecard.proposals_count
+                stats.active_projects = scorecard.active_projects_count
+                stats.completed_projects = scorecard.completed_projects_count
+                stats.total_earnings = scorecard.total_earnings
             
             logger.info(f"Retrieved stats for professional {professional_id}")
             return stats
@@ -204,39 +181,41 @@ class ProfessionalService:
         professional_id: uuid.UUID
     ) -> None:
         """
-        Recalculate and update professional rating from reviews.
+        Update professional rating from the running rating sum and count.
         
         Args:
             db: Database session
             professional_id: ID of professional
         """
         try:
-            # Calculate average rating and count
-            rating_query = (
-                select(
-                    func.avg(ProfessionalRating.rating),
-                    func.count(ProfessionalRating.id)
-                )
-                .where(ProfessionalRating.professional_id == professional_id)
-            )
-            
-            result = await db.execute(rating_query)
-            avg_rating, count = result.one()
-            
-            # Update professional record
             update_query = (
                 update(Professional)
-                .where(Professional.id == professional_id)
+                .where(
+                    and_(
+                        Professional.id == professional_id,
+                        ProfessionalScorecard.professional_id == Professional.id
+                    )
+                )
                 .values(
-                    rating=Decimal(str(round(avg_rating, 2))) if avg_rating else None,
-                    review_count=count or 0
+                    rating=func.round(
+                        cast(ProfessionalScorecard.rating_sum, Numeric)
+                        / func.nullif(ProfessionalScorecard.rating_count, 0),
+                        2
+                    ),
+                    review_count=ProfessionalScorecard.rating_count
                 )
+                .returning(Professional.rating, Professional.review_count)
             )
             
-            await db.execute(update_query)
+            result = await db.execute(update_query)
+            updated = result.one_or_none()
             await db.commit()
             
-            logger.info(f"Updated rating for professional {professional_id}: {avg_rating:.2f} ({count} reviews)")
+            if updated:
+                logger.info(
+                    f"Updated rating for professional {professional_id}: "
+                    f"{updated.rating} ({updated.review_count} reviews)"
+                )
             
         except Exception as e:
             await db.rollback()
@@ -261,41 +240,21 @@ class ProfessionalService:
             Dictionary of performance metrics
         """
         try:
-            # Calculate date range
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Get proposals in time period
-            proposals_query = (
+            # Sum of at most `days` daily activity rows
+            window_query = (
                 select(
-                    func.count(Proposal.id),
-                    func.count(func.nullif(Proposal.status == 'accepted', False)),
-                    func.avg(Proposal.price)
-                )
-                .where(
-                    and_(
-                        Proposal.professional_id == professional_id,
-                        Proposal.created_at >= cutoff_date
-                    )
+                    func.coalesce(func.sum(ProfessionalActivityDay.proposals_count), 0),
+                    func.coalesce(func.sum(ProfessionalActivityDay.accepted_proposals_count), 0),
+                    func.coalesce(func.sum(ProfessionalActivityDay.proposal_price_sum), 0),
+                    func.coalesce(func.sum(ProfessionalActivityDay.completed_projects_count), 0)
                 )
+                .where(_activity_window(professional_id, days))
             )
             
-            result = await db.execute(proposals_query)
-            total_proposals, accepted_proposals, avg_proposal_price = result.one()
-            
-            # Get completed projects in time period
-            completed_query = (
-                select(func.count(Project.id))
-                .where(
-                    and_(
-                        Project.professional_id == professional_id,
-                        Project.status == ProjectStatus.COMPLETED,
-                        Project.completion_date >= cutoff_date
-                    )
-                )
-            )
+            result = await db.execute(window_query)
+            total_proposals, accepted_proposals, proposal_price_sum, completed_projects = result.one()
             
-            result = await db.execute(completed_query)
-            completed_projects = result.scalar() or 0
+            avg_proposal_price = proposal_price_sum / total_proposals if total_proposals else 0
             
             # Calculate metrics
             proposal_acceptance_rate = (
@@ -319,89 +278,6 @@ class ProfessionalService:
             logger.error(f"Error calculating performance metrics for {professional_id}: {e}")
             raise
     
-    async def search_professionals(
-        self,
-        db: AsyncSession,
-        query: str,
-        location: Optional[str] = None,
-        specialties: Optional[List[str]] = None,
-        verified_only: bool = True,
-        min_rating: Optional[float] = None,
-        skip: int = 0,
-        limit: int = 50
-    ) -> List[Professional]:
-        """
-        Search professionals with advanced filters.
-        
-        Args:
-            db: Database session
-            query: Search query (profession, company name)
-            location: Location filter
-            specialties: Specialties filter
-            verified_only: Only return verified professionals
-            min_rating: Minimum rating filter
-            skip: Number of records to skip
-            limit: Number of records to return
-            
-        Returns:
-            List of matching professionals
-        """
-        try:
-            # Build base query
-            search_query = (
-                select(Professional)
-                .where(Professional.status == ProfessionalStatus.ACTIVE)
-            )
-            
-            # Add search filters
-            if query:
-                search_filter = or_(
-                    Professional.profession.ilike(f"%{query}%"),
-                    Professional.company_name.ilike(f"%{query}%")
-                )
-                search_query = search_query.where(search_filter)
-            
-            if location:
-                search_query = search_query.where(
-                    Professional.location.ilike(f"%{location}%")
-                )
-            
-            if specialties:
-                for specialty in specialties:
-                    search_query = search_query.where(
-                        Professional.specialties.any(specialty)
-                    )
-            
-            if verified_only:
-                search_query = search_query.where(Professional.is_verified == True)
-            
-            if min_rating is not None:
-                search_query = search_query.where(
-                    Professional.rating >= Decimal(str(min_rating))
-                )
-            
-            # Add ordering and pagination
-            search_query = (
-                search_query
-                .order_by(
-                    Professional.is_verified.desc(),
-                    Professional.rating.desc().nulls_last(),
-                    Professional.review_count.desc()
-                )
-                .offset(skip)
-                .limit(limit)
-            )
-            
-            result = await db.execute(search_query)
-            professionals = result.scalars().all()
-            
-            logger.info(f"Found {len(professionals)} professionals matching search criteria")
-            return professionals
-            
-        except Exception as e:
-            logger.error(f"Error searching professionals: {e}")
-            raise
-    
     async def get_pending_verifications(
         self,
         db: AsyncSession,
@@ -455,16 +331,37 @@ class ProfessionalService:
             Dictionary with score breakdown
         """
         try:
-            # Get professional data
-            query = select(Professional).where(Professional.id == professional_id)
+            recent_proposals = (
+                select(func.coalesce(func.sum(ProfessionalActivityDay.proposals_count), 0))
+                .where(_activity_window(professional_id, 30))
+                .scalar_subquery()
+            )
+            
+            query = (
+                select(
+                    Professional.is_verified,
+                    Professional.rating,
+                    Professional.review_count,
+                    ProfessionalScorecard.projects_count,
+                    ProfessionalScorecard.completed_projects_count,
+                    recent_proposals
+                )
+                .outerjoin(
+                    ProfessionalScorecard,
+                    ProfessionalScorecard.professional_id == Professional.id
+                )
+                .where(Professional.id == professional_id)
+            )
             result = await db.execute(query)
-            professional = result.scalar_one_or_none()
+            row = result.one_or_none()
             
-            if not professional:
+            if not row:
                 raise ValueError(f"Professional {professional_id} not found")
             
+            is_verified, rating, review_count, total_projects, completed_projects, recent_proposals = row
+            
             score_components = {
-                "verification_score": 30 if professional.is_verified else 0,
+                "verification_score": 30 if is_verified else 0,
                 "rating_score": 0,
                 "activity_score": 0,
                 "completion_score": 0,
@@ -472,37 +369,15 @@ class ProfessionalService:
             }
             
             # Rating score (0-25 points)
-            if professional.rating and professional.review_count >= 3:
-                rating_score = min(25, int(float(professional.rating) * 5))
+            if rating and review_count >= 3:
+                rating_score = min(25, int(float(rating) * 5))
                 score_components["rating_score"] = rating_score
             
-            # Activity score (0-25 points) - based on recent proposals
-            activity_query = (
-                select(func.count(Proposal.id))
-                .where(
-                    and_(
-                        Proposal.professional_id == professional_id,
-                        Proposal.created_at >= func.now() - text("INTERVAL '30 days'")
-                    )
-                )
-            )
-            result = await db.execute(activity_query)
-            recent_proposals = result.scalar() or 0
-            
+            # Activity score (0-25 points) - based on proposals in the last 30 days
             activity_score = min(25, recent_proposals * 2)
             score_components["activity_score"] = activity_score
             
             # Completion score (0-20 points) - based on completed projects
-            completion_query = (
-                select(
-                    func.count(Project.id),
-                    func.count(func.nullif(Project.status == ProjectStatus.COMPLETED, False))
-                )
-                .where(Project.professional_id == professional_id)
-            )
-            result = await db.execute(completion_query)
-            total_projects, completed_projects = result.one()
-            
             if total_projects and total_projects > 0:
                 completion_rate = completed_projects / total_projects
                 completion_score = int(completion_rate * 20)
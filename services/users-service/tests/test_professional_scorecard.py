@@ -0,0 +1,279 @@
+"""
+Professional scorecard tests against PostgreSQL.
+
+The scorecard is maintained by triggers on proposals, projects,
+lead_payments and professional_ratings. These tests write those tables and
+check that get_professional_stats agrees with COUNT/SUM queries over the
+source tables, as it computed them before the scorecard existed, after
+inserts, updates and deletes and after rebuild_professional_scorecards().
+
+Set TEST_DATABASE_URL to an empty database with the extensions from
+scripts/init_database.sql; the tests are skipped otherwise.
+"""
+
+import os
+import sys
+import uuid
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, delete, func, select, text, and_
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add libs to path
+sys.path.append("/app/libs")
+from python_shared.database.base import Base
+from python_shared.database.models import (
+    User, Professional, Lead, Proposal, Project, LeadPayment, ProfessionalRating,
+    ProfessionalScorecard, UserRole, LeadType, ProposalStatus, ProjectStatus
+)
+
+from app.services.professional_service import ProfessionalService
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+
+@pytest.fixture(scope="module")
+def schema():
+    """Freshly created schema, triggers included."""
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_session(schema):
+    """Async session on the test database."""
+    engine = create_async_engine(
+        TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+    )
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_maker() as session:
+        yield session
+
+    await engine.dispose()
+
+
+async def _stats_from_source_tables(db: AsyncSession, professional_id: uuid.UUID):
+    """Stats computed the way get_professional_stats did before scorecards."""
+    total_leads = (await db.execute(
+        select(func.count(Proposal.id.distinct()))
+        .where(Proposal.professional_id == professional_id)
+    )).scalar()
+
+    _, active_projects, completed_projects = (await db.execute(
+        select(
+            func.count(Project.id),
+            func.count(func.nullif(Project.status == ProjectStatus.ACTIVE, False)),
+            func.count(func.nullif(Project.status == ProjectStatus.COMPLETED, False))
+        )
+        .where(Project.professional_id == professional_id)
+    )).one()
+
+    total_earnings = (await db.execute(
+        select(func.coalesce(func.sum(LeadPayment.professional_net_amount), 0))
+        .join(Project, LeadPayment.proposal_id == Project.proposal_id)
+        .where(
+            and_(
+                Project.professional_id == professional_id,
+                Project.status == ProjectStatus.COMPLETED
+            )
+        )
+    )).scalar()
+
+    return {
+        "total_leads": total_leads,
+        "active_projects": active_projects,
+        "completed_projects": completed_projects,
+        "total_earnings": Decimal(total_earnings)
+    }
+
+
+async def _assert_scorecard_matches(db: AsyncSession, professional_id: uuid.UUID):
+    stats = await ProfessionalService().get_professional_stats(db, professional_id)
+    expected = await _stats_from_source_tables(db, professional_id)
+
+    assert {
+        "total_leads": stats.total_leads,
+        "active_projects": stats.active_projects,
+        "completed_projects": stats.completed_projects,
+        "total_earnings": Decimal(stats.total_earnings)
+    } == expected
+    return stats
+
+
+async def _user(db: AsyncSession, role=UserRole.CONSUMER) -> User:
+    user = User(id=uuid.uuid4(), name="משתמש", role=role)
+    db.add(user)
+    await db.flush()
+    return user
+
+
+async def _professional(db: AsyncSession) -> Professional:
+    user = await _user(db, UserRole.PROFESSIONAL)
+    professional = Professional(
+        id=uuid.uuid4(), user_id=user.id, profession="renovation", location="תל אביב"
+    )
+    db.add(professional)
+    await db.flush()
+    return professional
+
+
+async def _job(db: AsyncSession, professional: Professional, consumer: User,
+               price: str, status=ProposalStatus.PENDING):
+    """A lead with a proposal from the professional."""
+    lead = Lead(
+        id=uuid.uuid4(), type=LeadType.CONSUMER, title="שיפוץ", short_description="שיפוץ דירה",
+        category="renovation", location="תל אביב", created_by_user_id=consumer.id
+    )
+    db.add(lead)
+    await db.flush()
+
+    proposal = Proposal(
+        id=uuid.uuid4(), lead_id=lead.id, professional_id=professional.id,
+        price=Decimal(price), description="הצעה", status=status
+    )
+    db.add(proposal)
+    await db.flush()
+    return lead, proposal
+
+
+async def _project(db: AsyncSession, lead, proposal, consumer, status=ProjectStatus.ACTIVE):
+    project = Project(
+        id=uuid.uuid4(), lead_id=lead.id, proposal_id=proposal.id,
+        professional_id=proposal.professional_id, consumer_id=consumer.id, status=status
+    )
+    db.add(project)
+    await db.flush()
+    return project
+
+
+async def _payment(db: AsyncSession, lead, proposal, consumer, net: str):
+    payment = LeadPayment(
+        id=uuid.uuid4(), lead_id=lead.id, proposal_id=proposal.id, payer_user_id=consumer.id,
+        final_amount=Decimal(net) * 2, platform_commission=Decimal(net) / 2,
+        referrer_fee=Decimal(net) / 2, professional_net_amount=Decimal(net),
+        psp_provider="test", psp_reference=uuid.uuid4().hex
+    )
+    db.add(payment)
+    await db.flush()
+    return payment
+
+
+@pytest.mark.asyncio
+class TestProfessionalScorecard:
+    """Scorecard totals against the source tables."""
+
+    async def test_new_professional_has_empty_stats(self, async_session):
+        professional = await _professional(async_session)
+
+        stats = await _assert_scorecard_matches(async_session, professional.id)
+        assert stats.total_leads == 0
+        assert stats.total_earnings == Decimal("0.00")
+
+    async def test_scorecard_follows_inserts_updates_and_deletes(self, async_session):
+        db = async_session
+        professional = await _professional(db)
+        consumer = await _user(db)
+
+        lead_a, proposal_a = await _job(db, professional, consumer, "1000", ProposalStatus.ACCEPTED)
+        lead_b, proposal_b = await _job(db, professional, consumer, "2500", ProposalStatus.ACCEPTED)
+        _, proposal_c = await _job(db, professional, consumer, "700")
+
+        project_a = await _project(db, lead_a, proposal_a, consumer, ProjectStatus.COMPLETED)
+        project_b = await _project(db, lead_b, proposal_b, consumer)
+        await _payment(db, lead_a, proposal_a, consumer, "900")
+        await _payment(db, lead_b, proposal_b, consumer, "2000")
+        await db.commit()
+
+        stats = await _assert_scorecard_matches(db, professional.id)
+        assert (stats.total_leads, stats.active_projects, stats.completed_projects) == (3, 1, 1)
+        assert stats.total_earnings == Decimal("900.00")
+
+        # Completing a project that already has a payment adds its earnings
+        project_b.status = ProjectStatus.COMPLETED
+        await db.commit()
+        stats = await _assert_scorecard_matches(db, professional.id)
+        assert stats.total_earnings == Decimal("2900.00")
+
+        # A payment added to a completed project counts immediately
+        await _payment(db, lead_a, proposal_a, consumer, "100")
+        await db.commit()
+        stats = await _assert_scorecard_matches(db, professional.id)
+        assert stats.total_earnings == Decimal("3000.00")
+
+        # Deletes and disputes take their share back out
+        await db.delete(proposal_c)
+        project_a.status = ProjectStatus.DISPUTED
+        await db.commit()
+        stats = await _assert_scorecard_matches(db, professional.id)
+        assert (stats.total_leads, stats.completed_projects) == (2, 1)
+        assert stats.total_earnings == Decimal("2000.00")
+
+        await db.delete(project_a)
+        await db.commit()
+        await _assert_scorecard_matches(db, professional.id)
+
+    async def test_rating_is_copied_from_running_sum(self, async_session):
+        db = async_session
+        professional = await _professional(db)
+        consumer = await _user(db)
+        service = ProfessionalService()
+
+        ratings = []
+        for value in (5, 4, 2):
+            lead, proposal = await _job(db, professional, consumer, "500", ProposalStatus.ACCEPTED)
+            project = await _project(db, lead, proposal, consumer, ProjectStatus.COMPLETED)
+            rating = ProfessionalRating(
+                id=uuid.uuid4(), professional_id=professional.id, rater_user_id=consumer.id,
+                project_id=project.id, rating=value
+            )
+            db.add(rating)
+            ratings.append(rating)
+        await db.commit()
+
+        await service.update_professional_rating(db, professional.id)
+        stats = await service.get_professional_stats(db, professional.id)
+        assert stats.total_reviews == 3
+        assert stats.average_rating == Decimal("3.67")
+
+        ratings[2].rating = 5
+        await db.commit()
+        await service.update_professional_rating(db, professional.id)
+        stats = await service.get_professional_stats(db, professional.id)
+        assert stats.average_rating == Decimal("4.67")
+
+    async def test_rebuild_matches_source_tables(self, async_session):
+        db = async_session
+        professional = await _professional(db)
+        consumer = await _user(db)
+
+        lead, proposal = await _job(db, professional, consumer, "1200", ProposalStatus.ACCEPTED)
+        await _project(db, lead, proposal, consumer, ProjectStatus.COMPLETED)
+        await _payment(db, lead, proposal, consumer, "1000")
+        await _job(db, professional, consumer, "800")
+        await db.commit()
+
+        before = await _assert_scorecard_matches(db, professional.id)
+
+        # Drift: lose the scorecard, then rebuild it from the source tables
+        await db.execute(
+            delete(ProfessionalScorecard)
+            .where(ProfessionalScorecard.professional_id == professional.id)
+        )
+        await db.execute(text("SELECT rebuild_professional_scorecards()"))
+        await db.commit()
+
+        after = await _assert_scorecard_matches(db, professional.id)
+        assert after == before
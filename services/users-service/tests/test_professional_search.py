@@ -0,0 +1,159 @@
+"""
+Professional search helper tests.
+
+Test Coverage:
+- Query normalization and prefix tsquery building
+- LIKE escaping of user input
+- Keyset cursor encoding, decoding and validation
+- Next-page cursor built from the last row's sort key
+"""
+
+import base64
+import sys
+import uuid
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import Boolean, Integer, Numeric
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import UUID
+
+# Add libs to path
+sys.path.append("/app/libs")
+
+from app.services.professional_search import (
+    build_tsquery_text,
+    decode_cursor,
+    encode_cursor,
+    escape_like,
+    normalize_search_text,
+    search_professionals,
+)
+
+
+DIRECTORY_KEY_TYPES = [Boolean(), Numeric(), Integer(), UUID(as_uuid=True)]
+TEXT_KEY_TYPES = [Numeric(), UUID(as_uuid=True)]
+
+
+class TestNormalization:
+    """Test query normalization."""
+
+    def test_lowercases_and_strips(self):
+        assert normalize_search_text("  Electrician ") == "electrician"
+
+    def test_removes_niqqud(self):
+        assert normalize_search_text("חַשְׁמַלַּאי") == "חשמלאי"
+
+    def test_tsquery_prefix_matches_every_word(self):
+        assert build_tsquery_text('חשמלאי ת"א') == "חשמלאי:* & ת:* & א:*"
+
+    def test_tsquery_drops_operators(self):
+        assert build_tsquery_text("plumber & (roof | !tiles)") == "plumber:* & roof:* & tiles:*"
+
+    @pytest.mark.parametrize("query", ["", "   ", "!&|()"])
+    def test_tsquery_without_words(self, query):
+        assert build_tsquery_text(query) is None
+
+    def test_escape_like(self):
+        assert escape_like("100%_off\\") == "100\\%\\_off\\\\"
+
+
+class TestCursor:
+    """Test keyset cursor encoding and decoding."""
+
+    def test_directory_cursor_round_trip(self):
+        professional_id = uuid.uuid4()
+        cursor = encode_cursor([True, Decimal("4.50"), 12, professional_id])
+
+        values = [literal.value for literal in decode_cursor(cursor, DIRECTORY_KEY_TYPES)]
+
+        assert values == [True, Decimal("4.50"), 12, professional_id]
+
+    def test_text_cursor_round_trip(self):
+        professional_id = uuid.uuid4()
+        cursor = encode_cursor([Decimal("1.234567"), professional_id])
+
+        literals = decode_cursor(cursor, TEXT_KEY_TYPES)
+
+        assert [literal.value for literal in literals] == [Decimal("1.234567"), professional_id]
+        assert isinstance(literals[0].type, Numeric)
+        assert isinstance(literals[1].type, UUID)
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor([Decimal("0.999999"), uuid.uuid4()])
+
+        assert "=" not in cursor
+        assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+    @pytest.mark.parametrize("cursor", [
+        "not a cursor",
+        encode_cursor([Decimal("1.5")]),
+        encode_cursor(["x", str(uuid.uuid4())]),
+        encode_cursor([Decimal("1.5"), "not-a-uuid"]),
+    ])
+    def test_malformed_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, TEXT_KEY_TYPES)
+
+    def test_cursor_from_other_search_is_rejected(self):
+        cursor = encode_cursor([True, Decimal("4.50"), 12, uuid.uuid4()])
+
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, TEXT_KEY_TYPES)
+
+    def test_non_list_payload_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(b'{"a": 1}').decode()
+
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, TEXT_KEY_TYPES)
+
+
+@pytest.mark.asyncio
+class TestPagination:
+    """Test page slicing and the next-page cursor."""
+
+    @staticmethod
+    def _db(rows):
+        result = MagicMock()
+        result.all.return_value = rows
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=result)
+        return db
+
+    async def test_next_cursor_from_last_returned_row(self):
+        ids = [uuid.uuid4() for _ in range(3)]
+        rows = [(f"professional-{i}", True, Decimal("4.5"), 10 - i, ids[i]) for i in range(3)]
+        db = self._db(rows)
+
+        page = await search_professionals(db, limit=2)
+
+        assert page.professionals == ["professional-0", "professional-1"]
+        values = [literal.value for literal in decode_cursor(page.next_cursor, DIRECTORY_KEY_TYPES)]
+        assert values == [True, Decimal("4.5"), 9, ids[1]]
+
+    async def test_last_page_has_no_cursor(self):
+        db = self._db([("professional-0", True, Decimal("4.5"), 10, uuid.uuid4())])
+
+        page = await search_professionals(db, limit=2)
+
+        assert page.next_cursor is None
+
+    async def test_cursor_continues_after_sort_key(self):
+        db = self._db([])
+        cursor = encode_cursor([Decimal("1.2"), uuid.uuid4()])
+
+        await search_professionals(db, query="חשמלאי", cursor=cursor, skip=40, limit=10)
+
+        stmt = db.execute.await_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert ") < (" in sql
+        assert "OFFSET" not in sql
+        assert "LIMIT" in sql
+
+    async def test_malformed_cursor_fails_before_querying(self):
+        db = self._db([])
+
+        with pytest.raises(ValueError):
+            await search_professionals(db, cursor="garbage")
+        db.execute.assert_not_awaited()
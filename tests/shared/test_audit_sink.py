@@ -0,0 +1,133 @@
+"""Tests for the batched audit log sink."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+
+from python_shared.audit import AuditSink
+
+
+class RecordingWriter:
+    """Writer keeping every write; records named in `reject` fail any write they are in."""
+
+    def __init__(self, reject=()):
+        self.writes = []
+        self.attempts = 0
+        self.reject = set(reject)
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.written = asyncio.Event()
+
+    async def __call__(self, stream, records):
+        self.attempts += 1
+        await self.gate.wait()
+        if any(record["id"] in self.reject for record in records):
+            raise RuntimeError("rejected")
+        self.writes.append((stream, [record["id"] for record in records]))
+        self.written.set()
+
+
+def _record(record_id):
+    return {"id": record_id}
+
+
+@pytest.fixture
+def writer():
+    return RecordingWriter()
+
+
+@pytest.mark.asyncio
+class TestAuditSink:
+    """Batching, backpressure, retries and shutdown."""
+
+    async def test_full_batch_is_flushed_without_waiting_for_the_interval(self, writer):
+        sink = AuditSink(writer, batch_size=3, flush_interval_ms=60000)
+        sink.start()
+
+        for record_id in range(3):
+            await sink.submit("contact_access_logs", _record(record_id))
+        await asyncio.wait_for(writer.written.wait(), 1)
+
+        assert writer.writes == [("contact_access_logs", [0, 1, 2])]
+        await sink.stop()
+
+    async def test_partial_batch_is_flushed_after_the_interval(self, writer):
+        sink = AuditSink(writer, batch_size=100, flush_interval_ms=50)
+        sink.start()
+
+        await sink.submit("contact_access_logs", _record(1))
+        await sink.submit("contact_access_logs", _record(2))
+        await asyncio.sleep(0.01)
+        assert writer.writes == []
+
+        await asyncio.wait_for(writer.written.wait(), 1)
+
+        assert writer.writes == [("contact_access_logs", [1, 2])]
+        await sink.stop()
+
+    async def test_batch_is_written_per_stream(self, writer):
+        sink = AuditSink(writer, batch_size=3, flush_interval_ms=60000)
+        sink.start()
+
+        await sink.submit("admin_audit_logs", _record(1))
+        await sink.submit("contact_access_logs", _record(2))
+        await sink.submit("admin_audit_logs", _record(3))
+        await sink.stop()
+
+        assert writer.writes == [
+            ("admin_audit_logs", [1, 3]),
+            ("contact_access_logs", [2]),
+        ]
+
+    async def test_full_buffer_makes_submit_wait(self, writer):
+        writer.gate.clear()
+        sink = AuditSink(writer, max_buffer=2, batch_size=1, flush_interval_ms=0)
+        sink.start()
+
+        # One record is held by the blocked write, two fill the buffer
+        for record_id in range(3):
+            await asyncio.wait_for(sink.submit("contact_access_logs", _record(record_id)), 1)
+        blocked = asyncio.create_task(sink.submit("contact_access_logs", _record(3)))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+
+        writer.gate.set()
+        await asyncio.wait_for(blocked, 1)
+        await sink.stop()
+
+        assert [ids for _, ids in writer.writes] == [[0], [1], [2], [3]]
+
+    async def test_failed_batch_falls_back_to_single_rows(self):
+        writer = RecordingWriter(reject={2})
+        sink = AuditSink(writer, batch_size=3, flush_interval_ms=60000, max_retries=2)
+        sink.start()
+
+        for record_id in range(1, 4):
+            await sink.submit("contact_access_logs", _record(record_id))
+        await sink.stop()
+
+        # Two batch attempts, then one write per record; the bad one is dropped
+        assert writer.attempts == 5
+        assert writer.writes == [("contact_access_logs", [1]), ("contact_access_logs", [3])]
+
+    async def test_stop_flushes_queued_records(self, writer):
+        sink = AuditSink(writer, batch_size=100, flush_interval_ms=60000)
+        sink.start()
+
+        await sink.submit("contact_access_logs", _record(1))
+        await sink.submit("contact_access_logs", _record(2))
+        await sink.stop()
+
+        assert writer.writes == [("contact_access_logs", [1, 2])]
+        assert not sink.running
+
+    async def test_records_without_a_worker_are_written_inline(self, writer):
+        sink = AuditSink(writer)
+
+        await sink.submit("contact_access_logs", _record(1))
+
+        assert writer.writes == [("contact_access_logs", [1])]
@@ -0,0 +1,176 @@
+"""Tests for the stale-while-revalidate lead board cache."""
+
+import os
+import sys
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+
+from python_shared.cache import lead_board
+from python_shared.cache.lead_board import (
+    LeadBoardCache,
+    bump_leads_version,
+    bump_professional_board_version,
+)
+
+PROFESSIONAL_ID = "professional-1"
+FILTERS = {"category": "renovation", "radius_km": 25, "limit": 50}
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for freshness checks."""
+    now = [time.time()]
+    monkeypatch.setattr(lead_board.time, "time", lambda: now[0])
+    return now
+
+
+def _compute(payload='{"leads": []}'):
+    return AsyncMock(return_value=payload)
+
+
+async def _lock_keys(redis_client):
+    return [key async for key in redis_client.scan_iter(match="lead_board:*:lock")]
+
+
+@pytest.mark.asyncio
+class TestGetOrCompute:
+    """Test fresh, stale and failed lookups."""
+
+    async def test_miss_computes_and_caches(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        compute = _compute()
+
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute) == '{"leads": []}'
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute) == '{"leads": []}'
+
+        compute.assert_awaited_once()
+
+    async def test_filters_get_their_own_entry(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        compute = _compute()
+
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute)
+        await cache.get_or_compute(PROFESSIONAL_ID, {**FILTERS, "radius_km": 50}, compute)
+
+        assert compute.await_count == 2
+
+    async def test_fresh_entry_survives_until_fresh_seconds(self, fake_redis, clock):
+        cache = LeadBoardCache(fake_redis, fresh_seconds=300)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+
+        clock[0] += 299
+        compute = _compute("new")
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute) == "old"
+        compute.assert_not_awaited()
+
+    async def test_stale_without_lock_revalidates(self, fake_redis, clock):
+        cache = LeadBoardCache(fake_redis, fresh_seconds=300)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+
+        clock[0] += 301
+        compute = _compute("new")
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute) == "new"
+        compute.assert_awaited_once()
+        assert await _lock_keys(fake_redis) == []
+
+        # The rebuilt board is fresh again
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("newer")) == "new"
+
+    async def test_leads_version_bump_makes_entry_stale(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+
+        await bump_leads_version(fake_redis)
+
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("new")) == "new"
+
+    async def test_professional_version_bump_skips_old_entry(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+
+        await bump_professional_board_version(fake_redis, PROFESSIONAL_ID)
+
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("new")) == "new"
+
+    async def test_stale_with_lock_serves_stale(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+        await bump_leads_version(fake_redis)
+
+        # While this request rebuilds the board, others get the stale one
+        async def rebuild():
+            other = _compute("new")
+            assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, other) == "old"
+            other.assert_not_awaited()
+            return "new"
+
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, rebuild) == "new"
+
+    async def test_compute_failure_serves_stale_and_unlocks(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+        await bump_leads_version(fake_redis)
+
+        failing = AsyncMock(side_effect=RuntimeError("database down"))
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, failing) == "old"
+        assert await _lock_keys(fake_redis) == []
+
+        # The next request retries the rebuild
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("new")) == "new"
+
+    async def test_compute_failure_without_entry_raises(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        failing = AsyncMock(side_effect=RuntimeError("database down"))
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, failing)
+
+
+@pytest.mark.asyncio
+class TestRedisFailures:
+    """Test that Redis errors never fail the board."""
+
+    async def test_redis_unavailable_computes(self):
+        redis_client = AsyncMock()
+        redis_client.mget.side_effect = ConnectionError("Redis is down")
+
+        payload = await LeadBoardCache(redis_client).get_or_compute(
+            PROFESSIONAL_ID, FILTERS, _compute("board")
+        )
+
+        assert payload == "board"
+
+    async def test_unlock_failure_still_returns_board(self, fake_redis, monkeypatch):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+        await bump_leads_version(fake_redis)
+        monkeypatch.setattr(fake_redis, "delete", AsyncMock(side_effect=ConnectionError("gone")))
+
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("new")) == "new"
+
+    async def test_lock_failure_serves_stale(self, fake_redis):
+        cache = LeadBoardCache(fake_redis)
+        await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, _compute("old"))
+        await bump_leads_version(fake_redis)
+
+        set_entry = fake_redis.set
+
+        async def set_without_locks(key, *args, **kwargs):
+            if key.endswith(":lock"):
+                raise ConnectionError("Redis is down")
+            return await set_entry(key, *args, **kwargs)
+
+        cache.redis_client.set = set_without_locks
+        compute = _compute("new")
+        assert await cache.get_or_compute(PROFESSIONAL_ID, FILTERS, compute) == "old"
+        compute.assert_not_awaited()
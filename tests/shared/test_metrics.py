@@ -0,0 +1,265 @@
+"""Tests for the shared request metrics."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import create_engine, text
+
+LIBS = os.path.join(os.path.dirname(__file__), "..", "..", "libs")
+sys.path.append(LIBS)
+
+from python_shared.monitoring import (
+    MetricsMiddleware,
+    RequestMetrics,
+    histogram_quantile,
+    instrument_engine,
+    instrument_redis,
+    record_dependency_time,
+    setup_metrics,
+    timed_dependency,
+)
+from python_shared.monitoring.metrics import MULTIPROC_DIR_ENV, UNMATCHED_ROUTE
+
+
+def _samples(metrics: RequestMetrics) -> dict:
+    """(name, sorted labels) -> value of every rendered sample."""
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(metrics.render().decode("utf-8"))
+        for sample in family.samples
+    }
+
+
+def _value(metrics: RequestMetrics, name: str, **labels) -> float:
+    key = (name, tuple(sorted({"service": metrics.service, **labels}.items())))
+    return _samples(metrics).get(key, 0.0)
+
+
+@pytest.fixture
+def metrics():
+    return RequestMetrics("test-service")
+
+
+@pytest.fixture
+def app(metrics):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/missing")
+    async def missing():
+        raise HTTPException(status_code=404, detail="missing")
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/in-flight")
+    async def in_flight():
+        return {"in_flight": _value(metrics, "http_requests_in_flight")}
+
+    @app.get("/dependencies")
+    async def dependencies():
+        record_dependency_time("db", 0.2)
+        record_dependency_time("db", 0.05)
+        with timed_dependency("redis"):
+            await asyncio.sleep(0.01)
+        return {}
+
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app, raise_server_exceptions=False)
+
+
+class TestMetricsMiddleware:
+    """What the middleware records per request."""
+
+    def test_requests_are_counted_by_route_template_and_status(self, metrics, client):
+        for item_id in (1, 2, 3):
+            assert client.get(f"/items/{item_id}").status_code == 200
+        assert client.get("/missing").status_code == 404
+
+        assert _value(
+            metrics, "http_requests_total", method="GET", route="/items/{item_id}", status="200"
+        ) == 3
+        assert _value(
+            metrics, "http_requests_total", method="GET", route="/missing", status="404"
+        ) == 1
+        assert _value(
+            metrics, "http_request_duration_seconds_count", method="GET", route="/items/{item_id}"
+        ) == 3
+
+    def test_unhandled_error_is_recorded_as_500(self, metrics, client):
+        assert client.get("/boom").status_code == 500
+
+        assert _value(
+            metrics, "http_requests_total", method="GET", route="/boom", status="500"
+        ) == 1
+
+    def test_unmatched_paths_share_one_route_label(self, metrics, client):
+        client.get("/nope/1")
+        client.get("/nope/2")
+
+        assert _value(
+            metrics, "http_requests_total", method="GET", route=UNMATCHED_ROUTE, status="404"
+        ) == 2
+
+    def test_in_flight_counts_the_running_request(self, metrics, client):
+        assert client.get("/in-flight").json() == {"in_flight": 1.0}
+        assert _value(metrics, "http_requests_in_flight") == 0
+
+    def test_dependency_time_is_summed_per_request(self, metrics, client):
+        client.get("/dependencies")
+
+        labels = {"method": "GET", "route": "/dependencies"}
+        db_time = _value(metrics, "http_request_dependency_seconds_sum", dependency="db", **labels)
+        redis_time = _value(metrics, "http_request_dependency_seconds_sum", dependency="redis", **labels)
+
+        assert db_time == pytest.approx(0.25)
+        assert redis_time >= 0.01
+        assert _value(metrics, "http_request_dependency_seconds_count", dependency="db", **labels) == 1
+
+    def test_dependency_time_outside_a_request_is_ignored(self, metrics):
+        record_dependency_time("db", 1.0)
+
+        assert not any(
+            name.startswith("http_request_dependency_seconds") and value
+            for (name, _), value in _samples(metrics).items()
+        )
+
+
+class TestInstrumentation:
+    """Database and Redis clients report into the current request."""
+
+    def test_engine_queries_count_as_db_time(self, metrics):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        app = FastAPI()
+
+        @app.get("/query")
+        def query():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return {}
+
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+        TestClient(app).get("/query")
+
+        assert _value(
+            metrics, "http_request_dependency_seconds_count",
+            method="GET", route="/query", dependency="db"
+        ) == 1
+
+    def test_redis_commands_count_as_redis_time(self, metrics):
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = instrument_redis(fakeredis.FakeAsyncRedis())
+        assert instrument_redis(redis) is redis
+        app = FastAPI()
+
+        @app.get("/cache")
+        async def cache():
+            await redis.set("key", "value")
+            await redis.get("key")
+            return {}
+
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+        TestClient(app).get("/cache")
+
+        assert _value(
+            metrics, "http_request_dependency_seconds_count",
+            method="GET", route="/cache", dependency="redis"
+        ) == 1
+
+
+class TestSetupMetrics:
+    """The /metrics endpoint."""
+
+    def test_metrics_endpoint_is_served_and_not_measured(self):
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {}
+
+        metrics = setup_metrics(app, "setup-service")
+        client = TestClient(app)
+        client.get("/ping")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="GET",route="/ping",service="setup-service",status="200"} 1.0' in response.text
+        assert _value(metrics, "http_requests_total", method="GET", route="/metrics", status="200") == 0
+
+
+WORKER = textwrap.dedent("""
+    import sys
+    sys.path.append(sys.argv[1])
+    from python_shared.monitoring import RequestMetrics
+
+    metrics = RequestMetrics("multi-service")
+    for _ in range(int(sys.argv[2])):
+        metrics.observe("GET", "/items/{item_id}", 200, 0.02, {"db": 0.01})
+""")
+
+
+class TestMultiprocess:
+    """Workers sharing PROMETHEUS_MULTIPROC_DIR are reported as one service."""
+
+    def test_scrape_sums_all_workers(self, tmp_path, monkeypatch):
+        env = {**os.environ, MULTIPROC_DIR_ENV: str(tmp_path)}
+        for requests in (3, 4):
+            subprocess.run([sys.executable, "-c", WORKER, LIBS, str(requests)], env=env, check=True)
+
+        monkeypatch.setenv(MULTIPROC_DIR_ENV, str(tmp_path))
+        metrics = RequestMetrics("multi-service")
+
+        labels = {"method": "GET", "route": "/items/{item_id}"}
+        assert _value(metrics, "http_requests_total", status="200", **labels) == 7
+        assert _value(metrics, "http_request_duration_seconds_count", **labels) == 7
+        assert _value(
+            metrics, "http_request_dependency_seconds_sum", dependency="db", **labels
+        ) == pytest.approx(0.07)
+
+
+class TestHistogramQuantile:
+    """Quantiles from cumulative buckets, like PromQL."""
+
+    def test_no_observations(self):
+        assert histogram_quantile(0.5, []) is None
+        assert histogram_quantile(0.5, [(0.1, 0), (float("inf"), 0)]) is None
+
+    def test_interpolates_inside_the_bucket(self):
+        buckets = [(0.1, 50), (0.2, 100), (float("inf"), 100)]
+
+        assert histogram_quantile(0.5, buckets) == pytest.approx(0.1)
+        assert histogram_quantile(0.75, buckets) == pytest.approx(0.15)
+        assert histogram_quantile(0.25, buckets) == pytest.approx(0.05)
+
+    def test_bucket_order_does_not_matter(self):
+        buckets = [(float("inf"), 100), (0.2, 100), (0.1, 50)]
+
+        assert histogram_quantile(0.75, buckets) == pytest.approx(0.15)
+
+    def test_quantile_in_the_inf_bucket_returns_highest_finite_bound(self):
+        buckets = [(0.1, 10), (1.0, 90), (float("inf"), 100)]
+
+        assert histogram_quantile(0.99, buckets) == 1.0
+
+    def test_empty_bucket_at_the_rank_returns_its_bound(self):
+        buckets = [(0.1, 0), (0.2, 0), (0.5, 10), (float("inf"), 10)]
+
+        assert histogram_quantile(0.0, buckets) == 0.1
@@ -0,0 +1,263 @@
+"""Tests for the shared principal, token and revocation caches."""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+
+from python_shared.auth import principal
+from python_shared.auth.principal import (
+    PRINCIPAL_INVALIDATION_CHANNEL,
+    REVOKED_TOKENS_BACKFILLED,
+    REVOKED_TOKENS_INDEX,
+    PrincipalCache,
+    PrincipalResolver,
+    RevokedTokenSet,
+    TokenVerificationCache,
+    publish_principal_invalidation,
+    revoke_token,
+)
+from python_shared.database.models import User, UserRole
+
+
+@pytest.fixture
+def fake_redis():
+    """Fake Redis shared by publishers and subscribers."""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for the caches."""
+    now = [time.time()]
+    monkeypatch.setattr(principal.time, "time", lambda: now[0])
+    return now
+
+
+async def _eventually(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await condition():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+class TestTokenVerificationCache:
+    """Test verified-payload caching."""
+
+    def test_entry_does_not_outlive_token_exp(self, clock):
+        cache = TokenVerificationCache(ttl_seconds=300)
+        cache.put("token", {"sub": "user", "exp": clock[0] + 10})
+
+        assert cache.get("token") == {"sub": "user", "exp": clock[0] + 10}
+
+        clock[0] += 11
+        assert cache.get("token") is None
+
+    def test_entry_expires_with_cache_ttl(self, clock):
+        cache = TokenVerificationCache(ttl_seconds=5)
+        cache.put("token", {"sub": "user", "exp": clock[0] + 3600})
+
+        clock[0] += 6
+        assert cache.get("token") is None
+
+    def test_expired_token_is_never_served(self, clock):
+        cache = TokenVerificationCache(ttl_seconds=300)
+        cache.put("token", {"sub": "user", "exp": clock[0] - 1})
+
+        assert cache.get("token") is None
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TokenVerificationCache(max_size=2)
+        cache.put("a", {"sub": "a"})
+        cache.put("b", {"sub": "b"})
+        cache.get("a")
+        cache.put("c", {"sub": "c"})
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_resolver_decodes_once(self):
+        resolver = PrincipalResolver()
+        decode = MagicMock(return_value={"sub": "user", "exp": time.time() + 60})
+
+        resolver.verify_token("token", decode)
+        resolver.verify_token("token", decode)
+
+        decode.assert_called_once_with("token")
+
+
+@pytest.mark.asyncio
+class TestRevokedTokenSet:
+    """Test the local mirror of revoked token ids."""
+
+    async def test_revoked_after_index_reload(self, fake_redis):
+        revoked = RevokedTokenSet()
+        await revoke_token(fake_redis, "jti-1", ttl_seconds=60)
+
+        await revoked.sync(fake_redis)
+
+        assert revoked.is_fresh
+        assert await revoked.is_revoked(fake_redis, "jti-1")
+        assert not await revoked.is_revoked(fake_redis, "jti-2")
+
+    async def test_expired_revocations_are_dropped(self, fake_redis, clock):
+        revoked = RevokedTokenSet()
+        await fake_redis.zadd(REVOKED_TOKENS_INDEX, {"jti-1": clock[0] + 5})
+        await revoked.sync(fake_redis)
+
+        clock[0] += 6
+        assert not revoked.contains("jti-1")
+
+    async def test_stale_mirror_falls_back_to_redis(self, fake_redis):
+        revoked = RevokedTokenSet()
+        await fake_redis.set("revoked_token:jti-1", "1", ex=60)
+
+        assert not revoked.is_fresh
+        assert await revoked.is_revoked(fake_redis, "jti-1")
+        assert not await revoked.is_revoked(fake_redis, "jti-2")
+
+    async def test_backfill_indexes_pre_index_revocations(self, fake_redis):
+        revoked = RevokedTokenSet()
+        await fake_redis.set("revoked_token:old", "1", ex=600)
+        await fake_redis.set("revoked_token:forever", "1")
+
+        assert await revoked.backfill(fake_redis) == 2
+        await revoked.sync(fake_redis)
+
+        assert await revoked.is_revoked(fake_redis, "old")
+        assert await revoked.is_revoked(fake_redis, "forever")
+        score = await fake_redis.zscore(REVOKED_TOKENS_INDEX, "old")
+        assert time.time() < score <= time.time() + 600
+
+    async def test_backfill_runs_once(self, fake_redis):
+        revoked = RevokedTokenSet()
+        await revoked.backfill(fake_redis)
+        await fake_redis.set("revoked_token:later", "1", ex=600)
+
+        assert await fake_redis.exists(REVOKED_TOKENS_BACKFILLED)
+        assert await revoked.backfill(fake_redis) == 0
+
+    async def test_backfill_keeps_existing_expiry(self, fake_redis):
+        revoked = RevokedTokenSet()
+        expires_at = time.time() + 30
+        await fake_redis.zadd(REVOKED_TOKENS_INDEX, {"jti-1": expires_at})
+        await fake_redis.set("revoked_token:jti-1", "1", ex=600)
+
+        await revoked.backfill(fake_redis)
+
+        assert await fake_redis.zscore(REVOKED_TOKENS_INDEX, "jti-1") == pytest.approx(expires_at)
+
+
+@pytest.mark.asyncio
+class TestResolverSync:
+    """Test the pub/sub sync loop end to end."""
+
+    async def test_revoked_after_pubsub_message(self, fake_redis):
+        resolver = PrincipalResolver(revoked_sync_seconds=3600)
+        resolver.start(fake_redis)
+        try:
+            assert await _eventually(lambda: _async(resolver.revoked.is_fresh))
+
+            await revoke_token(fake_redis, "jti-1", ttl_seconds=60)
+
+            # Only the pub/sub message can reach the mirror before the next reload
+            assert await _eventually(lambda: _async(resolver.revoked.contains("jti-1")))
+            assert await resolver.is_revoked(fake_redis, "jti-1")
+        finally:
+            await resolver.stop()
+
+    async def test_backfilled_revocations_are_loaded_at_start(self, fake_redis):
+        await fake_redis.set("revoked_token:old", "1", ex=600)
+        resolver = PrincipalResolver()
+        resolver.start(fake_redis)
+        try:
+            assert await _eventually(lambda: _async(resolver.revoked.is_fresh))
+            assert resolver.revoked.contains("old")
+        finally:
+            await resolver.stop()
+
+    async def test_principal_invalidation_message(self, fake_redis):
+        resolver = PrincipalResolver()
+        user_id = str(uuid.uuid4())
+        resolver.principals._entries[user_id] = [object(), None, time.monotonic() + 60]
+        resolver.start(fake_redis)
+        try:
+            assert await _eventually(lambda: _async(resolver.revoked.is_fresh))
+
+            await publish_principal_invalidation(fake_redis, user_id)
+
+            assert await _eventually(lambda: _async(user_id not in resolver.principals._entries))
+        finally:
+            await resolver.stop()
+
+
+async def _async(value):
+    return value
+
+
+class TestPrincipalCache:
+    """Test principal caching and invalidation."""
+
+    @pytest.fixture
+    def user(self):
+        return User(id=uuid.uuid4(), name="Test User", role=UserRole.CONSUMER)
+
+    @pytest.fixture
+    def db(self, user):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = user
+        db.merge.side_effect = lambda instance, load=True: instance
+        return db
+
+    def test_user_is_loaded_once(self, db, user):
+        cache = PrincipalCache(ttl_seconds=30)
+
+        assert cache.get_user(db, str(user.id)) is user
+        assert cache.get_user(db, str(user.id)) is user
+        assert db.query.call_count == 1
+
+    def test_invalidate_reloads_user(self, db, user):
+        cache = PrincipalCache(ttl_seconds=30)
+        cache.get_user(db, str(user.id))
+
+        cache.invalidate(user.id)
+        cache.get_user(db, str(user.id))
+
+        assert db.query.call_count == 2
+
+    def test_entry_expires_with_ttl(self, db, user, monkeypatch):
+        cache = PrincipalCache(ttl_seconds=30)
+        now = [time.monotonic()]
+        monkeypatch.setattr(principal.time, "monotonic", lambda: now[0])
+        cache.get_user(db, str(user.id))
+
+        now[0] += 31
+        cache.get_user(db, str(user.id))
+
+        assert db.query.call_count == 2
+
+    def test_missing_user_is_not_cached(self, db, user):
+        db.query.return_value.filter.return_value.first.return_value = None
+        cache = PrincipalCache()
+
+        assert cache.get_user(db, str(user.id)) is None
+        assert str(user.id) not in cache._entries
+
+    def test_invalidate_all_message(self):
+        resolver = PrincipalResolver()
+        resolver.principals._entries["a"] = [object(), None, time.monotonic() + 60]
+        resolver.principals._entries["b"] = [object(), None, time.monotonic() + 60]
+
+        resolver._handle_message({"channel": PRINCIPAL_INVALIDATION_CHANNEL, "data": "*"})
+
+        assert not resolver.principals._entries
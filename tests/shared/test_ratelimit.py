@@ -0,0 +1,202 @@
+"""Tests for the shared sliding-window rate limiter and its local fallback."""
+
+import asyncio
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+
+from python_shared.ratelimit import limiter as limiter_module
+from python_shared.ratelimit import (
+    RateLimiter,
+    RateLimitRule,
+    TokenBucketLimiter,
+    get_rate_limiter,
+)
+
+
+@pytest.fixture
+def fake_redis():
+    """Fake Redis with Lua scripting."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeAsyncRedis()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the token buckets."""
+    now = [1000.0]
+    monkeypatch.setattr(limiter_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.asyncio
+class TestSlidingWindowScript:
+    """Test the Lua sliding-window script through RateLimiter."""
+
+    async def test_allows_up_to_limit(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+        rule = RateLimitRule("otp:0501234567", 3, 60)
+
+        results = [await limiter.check([rule]) for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.counts for r in results] == [(1,), (2,), (3,), (3,)]
+        assert all(r.backend == "redis" for r in results)
+        assert results[-1].retry_after == 60
+
+    async def test_rejected_requests_are_not_recorded(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+        rule = RateLimitRule("lead:user", 1, 60)
+
+        await limiter.check([rule])
+        for _ in range(5):
+            await limiter.check([rule])
+
+        assert await fake_redis.zcard("ratelimit:lead:user") == 1
+
+    async def test_request_counts_against_all_rules_or_none(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+        hourly = RateLimitRule("hour", 5, 3600)
+        daily = RateLimitRule("day", 1, 86400)
+
+        assert (await limiter.check([hourly, daily])).allowed
+        result = await limiter.check([hourly, daily])
+
+        assert not result.allowed
+        assert result.counts == (1, 1)
+        assert await fake_redis.zcard("ratelimit:hour") == 1
+
+    async def test_retry_after_is_longest_wait(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+        rules = [RateLimitRule("short", 1, 10), RateLimitRule("long", 1, 100)]
+
+        await limiter.check(rules)
+        result = await limiter.check(rules)
+
+        assert result.retry_after == 100
+
+    async def test_window_slides(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+        rule = RateLimitRule("sliding", 1, 1)
+
+        assert (await limiter.check([rule])).allowed
+        assert not (await limiter.check([rule])).allowed
+
+        await asyncio.sleep(1.1)
+        assert (await limiter.check([rule])).allowed
+
+    async def test_keys_expire_with_window(self, fake_redis):
+        limiter = RateLimiter(fake_redis, prefix="test")
+
+        await limiter.check([RateLimitRule("ttl", 2, 30)])
+
+        assert 0 < await fake_redis.pttl("test:ttl") <= 30000
+
+    async def test_zero_limit_always_rejects(self, fake_redis):
+        limiter = RateLimiter(fake_redis)
+
+        result = await limiter.check([RateLimitRule("blocked", 0, 60)])
+
+        assert not result.allowed
+        assert result.retry_after == 60
+
+    async def test_no_rules_allows(self, fake_redis):
+        assert (await RateLimiter(fake_redis).check([])).allowed
+
+
+class TestTokenBucketLimiter:
+    """Test the in-process fallback buckets."""
+
+    def test_burst_up_to_limit(self, clock):
+        buckets = TokenBucketLimiter()
+        rule = RateLimitRule("burst", 3, 60)
+
+        results = [buckets.check([rule]) for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.counts for r in results] == [(1,), (2,), (3,), (3,)]
+        assert results[-1].retry_after == 20
+        assert all(r.backend == "local" for r in results)
+
+    def test_refill(self, clock):
+        buckets = TokenBucketLimiter()
+        rule = RateLimitRule("refill", 2, 60)
+        buckets.check([rule])
+        buckets.check([rule])
+        assert not buckets.check([rule]).allowed
+
+        # One token back every 30 seconds
+        clock[0] += 30
+        assert buckets.check([rule]).allowed
+        assert not buckets.check([rule]).allowed
+
+    def test_refill_is_capped_at_limit(self, clock):
+        buckets = TokenBucketLimiter()
+        rule = RateLimitRule("cap", 2, 60)
+        buckets.check([rule])
+
+        clock[0] += 3600
+        results = [buckets.check([rule]).allowed for _ in range(3)]
+
+        assert results == [True, True, False]
+
+    def test_request_takes_from_all_buckets_or_none(self, clock):
+        buckets = TokenBucketLimiter()
+        loose = RateLimitRule("loose", 10, 60)
+        tight = RateLimitRule("tight", 1, 60)
+
+        assert buckets.check([loose, tight]).allowed
+        assert not buckets.check([loose, tight]).allowed
+
+        # The rejected request did not spend a token from the loose bucket
+        assert buckets.check([loose]).counts == (2,)
+
+    def test_least_recently_used_key_is_evicted(self, clock):
+        buckets = TokenBucketLimiter(max_keys=2)
+        for key in ("a", "b", "c"):
+            buckets.check([RateLimitRule(key, 1, 60)])
+
+        assert set(buckets._buckets) == {"b", "c"}
+        assert buckets.check([RateLimitRule("a", 1, 60)]).allowed
+
+
+@pytest.mark.asyncio
+class TestRedisFallback:
+    """Test the fallback when Redis errors."""
+
+    @pytest.fixture
+    def broken_redis(self):
+        redis_client = MagicMock()
+        redis_client.register_script.return_value = MagicMock(
+            side_effect=ConnectionError("Redis is down")
+        )
+        return redis_client
+
+    async def test_redis_error_uses_local_buckets(self, broken_redis, clock):
+        limiter = RateLimiter(broken_redis)
+        rule = RateLimitRule("fallback", 2, 60)
+
+        results = [await limiter.check([rule]) for _ in range(3)]
+
+        assert [r.allowed for r in results] == [True, True, False]
+        assert all(r.backend == "local" for r in results)
+
+    async def test_fallback_survives_client_change(self, broken_redis, clock):
+        limiter = get_rate_limiter(broken_redis)
+        rule = RateLimitRule("shared", 1, 60)
+        await limiter.check([rule])
+
+        other_redis = MagicMock()
+        other_redis.register_script.return_value = MagicMock(
+            side_effect=ConnectionError("Redis is down")
+        )
+        rebuilt = get_rate_limiter(other_redis)
+
+        assert rebuilt is not limiter
+        assert rebuilt.fallback is limiter.fallback
+        assert not (await rebuilt.check([rule])).allowed
@@ -0,0 +1,182 @@
+"""Tests for the transaction-scoped Row Level Security context.
+
+The PostgreSQL tests need TEST_DATABASE_URL pointing at any database; they
+only read settings back with current_setting().
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "libs"))
+
+from python_shared.database.connection import (
+    RLS_CONTEXT_KEY,
+    set_async_rls_context,
+    set_rls_context,
+)
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+requires_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+CURRENT_CONTEXT = text(
+    "SELECT current_setting('app.current_user_id', true), "
+    "current_setting('app.current_professional_id', true)"
+)
+
+
+@pytest.fixture
+def engine():
+    """Engine with a single pooled connection, so reuse is observable."""
+    engine = create_engine(TEST_DATABASE_URL, pool_size=1, max_overflow=0)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def statements(engine):
+    """Statements sent on the engine, in order."""
+    sent = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield sent
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def _context(db) -> tuple:
+    return tuple(db.execute(CURRENT_CONTEXT).one())
+
+
+class TestSetRlsContext:
+    """Context bookkeeping that needs no database."""
+
+    def test_context_is_stored_without_a_query(self):
+        db = Session()
+        professional_id = uuid.uuid4()
+
+        set_rls_context(db, "user-1", professional_id)
+
+        assert db.info[RLS_CONTEXT_KEY] == {
+            "user_id": "user-1",
+            "professional_id": str(professional_id),
+        }
+        assert not db.in_transaction()
+
+    def test_missing_professional_is_empty_string(self):
+        db = Session()
+
+        set_rls_context(db, "user-1")
+
+        assert db.info[RLS_CONTEXT_KEY]["professional_id"] == ""
+
+
+@requires_postgres
+class TestRlsContextOnPostgres:
+    """after_begin applies the context once per transaction."""
+
+    def test_first_statement_of_the_transaction_sets_context(self, engine, statements):
+        user_id = str(uuid.uuid4())
+        with Session(engine) as db:
+            set_rls_context(db, user_id)
+            assert statements == []
+
+            assert _context(db) == (user_id, "")
+            assert "set_config" in statements[0]
+            assert len(statements) == 2
+
+    def test_context_is_reapplied_after_commit_and_rollback(self, engine, statements):
+        user_id = str(uuid.uuid4())
+        professional_id = str(uuid.uuid4())
+        with Session(engine) as db:
+            set_rls_context(db, user_id, professional_id)
+            assert _context(db) == (user_id, professional_id)
+            db.commit()
+
+            assert _context(db) == (user_id, professional_id)
+            db.rollback()
+
+            assert _context(db) == (user_id, professional_id)
+            assert sum("set_config" in s for s in statements) == 3
+
+    def test_context_is_set_inside_an_open_transaction_once(self, engine, statements):
+        user_id = str(uuid.uuid4())
+        with Session(engine) as db:
+            db.execute(text("SELECT 1"))
+
+            set_rls_context(db, user_id)
+            set_rls_context(db, user_id)
+
+            assert _context(db) == (user_id, "")
+            assert sum("set_config" in s for s in statements) == 1
+
+    def test_changed_context_replaces_the_old_one(self, engine):
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        with Session(engine) as db:
+            set_rls_context(db, first)
+            assert _context(db) == (first, "")
+
+            set_rls_context(db, second)
+            assert _context(db) == (second, "")
+
+    def test_context_does_not_leak_to_the_next_session(self, engine):
+        with Session(engine) as db:
+            set_rls_context(db, str(uuid.uuid4()))
+            _context(db)
+            db.commit()
+
+        with Session(engine) as db:
+            assert _context(db) in {("", ""), (None, None)}
+
+
+@requires_postgres
+@pytest.mark.asyncio
+class TestAsyncRlsContextOnPostgres:
+    """set_async_rls_context goes through the same after_begin hook."""
+
+    @pytest_asyncio.fixture
+    async def async_engine(self):
+        engine = create_async_engine(
+            TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+        )
+        yield engine
+        await engine.dispose()
+
+    async def test_context_is_kept_on_the_sync_session(self, async_engine):
+        user_id = str(uuid.uuid4())
+        async with AsyncSession(async_engine) as db:
+            await set_async_rls_context(db, user_id)
+
+            assert db.sync_session.info[RLS_CONTEXT_KEY]["user_id"] == user_id
+            assert not db.in_transaction()
+
+    async def test_context_is_reapplied_after_commit(self, async_engine):
+        user_id = str(uuid.uuid4())
+        professional_id = str(uuid.uuid4())
+        async with AsyncSession(async_engine) as db:
+            await set_async_rls_context(db, user_id, professional_id)
+            assert tuple((await db.execute(CURRENT_CONTEXT)).one()) == (user_id, professional_id)
+            await db.commit()
+
+            assert tuple((await db.execute(CURRENT_CONTEXT)).one()) == (user_id, professional_id)
+
+    async def test_context_is_set_inside_an_open_transaction(self, async_engine):
+        user_id = str(uuid.uuid4())
+        async with AsyncSession(async_engine) as db:
+            await db.execute(text("SELECT 1"))
+
+            await set_async_rls_context(db, user_id)
+
+            assert tuple((await db.execute(CURRENT_CONTEXT)).one()) == (user_id, "")